@@ -69,7 +69,7 @@ def serialize_coder(coder):
 
 def deserialize_coder(serialized):
   from apache_beam.internal import pickler
-  return pickler.loads(serialized.split(b'$', 1)[1])
+  return pickler.loads(serialized.split(b'$', 1)[1], memoize=True)
 # pylint: enable=wrong-import-order, wrong-import-position
 
 
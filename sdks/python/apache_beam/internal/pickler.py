@@ -31,8 +31,11 @@ the coders.*PickleCoder classes should be used instead.
 from __future__ import absolute_import
 
 import base64
+import contextlib
+import hashlib
 import logging
 import sys
+import threading
 import traceback
 import types
 import zlib
@@ -158,13 +161,19 @@ if 'save_module' in dir(dill.dill):
   # by referencing their module.
   old_save_module_dict = dill.dill.save_module_dict
   known_module_dicts = {}
+  # The number of modules loaded when known_module_dicts was last updated.
+  # Dicts of modules which are not known, e.g. that of __main__, are only
+  # looked up again once more modules were loaded.
+  known_module_count = [0]
 
   @dill.dill.register(dict)
   def new_save_module_dict(pickler, obj):
     obj_id = id(obj)
     if not known_module_dicts or '__file__' in obj or '__package__' in obj:
-      if obj_id not in known_module_dicts:
-        for m in sys.modules.values():
+      if (obj_id not in known_module_dicts
+          and len(sys.modules) != known_module_count[0]):
+        known_module_count[0] = len(sys.modules)
+        for m in list(sys.modules.values()):
           try:
             if (m
                 and m.__name__ != '__main__'
@@ -205,11 +214,155 @@ if 'save_module' in dir(dill.dill):
 logging.getLogger('dill').setLevel(logging.WARN)
 
 
+# The zlib compression level of the pickled payloads.
+DEFAULT_COMPRESSION_LEVEL = 9
+
+_MAX_CACHED_PAYLOADS = 1024
+_MAX_CACHED_PAYLOAD_BYTES = 64 << 20
+
+
+class DigestCache(object):
+  """A thread-safe cache of payloads, keyed by the digests of their sources.
+
+  Keying by digests bounds the size of the keys, however large the sources.
+  The cache is cleared once it would hold more than max_entries payloads, or
+  more than max_bytes of them.
+  """
+
+  def __init__(self, max_entries=_MAX_CACHED_PAYLOADS,
+               max_bytes=_MAX_CACHED_PAYLOAD_BYTES):
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self._payloads = {}
+    self._size_in_bytes = 0
+    self._lock = threading.Lock()
+
+  @staticmethod
+  def key(*sources):
+    """Returns the key of the payload derived from the given byte strings."""
+    return tuple(hashlib.sha256(source).digest() for source in sources)
+
+  def get(self, key):
+    return self._payloads.get(key)
+
+  def put(self, key, payload, size=None):
+    """Caches the payload, of len(payload) bytes unless size is given."""
+    if size is None:
+      size = len(payload)
+    if size > self.max_bytes:
+      return
+    with self._lock:
+      if (len(self._payloads) >= self.max_entries or
+          self._size_in_bytes + size > self.max_bytes):
+        self._payloads.clear()
+        self._size_in_bytes = 0
+      if key not in self._payloads:
+        self._payloads[key] = payload
+        self._size_in_bytes += size
+
+  def keys(self):
+    return list(self._payloads)
+
+  @property
+  def size_in_bytes(self):
+    return self._size_in_bytes
+
+
+# The payloads of the most recently pickled objects, keyed by the level they
+# were compressed with and the digest of their uncompressed pickle. Identical
+# objects hence share a single payload, which is not compressed again.
+_payloads_by_digest = DigestCache()
+
+
+class _Memo(threading.local):
+  """The state of the memoizing() scopes of a thread."""
+
+  def __init__(self):
+    super(_Memo, self).__init__()
+    self.depth = 0
+    self.compression_level = None
+    # The objects pickled, or unpickled, in the scope with their payload,
+    # keyed by _identity_key.
+    self.payloads = {}
+    # The objects unpickled with memoize=True in the scope, by payload.
+    self.objects = {}
+    # The objects unpickled in the scope, and their items, by id.
+    self.unpickled = {}
+
+
+_memo = _Memo()
+
+
+@contextlib.contextmanager
+def memoizing(compression_level=None):
+  """Memoizes the pickling and unpickling of this thread in the scope.
+
+  Within the scope, pickling an object pickled before returns the earlier
+  payload. Tuples and dicts are memoized by the identity of their items,
+  so that e.g. DoFns shared by several transforms are pickled once, and so
+  are objects which were unpickled in the scope. Unpickling a payload with
+  memoize=True returns the object unpickled from it before, if any.
+
+  The objects pickled or unpickled in the scope must not be mutated in it.
+
+  Args:
+    compression_level: the zlib compression level of the payloads pickled in
+      the scope, or None for DEFAULT_COMPRESSION_LEVEL.
+  """
+  previous_level = _memo.compression_level
+  if compression_level is not None:
+    _memo.compression_level = compression_level
+  _memo.depth += 1
+  try:
+    yield
+  finally:
+    _memo.depth -= 1
+    _memo.compression_level = previous_level
+    if not _memo.depth:
+      _memo.payloads.clear()
+      _memo.objects.clear()
+      _memo.unpickled.clear()
+
+
+def is_unpickled(o):
+  """Returns whether o was unpickled in the current memoizing() scope.
+
+  The items of unpickled tuples, e.g. the DoFn of a ParDo payload, are
+  considered unpickled as well. Such objects need not be checked to be
+  picklable.
+  """
+  return bool(_memo.depth) and id(o) in _memo.unpickled
+
+
+def _identity_key(o):
+  if type(o) is tuple:
+    return (tuple,) + tuple(_identity_key(item) for item in o)
+  elif type(o) is dict:
+    return (dict,) + tuple(
+        (id(key), _identity_key(value)) for key, value in o.items())
+  else:
+    return id(o)
+
+
+def _compress(s, compression_level):
+  key = (compression_level,) + DigestCache.key(s)
+  payload = _payloads_by_digest.get(key)
+  if payload is None:
+    payload = base64.b64encode(zlib.compress(s, compression_level))
+    _payloads_by_digest.put(key, payload)
+  return payload
+
+
 # TODO(ccy): Currently, there are still instances of pickler.dumps() and
 # pickler.loads() being used for data, which results in an unnecessary base64
 # encoding.  This should be cleaned up.
-def dumps(o, enable_trace=True):
+def dumps(o, enable_trace=True, compression_level=None):
   """For internal use only; no backwards-compatibility guarantees."""
+  if _memo.depth:
+    key = _identity_key(o)
+    memoized = _memo.payloads.get(key)
+    if memoized is not None:
+      return memoized[1]
 
   try:
     s = dill.dumps(o)
@@ -222,17 +375,33 @@ def dumps(o, enable_trace=True):
   finally:
     dill.dill._trace(False)  # pylint: disable=protected-access
 
-  # Compress as compactly as possible to decrease peak memory usage (of multiple
-  # in-memory copies) and free up some possibly large and no-longer-needed
-  # memory.
-  c = zlib.compress(s, 9)
+  if compression_level is None:
+    compression_level = (
+        _memo.compression_level if _memo.compression_level is not None
+        else DEFAULT_COMPRESSION_LEVEL)
+  payload = _compress(s, compression_level)
   del s
 
-  return base64.b64encode(c)
+  if _memo.depth:
+    # The object is held to keep the ids of the key valid.
+    _memo.payloads[key] = o, payload
+  return payload
 
 
-def loads(encoded, enable_trace=True):
-  """For internal use only; no backwards-compatibility guarantees."""
+def loads(encoded, enable_trace=True, memoize=False):
+  """For internal use only; no backwards-compatibility guarantees.
+
+  Args:
+    encoded: a payload returned by dumps().
+    enable_trace: whether to trace the unpickling on failure.
+    memoize: whether a memoizing() scope may return the object it unpickled
+      from the same payload before, rather than a new one. This should only
+      be set if the unpickled objects may be shared.
+  """
+  if _memo.depth and memoize:
+    o = _memo.objects.get(encoded, _memo)
+    if o is not _memo:
+      return o
 
   c = base64.b64decode(encoded)
 
@@ -240,16 +409,27 @@ def loads(encoded, enable_trace=True):
   del c  # Free up some possibly large and no-longer-needed memory.
 
   try:
-    return dill.loads(s)
+    o = dill.loads(s)
   except Exception:          # pylint: disable=broad-except
     if enable_trace:
       dill.dill._trace(True)   # pylint: disable=protected-access
-      return dill.loads(s)
+      o = dill.loads(s)
     else:
       raise
   finally:
     dill.dill._trace(False)  # pylint: disable=protected-access
 
+  if _memo.depth:
+    if memoize:
+      _memo.objects[encoded] = o
+    # Pickling the object again results in the same payload.
+    _memo.payloads[_identity_key(o)] = o, encoded
+    _memo.unpickled[id(o)] = o
+    if type(o) is tuple:
+      for item in o:
+        _memo.unpickled[id(item)] = item
+  return o
+
 
 def dump_session(file_path):
   """For internal use only; no backwards-compatibility guarantees.
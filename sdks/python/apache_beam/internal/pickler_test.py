@@ -21,7 +21,10 @@ from __future__ import absolute_import
 
 import unittest
 
+import mock
+
 from apache_beam.internal import module_test
+from apache_beam.internal import pickler
 from apache_beam.internal.pickler import dumps
 from apache_beam.internal.pickler import loads
 
@@ -86,6 +89,48 @@ class PicklerTest(unittest.TestCase):
     self.assertEquals('RecursiveClass:abc',
                       loads(dumps(module_test.RecursiveClass('abc').datum)))
 
+  def test_compression_level(self):
+    obj = [module_test.XYZ_OBJECT] * 100
+    uncompressed = dumps(obj, compression_level=0)
+    self.assertGreater(len(uncompressed), len(dumps(obj)))
+    self.assertEquals(
+        ['abc', 'def'], loads(uncompressed)[0].foo('abc def'))
+    with pickler.memoizing(compression_level=0):
+      self.assertEqual(uncompressed, dumps(obj))
+
+  def test_payload_cache_is_bounded_by_size(self):
+    obj = [module_test.XYZ_OBJECT] * 100
+    payload = dumps(obj, compression_level=0)
+    cache = pickler._payloads_by_digest
+    with mock.patch.object(cache, 'max_bytes', 2 * len(payload) + 1):
+      for i in range(3):
+        dumps(obj + [i], compression_level=0)
+        self.assertLessEqual(cache.size_in_bytes, cache.max_bytes)
+    # The cache holds digests of the pickles rather than the pickles.
+    for _, digest in cache.keys():
+      self.assertEqual(32, len(digest))
+
+  def test_memoizing_dumps(self):
+    fn = lambda x: x
+    with pickler.memoizing():
+      payload = dumps((fn, ()))
+      with mock.patch('dill.dumps') as dill_dumps:
+        # The tuple holds the same items, hence is not pickled again.
+        self.assertEqual(payload, dumps((fn, ())))
+        dill_dumps.assert_not_called()
+
+  def test_memoizing_loads(self):
+    payload = dumps(module_test.TopClass.NestedClass('abc'))
+    with pickler.memoizing():
+      obj = loads(payload, memoize=True)
+      self.assertIs(obj, loads(payload, memoize=True))
+      self.assertIsNot(obj, loads(payload))
+      # Objects unpickled in the scope are not pickled again.
+      with mock.patch('dill.dumps') as dill_dumps:
+        self.assertEqual(payload, dumps(obj))
+        dill_dumps.assert_not_called()
+    self.assertIsNot(obj, loads(payload, memoize=True))
+
 
 if __name__ == '__main__':
   unittest.main()
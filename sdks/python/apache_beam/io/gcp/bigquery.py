@@ -125,10 +125,13 @@ import decimal
 import json
 import logging
 import re
+import threading
 import time
 import uuid
 from builtins import object
+from builtins import range
 from builtins import zip
+from concurrent import futures
 
 from future.utils import iteritems
 from future.utils import itervalues
@@ -139,12 +142,20 @@ from apache_beam.internal.gcp import auth
 from apache_beam.internal.gcp.json_value import from_json_value
 from apache_beam.internal.gcp.json_value import to_json_value
 from apache_beam.internal.http_client import get_new_http
+from apache_beam.io import avroio
+from apache_beam.io import textio
+from apache_beam.io.filesystems import FileSystems
 from apache_beam.io.gcp.internal.clients import bigquery
 from apache_beam.options.pipeline_options import GoogleCloudOptions
+from apache_beam.pvalue import AsList
+from apache_beam.pvalue import AsSingleton
 from apache_beam.runners.dataflow.native_io import iobase as dataflow_io
+from apache_beam.transforms import Create
 from apache_beam.transforms import DoFn
+from apache_beam.transforms import Map
 from apache_beam.transforms import ParDo
 from apache_beam.transforms import PTransform
+from apache_beam.transforms import combiners
 from apache_beam.transforms.display import DisplayDataItem
 from apache_beam.utils import retry
 
@@ -162,11 +173,20 @@ __all__ = [
     'BigQueryDisposition',
     'BigQuerySource',
     'BigQuerySink',
+    'ReadFromBigQuery',
     'WriteToBigQuery',
     ]
 
 JSON_COMPLIANCE_ERROR = 'NAN, INF and -INF values are not JSON compliant.'
 MAX_RETRIES = 3
+DEFAULT_MAX_CONCURRENT_INSERTS = 4
+
+# The insertErrors reasons of rows which may be inserted by retrying them.
+# A row is 'stopped' when another row of its request failed, so it is only
+# retried if the errors of the other rows are transient too.
+_TRANSIENT_INSERT_ERROR_REASONS = frozenset([
+    'backendError', 'internalError', 'rateLimitExceeded', 'stopped',
+    'timeout'])
 
 
 def default_encoder(obj):
@@ -632,7 +652,7 @@ class BigQueryReader(dataflow_io.NativeSourceReader):
   """A reader for a BigQuery source."""
 
   def __init__(self, source, test_bigquery_client=None, use_legacy_sql=True,
-               flatten_results=True):
+               flatten_results=True, prefetch_pages=True):
     self.source = source
     self.test_bigquery_client = test_bigquery_client
     if auth.is_running_in_gce:
@@ -656,6 +676,9 @@ class BigQueryReader(dataflow_io.NativeSourceReader):
     self.schema = None
     self.use_legacy_sql = use_legacy_sql
     self.flatten_results = flatten_results
+    # Whether to fetch the next page of results while the current one is
+    # being consumed.
+    self.prefetch_pages = prefetch_pages
 
     if self.source.table_reference is not None:
       # If table schema did not define a project we default to executing
@@ -711,17 +734,27 @@ class BigQueryReader(dataflow_io.NativeSourceReader):
     self.client.clean_up_temporary_dataset(self.executing_project)
 
   def __iter__(self):
-    for rows, schema in self.client.run_query(
+    pages = self.client.run_query(
         project_id=self.executing_project, query=self.query,
         use_legacy_sql=self.use_legacy_sql,
-        flatten_results=self.flatten_results):
-      if self.schema is None:
-        self.schema = schema
-      for row in rows:
-        if self.row_as_dict:
-          yield self.client.convert_row_to_dict(row, schema)
-        else:
-          yield row
+        flatten_results=self.flatten_results,
+        prefetch_pages=self.prefetch_pages)
+    converted_schema = convert_row = None
+    try:
+      for rows, schema in pages:
+        if self.schema is None:
+          self.schema = schema
+        if not self.row_as_dict:
+          for row in rows:
+            yield row
+          continue
+        if schema is not converted_schema:
+          convert_row = self.client.compile_row_converter(schema)
+          converted_schema = schema
+        for row in rows:
+          yield convert_row(row)
+    finally:
+      pages.close()
 
 
 class BigQueryWriter(dataflow_io.NativeSinkWriter):
@@ -894,6 +927,86 @@ class BigQueryWrapper(object):
     response = self.client.jobs.Insert(request)
     return response.jobReference.jobId
 
+  @retry.with_exponential_backoff(
+      num_retries=MAX_RETRIES,
+      retry_filter=retry.retry_on_server_errors_and_timeout_filter)
+  def _start_export_job(self, project_id, table_reference, destination_uris,
+                        destination_format, job_id):
+    reference = bigquery.JobReference(jobId=job_id, projectId=project_id)
+    request = bigquery.BigqueryJobsInsertRequest(
+        projectId=project_id,
+        job=bigquery.Job(
+            configuration=bigquery.JobConfiguration(
+                extract=bigquery.JobConfigurationExtract(
+                    sourceTable=table_reference,
+                    destinationUris=destination_uris,
+                    destinationFormat=destination_format)),
+            jobReference=reference))
+
+    response = self.client.jobs.Insert(request)
+    return response.jobReference.jobId
+
+  @retry.with_exponential_backoff(
+      num_retries=MAX_RETRIES,
+      retry_filter=retry.retry_on_server_errors_and_timeout_filter)
+  def _get_job(self, project_id, job_id):
+    request = bigquery.BigqueryJobsGetRequest(
+        jobId=job_id, projectId=project_id)
+    return self.client.jobs.Get(request)
+
+  def wait_for_bq_job(self, project_id, job_id, sleep_duration_sec=5):
+    """Polls a BigQuery job until it is done.
+
+    Raises:
+      RuntimeError: If the job completed with an error.
+    """
+    while True:
+      job = self._get_job(project_id, job_id)
+      if job.status is not None and job.status.state == 'DONE':
+        if job.status.errorResult:
+          raise RuntimeError(
+              'BigQuery job %s failed. Error Result: %s'
+              % (job_id, job.status.errorResult))
+        return job
+      logging.info('Waiting on BigQuery job %s ...', job_id)
+      time.sleep(sleep_duration_sec)
+
+  def export_table(self, project_id, table_reference, destination_pattern,
+                   destination_format):
+    """Exports a table to files matching a single-wildcard destination URI.
+
+    Args:
+      project_id: The project id running the export job.
+      table_reference: A bigquery.TableReference of the table to export.
+      destination_pattern: A URI with a single ``*`` wildcard under which the
+        exported files are written.
+      destination_format: AVRO or NEWLINE_DELIMITED_JSON.
+    """
+    job_id = self._start_export_job(
+        project_id, table_reference, [destination_pattern], destination_format,
+        job_id=uuid.uuid4().hex)
+    self.wait_for_bq_job(project_id, job_id)
+
+  def export_query_results(self, project_id, query, use_legacy_sql,
+                           flatten_results, destination_pattern,
+                           destination_format):
+    """Runs a query into a temporary table and exports the table to files.
+
+    The temporary dataset holding the query results is deleted afterwards.
+    """
+    self.create_temporary_dataset(
+        project_id,
+        location=self.get_query_location(project_id, query, use_legacy_sql))
+    try:
+      job_id = self._start_query_job(
+          project_id, query, use_legacy_sql, flatten_results,
+          job_id=uuid.uuid4().hex)
+      self.wait_for_bq_job(project_id, job_id)
+      self.export_table(project_id, self._get_temp_table(project_id),
+                        destination_pattern, destination_format)
+    finally:
+      self.clean_up_temporary_dataset(project_id)
+
   @retry.with_exponential_backoff(
       num_retries=MAX_RETRIES,
       retry_filter=retry.retry_on_server_errors_and_timeout_filter)
@@ -1143,7 +1256,12 @@ class BigQueryWrapper(object):
         return created_table
 
   def run_query(self, project_id, query, use_legacy_sql, flatten_results,
-                dry_run=False):
+                dry_run=False, prefetch_pages=False):
+    """Runs a query and yields its results as (rows, schema) pages.
+
+    If prefetch_pages is True, the next page is fetched on a background thread
+    while the current page is being consumed.
+    """
     job_id = self._start_query_job(project_id, query, use_legacy_sql,
                                    flatten_results, job_id=uuid.uuid4().hex,
                                    dry_run=dry_run)
@@ -1151,6 +1269,13 @@ class BigQueryWrapper(object):
       # If this was a dry run then the fact that we get here means the
       # query has no errors. The start_query_job would raise an error otherwise.
       return
+    pages = self._query_result_pages(project_id, query, job_id)
+    if prefetch_pages:
+      pages = _prefetch(pages)
+    for page in pages:
+      yield page
+
+  def _query_result_pages(self, project_id, query, job_id):
     page_token = None
     while True:
       response = self._get_query_results(project_id, job_id, page_token)
@@ -1169,7 +1294,8 @@ class BigQueryWrapper(object):
         break
       page_token = response.pageToken
 
-  def insert_rows(self, project_id, dataset_id, table_id, rows):
+  def insert_rows(self, project_id, dataset_id, table_id, rows,
+                  insert_ids=None):
     """Inserts rows into the specified table.
 
     Args:
@@ -1178,6 +1304,9 @@ class BigQueryWrapper(object):
       table_id: The table id.
       rows: A list of plain Python dictionaries. Each dictionary is a row and
         each key in it is the name of a field.
+      insert_ids: An optional list with one unique ID per row. Passing the same
+        IDs again when retrying rows lets BigQuery deduplicate them. If None,
+        new IDs are generated.
 
     Returns:
       A tuple (bool, errors). If first element is False then the second element
@@ -1190,8 +1319,10 @@ class BigQueryWrapper(object):
     # BigQuery will do a best-effort if unique IDs are provided. This situation
     # can happen during retries on failures.
     # TODO(silviuc): Must add support to writing TableRow's instead of dicts.
+    if insert_ids is None:
+      insert_ids = [self.unique_row_id for _ in rows]
     final_rows = []
-    for row in rows:
+    for row, insert_id in zip(rows, insert_ids):
       json_object = bigquery.JsonObject()
       for k, v in iteritems(row):
         if isinstance(v, decimal.Decimal):
@@ -1204,53 +1335,20 @@ class BigQueryWrapper(object):
                 key=k, value=to_json_value(v)))
       final_rows.append(
           bigquery.TableDataInsertAllRequest.RowsValueListEntry(
-              insertId=str(self.unique_row_id),
+              insertId=str(insert_id),
               json=json_object))
     result, errors = self._insert_all_rows(
         project_id, dataset_id, table_id, final_rows)
     return result, errors
 
   def _convert_cell_value_to_dict(self, value, field):
-    if field.type == 'STRING':
-      # Input: "XYZ" --> Output: "XYZ"
-      return value
-    elif field.type == 'BOOLEAN':
-      # Input: "true" --> Output: True
-      return value == 'true'
-    elif field.type == 'INTEGER':
-      # Input: "123" --> Output: 123
-      return int(value)
-    elif field.type == 'FLOAT':
-      # Input: "1.23" --> Output: 1.23
-      return float(value)
-    elif field.type == 'TIMESTAMP':
-      # The UTC should come from the timezone library but this is a known
-      # issue in python 2.7 so we'll just hardcode it as we're reading using
-      # utcfromtimestamp.
-      # Input: 1478134176.985864 --> Output: "2016-11-03 00:49:36.985864 UTC"
-      dt = datetime.datetime.utcfromtimestamp(float(value))
-      return dt.strftime('%Y-%m-%d %H:%M:%S.%f UTC')
-    elif field.type == 'BYTES':
-      # Input: "YmJi" --> Output: "YmJi"
-      return value
-    elif field.type == 'DATE':
-      # Input: "2016-11-03" --> Output: "2016-11-03"
-      return value
-    elif field.type == 'DATETIME':
-      # Input: "2016-11-03T00:49:36" --> Output: "2016-11-03T00:49:36"
-      return value
-    elif field.type == 'TIME':
-      # Input: "00:49:36" --> Output: "00:49:36"
-      return value
-    elif field.type == 'RECORD':
+    if field.type == 'RECORD':
       # Note that a schema field object supports also a RECORD type. However
       # when querying, the repeated and/or record fields are flattened
       # unless we pass the flatten_results flag as False to the source
       return self.convert_row_to_dict(value, field)
-    elif field.type == 'NUMERIC':
-      return decimal.Decimal(value)
-    elif field.type == 'GEOGRAPHY':
-      return value
+    elif field.type in _CELL_VALUE_CONVERTERS:
+      return _CELL_VALUE_CONVERTERS[field.type](value)
     else:
       raise RuntimeError('Unexpected field type: %s' % field.type)
 
@@ -1282,20 +1380,145 @@ class BigQueryWrapper(object):
         result[field.name] = self._convert_cell_value_to_dict(value, field)
     return result
 
+  def compile_row_converter(self, schema):
+    """Returns a function converting TableRow instances to Python dicts.
+
+    The result is the same as :meth:`convert_row_to_dict`, but the schema is
+    only walked once: each field is compiled into a conversion function, so
+    converting a row does not dispatch on the field types again.
+
+    Args:
+      schema: A bigquery.TableSchema instance.
+    """
+    fields = [(field.name, _compile_field_converter(field))
+              for field in schema.fields]
+
+    def convert_row(row):
+      result = {}
+      for (name, convert_field), cell in zip(fields, row.f):
+        value = cell.v
+        result[name] = convert_field(
+            None if value is None else from_json_value(value))
+      return result
+    return convert_row
+
+
+def _prefetch(iterator):
+  """Yields the items of iterator, computing each next item in the background.
+  """
+  executor = futures.ThreadPoolExecutor(max_workers=1)
+  done = object()
+  try:
+    next_item = executor.submit(next, iterator, done)
+    while True:
+      item = next_item.result()
+      if item is done:
+        return
+      next_item = executor.submit(next, iterator, done)
+      yield item
+  finally:
+    executor.shutdown()
+
+
+def _timestamp_to_string(value):
+  # The UTC should come from the timezone library but this is a known
+  # issue in python 2.7 so we'll just hardcode it as we're reading using
+  # utcfromtimestamp.
+  # Input: 1478134176.985864 --> Output: "2016-11-03 00:49:36.985864 UTC"
+  dt = datetime.datetime.utcfromtimestamp(float(value))
+  return dt.strftime('%Y-%m-%d %H:%M:%S.%f UTC')
+
+
+def _identity(value):
+  return value
+
+
+# The conversions of the JSON values of cells by field type, except RECORD.
+_CELL_VALUE_CONVERTERS = {
+    # Input: "XYZ" --> Output: "XYZ"
+    'STRING': _identity,
+    # Input: "true" --> Output: True
+    'BOOLEAN': lambda value: value == 'true',
+    # Input: "123" --> Output: 123
+    'INTEGER': int,
+    # Input: "1.23" --> Output: 1.23
+    'FLOAT': float,
+    'TIMESTAMP': _timestamp_to_string,
+    # Input: "YmJi" --> Output: "YmJi"
+    'BYTES': _identity,
+    # Input: "2016-11-03" --> Output: "2016-11-03"
+    'DATE': _identity,
+    # Input: "2016-11-03T00:49:36" --> Output: "2016-11-03T00:49:36"
+    'DATETIME': _identity,
+    # Input: "00:49:36" --> Output: "00:49:36"
+    'TIME': _identity,
+    'NUMERIC': decimal.Decimal,
+    'GEOGRAPHY': _identity,
+}
+
+
+def _compile_field_converter(field):
+  """Compiles a schema field into a function converting its cell values.
+
+  The function takes the JSON value of a cell (None if the cell is empty) and
+  mirrors what BigQueryWrapper.convert_row_to_dict does for the field.
+  """
+  if field.type == 'RECORD':
+    subfields = [(subfield.name, _compile_field_converter(subfield))
+                 for subfield in field.fields]
+
+    def convert_value(value):
+      result = {}
+      for (name, convert_subfield), cell in zip(subfields, value['f']):
+        result[name] = convert_subfield(cell.get('v'))
+      return result
+  elif field.type in _CELL_VALUE_CONVERTERS:
+    convert_value = _CELL_VALUE_CONVERTERS[field.type]
+  else:
+    raise RuntimeError('Unexpected field type: %s' % field.type)
+
+  if field.mode == 'REPEATED':
+    def convert_field(value):
+      if value is None:
+        # Ideally this should never happen as repeated fields default to
+        # returning an empty list
+        return []
+      return [convert_value(x['v']) for x in value]
+  elif field.mode == 'NULLABLE':
+    def convert_field(value):
+      return None if value is None else convert_value(value)
+  else:
+    def convert_field(value):
+      if value is None:
+        raise ValueError('Received \'None\' as the value for the field %s '
+                         'but the field is not NULLABLE.' % field.name)
+      return convert_value(value)
+  return convert_field
+
 
 class BigQueryWriteFn(DoFn):
   """A ``DoFn`` that streams writes to BigQuery once the table is created.
+
+  Rows are buffered per destination table and sent with streaming inserts.
+  Up to ``max_concurrent_inserts`` insert requests are kept in flight at once,
+  tables are only looked up or created the first time a destination is seen
+  by this instance, and rows reported as failed in ``insertErrors`` for
+  transient reasons are retried (with the same insert IDs) without resending
+  the rows that made it. Other errors, e.g. invalid rows, fail the bundle.
   """
 
   def __init__(self, table_id, dataset_id, project_id, batch_size, schema,
-               create_disposition, write_disposition, test_client):
+               create_disposition, write_disposition, test_client,
+               max_concurrent_inserts=1, max_insert_retries=MAX_RETRIES):
     """Initialize a WriteToBigQuery transform.
 
     Args:
       table_id: The ID of the table. The ID must contain only letters
         (a-z, A-Z), numbers (0-9), or underscores (_). If dataset argument is
         None then the table argument must contain the entire table reference
-        specified as: 'DATASET.TABLE' or 'PROJECT:DATASET.TABLE'.
+        specified as: 'DATASET.TABLE' or 'PROJECT:DATASET.TABLE'. It can also
+        be a callable that receives an element and returns its destination
+        table, as a table reference string or a bigquery.TableReference.
       dataset_id: The ID of the dataset containing this table or null if the
         table reference is specified entirely by the table argument.
       project_id: The ID of the project containing this table or null if the
@@ -1319,6 +1542,10 @@ class BigQueryWriteFn(DoFn):
         -  BigQueryDisposition.WRITE_EMPTY: fail the write if table not empty.
         For streaming pipelines WriteTruncate can not be used.
       test_client: Override the default bigquery client used for testing.
+      max_concurrent_inserts: Maximum number of insert requests in flight at
+        the same time. With 1, batches are inserted synchronously.
+      max_insert_retries: Number of times rows reported as failed by BigQuery
+        for transient reasons are retried before the bundle fails.
     """
     self.table_id = table_id
     self.dataset_id = dataset_id
@@ -1327,12 +1554,17 @@ class BigQueryWriteFn(DoFn):
     self.test_client = test_client
     self.create_disposition = create_disposition
     self.write_disposition = write_disposition
-    self._rows_buffer = []
     # The default batch size is 500
     self._max_batch_size = batch_size or 500
+    self._max_concurrent_inserts = max_concurrent_inserts or 1
+    self._max_insert_retries = max_insert_retries
+    self._created_tables = set()
+    self.bigquery_wrapper = None
+    self._thread_local = None
+    self._executor = None
 
   def display_data(self):
-    return {'table_id': self.table_id,
+    return {'table_id': str(self.table_id),
             'dataset_id': self.dataset_id,
             'project_id': self.project_id,
             'schema': str(self.schema),
@@ -1358,36 +1590,141 @@ class BigQueryWriteFn(DoFn):
       raise TypeError('Unexpected schema argument: %s.' % schema)
 
   def start_bundle(self):
-    self._rows_buffer = []
-    self.table_schema = self.get_table_schema(self.schema)
-
-    self.bigquery_wrapper = BigQueryWrapper(client=self.test_client)
+    # Mapping of (project, dataset, table) -> list of buffered rows.
+    self._rows_buffers = collections.defaultdict(list)
+    self._pending_inserts = []
+
+    # The clients and insert threads are created once, and reused by the
+    # bundles processed by this instance.
+    if self.bigquery_wrapper is None:
+      self.table_schema = self.get_table_schema(self.schema)
+      self.bigquery_wrapper = BigQueryWrapper(client=self.test_client)
+      self._thread_local = threading.local()
+      self._thread_local.bigquery_wrapper = self.bigquery_wrapper
+    if self._executor is None and self._max_concurrent_inserts > 1:
+      self._executor = futures.ThreadPoolExecutor(
+          max_workers=self._max_concurrent_inserts)
+    if not callable(self.table_id):
+      self._create_table_if_needed(
+          (self.project_id, self.dataset_id, self.table_id))
+
+  def _get_destination(self, element):
+    if not callable(self.table_id):
+      return self.project_id, self.dataset_id, self.table_id
+    table_reference = _parse_table_reference(
+        self.table_id(element), self.dataset_id, self.project_id)
+    return (table_reference.projectId or self.project_id,
+            table_reference.datasetId,
+            table_reference.tableId)
+
+  def _create_table_if_needed(self, destination):
+    if destination in self._created_tables:
+      return
+    project_id, dataset_id, table_id = destination
     self.bigquery_wrapper.get_or_create_table(
-        self.project_id, self.dataset_id, self.table_id, self.table_schema,
+        project_id, dataset_id, table_id, self.table_schema,
         self.create_disposition, self.write_disposition)
+    self._created_tables.add(destination)
 
   def process(self, element, unused_create_fn_output=None):
-    self._rows_buffer.append(element)
-    if len(self._rows_buffer) >= self._max_batch_size:
-      self._flush_batch()
+    try:
+      destination = self._get_destination(element)
+      self._create_table_if_needed(destination)
+      rows = self._rows_buffers[destination]
+      rows.append(element)
+      if len(rows) >= self._max_batch_size:
+        self._flush_batch(destination)
+    except:
+      self._shutdown_executor()
+      raise
 
   def finish_bundle(self):
-    if self._rows_buffer:
-      self._flush_batch()
-    self._rows_buffer = []
-
-  def _flush_batch(self):
-    # Flush the current batch of rows to BigQuery.
-    passed, errors = self.bigquery_wrapper.insert_rows(
-        project_id=self.project_id, dataset_id=self.dataset_id,
-        table_id=self.table_id, rows=self._rows_buffer)
-    if not passed:
-      raise RuntimeError('Could not successfully insert rows to BigQuery'
-                         ' table [%s:%s.%s]. Errors: %s'%
-                         (self.project_id, self.dataset_id,
-                          self.table_id, errors))
-    logging.debug("Successfully wrote %d rows.", len(self._rows_buffer))
-    self._rows_buffer = []
+    try:
+      for destination in list(self._rows_buffers):
+        self._flush_batch(destination)
+      for pending in self._pending_inserts:
+        pending.result()
+    except:
+      self._shutdown_executor()
+      raise
+    finally:
+      self._pending_inserts = []
+      self._rows_buffers.clear()
+
+  def teardown(self):
+    """Stops the insert threads of this instance."""
+    self._shutdown_executor()
+
+  def _shutdown_executor(self):
+    # The inserts of a failed bundle are abandoned, and the threads are
+    # recreated by the next bundle.
+    if self._executor is not None:
+      self._executor.shutdown(wait=False)
+      self._executor = None
+
+  def _flush_batch(self, destination):
+    # Flush the current batch of rows of a destination to BigQuery.
+    rows = self._rows_buffers.pop(destination, None)
+    if not rows:
+      return
+    insert_ids = [self.bigquery_wrapper.unique_row_id for _ in rows]
+    if self._executor is None:
+      self._insert_rows(destination, rows, insert_ids)
+      return
+    # Bound the number of inserts in flight, surfacing failures early.
+    if len(self._pending_inserts) >= self._max_concurrent_inserts:
+      done, not_done = futures.wait(
+          self._pending_inserts, return_when=futures.FIRST_COMPLETED)
+      for pending in done:
+        pending.result()
+      self._pending_inserts = list(not_done)
+    self._pending_inserts.append(self._executor.submit(
+        self._insert_rows, destination, rows, insert_ids))
+
+  def _insert_rows(self, destination, rows, insert_ids):
+    """Inserts rows, retrying only the ones reported in insertErrors.
+
+    Raises:
+      RuntimeError: if rows failed for reasons which are not transient, or
+        still failed after max_insert_retries retries.
+    """
+    # The underlying HTTP client is not thread-safe, so every insert thread
+    # uses a client of its own.
+    bigquery_wrapper = getattr(self._thread_local, 'bigquery_wrapper', None)
+    if bigquery_wrapper is None:
+      bigquery_wrapper = BigQueryWrapper(client=self.test_client)
+      self._thread_local.bigquery_wrapper = bigquery_wrapper
+    project_id, dataset_id, table_id = destination
+    retry_intervals = iter(retry.FuzzedExponentialIntervals(
+        initial_delay_secs=1, num_retries=self._max_insert_retries,
+        max_delay_secs=60))
+    while True:
+      passed, errors = bigquery_wrapper.insert_rows(
+          project_id=project_id, dataset_id=dataset_id, table_id=table_id,
+          rows=rows, insert_ids=insert_ids)
+      if passed:
+        logging.debug('Successfully wrote %d rows.', len(rows))
+        return
+      if any(error.index is None for error in errors):
+        # Errors that do not point at a row apply to the whole request.
+        failed = list(range(len(rows)))
+      else:
+        failed = sorted(set(error.index for error in errors))
+      reasons = set(proto.reason for error in errors for proto in error.errors)
+      sleep_secs = None
+      if reasons <= _TRANSIENT_INSERT_ERROR_REASONS:
+        sleep_secs = next(retry_intervals, None)
+      if sleep_secs is None:
+        raise RuntimeError('Could not successfully insert rows to BigQuery'
+                           ' table [%s:%s.%s]. Errors: %s'%
+                           (project_id, dataset_id, table_id, errors))
+      logging.info('Retrying %d of %d rows that failed to be inserted into '
+                   'table [%s:%s.%s] in %.1f seconds. Errors: %s',
+                   len(failed), len(rows), project_id, dataset_id, table_id,
+                   sleep_secs, errors)
+      time.sleep(sleep_secs)
+      rows = [rows[i] for i in failed]
+      insert_ids = [insert_ids[i] for i in failed]
 
 
 class WriteToBigQuery(PTransform):
@@ -1395,15 +1732,21 @@ class WriteToBigQuery(PTransform):
   def __init__(self, table, dataset=None, project=None, schema=None,
                create_disposition=BigQueryDisposition.CREATE_IF_NEEDED,
                write_disposition=BigQueryDisposition.WRITE_APPEND,
-               batch_size=None, test_client=None):
+               batch_size=None, test_client=None,
+               max_concurrent_inserts=DEFAULT_MAX_CONCURRENT_INSERTS,
+               max_insert_retries=MAX_RETRIES):
     """Initialize a WriteToBigQuery transform.
 
     Args:
-      table (str): The ID of the table. The ID must contain only letters
-        ``a-z``, ``A-Z``, numbers ``0-9``, or underscores ``_``. If dataset
-        argument is :data:`None` then the table argument must contain the
-        entire table reference specified as: ``'DATASET.TABLE'`` or
-        ``'PROJECT:DATASET.TABLE'``.
+      table (str, callable): The ID of the table. The ID must contain only
+        letters ``a-z``, ``A-Z``, numbers ``0-9``, or underscores ``_``. If
+        dataset argument is :data:`None` then the table argument must contain
+        the entire table reference specified as: ``'DATASET.TABLE'`` or
+        ``'PROJECT:DATASET.TABLE'``. It can also be a callable that receives
+        an element and returns its destination table, in either of those
+        forms or as a :class:`~apache_beam.io.gcp.internal.clients.bigquery.\
+bigquery_v2_messages.TableReference`; all the destinations share the same
+        schema and dispositions.
       dataset (str): The ID of the dataset containing this table or
         :data:`None` if the table reference is specified entirely by the table
         argument.
@@ -1441,8 +1784,19 @@ bigquery_v2_messages.TableSchema`
       batch_size (int): Number of rows to be written to BQ per streaming API
         insert.
       test_client: Override the default bigquery client used for testing.
+      max_concurrent_inserts (int): Maximum number of streaming insert
+        requests each worker keeps in flight at once.
+      max_insert_retries (int): Number of times the rows that BigQuery reports
+        as failed are retried before the write fails.
     """
-    self.table_reference = _parse_table_reference(table, dataset, project)
+    if callable(table):
+      self.table_reference = None
+      self.table_fn = table
+      self.dataset = dataset
+      self.project = project
+    else:
+      self.table_reference = _parse_table_reference(table, dataset, project)
+      self.table_fn = None
     self.create_disposition = BigQueryDisposition.validate_create(
         create_disposition)
     self.write_disposition = BigQueryDisposition.validate_write(
@@ -1450,6 +1804,8 @@ bigquery_v2_messages.TableSchema`
     self.schema = schema
     self.batch_size = batch_size
     self.test_client = test_client
+    self.max_concurrent_inserts = max_concurrent_inserts
+    self.max_insert_retries = max_insert_retries
 
   @staticmethod
   def get_table_schema_from_string(schema):
@@ -1530,18 +1886,28 @@ bigquery_v2_messages.TableSchema):
       raise TypeError('Unexpected schema argument: %s.' % schema)
 
   def expand(self, pcoll):
-    if self.table_reference.projectId is None:
-      self.table_reference.projectId = pcoll.pipeline.options.view_as(
+    if self.table_fn is not None:
+      table_id, dataset_id = self.table_fn, self.dataset
+      project_id = self.project or pcoll.pipeline.options.view_as(
           GoogleCloudOptions).project
+    else:
+      if self.table_reference.projectId is None:
+        self.table_reference.projectId = pcoll.pipeline.options.view_as(
+            GoogleCloudOptions).project
+      table_id = self.table_reference.tableId
+      dataset_id = self.table_reference.datasetId
+      project_id = self.table_reference.projectId
     bigquery_write_fn = BigQueryWriteFn(
-        table_id=self.table_reference.tableId,
-        dataset_id=self.table_reference.datasetId,
-        project_id=self.table_reference.projectId,
+        table_id=table_id,
+        dataset_id=dataset_id,
+        project_id=project_id,
         batch_size=self.batch_size,
         schema=self.get_dict_table_schema(self.schema),
         create_disposition=self.create_disposition,
         write_disposition=self.write_disposition,
-        test_client=self.test_client)
+        test_client=self.test_client,
+        max_concurrent_inserts=self.max_concurrent_inserts,
+        max_insert_retries=self.max_insert_retries)
     return pcoll | 'WriteToBigQuery' >> ParDo(bigquery_write_fn)
 
   def display_data(self):
@@ -1554,3 +1920,166 @@ bigquery_v2_messages.TableSchema):
                                    tableSpec)
       res['table'] = DisplayDataItem(tableSpec, label='Table')
     return res
+
+
+# -----------------------------------------------------------------------------
+# ReadFromBigQuery.
+
+
+class _ExportToFilesFn(DoFn):
+  """Exports a table or query results to files and outputs the file paths."""
+
+  def __init__(self, table_reference, query, use_legacy_sql, flatten_results,
+               project, export_dir, export_format, test_client):
+    self.table_reference = table_reference
+    self.query = query
+    self.use_legacy_sql = use_legacy_sql
+    self.flatten_results = flatten_results
+    self.project = project
+    self.export_dir = export_dir
+    self.export_format = export_format
+    self.test_client = test_client
+
+  def process(self, unused_element):
+    bigquery_wrapper = BigQueryWrapper(client=self.test_client)
+    extension = ('avro' if self.export_format == ReadFromBigQuery.AVRO
+                 else 'json')
+    destination_pattern = FileSystems.join(
+        self.export_dir, 'export-*.%s' % extension)
+    if self.query is None:
+      bigquery_wrapper.export_table(
+          self.project, self.table_reference, destination_pattern,
+          self.export_format)
+    else:
+      bigquery_wrapper.export_query_results(
+          self.project, self.query, self.use_legacy_sql, self.flatten_results,
+          destination_pattern, self.export_format)
+    for metadata in FileSystems.match([destination_pattern])[0].metadata_list:
+      yield metadata.path
+
+
+class _DeleteExportedFilesFn(DoFn):
+  """Deletes the exported files once all the rows have been read."""
+
+  def process(self, unused_element, exported_files, unused_row_count):
+    if exported_files:
+      FileSystems.delete(exported_files)
+      logging.info('Deleted %d files exported from BigQuery.',
+                   len(exported_files))
+
+
+class ReadFromBigQuery(PTransform):
+  """Reads a BigQuery table or query results by exporting them to files.
+
+  An extract job writes the table (or a temporary table holding the query
+  results) as Avro or newline-delimited JSON files under ``gcs_location``.
+  The files are then read in parallel with the file-based sources, so unlike
+  :class:`BigQuerySource` this transform runs on any runner. The exported
+  files are deleted once all of them have been read.
+
+  Rows are dictionaries keyed by field name, with values typed as in the
+  export format: for instance TIMESTAMP fields are microseconds since the
+  epoch in Avro files, and INTEGER fields are strings in JSON files.
+  """
+
+  AVRO = 'AVRO'
+  JSON = 'NEWLINE_DELIMITED_JSON'
+
+  def __init__(self, table=None, dataset=None, project=None, query=None,
+               use_standard_sql=False, flatten_results=True,
+               gcs_location=None, export_format=AVRO, test_client=None):
+    """Initializes a ReadFromBigQuery transform.
+
+    Args:
+      table (str): The ID of a BigQuery table, specified as ``'TABLE'`` with
+        ``dataset``, or as ``'DATASET.TABLE'`` or ``'PROJECT:DATASET.TABLE'``.
+        If specified, ``query`` must be :data:`None`.
+      dataset (str): The ID of the dataset containing this table or
+        :data:`None` if the table reference is specified entirely by the table
+        argument or a query is specified.
+      project (str): The ID of the project running the BigQuery jobs. Defaults
+        to the project of the pipeline options.
+      query (str): A query to be used instead of the ``table`` argument.
+      use_standard_sql (bool): Specifies whether to use BigQuery's standard SQL
+        dialect for the query. Only applies to query reads.
+      flatten_results (bool): Flattens all nested and repeated fields in the
+        query results. Only applies to query reads.
+      gcs_location (str): The directory the files are exported to. Defaults to
+        the ``temp_location`` of the pipeline options.
+      export_format (str): :attr:`ReadFromBigQuery.AVRO` or
+        :attr:`ReadFromBigQuery.JSON`.
+      test_client: Override the default bigquery client used for testing.
+
+    Raises:
+      ValueError: if both or neither of ``table`` and ``query`` are
+        specified, or if the export format is not supported.
+    """
+    if (table is None) == (query is None):
+      raise ValueError('Exactly one of table or query must be specified')
+    if export_format not in (ReadFromBigQuery.AVRO, ReadFromBigQuery.JSON):
+      raise ValueError('Unsupported export format %s' % export_format)
+    if table is not None:
+      self.table_reference = _parse_table_reference(table, dataset, project)
+    else:
+      self.table_reference = None
+    self.query = query
+    self.use_legacy_sql = not use_standard_sql
+    self.flatten_results = flatten_results
+    self.project = project
+    self.gcs_location = gcs_location
+    self.export_format = export_format
+    self.test_client = test_client
+
+  def expand(self, pbegin):
+    options = pbegin.pipeline.options.view_as(GoogleCloudOptions)
+    project = (self.project
+               or (self.table_reference and self.table_reference.projectId)
+               or options.project)
+    gcs_location = self.gcs_location or options.temp_location
+    if gcs_location is None:
+      raise ValueError('ReadFromBigQuery needs a gcs_location or a '
+                       '--temp_location to export the rows to.')
+    table_reference = self.table_reference
+    if table_reference is not None and table_reference.projectId is None:
+      table_reference = bigquery.TableReference(
+          projectId=project, datasetId=table_reference.datasetId,
+          tableId=table_reference.tableId)
+    export_dir = FileSystems.join(
+        gcs_location, 'bigquery-export-%s' % uuid.uuid4().hex)
+
+    files = (pbegin
+             | 'Impulse' >> Create([None])
+             | 'Export' >> ParDo(_ExportToFilesFn(
+                 table_reference, self.query, self.use_legacy_sql,
+                 self.flatten_results, project, export_dir,
+                 self.export_format, self.test_client)))
+    if self.export_format == ReadFromBigQuery.AVRO:
+      rows = files | 'ReadAvroFiles' >> avroio.ReadAllFromAvro()
+    else:
+      rows = (files
+              | 'ReadJsonFiles' >> textio.ReadAllFromText()
+              | 'ParseJson' >> Map(json.loads))
+
+    # The row count is only available once every file has been read, which
+    # makes it a convenient signal for deleting the exported files.
+    _ = (pbegin
+         | 'CleanUpImpulse' >> Create([None])
+         | 'CleanUp' >> ParDo(
+             _DeleteExportedFilesFn(), AsList(files),
+             AsSingleton(rows | 'CountRows' >> combiners.Count.Globally())))
+    return rows
+
+  def display_data(self):
+    res = {}
+    if self.table_reference is not None:
+      tableSpec = '{}.{}'.format(self.table_reference.datasetId,
+                                 self.table_reference.tableId)
+      if self.table_reference.projectId is not None:
+        tableSpec = '{}:{}'.format(self.table_reference.projectId,
+                                   tableSpec)
+      res['table'] = DisplayDataItem(tableSpec, label='Table')
+    else:
+      res['query'] = DisplayDataItem(self.query, label='Query')
+    res['export_format'] = DisplayDataItem(self.export_format,
+                                           label='Export Format')
+    return res
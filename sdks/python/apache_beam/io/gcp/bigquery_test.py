@@ -22,12 +22,17 @@ import datetime
 import decimal
 import json
 import logging
+import os
 import re
+import shutil
+import tempfile
 import time
 import unittest
 
 import hamcrest as hc
 import mock
+from avro.datafile import DataFileWriter
+from avro.io import DatumWriter
 from future.utils import iteritems
 
 import apache_beam as beam
@@ -38,9 +43,19 @@ from apache_beam.io.gcp.bigquery import TableRowJsonCoder
 from apache_beam.io.gcp.bigquery import parse_table_schema_from_json
 from apache_beam.io.gcp.internal.clients import bigquery
 from apache_beam.options.pipeline_options import PipelineOptions
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that
+from apache_beam.testing.util import equal_to
 from apache_beam.transforms.display import DisplayData
 from apache_beam.transforms.display_test import DisplayDataItemMatcher
 
+# pylint: disable=wrong-import-order, wrong-import-position, ungrouped-imports
+try:
+  from avro.schema import Parse  # avro-python3 library for python3
+except ImportError:
+  from avro.schema import parse as Parse  # avro library for python2
+# pylint: enable=wrong-import-order, wrong-import-position, ungrouped-imports
+
 # Protect against environments where bigquery library is not available.
 # pylint: disable=wrong-import-order, wrong-import-position
 try:
@@ -581,6 +596,58 @@ class TestBigQueryReader(unittest.TestCase):
     # adjust our expectation below accordingly.
     self.assertEqual(actual_rows, expected_rows * 2)
 
+  def test_read_from_table_without_prefetching_pages(self):
+    client = mock.Mock()
+    client.jobs.Insert.return_value = bigquery.Job(
+        jobReference=bigquery.JobReference(
+            jobId='somejob'))
+    table_rows, schema, expected_rows = self.get_test_rows()
+    client.jobs.GetQueryResults.side_effect = [
+        bigquery.GetQueryResultsResponse(
+            jobComplete=True, rows=table_rows, schema=schema,
+            pageToken='token'),
+        bigquery.GetQueryResultsResponse(
+            jobComplete=True, rows=table_rows, schema=schema)]
+    source = beam.io.BigQuerySource('dataset.table')
+    reader = beam.io.gcp.bigquery.BigQueryReader(
+        source, test_bigquery_client=client, prefetch_pages=False)
+    with reader:
+      actual_rows = list(reader)
+    self.assertEqual(actual_rows, expected_rows * 2)
+
+  def test_compiled_row_converter(self):
+    table_rows, schema, expected_rows = self.get_test_rows()
+    wrapper = beam.io.gcp.bigquery.BigQueryWrapper(mock.Mock())
+    convert_row = wrapper.compile_row_converter(schema)
+    self.assertEqual(expected_rows, [convert_row(row) for row in table_rows])
+    self.assertEqual(
+        [wrapper.convert_row_to_dict(row, schema) for row in table_rows],
+        [convert_row(row) for row in table_rows])
+
+  def test_compiled_row_converter_rejects_missing_required_value(self):
+    schema = bigquery.TableSchema(fields=[
+        bigquery.TableFieldSchema(name='i', type='INTEGER', mode='REQUIRED')])
+    wrapper = beam.io.gcp.bigquery.BigQueryWrapper(mock.Mock())
+    convert_row = wrapper.compile_row_converter(schema)
+    with self.assertRaises(ValueError):
+      convert_row(bigquery.TableRow(f=[bigquery.TableCell(v=None)]))
+
+  def test_prefetch_fetches_next_page_ahead(self):
+    fetched = []
+
+    def pages():
+      for page in range(3):
+        fetched.append(page)
+        yield page
+
+    prefetched = beam.io.gcp.bigquery._prefetch(pages())
+    self.assertEqual(0, next(prefetched))
+    # Wait for the background fetch of the following page.
+    while len(fetched) < 2:
+      time.sleep(0.01)
+    self.assertEqual([0, 1], fetched)
+    self.assertEqual([1, 2], list(prefetched))
+
   def test_table_schema_without_project(self):
     # Reader should pick executing project by default.
     source = beam.io.BigQuerySource(table='mydataset.mytable')
@@ -1026,6 +1093,176 @@ class WriteToBigQuery(unittest.TestCase):
     # InsertRows not called in finish bundle as no records
     self.assertFalse(client.tabledata.InsertAll.called)
 
+  def test_dofn_dynamic_destinations_reuse_created_tables(self):
+    client = mock.Mock()
+    client.tables.Get.return_value = bigquery.Table(
+        tableReference=bigquery.TableReference(
+            projectId='project_id', datasetId='dataset_id', tableId='table_id'))
+    client.tabledata.InsertAll.return_value = (
+        bigquery.TableDataInsertAllResponse(insertErrors=[]))
+
+    fn = beam.io.gcp.bigquery.BigQueryWriteFn(
+        table_id=lambda row: 'dataset_id.table_%d' % (row['month'] % 2),
+        dataset_id=None,
+        project_id='project_id',
+        batch_size=2,
+        schema=None,
+        create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER,
+        write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+        test_client=client,
+        max_concurrent_inserts=2)
+
+    for _ in range(2):
+      fn.start_bundle()
+      for month in range(5):
+        fn.process({'month': month})
+      fn.finish_bundle()
+
+    # Tables are only looked up the first time they are seen.
+    self.assertEqual(
+        ['table_0', 'table_1'],
+        sorted(call[0][0].tableId for call in client.tables.Get.call_args_list))
+    inserted = {}
+    for call in client.tabledata.InsertAll.call_args_list:
+      request = call[0][0]
+      self.assertEqual('project_id', request.projectId)
+      inserted.setdefault(request.tableId, []).extend(
+          row.json for row in request.tableDataInsertAllRequest.rows)
+    self.assertEqual(6, len(inserted['table_0']))
+    self.assertEqual(4, len(inserted['table_1']))
+
+  @mock.patch('time.sleep', return_value=None)
+  def test_dofn_retries_only_failed_rows(self, unused_patched_sleep):
+    client = mock.Mock()
+    client.tables.Get.return_value = bigquery.Table(
+        tableReference=bigquery.TableReference(
+            projectId='project_id', datasetId='dataset_id', tableId='table_id'))
+    client.tabledata.InsertAll.side_effect = [
+        bigquery.TableDataInsertAllResponse(insertErrors=[
+            bigquery.TableDataInsertAllResponse.InsertErrorsValueListEntry(
+                index=1, errors=[bigquery.ErrorProto(reason='backendError')])]),
+        bigquery.TableDataInsertAllResponse(insertErrors=[])]
+
+    fn = beam.io.gcp.bigquery.BigQueryWriteFn(
+        table_id='table_id',
+        dataset_id='dataset_id',
+        project_id='project_id',
+        batch_size=3,
+        schema=None,
+        create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER,
+        write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+        test_client=client)
+
+    fn.start_bundle()
+    for month in range(3):
+      fn.process({'month': month})
+    fn.finish_bundle()
+
+    first, second = [call[0][0].tableDataInsertAllRequest.rows
+                     for call in client.tabledata.InsertAll.call_args_list]
+    self.assertEqual(3, len(first))
+    self.assertEqual([first[1].insertId], [row.insertId for row in second])
+    self.assertEqual(first[1].json, second[0].json)
+
+  @mock.patch('time.sleep', return_value=None)
+  def test_dofn_fails_after_insert_retries(self, unused_patched_sleep):
+    client = mock.Mock()
+    client.tables.Get.return_value = bigquery.Table(
+        tableReference=bigquery.TableReference(
+            projectId='project_id', datasetId='dataset_id', tableId='table_id'))
+    client.tabledata.InsertAll.return_value = (
+        bigquery.TableDataInsertAllResponse(insertErrors=[
+            bigquery.TableDataInsertAllResponse.InsertErrorsValueListEntry(
+                index=0, errors=[bigquery.ErrorProto(reason='timeout')])]))
+
+    fn = beam.io.gcp.bigquery.BigQueryWriteFn(
+        table_id='table_id',
+        dataset_id='dataset_id',
+        project_id='project_id',
+        batch_size=1,
+        schema=None,
+        create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER,
+        write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+        test_client=client,
+        max_concurrent_inserts=2,
+        max_insert_retries=2)
+
+    fn.start_bundle()
+    fn.process({'month': 1})
+    with self.assertRaises(RuntimeError):
+      fn.finish_bundle()
+    self.assertEqual(3, client.tabledata.InsertAll.call_count)
+
+  @mock.patch('time.sleep', return_value=None)
+  def test_dofn_fails_fast_on_invalid_rows(self, unused_patched_sleep):
+    client = mock.Mock()
+    client.tables.Get.return_value = bigquery.Table(
+        tableReference=bigquery.TableReference(
+            projectId='project_id', datasetId='dataset_id', tableId='table_id'))
+    client.tabledata.InsertAll.return_value = (
+        bigquery.TableDataInsertAllResponse(insertErrors=[
+            bigquery.TableDataInsertAllResponse.InsertErrorsValueListEntry(
+                index=0, errors=[bigquery.ErrorProto(reason='stopped')]),
+            bigquery.TableDataInsertAllResponse.InsertErrorsValueListEntry(
+                index=1, errors=[bigquery.ErrorProto(reason='invalid')])]))
+
+    fn = beam.io.gcp.bigquery.BigQueryWriteFn(
+        table_id='table_id',
+        dataset_id='dataset_id',
+        project_id='project_id',
+        batch_size=2,
+        schema=None,
+        create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER,
+        write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+        test_client=client,
+        max_insert_retries=2)
+
+    fn.start_bundle()
+    fn.process({'month': 1})
+    with self.assertRaisesRegexp(RuntimeError, 'invalid'):
+      fn.process({'month': 'invalid'})
+    self.assertEqual(1, client.tabledata.InsertAll.call_count)
+
+  def test_dofn_reuses_insert_threads_until_failure(self):
+    client = mock.Mock()
+    client.tables.Get.return_value = bigquery.Table(
+        tableReference=bigquery.TableReference(
+            projectId='project_id', datasetId='dataset_id', tableId='table_id'))
+    client.tabledata.InsertAll.return_value = (
+        bigquery.TableDataInsertAllResponse(insertErrors=[]))
+
+    fn = beam.io.gcp.bigquery.BigQueryWriteFn(
+        table_id='table_id',
+        dataset_id='dataset_id',
+        project_id='project_id',
+        batch_size=1,
+        schema=None,
+        create_disposition=beam.io.BigQueryDisposition.CREATE_NEVER,
+        write_disposition=beam.io.BigQueryDisposition.WRITE_APPEND,
+        test_client=client,
+        max_concurrent_inserts=2,
+        max_insert_retries=0)
+
+    fn.start_bundle()
+    executor = fn._executor
+    bigquery_wrapper = fn.bigquery_wrapper
+    fn.process({'month': 1})
+    fn.finish_bundle()
+    fn.start_bundle()
+    self.assertIs(executor, fn._executor)
+    self.assertIs(bigquery_wrapper, fn.bigquery_wrapper)
+
+    client.tabledata.InsertAll.side_effect = RuntimeError('unavailable')
+    fn.process({'month': 2})
+    with self.assertRaisesRegexp(RuntimeError, 'unavailable'):
+      fn.finish_bundle()
+    self.assertIsNone(fn._executor)
+    fn.start_bundle()
+    self.assertIsNotNone(fn._executor)
+    fn.finish_bundle()
+    fn.teardown()
+    self.assertIsNone(fn._executor)
+
   def test_noop_schema_parsing(self):
     expected_table_schema = None
     table_schema = beam.io.gcp.bigquery.BigQueryWriteFn.get_table_schema(
@@ -1112,6 +1349,109 @@ class WriteToBigQuery(unittest.TestCase):
     self.assertEqual(expected_dict_schema, dict_schema)
 
 
+class _FakeExportClient(object):
+  """A picklable BigQuery client whose extract jobs write local files."""
+
+  AVRO_SCHEMA = json.dumps({
+      'type': 'record', 'name': 'Row',
+      'fields': [{'name': 'month', 'type': 'long'}]})
+
+  def __init__(self, rows_per_file):
+    self.rows_per_file = rows_per_file
+    self.jobs = self
+
+  # pylint: disable=invalid-name
+  def Insert(self, request):
+    extract = request.job.configuration.extract
+    pattern = extract.destinationUris[0]
+    dirname = os.path.dirname(pattern)
+    if not os.path.exists(dirname):
+      os.makedirs(dirname)
+    for ix, rows in enumerate(self.rows_per_file):
+      path = pattern.replace('*', '%012d' % ix)
+      if extract.destinationFormat == 'AVRO':
+        with open(path, 'wb') as f:
+          writer = DataFileWriter(f, DatumWriter(), Parse(self.AVRO_SCHEMA))
+          for row in rows:
+            writer.append(row)
+          writer.close()
+      else:
+        with open(path, 'w') as f:
+          for row in rows:
+            f.write(json.dumps(row) + '\n')
+    return bigquery.Job(jobReference=request.job.jobReference)
+
+  def Get(self, request):
+    return bigquery.Job(status=bigquery.JobStatus(state='DONE'))
+  # pylint: enable=invalid-name
+
+
+@unittest.skipIf(HttpError is None, 'GCP dependencies are not installed')
+class TestReadFromBigQuery(unittest.TestCase):
+
+  def setUp(self):
+    self.temp_dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.temp_dir)
+
+  def _read(self, export_format):
+    rows_per_file = [[{'month': 1}, {'month': 2}], [{'month': 3}]]
+    with TestPipeline() as p:
+      rows = p | beam.io.ReadFromBigQuery(
+          table='project:dataset.table', gcs_location=self.temp_dir,
+          export_format=export_format,
+          test_client=_FakeExportClient(rows_per_file))
+      assert_that(rows, equal_to([{'month': 1}, {'month': 2}, {'month': 3}]))
+    # The exported files are deleted once they have been read.
+    for _, _, files in os.walk(self.temp_dir):
+      self.assertEqual([], files)
+
+  def test_read_exported_avro_files(self):
+    self._read(beam.io.ReadFromBigQuery.AVRO)
+
+  def test_read_exported_json_files(self):
+    self._read(beam.io.ReadFromBigQuery.JSON)
+
+  def test_export_query_results(self):
+    client = mock.Mock()
+    client.jobs.Insert.return_value = bigquery.Job(
+        jobReference=bigquery.JobReference(jobId='job_id'))
+    client.jobs.Get.return_value = bigquery.Job(
+        status=bigquery.JobStatus(state='DONE'))
+    client.datasets.Get.side_effect = HttpError(
+        response={'status': '404'}, url='', content='')
+    wrapper = beam.io.gcp.bigquery.BigQueryWrapper(client)
+    wrapper.export_query_results(
+        'project', 'SELECT * FROM t', True, True,
+        'gs://bucket/export-*.avro', 'AVRO')
+    configurations = [call[0][0].job.configuration
+                      for call in client.jobs.Insert.call_args_list]
+    query, export = configurations[-2:]
+    self.assertEqual('SELECT * FROM t', query.query.query)
+    self.assertEqual(query.query.destinationTable, export.extract.sourceTable)
+    self.assertEqual(['gs://bucket/export-*.avro'],
+                     export.extract.destinationUris)
+    self.assertEqual('AVRO', export.extract.destinationFormat)
+
+  @mock.patch('time.sleep', return_value=None)
+  def test_wait_for_failed_job(self, unused_patched_sleep):
+    client = mock.Mock()
+    client.jobs.Get.side_effect = [
+        bigquery.Job(status=bigquery.JobStatus(state='RUNNING')),
+        bigquery.Job(status=bigquery.JobStatus(
+            state='DONE', errorResult=bigquery.ErrorProto(reason='invalid')))]
+    wrapper = beam.io.gcp.bigquery.BigQueryWrapper(client)
+    with self.assertRaisesRegexp(RuntimeError, 'invalid'):
+      wrapper.wait_for_bq_job('project', 'job_id')
+
+  def test_table_or_query_required(self):
+    with self.assertRaises(ValueError):
+      beam.io.ReadFromBigQuery()
+    with self.assertRaises(ValueError):
+      beam.io.ReadFromBigQuery(table='dataset.table', query='SELECT 1')
+
+
 if __name__ == '__main__':
   logging.getLogger().setLevel(logging.INFO)
   unittest.main()
@@ -27,7 +27,6 @@ from builtins import round
 from apache_beam.io.gcp.datastore.v1 import helper
 from apache_beam.io.gcp.datastore.v1 import query_splitter
 from apache_beam.io.gcp.datastore.v1 import util
-from apache_beam.io.gcp.datastore.v1.adaptive_throttler import AdaptiveThrottler
 from apache_beam.metrics.metric import Metrics
 from apache_beam.transforms import Create
 from apache_beam.transforms import DoFn
@@ -227,20 +226,44 @@ class ReadFromDatastore(PTransform):
       return disp_data
 
   class ReadFn(DoFn):
-    """A DoFn that reads entities from Cloud Datastore, for a given query."""
-    def __init__(self, project, namespace=None):
+    """A DoFn that reads entities from Cloud Datastore, for a given query.
+
+    The next page of a query is requested while the current one is being
+    output, page sizes adapt to the observed latency and entity size, and the
+    RPCs are throttled together with the writes to the same project.
+    """
+    def __init__(self, project, namespace=None, read_ahead=True):
       super(ReadFromDatastore.ReadFn, self).__init__()
       self._project = project
       self._datastore_namespace = namespace
+      self._read_ahead = read_ahead
       self._datastore = None
+      self._page_sizer = None
+      self._rpc_successes = Metrics.counter(
+          ReadFromDatastore.ReadFn, "datastoreRpcSuccesses")
+      self._rpc_errors = Metrics.counter(
+          ReadFromDatastore.ReadFn, "datastoreRpcErrors")
+      self._throttled_secs = Metrics.counter(
+          ReadFromDatastore.ReadFn, "cumulativeThrottlingSeconds")
+
+    def _update_rpc_stats(self, successes=0, errors=0, throttled_secs=0):
+      self._rpc_successes.inc(successes)
+      self._rpc_errors.inc(errors)
+      self._throttled_secs.inc(throttled_secs)
 
     def start_bundle(self):
       self._datastore = helper.get_datastore(self._project)
+      self._throttler = helper.get_throttler(self._project)
+      if self._page_sizer is None:
+        self._page_sizer = helper.DynamicPageSizer()
 
     def process(self, query, *args, **kwargs):
       # Returns an iterator of entities that reads in batches.
-      entities = helper.fetch_entities(self._project, self._datastore_namespace,
-                                       query, self._datastore)
+      entities = helper.fetch_entities(
+          self._project, self._datastore_namespace, query, self._datastore,
+          page_sizer=self._page_sizer, throttler=self._throttler,
+          rpc_stats_callback=self._update_rpc_stats,
+          read_ahead=self._read_ahead)
       return entities
 
     def display_data(self):
@@ -410,8 +433,7 @@ class _Mutate(PTransform):
           _Mutate.DatastoreWriteFn, "datastoreRpcErrors")
       self._throttled_secs = Metrics.counter(
           _Mutate.DatastoreWriteFn, "cumulativeThrottlingSeconds")
-      self._throttler = AdaptiveThrottler(window_ms=120000, bucket_ms=1000,
-                                          overload_ratio=1.25)
+      self._throttler = None
 
     def _update_rpc_stats(self, successes=0, errors=0, throttled_secs=0):
       self._rpc_successes.inc(successes)
@@ -422,6 +444,7 @@ class _Mutate(PTransform):
       self._mutations = []
       self._mutations_size = 0
       self._datastore = helper.get_datastore(self._project)
+      self._throttler = helper.get_throttler(self._project)
       if self._fixed_batch_size:
         self._target_batch_size = self._fixed_batch_size
       else:
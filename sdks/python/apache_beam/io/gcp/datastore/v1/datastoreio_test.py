@@ -28,12 +28,15 @@ from mock import MagicMock
 from mock import call
 from mock import patch
 
+import apache_beam as beam
 from apache_beam.io.gcp.datastore.v1 import fake_datastore
 from apache_beam.io.gcp.datastore.v1 import helper
 from apache_beam.io.gcp.datastore.v1 import query_splitter
 from apache_beam.io.gcp.datastore.v1.datastoreio import ReadFromDatastore
 from apache_beam.io.gcp.datastore.v1.datastoreio import WriteToDatastore
 from apache_beam.io.gcp.datastore.v1.datastoreio import _Mutate
+from apache_beam.metrics.metric import MetricsFilter
+from apache_beam.runners.portability import fn_api_runner
 
 
 # Protect against environments where datastore library is not available.
@@ -161,6 +164,47 @@ class DatastoreioTest(unittest.TestCase):
                            len(self._mock_datastore.run_query.call_args_list))
           self.verify_unique_keys(returned_split_queries)
 
+  def test_ReadFn_reads_all_pages_of_each_split(self):
+    with patch.object(helper, 'get_datastore',
+                      return_value=self._mock_datastore):
+      entities = fake_datastore.create_entities(1234)
+      self._mock_datastore.run_query.side_effect = (
+          fake_datastore.create_run_query(entities, 300))
+      read_fn = ReadFromDatastore.ReadFn(self._PROJECT)
+      for _ in range(2):
+        read_fn.start_bundle()
+        self.assertEqual([e.entity for e in entities],
+                         list(read_fn.process(self._query)))
+        read_fn.finish_bundle()
+
+  def test_ReadFn_reports_rpc_stats_when_reading_ahead(self):
+    with patch.object(helper, 'get_datastore',
+                      return_value=self._mock_datastore):
+      entities = fake_datastore.create_entities(1234)
+      self._mock_datastore.run_query.side_effect = (
+          fake_datastore.create_run_query(entities, 300))
+      p = beam.Pipeline(runner=fn_api_runner.FnApiRunner())
+      # pylint: disable=expression-not-assigned
+      (p
+       | beam.Create([self._query])
+       | beam.ParDo(ReadFromDatastore.ReadFn(self._PROJECT, read_ahead=True)))
+      result = p.run()
+      result.wait_until_finish()
+    counters = result.metrics().query(
+        MetricsFilter().with_name('datastoreRpcSuccesses'))['counters']
+    self.assertEqual(1, len(counters))
+    self.assertEqual(self._mock_datastore.run_query.call_count,
+                     counters[0].committed)
+
+  def test_reads_and_writes_share_throttler(self):
+    with patch.object(helper, 'get_datastore',
+                      return_value=self._mock_datastore):
+      read_fn = ReadFromDatastore.ReadFn(self._PROJECT)
+      write_fn = _Mutate.DatastoreWriteFn(self._PROJECT)
+      read_fn.start_bundle()
+      write_fn.start_bundle()
+      self.assertIs(read_fn._throttler, write_fn._throttler)
+
   def test_DatastoreWriteFn_with_emtpy_batch(self):
     self.check_DatastoreWriteFn(0)
 
@@ -21,12 +21,16 @@ For internal use only; no backwards-compatibility guarantees.
 """
 
 from __future__ import absolute_import
+from __future__ import division
 
+import collections
 import errno
 import logging
 import sys
+import threading
 import time
 from builtins import object
+from concurrent import futures
 from socket import error as SocketError
 
 from future.builtins import next
@@ -34,6 +38,8 @@ from past.builtins import unicode
 
 # pylint: disable=ungrouped-imports
 from apache_beam.internal.gcp import auth
+from apache_beam.io.gcp.datastore.v1 import util
+from apache_beam.io.gcp.datastore.v1.adaptive_throttler import AdaptiveThrottler
 from apache_beam.utils import retry
 
 # Protect against environments where datastore library is not available.
@@ -116,6 +122,22 @@ def get_datastore(project):
   return Datastore(project, credentials, host='batch-datastore.googleapis.com')
 
 
+# Reads and writes running in the same process share a throttler per project,
+# so that both back off when Datastore starts rejecting either of them.
+_throttlers = {}
+_throttlers_lock = threading.Lock()
+
+
+def get_throttler(project):
+  """Returns the AdaptiveThrottler shared by all the RPCs to a project."""
+  with _throttlers_lock:
+    throttler = _throttlers.get(project)
+    if throttler is None:
+      throttler = _throttlers[project] = AdaptiveThrottler(
+          window_ms=120000, bucket_ms=1000, overload_ratio=1.25)
+    return throttler
+
+
 def make_request(project, namespace, query):
   """Make a Cloud Datastore request for the given query."""
   req = datastore_pb2.RunQueryRequest()
@@ -152,7 +174,7 @@ def retry_on_rpc_error(exception):
   return False
 
 
-def fetch_entities(project, namespace, query, datastore):
+def fetch_entities(project, namespace, query, datastore, **kwargs):
   """A helper method to fetch entities from Cloud Datastore.
 
   Args:
@@ -160,11 +182,12 @@ def fetch_entities(project, namespace, query, datastore):
     namespace: Cloud Datastore namespace
     query: Query to be read from
     datastore: Cloud Datastore Client
+    **kwargs: Optional reading options passed on to QueryIterator.
 
   Returns:
     An iterator of entities.
   """
-  return QueryIterator(project, namespace, query, datastore)
+  return QueryIterator(project, namespace, query, datastore, **kwargs)
 
 
 def is_key_valid(key):
@@ -270,15 +293,85 @@ def make_kind_stats_query(namespace, kind, latest_timestamp):
   return kind_stat_query
 
 
+class DynamicPageSizer(object):
+  """Determines page sizes for future Datastore queries.
+
+  The page size targets both a latency and a response size, based on the
+  latency and the size per entity observed over the last two minutes.
+  """
+
+  _INITIAL_SIZE = 500
+  _MIN_SIZE = 50
+  _MAX_SIZE = 2000
+  _TARGET_LATENCY_MS = 2000
+  _TARGET_BYTES = 8 * 1024 * 1024
+
+  def __init__(self):
+    self._latency_per_entity_ms = util.MovingSum(window_ms=120000,
+                                                 bucket_ms=10000)
+    self._bytes_per_entity = util.MovingSum(window_ms=120000,
+                                            bucket_ms=10000)
+
+  def get_page_size(self, now):
+    """Returns the recommended number of entities per query at this time."""
+    if not self._latency_per_entity_ms.has_data(now):
+      return self._INITIAL_SIZE
+
+    count = self._latency_per_entity_ms.count(now)
+    mean_latency_ms = self._latency_per_entity_ms.sum(now) / count
+    mean_bytes = self._bytes_per_entity.sum(now) / count
+    return int(max(self._MIN_SIZE,
+                   min(self._MAX_SIZE,
+                       self._TARGET_LATENCY_MS / max(mean_latency_ms, 0.01),
+                       self._TARGET_BYTES / max(mean_bytes, 1))))
+
+  def report_page(self, now, latency_ms, num_entities, num_bytes):
+    """Reports the latency and size of a page of query results.
+
+    Args:
+      now: double, completion time of the RPC as milliseconds since the epoch.
+      latency_ms: double, the observed latency in milliseconds for this RPC.
+      num_entities: int, number of entities returned by the RPC.
+      num_bytes: int, the size in bytes of the returned entities.
+    """
+    if num_entities:
+      self._latency_per_entity_ms.add(now, latency_ms / num_entities)
+      self._bytes_per_entity.add(now, num_bytes / num_entities)
+
+
 class QueryIterator(object):
   """A iterator class for entities of a given query.
 
   Entities are read in batches. Retries on failures.
+
+  Optionally, the page size adapts to the observed latency and entity size,
+  RPCs go through a client-side throttler, and the next page is read ahead
+  on a background thread, starting from the cursor of the current page, while
+  the entities of the current page are being consumed.
   """
   # Maximum number of results to request per query.
   _BATCH_SIZE = 500
 
-  def __init__(self, project, namespace, query, datastore):
+  def __init__(self, project, namespace, query, datastore, page_sizer=None,
+               throttler=None, rpc_stats_callback=None, read_ahead=False,
+               throttle_delay=1):
+    """Initializes a QueryIterator.
+
+    Args:
+      project: Project ID
+      namespace: Cloud Datastore namespace
+      query: Query to be read from
+      datastore: Cloud Datastore Client
+      page_sizer: an optional DynamicPageSizer choosing the size of each page;
+        pages have _BATCH_SIZE entities if None.
+      throttler: an optional AdaptiveThrottler selecting RPCs to delay.
+      rpc_stats_callback: an optional function called with arguments
+        `successes`, `errors` and `throttled_secs` to record RPC statistics.
+        It is called on the thread iterating, even if the page was read
+        ahead.
+      read_ahead: whether to request the next page in the background.
+      throttle_delay: float, time in seconds to sleep when throttled.
+    """
     self._query = query
     self._datastore = datastore
     self._project = project
@@ -286,37 +379,121 @@ class QueryIterator(object):
     self._start_cursor = None
     self._limit = self._query.limit.value or sys.maxsize
     self._req = make_request(project, namespace, query)
+    self._page_sizer = page_sizer
+    self._throttler = throttler
+    self._rpc_stats_callback = rpc_stats_callback or (lambda **kwargs: None)
+    self._read_ahead = read_ahead
+    self._throttle_delay = throttle_delay
 
   @retry.with_exponential_backoff(num_retries=5,
                                   retry_filter=retry_on_rpc_error)
-  def _next_batch(self):
-    """Fetches the next batch of entities."""
+  def _next_batch(self, rpc_stats):
+    """Fetches the next batch of entities.
+
+    The statistics of the RPCs made, including the failed attempts, are added
+    to the rpc_stats Counter, to be reported by the thread iterating.
+
+    Returns a tuple of the response and the number of entities requested.
+    """
     if self._start_cursor is not None:
       self._req.query.start_cursor = self._start_cursor
 
     # set batch size
-    self._req.query.limit.value = min(self._BATCH_SIZE, self._limit)
-    resp = self._datastore.run_query(self._req)
-    return resp
+    if self._page_sizer is None:
+      batch_size = self._BATCH_SIZE
+    else:
+      batch_size = self._page_sizer.get_page_size(time.time() * 1000)
+    self._req.query.limit.value = min(batch_size, self._limit)
+
+    # Client-side throttling.
+    while (self._throttler is not None and
+           self._throttler.throttle_request(time.time() * 1000)):
+      logging.info("Delaying request for %ds due to previous failures",
+                   self._throttle_delay)
+      time.sleep(self._throttle_delay)
+      rpc_stats['throttled_secs'] += self._throttle_delay
+
+    start_time = time.time()
+    try:
+      resp = self._datastore.run_query(self._req)
+    except (RPCError, SocketError):
+      rpc_stats['errors'] += 1
+      raise
+    end_time = time.time()
+    rpc_stats['successes'] += 1
+    if self._throttler is not None:
+      self._throttler.successful_request(start_time * 1000)
+    if self._page_sizer is not None:
+      self._page_sizer.report_page(
+          end_time * 1000, (end_time - start_time) * 1000,
+          len(resp.batch.entity_results), resp.batch.ByteSize())
+    return resp, batch_size
+
+  def _request_batch(self, executor):
+    """Requests the next batch, in the background if executor is not None.
+
+    Returns the pending batch, to be passed to _wait_for_batch().
+    """
+    rpc_stats = collections.Counter()
+    if executor is not None:
+      return executor.submit(self._next_batch, rpc_stats), rpc_stats
+    try:
+      return self._next_batch(rpc_stats), None
+    finally:
+      self._report_rpc_stats(rpc_stats)
+
+  def _wait_for_batch(self, pending):
+    """Returns the response and the batch size of a pending batch."""
+    batch, rpc_stats = pending
+    if rpc_stats is None:
+      return batch
+    try:
+      return batch.result()
+    finally:
+      # The callback may record metrics, which are only recorded on the
+      # thread executing the step.
+      self._report_rpc_stats(rpc_stats)
+
+  def _report_rpc_stats(self, rpc_stats):
+    if rpc_stats:
+      self._rpc_stats_callback(**rpc_stats)
 
   def __iter__(self):
-    more_results = True
-    while more_results:
-      resp = self._next_batch()
-      for entity_result in resp.batch.entity_results:
-        yield entity_result.entity
-
-      self._start_cursor = resp.batch.end_cursor
-      num_results = len(resp.batch.entity_results)
-      self._limit -= num_results
-
-      # Check if we need to read more entities.
-      # True when query limit hasn't been satisfied and there are more entities
-      # to be read. The latter is true if the response has a status
-      # `NOT_FINISHED` or if the number of results read in the previous batch
-      # is equal to `_BATCH_SIZE` (all indications that there is more data be
-      # read).
-      more_results = ((self._limit > 0) and
-                      ((num_results == self._BATCH_SIZE) or
-                       (resp.batch.more_results ==
-                        query_pb2.QueryResultBatch.NOT_FINISHED)))
+    executor = None
+    if self._read_ahead:
+      executor = futures.ThreadPoolExecutor(max_workers=1)
+    next_batch = None
+    try:
+      next_batch = self._request_batch(executor)
+      while next_batch is not None:
+        resp, batch_size = self._wait_for_batch(next_batch)
+        next_batch = None
+
+        self._start_cursor = resp.batch.end_cursor
+        num_results = len(resp.batch.entity_results)
+        self._limit -= num_results
+
+        # Check if we need to read more entities.
+        # True when query limit hasn't been satisfied and there are more
+        # entities to be read. The latter is true if the response has a status
+        # `NOT_FINISHED` or if the number of results read in the previous
+        # batch is equal to the requested batch size (all indications that
+        # there is more data be read).
+        more_results = ((self._limit > 0) and
+                        ((num_results == batch_size) or
+                         (resp.batch.more_results ==
+                          query_pb2.QueryResultBatch.NOT_FINISHED)))
+        if more_results and executor is not None:
+          next_batch = self._request_batch(executor)
+
+        for entity_result in resp.batch.entity_results:
+          yield entity_result.entity
+
+        if more_results and executor is None:
+          next_batch = self._request_batch(executor)
+    finally:
+      if executor is not None:
+        executor.shutdown()
+        if next_batch is not None:
+          # The iteration stopped before the page read ahead was consumed.
+          self._report_rpc_stats(next_batch[1])
@@ -22,6 +22,7 @@ import errno
 import os
 import random
 import sys
+import threading
 import unittest
 from builtins import map
 from socket import error as SocketError
@@ -145,20 +146,87 @@ class HelperTest(unittest.TestCase):
     self._query.limit.value = 10000
     self.check_query_iterator(num_entities, batch_size, self._query)
 
-  def check_query_iterator(self, num_entities, batch_size, query):
+  def test_query_iterator_with_read_ahead(self):
+    self.check_query_iterator(1098, 500, self._query, read_ahead=True)
+
+  def test_query_iterator_with_read_ahead_and_query_limit(self):
+    self._query.limit.value = 1004
+    self.check_query_iterator(1098, 500, self._query, read_ahead=True)
+
+  def test_query_iterator_reports_rpc_stats_on_iterating_thread(self):
+    entities = fake_datastore.create_entities(1098)
+    self._mock_datastore.run_query.side_effect = (
+        fake_datastore.create_run_query(entities, 500))
+    threads = []
+
+    def rpc_stats_callback(successes=0, errors=0, throttled_secs=0):
+      threads.append((threading.current_thread(), successes))
+
+    query_iterator = helper.QueryIterator(
+        "project", None, self._query, self._mock_datastore,
+        rpc_stats_callback=rpc_stats_callback, read_ahead=True)
+    self.assertEqual([e.entity for e in entities], list(query_iterator))
+    self.assertEqual([(threading.current_thread(), 1)] * 3, threads)
+
+  def test_query_iterator_with_dynamic_page_sizes(self):
+    entities = fake_datastore.create_entities(3000)
+    run_query = fake_datastore.create_run_query(entities, 2000)
+    limits = []
+
+    def record_limit_and_run_query(req):
+      limits.append(req.query.limit.value)
+      return run_query(req)
+
+    self._mock_datastore.run_query.side_effect = record_limit_and_run_query
+    query_iterator = helper.QueryIterator(
+        "project", None, self._query, self._mock_datastore,
+        page_sizer=helper.DynamicPageSizer(),
+        throttler=helper.get_throttler('project'), read_ahead=True)
+    self.assertEqual([e.entity for e in entities], list(query_iterator))
+    # The fake datastore answers instantly, so pages grow to the maximum size.
+    self.assertEqual(helper.DynamicPageSizer._INITIAL_SIZE, limits[0])
+    self.assertEqual(helper.DynamicPageSizer._MAX_SIZE, limits[1])
+
+  def test_query_iterator_with_read_ahead_failure(self):
+    self._mock_datastore.run_query.side_effect = (
+        self.non_retriable_datastore_failure)
+    query_iterator = helper.QueryIterator("project", None, self._query,
+                                          self._mock_datastore,
+                                          read_ahead=True)
+    self.assertRaises(tuple(map(type, self._non_retriable_errors)),
+                      iter(query_iterator).next)
+
+  def test_dynamic_page_sizer(self):
+    page_sizer = helper.DynamicPageSizer()
+    self.assertEqual(500, page_sizer.get_page_size(0))
+    # 10ms per entity: 2000ms target latency gives 200 entities per page.
+    page_sizer.report_page(0, 1000, 100, 100 * 1000)
+    self.assertEqual(200, page_sizer.get_page_size(0))
+    # 100kB per entity: the 8MB target size caps pages to 83 entities.
+    page_sizer.report_page(0, 10, 100, 100 * 199000)
+    self.assertEqual(83, page_sizer.get_page_size(0))
+
+  def test_throttler_is_shared_per_project(self):
+    self.assertIs(helper.get_throttler('project'),
+                  helper.get_throttler('project'))
+    self.assertIsNot(helper.get_throttler('project'),
+                     helper.get_throttler('other-project'))
+
+  def check_query_iterator(self, num_entities, batch_size, query, **kwargs):
     """A helper method to test the QueryIterator.
 
     Args:
       num_entities: number of entities contained in the fake datastore.
       batch_size: the number of entities returned by fake datastore in one req.
       query: the query to be executed
+      **kwargs: optional arguments of the QueryIterator.
 
     """
     entities = fake_datastore.create_entities(num_entities)
     self._mock_datastore.run_query.side_effect = \
         fake_datastore.create_run_query(entities, batch_size)
     query_iterator = helper.QueryIterator("project", None, self._query,
-                                          self._mock_datastore)
+                                          self._mock_datastore, **kwargs)
 
     i = 0
     for entity in query_iterator:
@@ -512,6 +512,31 @@ class TestReadFromPubSub(unittest.TestCase):
       p.run()
     mock_pubsub.return_value.acknowledge.assert_not_called()
 
+  def test_read_messages_pull_size(self, mock_pubsub):
+    ack_id = 'ack_id'
+    pull_response = test_utils.create_pull_response([
+        test_utils.PullResponseMessage(b'data', ack_id=ack_id)])
+    mock_pubsub.return_value.pull.return_value = pull_response
+
+    options = PipelineOptions(['--direct_runner_pubsub_pull_size=500'])
+    options.view_as(StandardOptions).streaming = True
+    p = TestPipeline(options=options)
+    pcoll = (p
+             | ReadFromPubSub('projects/fakeprj/topics/a_topic', None, None))
+    assert_that(pcoll, equal_to([b'data']))
+    p.run()
+    mock_pubsub.return_value.pull.assert_called_once_with(
+        mock.ANY, max_messages=500, return_immediately=True)
+    self.assertEqual(1, mock_pubsub.call_count)
+
+  def test_read_messages_invalid_pull_size(self, unused_mock_pubsub):
+    options = PipelineOptions(['--direct_runner_pubsub_pull_size=1001'])
+    options.view_as(StandardOptions).streaming = True
+    p = TestPipeline(options=options)
+    _ = (p | ReadFromPubSub('projects/fakeprj/topics/a_topic', None, None))
+    with self.assertRaisesRegexp(ValueError, r'pull_size'):
+      p.run()
+
   def test_read_message_id_label_unsupported(self, unused_mock_pubsub):
     # id_label is unsupported in DirectRunner.
     options = PipelineOptions([])
@@ -542,6 +567,21 @@ class TestWriteToPubSub(unittest.TestCase):
     mock_pubsub.return_value.publish.assert_has_calls([
         mock.call(mock.ANY, data)])
 
+  def test_write_messages_reuses_client(self, mock_pubsub):
+    options = PipelineOptions([])
+    options.view_as(StandardOptions).streaming = True
+    for payloads in (['a', 'b'], ['c']):
+      p = TestPipeline(options=options)
+      _ = (p
+           | Create(payloads)
+           | WriteToPubSub('projects/fakeprj/topics/a_topic',
+                           with_attributes=False))
+      p.run()
+    self.assertEqual(1, mock_pubsub.call_count)
+    mock_pubsub.return_value.publish.assert_has_calls([
+        mock.call(mock.ANY, 'a'), mock.call(mock.ANY, 'b'),
+        mock.call(mock.ANY, 'c')], any_order=True)
+
   def test_write_messages_deprecated(self, mock_pubsub):
     data = 'data'
     payloads = [data]
@@ -0,0 +1,50 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+cimport cython
+from libc.stdint cimport int64_t, INT64_MIN, INT64_MAX
+
+
+cdef class _ThreadConfinedCell(object):
+  cdef int _state
+  cdef object _committed
+  cdef object _committing
+  cpdef _snapshot(self)
+  cpdef bint _changed(self) except -1
+
+
+cdef class ThreadConfinedCounterCell(_ThreadConfinedCell):
+  cdef int64_t _int64_value
+  cdef object _overflow
+  @cython.locals(int_n=int64_t)
+  cpdef inc(self, n=*)
+  cpdef dec(self, n=*)
+
+
+cdef class ThreadConfinedDistributionCell(_ThreadConfinedCell):
+  cdef public int64_t count
+  cdef int64_t _int64_sum
+  cdef public int64_t min
+  cdef public int64_t max
+  cdef object _object_data
+  @cython.locals(int_value=int64_t)
+  cpdef update(self, value)
+
+
+cdef class ThreadConfinedHistogramCell(_ThreadConfinedCell):
+  cdef public object data
+  cpdef update(self, value)
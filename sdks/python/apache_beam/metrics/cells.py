@@ -36,9 +36,14 @@ from google.protobuf import timestamp_pb2
 from apache_beam.metrics.metricbase import Counter
 from apache_beam.metrics.metricbase import Distribution
 from apache_beam.metrics.metricbase import Gauge
+from apache_beam.metrics.metricbase import Histogram
 from apache_beam.portability.api import beam_fn_api_pb2
 
-__all__ = ['DistributionResult', 'GaugeResult']
+__all__ = ['DistributionResult', 'GaugeResult', 'HistogramResult']
+
+_63 = 63  # Avoid large literals in C source code.
+globals()['INT64_MAX'] = 2**_63 - 1
+globals()['INT64_MIN'] = -2**_63
 
 
 class CellCommitState(object):
@@ -261,6 +266,248 @@ class GaugeCell(Gauge, MetricCell):
       return self.data.get_cumulative()
 
 
+class HistogramCell(Histogram, MetricCell):
+  """For internal use only; no backwards-compatibility guarantees.
+
+  Tracks the current value and delta for a histogram metric.
+
+  Each cell tracks the state of a metric independently per context per bundle.
+  Therefore, each metric has a different cell in each bundle, that is later
+  aggregated.
+
+  This class is thread safe.
+  """
+  def __init__(self, *args):
+    super(HistogramCell, self).__init__(*args)
+    self.data = HistogramAggregator.identity_element()
+
+  def reset(self):
+    self.commit = CellCommitState()
+    self.data = HistogramAggregator.identity_element()
+
+  def combine(self, other):
+    result = HistogramCell()
+    result.data = self.data.combine(other.data)
+    return result
+
+  def update(self, value):
+    with self._lock:
+      self.commit.after_modification()
+      self.data.add(int(value))
+
+  def get_cumulative(self):
+    with self._lock:
+      return self.data.get_cumulative()
+
+
+class _ThreadConfinedCell(object):
+  """For internal use only; no backwards-compatibility guarantees.
+
+  Base of the cells updated by a single thread, such as the thread
+  processing a bundle.
+
+  Updates only accumulate plain values, without any locking or commit
+  bookkeeping. The cell acts as its own commit state: whether it is dirty is
+  decided when committing, by comparing a snapshot of its value with the
+  snapshot taken by the previous commit.
+  """
+
+  def __init__(self):
+    self._state = CellCommitState.DIRTY
+    self._committed = None
+    self._committing = None
+
+  @property
+  def commit(self):
+    return self
+
+  @property
+  def state(self):
+    if self._state == CellCommitState.CLEAN and self._changed():
+      return CellCommitState.DIRTY
+    return self._state
+
+  def _snapshot(self):
+    raise NotImplementedError
+
+  def _changed(self):
+    return self._snapshot() != self._committed
+
+  def after_modification(self):
+    self._state = CellCommitState.DIRTY
+
+  def before_commit(self):
+    if self._state == CellCommitState.CLEAN and not self._changed():
+      return False
+    self._state = CellCommitState.COMMITTING
+    self._committing = self._snapshot()
+    return True
+
+  def after_commit(self):
+    if self._state == CellCommitState.COMMITTING:
+      self._state = CellCommitState.CLEAN
+      self._committed = self._committing
+
+  def _reset_commit(self):
+    self._state = CellCommitState.DIRTY
+    self._committed = None
+    self._committing = None
+
+
+class ThreadConfinedCounterCell(_ThreadConfinedCell):
+  """For internal use only; no backwards-compatibility guarantees.
+
+  A ``CounterCell`` that must only be updated from a single thread.
+
+  Reads from other threads, e.g. for progress reporting, are safe but may
+  miss the latest updates. The value is kept as an int64 when compiled, and
+  the increments which would overflow it are kept as a Python int instead.
+  """
+  def __init__(self):
+    super(ThreadConfinedCounterCell, self).__init__()
+    self._int64_value = 0
+    self._overflow = 0
+
+  def reset(self):
+    self._reset_commit()
+    self._int64_value = 0
+    self._overflow = 0
+
+  @property
+  def value(self):
+    if self._overflow:
+      return self._int64_value + self._overflow
+    return self._int64_value
+
+  def combine(self, other):
+    result = ThreadConfinedCounterCell()
+    result.inc(self.value + other.value)
+    return result
+
+  def inc(self, n=1):
+    global INT64_MAX, INT64_MIN  # pylint: disable=global-variable-not-assigned
+    if INT64_MIN <= n <= INT64_MAX:
+      int_n = n
+      if not (int_n > 0 and self._int64_value > INT64_MAX - int_n or
+              int_n < 0 and self._int64_value < INT64_MIN - int_n):
+        self._int64_value += int_n
+        return
+    self._overflow += n
+
+  def dec(self, n=1):
+    self.inc(-n)
+
+  def get_cumulative(self):
+    return self.value
+
+  def _snapshot(self):
+    return self.value
+
+  def to_runner_api_monitoring_info(self):
+    """Returns a Metric with this counter value for use in a MonitoringInfo."""
+    return beam_fn_api_pb2.Metric(
+        counter_data=beam_fn_api_pb2.CounterData(
+            int64_value=self.value
+        )
+    )
+
+
+class ThreadConfinedDistributionCell(_ThreadConfinedCell):
+  """For internal use only; no backwards-compatibility guarantees.
+
+  A ``DistributionCell`` that must only be updated from a single thread.
+
+  The count, sum, min and max are kept as plain fields, int64s when compiled,
+  and only turned into a ``DistributionData`` when the cumulative value is
+  requested. The updates which do not fit in these fields are accumulated in
+  a ``DistributionData`` of Python ints instead.
+  """
+  def __init__(self):
+    super(ThreadConfinedDistributionCell, self).__init__()
+    self.count = 0
+    self._int64_sum = 0
+    self.min = 0
+    self.max = 0
+    self._object_data = None
+
+  def reset(self):
+    self._reset_commit()
+    self.count = 0
+    self._int64_sum = 0
+    self.min = 0
+    self.max = 0
+    self._object_data = None
+
+  def combine(self, other):
+    result = ThreadConfinedDistributionCell()
+    data = self.get_cumulative().combine(other.get_cumulative())
+    if data.count:
+      result._add_data(data)
+    return result
+
+  def update(self, value):
+    global INT64_MAX, INT64_MIN  # pylint: disable=global-variable-not-assigned
+    value = int(value)
+    if INT64_MIN <= value <= INT64_MAX:
+      int_value = value
+      if not (int_value > 0 and self._int64_sum > INT64_MAX - int_value or
+              int_value < 0 and self._int64_sum < INT64_MIN - int_value):
+        if self.count:
+          if int_value < self.min:
+            self.min = int_value
+          elif int_value > self.max:
+            self.max = int_value
+        else:
+          self.min = self.max = int_value
+        self.count += 1
+        self._int64_sum += int_value
+        return
+    self._add_data(DistributionData.singleton(value))
+
+  def _add_data(self, data):
+    self._object_data = data.combine(self._object_data)
+
+  def get_cumulative(self):
+    if not self.count:
+      if self._object_data is None:
+        return DistributionAggregator.identity_element()
+      return self._object_data
+    return DistributionData(
+        self._int64_sum, self.count, self.min, self.max).combine(
+            self._object_data)
+
+  def _snapshot(self):
+    return self.count, self._int64_sum, self._object_data
+
+
+class ThreadConfinedHistogramCell(_ThreadConfinedCell):
+  """For internal use only; no backwards-compatibility guarantees.
+
+  A ``HistogramCell`` that must only be updated from a single thread.
+  """
+  def __init__(self):
+    super(ThreadConfinedHistogramCell, self).__init__()
+    self.data = HistogramAggregator.identity_element()
+
+  def reset(self):
+    self._reset_commit()
+    self.data = HistogramAggregator.identity_element()
+
+  def combine(self, other):
+    result = ThreadConfinedHistogramCell()
+    result.data = self.data.combine(other.get_cumulative())
+    return result
+
+  def update(self, value):
+    self.data.add(int(value))
+
+  def get_cumulative(self):
+    return self.data.get_cumulative()
+
+  def _snapshot(self):
+    return self.data.count, self.data.sum
+
+
 class DistributionResult(object):
   """The result of a Distribution metric."""
   def __init__(self, data):
@@ -344,6 +591,77 @@ class GaugeResult(object):
     return self.data.timestamp
 
 
+class HistogramResult(object):
+  """The result of a Histogram metric.
+
+  Besides the exact count, sum, min and max of the values, it estimates their
+  percentiles, within the relative error of the histogram buckets.
+  """
+  def __init__(self, data):
+    self.data = data
+
+  def __eq__(self, other):
+    if isinstance(other, HistogramResult):
+      return self.data == other.data
+    else:
+      return False
+
+  def __hash__(self):
+    return hash(self.data)
+
+  def __ne__(self, other):
+    # TODO(BEAM-5949): Needed for Python 2 compatibility.
+    return not self == other
+
+  def __repr__(self):
+    return ('<HistogramResult(count={}, min={}, p50={}, p90={}, p99={}, '
+            'max={})>'.format(self.count, self.min, self.p50, self.p90,
+                              self.p99, self.max))
+
+  @property
+  def max(self):
+    return self.data.max
+
+  @property
+  def min(self):
+    return self.data.min
+
+  @property
+  def count(self):
+    return self.data.count
+
+  @property
+  def sum(self):
+    return self.data.sum
+
+  @property
+  def mean(self):
+    """Returns the float mean of the values, or None if there are none."""
+    if self.data.count == 0:
+      return None
+    return self.data.sum / self.data.count
+
+  def percentile(self, percent):
+    """Returns an estimate of the given percentile, or None if empty.
+
+    Args:
+      percent: a number between 0 and 100.
+    """
+    return self.data.quantile(percent / 100)
+
+  @property
+  def p50(self):
+    return self.percentile(50)
+
+  @property
+  def p90(self):
+    return self.percentile(90)
+
+  @property
+  def p99(self):
+    return self.percentile(99)
+
+
 class GaugeData(object):
   """For internal use only; no backwards-compatibility guarantees.
 
@@ -484,6 +802,129 @@ class DistributionData(object):
                 count=self.count, sum=self.sum, min=self.min, max=self.max)))
 
 
+# Values below 2**(_HISTOGRAM_PRECISION_BITS + 1) get a bucket of their own;
+# larger ones share buckets at most 2**-_HISTOGRAM_PRECISION_BITS wide
+# relative to the values they hold.
+_HISTOGRAM_PRECISION_BITS = 3
+
+
+def _histogram_bucket(value):
+  """Returns the bucket of an int, i.e. the value closest to zero it holds."""
+  if value < 0:
+    return -_histogram_bucket(-value)
+  shift = value.bit_length() - _HISTOGRAM_PRECISION_BITS - 1
+  if shift <= 0:
+    return value
+  return (value >> shift) << shift
+
+
+def _histogram_bucket_bounds(bucket):
+  """Returns the smallest and largest values held by a bucket."""
+  shift = max(0, abs(bucket).bit_length() - _HISTOGRAM_PRECISION_BITS - 1)
+  width = (1 << shift) - 1
+  if bucket < 0:
+    return bucket - width, bucket
+  return bucket, bucket + width
+
+
+def _total_count(buckets):
+  return sum(buckets.values())
+
+
+class HistogramData(object):
+  """For internal use only; no backwards-compatibility guarantees.
+
+  The data structure that holds data about a histogram metric.
+
+  Values are counted in exponentially growing buckets, so the histogram stays
+  small whatever the range of the values, and two histograms are merged by
+  adding up the counts of their buckets. The exact sum, min and max are kept
+  too.
+
+  Histogram metrics are restricted to integers only.
+
+  This object is not thread safe, so it's not supposed to be modified
+  by other than the HistogramCell that contains it.
+  """
+  def __init__(self, buckets=None, sum=0, min=None, max=None):
+    self.buckets = buckets if buckets is not None else {}
+    self.count = _total_count(self.buckets)
+    self.sum = sum
+    self.min = min
+    self.max = max
+
+  def __eq__(self, other):
+    return (self.buckets == other.buckets and
+            self.sum == other.sum and
+            self.min == other.min and
+            self.max == other.max)
+
+  def __hash__(self):
+    return hash((frozenset(self.buckets.items()), self.sum, self.min, self.max))
+
+  def __ne__(self, other):
+    # TODO(BEAM-5949): Needed for Python 2 compatibility.
+    return not self == other
+
+  def __repr__(self):
+    return ('<HistogramData(count={}, sum={}, min={}, max={}, '
+            'buckets={})>'.format(
+                self.count,
+                self.sum,
+                self.min,
+                self.max,
+                len(self.buckets)))
+
+  def add(self, value):
+    """Adds an int value to the histogram."""
+    bucket = _histogram_bucket(value)
+    buckets = self.buckets
+    buckets[bucket] = buckets.get(bucket, 0) + 1
+    if self.count:
+      if value < self.min:
+        self.min = value
+      elif value > self.max:
+        self.max = value
+    else:
+      self.min = self.max = value
+    self.count += 1
+    self.sum += value
+
+  def quantile(self, q):
+    """Returns an estimate of the q-quantile of the values, for q in [0, 1]."""
+    if not self.count:
+      return None
+    rank = q * (self.count - 1)
+    seen = 0
+    for bucket in sorted(self.buckets):
+      seen += self.buckets[bucket]
+      if seen > rank:
+        low, high = _histogram_bucket_bounds(bucket)
+        estimate = (low + high) // 2
+        return min(max(estimate, self.min), self.max)
+    return self.max
+
+  def get_cumulative(self):
+    return HistogramData(dict(self.buckets), self.sum, self.min, self.max)
+
+  def combine(self, other):
+    if other is None:
+      return self
+
+    buckets = dict(self.buckets)
+    for bucket, count in other.buckets.items():
+      buckets[bucket] = buckets.get(bucket, 0) + count
+    new_min = (None if self.min is None and other.min is None else
+               min(x for x in (self.min, other.min) if x is not None))
+    new_max = (None if self.max is None and other.max is None else
+               max(x for x in (self.max, other.max) if x is not None))
+    return HistogramData(buckets, self.sum + other.sum, new_min, new_max)
+
+  @staticmethod
+  def singleton(value):
+    return HistogramData({_histogram_bucket(value): 1}, value, value, value)
+
+
 class MetricAggregator(object):
   """For internal use only; no backwards-compatibility guarantees.
 
@@ -557,3 +998,21 @@ class GaugeAggregator(MetricAggregator):
 
   def result(self, x):
     return GaugeResult(x.get_cumulative())
+
+
+class HistogramAggregator(MetricAggregator):
+  """For internal use only; no backwards-compatibility guarantees.
+
+  Aggregator for Histogram metric data during pipeline execution.
+
+  Values aggregated should be ``HistogramData`` objects.
+  """
+  @staticmethod
+  def identity_element():
+    return HistogramData()
+
+  def combine(self, x, y):
+    return x.combine(y)
+
+  def result(self, x):
+    return HistogramResult(x.get_cumulative())
@@ -16,6 +16,7 @@
 #
 
 from __future__ import absolute_import
+from __future__ import division
 
 import threading
 import unittest
@@ -27,6 +28,15 @@ from apache_beam.metrics.cells import DistributionCell
 from apache_beam.metrics.cells import DistributionData
 from apache_beam.metrics.cells import GaugeCell
 from apache_beam.metrics.cells import GaugeData
+from apache_beam.metrics.cells import HistogramCell
+from apache_beam.metrics.cells import HistogramData
+from apache_beam.metrics.cells import HistogramResult
+from apache_beam.metrics.cells import ThreadConfinedCounterCell
+from apache_beam.metrics.cells import ThreadConfinedDistributionCell
+from apache_beam.metrics.cells import ThreadConfinedHistogramCell
+
+INT64_MAX = 2**63 - 1
+INT64_MIN = -2**63
 
 
 class TestCounterCell(unittest.TestCase):
@@ -153,6 +163,162 @@ class TestGaugeCell(unittest.TestCase):
     self.assertEqual(result.data.value, 1)
 
 
+class TestHistogramCell(unittest.TestCase):
+  def test_parallel_access(self):
+    threads = []
+    h = HistogramCell()
+    for _ in range(10):
+      t = threading.Thread(target=lambda: [h.update(i) for i in range(100)])
+      threads.append(t)
+      t.start()
+    for t in threads:
+      t.join()
+
+    data = h.get_cumulative()
+    self.assertEqual(1000, data.count)
+    self.assertEqual(10 * sum(range(100)), data.sum)
+    self.assertEqual((0, 99), (data.min, data.max))
+
+  def test_small_values_are_exact(self):
+    h = HistogramCell()
+    for value in (3, 1, 4, 1, 5, 9, 2, 6):
+      h.update(value)
+    result = HistogramResult(h.get_cumulative())
+    self.assertEqual(8, result.count)
+    self.assertEqual(31, result.sum)
+    self.assertEqual(3.875, result.mean)
+    self.assertEqual(1, result.percentile(0))
+    self.assertEqual(3, result.p50)
+    self.assertEqual(9, result.percentile(100))
+
+  def test_percentiles_within_relative_error(self):
+    h = HistogramCell()
+    values = list(range(1, 100001))
+    for value in values:
+      h.update(value)
+    result = HistogramResult(h.get_cumulative())
+    for percent in (1, 10, 50, 90, 99, 99.9):
+      expected = values[int(percent / 100 * (len(values) - 1))]
+      self.assertLess(abs(result.percentile(percent) - expected),
+                      expected / 8.0, percent)
+    self.assertEqual(100000, result.percentile(100))
+
+  def test_negative_values(self):
+    h = HistogramCell()
+    for value in range(-1000, 1001):
+      h.update(value)
+    result = HistogramResult(h.get_cumulative())
+    self.assertEqual(0, result.sum)
+    self.assertEqual(-1000, result.min)
+    self.assertEqual(0, result.p50)
+    self.assertLess(abs(result.percentile(5) + 900), 900 / 8.0)
+
+  def test_integer_only(self):
+    h = HistogramCell()
+    h.update(3.1)
+    h.update(3.7)
+    self.assertEqual(h.get_cumulative(), HistogramData.singleton(3).combine(
+        HistogramData.singleton(3)))
+
+  def test_combine(self):
+    h1 = HistogramCell()
+    h2 = HistogramCell()
+    for value in range(0, 5000, 2):
+      h1.update(value)
+      h2.update(value + 1)
+    combined = HistogramResult(h1.combine(h2).get_cumulative())
+    self.assertEqual(5000, combined.count)
+    self.assertEqual((0, 4999), (combined.min, combined.max))
+    self.assertLess(abs(combined.p50 - 2500), 2500 / 8.0)
+    self.assertEqual(HistogramData(), HistogramCell().get_cumulative())
+    self.assertIsNone(HistogramResult(HistogramData()).p99)
+
+  def test_bucket_count_is_logarithmic(self):
+    h = HistogramCell()
+    for value in range(1 << 20):
+      h.update(value)
+    self.assertLess(len(h.get_cumulative().buckets), 8 * 21)
+
+
+class TestThreadConfinedCells(unittest.TestCase):
+  def test_counter(self):
+    c = ThreadConfinedCounterCell()
+    c.inc(2)
+    c.dec(10)
+    c.inc()
+    self.assertEqual(c.get_cumulative(), -7)
+    self.assertEqual(c.combine(c).get_cumulative(), -14)
+    self.assertEqual(
+        -7, c.to_runner_api_monitoring_info().counter_data.int64_value)
+
+  def test_distribution(self):
+    d = ThreadConfinedDistributionCell()
+    self.assertEqual(d.get_cumulative(), DistributionData(0, 0, None, None))
+    for value in (10, 2, 900, 3.7):
+      d.update(value)
+    self.assertEqual(d.get_cumulative(), DistributionData(915, 4, 2, 900))
+    self.assertEqual(d.combine(ThreadConfinedDistributionCell())
+                     .get_cumulative(),
+                     DistributionData(915, 4, 2, 900))
+
+  def test_counter_overflow(self):
+    # The value is an int64 when compiled, which must not wrap around.
+    c = ThreadConfinedCounterCell()
+    c.inc(INT64_MAX)
+    c.inc(2)
+    self.assertEqual(INT64_MAX + 2, c.get_cumulative())
+    c.dec(INT64_MAX + 4)
+    self.assertEqual(-2, c.get_cumulative())
+    c.inc(2 ** 70)
+    self.assertEqual(2 ** 70 - 2, c.get_cumulative())
+    self.assertEqual(2 ** 71 - 4, c.combine(c).get_cumulative())
+
+  def test_distribution_overflow(self):
+    # The sum is an int64 when compiled, which must not wrap around.
+    d = ThreadConfinedDistributionCell()
+    for value in (INT64_MAX, 2, INT64_MIN, 2 ** 70, -1):
+      d.update(value)
+    self.assertEqual(
+        DistributionData(2 ** 70, 5, INT64_MIN, 2 ** 70),
+        d.get_cumulative())
+    self.assertEqual(
+        DistributionData(2 ** 71, 10, INT64_MIN, 2 ** 70),
+        d.combine(d).get_cumulative())
+
+  def test_histogram(self):
+    h = ThreadConfinedHistogramCell()
+    for value in (10, 2, 900):
+      h.update(value)
+    expected = HistogramCell()
+    for value in (10, 2, 900):
+      expected.update(value)
+    self.assertEqual(h.get_cumulative(), expected.get_cumulative())
+    self.assertEqual(h.combine(h).get_cumulative().count, 6)
+    h.reset()
+    self.assertEqual(h.get_cumulative(), HistogramData())
+
+  def test_commit_state(self):
+    c = ThreadConfinedCounterCell()
+    # Starts dirty
+    self.assertTrue(c.commit.before_commit())
+    c.commit.after_commit()
+    self.assertFalse(c.commit.before_commit())
+
+    # Updates make it dirty again
+    c.inc()
+    self.assertEqual(c.commit.state, CellCommitState.DIRTY)
+    self.assertTrue(c.commit.before_commit())
+    c.commit.after_commit()
+    self.assertFalse(c.commit.before_commit())
+
+    # Updates during a commit keep it dirty
+    c.inc()
+    self.assertTrue(c.commit.before_commit())
+    c.inc()
+    c.commit.after_commit()
+    self.assertTrue(c.commit.before_commit())
+
+
 class TestCellCommitState(unittest.TestCase):
   def test_basic_path(self):
     ds = CellCommitState()
@@ -23,3 +23,4 @@ cdef class MetricsContainer(object):
   cdef public object counters
   cdef public object distributions
   cdef public object gauges
+  cdef public object histograms
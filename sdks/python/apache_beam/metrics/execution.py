@@ -40,6 +40,10 @@ from apache_beam.metrics import monitoring_infos
 from apache_beam.metrics.cells import CounterCell
 from apache_beam.metrics.cells import DistributionCell
 from apache_beam.metrics.cells import GaugeCell
+from apache_beam.metrics.cells import HistogramCell
+from apache_beam.metrics.cells import ThreadConfinedCounterCell
+from apache_beam.metrics.cells import ThreadConfinedDistributionCell
+from apache_beam.metrics.cells import ThreadConfinedHistogramCell
 from apache_beam.metrics.monitoring_infos import user_metric_urn
 from apache_beam.portability.api import beam_fn_api_pb2
 from apache_beam.runners.worker import statesampler
@@ -149,11 +153,24 @@ MetricsEnvironment = _MetricsEnvironment()
 
 
 class MetricsContainer(object):
-  """Holds the metrics of a single step and a single bundle."""
-  def __init__(self, step_name):
+  """Holds the metrics of a single step and a single bundle.
+
+  Args:
+    step_name: the name of the step the metrics belong to.
+    thread_confined: whether the metrics are only updated by the thread
+      executing the bundle. If so, counters, distributions and histograms
+      accumulate without locking, and are only aggregated when read.
+  """
+  def __init__(self, step_name, thread_confined=False):
     self.step_name = step_name
-    self.counters = defaultdict(lambda: CounterCell())
-    self.distributions = defaultdict(lambda: DistributionCell())
+    if thread_confined:
+      self.counters = defaultdict(ThreadConfinedCounterCell)
+      self.distributions = defaultdict(ThreadConfinedDistributionCell)
+      self.histograms = defaultdict(ThreadConfinedHistogramCell)
+    else:
+      self.counters = defaultdict(lambda: CounterCell())
+      self.distributions = defaultdict(lambda: DistributionCell())
+      self.histograms = defaultdict(lambda: HistogramCell())
     self.gauges = defaultdict(lambda: GaugeCell())
 
   def get_counter(self, metric_name):
@@ -165,6 +182,9 @@ class MetricsContainer(object):
   def get_gauge(self, metric_name):
     return self.gauges[metric_name]
 
+  def get_histogram(self, metric_name):
+    return self.histograms[metric_name]
+
   def _get_updates(self, filter=None):
     """Return cumulative values of metrics filtered according to a lambda.
 
@@ -186,7 +206,11 @@ class MetricsContainer(object):
               for k, v in self.gauges.items()
               if filter(v)}
 
-    return MetricUpdates(counters, distributions, gauges)
+    histograms = {MetricKey(self.step_name, k): v.get_cumulative()
+                  for k, v in self.histograms.items()
+                  if filter(v)}
+
+    return MetricUpdates(counters, distributions, gauges, histograms)
 
   def get_updates(self):
     """Return cumulative values of metrics that changed since the last commit.
@@ -205,6 +229,8 @@ class MetricsContainer(object):
     return self._get_updates()
 
   def to_runner_api(self):
+    # Histograms have no representation in the legacy user metrics protos,
+    # they are only reported as MonitoringInfos.
     return (
         [beam_fn_api_pb2.Metrics.User(
             metric_name=k.to_runner_api(),
@@ -244,6 +270,13 @@ class MetricsContainer(object):
           v.get_cumulative().to_runner_api_monitoring_info(),
           ptransform=transform_id
       ))
+
+    for k, v in self.histograms.items():
+      all_user_metrics.append(monitoring_infos.int64_histogram(
+          user_metric_urn(k.namespace, k.name),
+          v.get_cumulative(),
+          ptransform=transform_id
+      ))
     return {monitoring_infos.to_key(mi) : mi for mi in all_user_metrics}
 
   def reset(self):
@@ -253,6 +286,8 @@ class MetricsContainer(object):
       distribution.reset()
     for gauge in self.gauges.values():
       gauge.reset()
+    for histogram in self.histograms.values():
+      histogram.reset()
 
 
 class MetricUpdates(object):
@@ -262,14 +297,17 @@ class MetricUpdates(object):
   For Distribution metrics, it is DistributionData, and for Counter metrics,
   it's an int.
   """
-  def __init__(self, counters=None, distributions=None, gauges=None):
+  def __init__(self, counters=None, distributions=None, gauges=None,
+               histograms=None):
     """Create a MetricUpdates object.
 
     Args:
       counters: Dictionary of MetricKey:MetricUpdate updates.
       distributions: Dictionary of MetricKey:MetricUpdate objects.
       gauges: Dictionary of MetricKey:MetricUpdate objects.
+      histograms: Dictionary of MetricKey:MetricUpdate objects.
     """
     self.counters = counters or {}
     self.distributions = distributions or {}
     self.gauges = gauges or {}
+    self.histograms = histograms or {}
@@ -21,8 +21,12 @@ import unittest
 from builtins import range
 
 from apache_beam.metrics.cells import CellCommitState
+from apache_beam.metrics.cells import DistributionData
+from apache_beam.metrics.cells import HistogramData
+from apache_beam.metrics.cells import HistogramResult
 from apache_beam.metrics.execution import MetricsContainer
 from apache_beam.metrics.metricbase import MetricName
+from apache_beam.metrics.monitoring_infos import extract_metric_result_map_value
 
 
 class TestMetricsContainer(unittest.TestCase):
@@ -93,6 +97,63 @@ class TestMetricsContainer(unittest.TestCase):
     self.assertEqual(set(dirty_values + clean_values),
                      set([v.value for _, v in cumulative.gauges.items()]))
 
+  def test_thread_confined_updates(self):
+    mc = MetricsContainer('astep', thread_confined=True)
+    counter = mc.get_counter(MetricName('namespace', 'counter'))
+    distribution = mc.get_distribution(MetricName('namespace', 'dist'))
+    self.assertIs(counter, mc.get_counter(MetricName('namespace', 'counter')))
+
+    counter.inc(3)
+    counter.dec()
+    for value in (5, 1, 9):
+      distribution.update(value)
+    updates = mc.get_updates()
+    self.assertEqual([2], list(updates.counters.values()))
+    self.assertEqual([DistributionData(15, 3, 1, 9)],
+                     list(updates.distributions.values()))
+
+    # Committed cells are only reported again once they change.
+    counter.commit.after_commit()
+    distribution.commit.after_commit()
+    self.assertEqual(CellCommitState.CLEAN, counter.commit.state)
+    self.assertFalse(mc.get_updates().counters)
+    self.assertFalse(mc.get_updates().distributions)
+    distribution.update(0)
+    self.assertEqual(CellCommitState.DIRTY, distribution.commit.state)
+    self.assertEqual([DistributionData(15, 4, 0, 9)],
+                     list(mc.get_updates().distributions.values()))
+    self.assertEqual(1, len(mc.get_cumulative().counters))
+
+    self.assertEqual(
+        2, len(mc.to_runner_api_monitoring_infos('atransform')))
+    mc.reset()
+    self.assertEqual(0, counter.get_cumulative())
+    self.assertEqual(DistributionData(0, 0, None, None),
+                     distribution.get_cumulative())
+
+  def test_histogram_updates(self):
+    for thread_confined in (False, True):
+      mc = MetricsContainer('astep', thread_confined=thread_confined)
+      histogram = mc.get_histogram(MetricName('namespace', 'latency'))
+      for value in (120, 7, 4000, 35):
+        histogram.update(value)
+
+      updates = mc.get_updates()
+      self.assertEqual(1, len(updates.histograms))
+      data = list(updates.histograms.values())[0]
+      self.assertEqual((4, 4162, 7, 4000),
+                       (data.count, data.sum, data.min, data.max))
+
+      [monitoring_info] = mc.to_runner_api_monitoring_infos(
+          'atransform').values()
+      self.assertEqual(HistogramResult(data),
+                       extract_metric_result_map_value(monitoring_info))
+
+      histogram.commit.after_commit()
+      self.assertFalse(mc.get_updates().histograms)
+      mc.reset()
+      self.assertEqual(HistogramData(), histogram.get_cumulative())
+
 
 if __name__ == '__main__':
   unittest.main()
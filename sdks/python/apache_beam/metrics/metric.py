@@ -33,6 +33,7 @@ from apache_beam.metrics.execution import MetricsEnvironment
 from apache_beam.metrics.metricbase import Counter
 from apache_beam.metrics.metricbase import Distribution
 from apache_beam.metrics.metricbase import Gauge
+from apache_beam.metrics.metricbase import Histogram
 from apache_beam.metrics.metricbase import MetricName
 
 __all__ = ['Metrics', 'MetricsFilter']
@@ -95,6 +96,24 @@ class Metrics(object):
     namespace = Metrics.get_namespace(namespace)
     return Metrics.DelegatingGauge(MetricName(namespace, name))
 
+  @staticmethod
+  def histogram(namespace, name):
+    """Obtains or creates a Histogram metric.
+
+    Unlike a Distribution, a Histogram also estimates the percentiles of the
+    values, such as their median or 99th percentile. Histogram metrics are
+    restricted to integer-only values.
+
+    Args:
+      namespace: A class or string that gives the namespace to a metric
+      name: A string that gives a unique name to a metric
+
+    Returns:
+      A Histogram object.
+    """
+    namespace = Metrics.get_namespace(namespace)
+    return Metrics.DelegatingHistogram(MetricName(namespace, name))
+
   class DelegatingCounter(Counter):
     """Metrics Counter that Delegates functionality to MetricsEnvironment."""
 
@@ -131,11 +150,24 @@ class Metrics(object):
       if container is not None:
         container.get_gauge(self.metric_name).set(value)
 
+  class DelegatingHistogram(Histogram):
+    """Metrics Histogram that Delegates functionality to MetricsEnvironment."""
+
+    def __init__(self, metric_name):
+      super(Metrics.DelegatingHistogram, self).__init__()
+      self.metric_name = metric_name
+
+    def update(self, value):
+      container = MetricsEnvironment.current_container()
+      if container is not None:
+        container.get_histogram(self.metric_name).update(value)
+
 
 class MetricResults(object):
   COUNTERS = "counters"
   DISTRIBUTIONS = "distributions"
   GAUGES = "gauges"
+  HISTOGRAMS = "histograms"
 
   @staticmethod
   def _matches_name(filter, metric_key):
@@ -192,11 +224,13 @@ class MetricResults(object):
         {
           "counters": [MetricResult(counter_key, committed, attempted), ...],
           "distributions": [MetricResult(dist_key, committed, attempted), ...],
-          "gauges": []  // Empty list if nothing matched the filter.
+          "gauges": [],  // Empty list if nothing matched the filter.
+          "histograms": [MetricResult(histogram_key, committed, attempted), ...]
         }
 
-    The committed / attempted values are DistributionResult / GaugeResult / int
-    objects.
+    The committed / attempted values are DistributionResult / GaugeResult /
+    HistogramResult / int objects. Runners that do not support histograms may
+    omit the "histograms" entry.
     """
     raise NotImplementedError
 
@@ -29,6 +29,8 @@ Available classes:
     distribution of a variable to be collected during pipeline execution.
 - Gauge - Gauge Metric interface. Allows to track the latest value of a
     variable during pipeline execution.
+- Histogram - Histogram Metric interface. Allows to estimate the percentiles
+    of a variable during pipeline execution.
 - MetricName - Namespace and name used to refer to a Metric.
 """
 
@@ -38,7 +40,8 @@ from builtins import object
 
 from apache_beam.portability.api import beam_fn_api_pb2
 
-__all__ = ['Metric', 'Counter', 'Distribution', 'Gauge', 'MetricName']
+__all__ = ['Metric', 'Counter', 'Distribution', 'Gauge', 'Histogram',
+           'MetricName']
 
 
 class MetricName(object):
@@ -119,3 +122,13 @@ class Gauge(Metric):
 
   def set(self, value):
     raise NotImplementedError
+
+
+class Histogram(Metric):
+  """Histogram Metric interface.
+
+  Allows the distribution of a variable, including its percentiles, to be
+  estimated during pipeline execution."""
+
+  def update(self, value):
+    raise NotImplementedError
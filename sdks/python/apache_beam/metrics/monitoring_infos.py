@@ -28,8 +28,12 @@ from apache_beam.metrics.cells import DistributionData
 from apache_beam.metrics.cells import DistributionResult
 from apache_beam.metrics.cells import GaugeData
 from apache_beam.metrics.cells import GaugeResult
+from apache_beam.metrics.cells import HistogramData
+from apache_beam.metrics.cells import HistogramResult
 from apache_beam.portability import common_urns
 from apache_beam.portability.api.beam_fn_api_pb2 import CounterData
+from apache_beam.portability.api.beam_fn_api_pb2 import ExtremaData
+from apache_beam.portability.api.beam_fn_api_pb2 import IntExtremaData
 from apache_beam.portability.api.beam_fn_api_pb2 import Metric
 from apache_beam.portability.api.beam_fn_api_pb2 import MonitoringInfo
 
@@ -40,6 +44,12 @@ FINISH_BUNDLE_MSECS_URN = common_urns.monitoring_infos.FINISH_BUNDLE_MSECS.urn
 TOTAL_MSECS_URN = common_urns.monitoring_infos.TOTAL_MSECS.urn
 USER_COUNTER_URN_PREFIX = (
     common_urns.monitoring_infos.USER_COUNTER_URN_PREFIX.urn)
+# The net number of bytes allocated by a step during a bundle, as attributed
+# by the memory accounting of the SDK harness.
+ALLOCATED_BYTES_URN = 'beam:metric:ptransform_memory:allocated_bytes:v1'
+# An estimate of the bytes held by the long lived structures of a step, e.g.
+# partial group by key tables, side input caches or grouping buffers.
+RETAINED_BYTES_URN = 'beam:metric:ptransform_memory:retained_bytes:v1'
 
 # TODO(ajamato): Implement the remaining types, i.e. Double types
 # Extrema types, etc. See:
@@ -48,10 +58,15 @@ SUM_INT64_TYPE = common_urns.monitoring_info_types.SUM_INT64_TYPE.urn
 DISTRIBUTION_INT64_TYPE = (
     common_urns.monitoring_info_types.DISTRIBUTION_INT64_TYPE.urn)
 LATEST_INT64_TYPE = common_urns.monitoring_info_types.LATEST_INT64_TYPE.urn
+# Histograms have no type of their own in the Fn API protos yet. Their
+# count, sum, min, max and bucket counts are packed into the int_values of
+# an IntExtremaData, see int64_histogram.
+HISTOGRAM_INT64_TYPE = 'beam:metrics:histogram_int64:v1'
 
 COUNTER_TYPES = set([SUM_INT64_TYPE])
 DISTRIBUTION_TYPES = set([DISTRIBUTION_INT64_TYPE])
 GAUGE_TYPES = set([LATEST_INT64_TYPE])
+HISTOGRAM_TYPES = set([HISTOGRAM_INT64_TYPE])
 
 
 def to_timestamp_proto(timestamp_secs):
@@ -92,6 +107,21 @@ def extract_distribution(monitoring_info_proto):
   return None
 
 
+def extract_histogram(monitoring_info_proto):
+  """Returns the HistogramData of the monitoring info.
+
+  Args:
+    monitoring_info_proto: The monitoring info for the histogram.
+  """
+  if not is_histogram(monitoring_info_proto):
+    return None
+  values = monitoring_info_proto.metric.extrema_data.int_extrema_data.int_values
+  if not values or not values[0]:
+    return HistogramData()
+  buckets = dict(zip(values[4::2], values[5::2]))
+  return HistogramData(buckets, values[1], values[2], values[3])
+
+
 def create_labels(ptransform='', tag=''):
   """Create the label dictionary based on the provided tags.
 
@@ -155,6 +185,41 @@ def int64_gauge(urn, metric, ptransform='', tag=''):
   return create_monitoring_info(urn, LATEST_INT64_TYPE, metric, labels)
 
 
+def int64_gauge_value(urn, value, ptransform='', tag=''):
+  """Return the gauge monitoring info of an int value, for the URN and labels.
+
+  Args:
+    urn: The URN of the monitoring info/metric.
+    value: The int value of the gauge.
+    ptransform: The ptransform/step name used as a label.
+    tag: The output tag name, used as a label.
+  """
+  metric = Metric(counter_data=CounterData(int64_value=value))
+  return int64_gauge(urn, metric, ptransform=ptransform, tag=tag)
+
+
+def int64_histogram(urn, histogram_data, ptransform='', tag=''):
+  """Return the histogram monitoring info for the URN, data and labels.
+
+  Args:
+    urn: The URN of the monitoring info/metric.
+    histogram_data: The HistogramData to report.
+    ptransform: The ptransform/step name used as a label.
+    tag: The output tag name, used as a label.
+  """
+  labels = create_labels(ptransform=ptransform, tag=tag)
+  values = [histogram_data.count, histogram_data.sum,
+            histogram_data.min or 0, histogram_data.max or 0]
+  for bucket in sorted(histogram_data.buckets):
+    values.extend((bucket, histogram_data.buckets[bucket]))
+  metric = Metric(
+      extrema_data=ExtremaData(
+          int_extrema_data=IntExtremaData(int_values=values)
+      )
+  )
+  return create_monitoring_info(urn, HISTOGRAM_INT64_TYPE, metric, labels)
+
+
 def create_monitoring_info(urn, type_urn, metric_proto, labels=None):
   """Return the gauge monitoring info for the URN, type, metric and labels.
 
@@ -200,13 +265,19 @@ def is_gauge(monitoring_info_proto):
   return monitoring_info_proto.type in GAUGE_TYPES
 
 
+def is_histogram(monitoring_info_proto):
+  """Returns true if the monitoring info is a histogram metric."""
+  return monitoring_info_proto.type in HISTOGRAM_TYPES
+
+
 def is_user_monitoring_info(monitoring_info_proto):
   """Returns true if the monitoring info is a user metric."""
   return monitoring_info_proto.urn.startswith(USER_COUNTER_URN_PREFIX)
 
 
 def extract_metric_result_map_value(monitoring_info_proto):
-  """Returns the relevant GaugeResult, DistributionResult or int value.
+  """Returns the relevant GaugeResult, DistributionResult, HistogramResult or
+  int value.
 
   These are the proper format for use in the MetricResult.query() result.
   """
@@ -223,6 +294,8 @@ def extract_metric_result_map_value(monitoring_info_proto):
     timestamp_secs = to_timestamp_secs(monitoring_info_proto.timestamp)
     return GaugeResult(GaugeData(
         extract_counter_value(monitoring_info_proto), timestamp_secs))
+  if is_histogram(monitoring_info_proto):
+    return HistogramResult(extract_histogram(monitoring_info_proto))
 
 
 def parse_namespace_and_name(monitoring_info_proto):
@@ -40,6 +40,7 @@ __all__ = [
     'WorkerOptions',
     'DebugOptions',
     'ProfilingOptions',
+    'SdkHarnessOptions',
     'SetupOptions',
     'TestOptions',
     ]
@@ -269,8 +270,20 @@ class PipelineOptions(HasDisplayData):
     return self.get_all_options(True)
 
   def view_as(self, cls):
-    view = cls(self._flags)
+    # Parsing the flags is costly, and views are requested often during
+    # pipeline construction, so the options recognized by each class are
+    # parsed once and shared by all the views of these options.
+    if '_visible_options_by_class' not in self.__dict__:
+      self._visible_options_by_class = {type(self): self._visible_options}
+    if cls in self._visible_options_by_class:
+      view = cls.__new__(cls)
+      view._flags = self._flags
+      view._visible_options = self._visible_options_by_class[cls]
+    else:
+      view = cls(self._flags)
+      self._visible_options_by_class[cls] = view._visible_options
     view._all_options = self._all_options
+    view._visible_options_by_class = self._visible_options_by_class
     return view
 
   def _visible_option_list(self):
@@ -293,7 +306,8 @@ class PipelineOptions(HasDisplayData):
                            (type(self).__name__, name))
 
   def __setattr__(self, name, value):
-    if name in ('_flags', '_all_options', '_visible_options'):
+    if name in ('_flags', '_all_options', '_visible_options',
+                '_visible_options_by_class'):
       super(PipelineOptions, self).__setattr__(name, value)
     elif name in self._visible_option_list():
       self._all_options[name] = value
@@ -365,6 +379,46 @@ class DirectOptions(PipelineOptions):
         default=0,
         help='replay every bundle this many extra times, for profiling'
         'and debugging')
+    parser.add_argument(
+        '--direct_runner_use_encoded_gbk',
+        default=False,
+        action='store_true',
+        help='DirectRunner buffers the values of a batch GroupByKey as '
+        'encoded bytes in hash partitions, spilling to disk when needed, '
+        'instead of keeping one Python object per value in keyed state. '
+        'Requires the grouped values to be encodable by their coder.')
+    parser.add_argument(
+        '--direct_runner_gbk_partitions',
+        type=int,
+        default=16,
+        help='Number of hash partitions (and of output bundles) used by '
+        '--direct_runner_use_encoded_gbk.')
+    parser.add_argument(
+        '--direct_runner_gbk_memory_mb',
+        type=int,
+        default=256,
+        help='Approximate in-memory budget, in megabytes, of each encoded '
+        'GroupByKey before partitions are spilled to temporary files.')
+    parser.add_argument(
+        '--direct_runner_pubsub_pull_size',
+        type=int,
+        default=1000,
+        help='Maximum number of messages read from a Pub/Sub subscription '
+        'per bundle, between 1 and 1000.')
+    parser.add_argument(
+        '--direct_runner_pubsub_streaming_pull',
+        default=False,
+        action='store_true',
+        help='DirectRunner pulls Pub/Sub messages continuously on a '
+        'background thread into a bounded buffer, instead of pulling '
+        'synchronously at the end of every bundle.')
+    parser.add_argument(
+        '--direct_runner_pubsub_buffer_size',
+        type=int,
+        default=10000,
+        help='Maximum number of Pub/Sub messages held in the buffer of '
+        '--direct_runner_pubsub_streaming_pull. The ack deadline of the '
+        'buffered messages is extended until they are read.')
 
 
 class GoogleCloudOptions(PipelineOptions):
@@ -624,6 +678,68 @@ class ProfilingOptions(PipelineOptions):
                         default=1.0,
                         help='A number between 0 and 1 indicating the ratio '
                         'of bundles that should be profiled.')
+    parser.add_argument('--profile_cpu_sampling',
+                        action='store_true',
+                        help='Enable a low overhead sampling profiler of the '
+                        'CPU usage of each step. Collapsed stacks of each '
+                        'step are written to the profile location.')
+    parser.add_argument('--profile_sampling_period_ms',
+                        type=int,
+                        default=10,
+                        help='The minimum period between two samples of the '
+                        'sampling profiler. The period grows whenever '
+                        'sampling would take more than 1%% of the time.')
+    parser.add_argument('--profile_memory_per_step',
+                        action='store_true',
+                        help='Enable reporting the bytes retained by each '
+                        'step of the SDK harness as monitoring infos, and, '
+                        'with tracemalloc (Python 3), tracing the memory '
+                        'allocations and reporting the bytes allocated by '
+                        'each step.')
+    parser.add_argument('--profile_memory_dump_threshold_mb',
+                        type=int,
+                        default=None,
+                        help='When memory allocations are traced per step, '
+                        'the traced memory size above which the top '
+                        'allocation sites are logged and written to the '
+                        'profile location. Requires Python 3.')
+    parser.add_argument('--profile_flush_interval_secs',
+                        type=int,
+                        default=300,
+                        help='How often the sampling profiler writes its '
+                        'collapsed stacks to the profile location.')
+
+
+class SdkHarnessOptions(PipelineOptions):
+
+  @classmethod
+  def _add_argparse_args(cls, parser):
+    parser.add_argument('--default_sdk_harness_log_level',
+                        default='INFO',
+                        help='The level of the log records which the SDK '
+                        'harness sends to the runner, e.g. DEBUG or WARNING.')
+    parser.add_argument('--sdk_harness_log_level_override',
+                        '--sdk_harness_log_level_overrides',
+                        dest='sdk_harness_log_level_overrides',
+                        action='append',
+                        default=None,
+                        help='An override of the SDK harness log level, as '
+                        'NAME=LEVEL, for the records logged in the step, '
+                        'logger or module NAME. The records of a logger '
+                        'also use the overrides of its parent loggers. May '
+                        'be given several times.')
+    parser.add_argument('--sdk_harness_log_rate_per_site',
+                        type=float,
+                        default=None,
+                        help='The number of records per second which each '
+                        'logging call site of the SDK harness may send to '
+                        'the runner. The records over this rate are counted '
+                        'and summarized instead. Unlimited if not set.')
+    parser.add_argument('--sdk_harness_log_burst_per_site',
+                        type=int,
+                        default=100,
+                        help='The number of records which a logging call '
+                        'site may send at once, exceeding the rate limit.')
 
 
 class SetupOptions(PipelineOptions):
@@ -684,6 +800,15 @@ class SetupOptions(PipelineOptions):
          'Some workflows do not need the session state if for instance all '
          'their functions/classes are defined in proper modules (not __main__)'
          ' and the modules are importable in the worker. '))
+    parser.add_argument(
+        '--pickle_compression_level',
+        type=int,
+        default=None,
+        help=
+        ('The zlib compression level, from 0 to 9, of the pickled functions '
+         'and objects of the pipeline. Lower levels make the construction of '
+         'large pipelines faster, and their representation larger. '
+         'Defaults to 9.'))
     parser.add_argument(
         '--sdk_location',
         default='default',
@@ -23,6 +23,7 @@ import logging
 import unittest
 
 import hamcrest as hc
+import mock
 
 from apache_beam.options.pipeline_options import PipelineOptions
 from apache_beam.options.pipeline_options import ProfilingOptions
@@ -190,6 +191,20 @@ class PipelineOptionsTest(unittest.TestCase):
     self.assertEqual(options.get_all_options()['num_workers'], 5)
     self.assertTrue(options.get_all_options()['mock_flag'])
 
+  def test_views_share_parsed_options(self):
+    options = PipelineOptions(['--num_workers', '5', '--mock_option', 'abc'])
+    view = options.view_as(PipelineOptionsTest.MockOptions)
+    self.assertEqual('abc', view.mock_option)
+    with mock.patch.object(
+        PipelineOptionsTest.MockOptions, '_add_argparse_args') as add_args:
+      other_view = options.view_as(TypeOptions).view_as(
+          PipelineOptionsTest.MockOptions)
+      add_args.assert_not_called()
+    self.assertEqual('abc', other_view.mock_option)
+    other_view.mock_option = 'def'
+    self.assertEqual('def', view.mock_option)
+    self.assertEqual(options.get_all_options()['num_workers'], 5)
+
   def test_experiments(self):
     options = PipelineOptions(['--experiment', 'abc', '--experiment', 'def'])
     self.assertEqual(
@@ -645,10 +645,12 @@ class Pipeline(object):
 
     # Mutates context; placing inline would force dependence on
     # argument evaluation order.
-    root_transform_id = context.transforms.get_id(self._root_transform())
-    proto = beam_runner_api_pb2.Pipeline(
-        root_transform_ids=[root_transform_id],
-        components=context.to_runner_api())
+    with pickler.memoizing(compression_level=self._options.view_as(
+        SetupOptions).pickle_compression_level):
+      root_transform_id = context.transforms.get_id(self._root_transform())
+      proto = beam_runner_api_pb2.Pipeline(
+          root_transform_ids=[root_transform_id],
+          components=context.to_runner_api())
     proto.components.transforms[root_transform_id].unique_name = (
         root_transform_id)
     if return_context:
@@ -663,8 +665,10 @@ class Pipeline(object):
     from apache_beam.runners import pipeline_context
     context = pipeline_context.PipelineContext(proto.components)
     root_transform_id, = proto.root_transform_ids
-    p.transforms_stack = [
-        context.transforms.get_by_id(root_transform_id)]
+    # Objects unpickled from identical payloads, e.g. DoFns, are shared.
+    with pickler.memoizing():
+      p.transforms_stack = [
+          context.transforms.get_by_id(root_transform_id)]
     # TODO(robertwb): These are only needed to continue construction. Omit?
     p.applied_labels = set([
         t.unique_name for t in proto.components.transforms.values()])
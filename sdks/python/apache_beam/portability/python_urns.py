@@ -38,7 +38,8 @@ GENERIC_COMPOSITE_TRANSFORM = "beam:transform:generic_composite:v1"
 EMBEDDED_PYTHON = "beam:env:embedded_python:v1"
 
 # Invoke UserFns in process, but over GRPC channels.
-# Payload: (optional) Number of worker threads, as a decimal string.
+# Payload: (optional) Number of worker threads, as a decimal string,
+# optionally followed by a comma and the number of worker processes.
 # (Used for testing.)
 EMBEDDED_PYTHON_GRPC = "beam:env:embedded_python_grpc:v1"
 
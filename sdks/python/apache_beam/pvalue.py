@@ -158,7 +158,7 @@ class PCollection(PValue, typing.Generic[typing.TypeVar('T')]):
     # same object is returned for the same pcollection id.
     return PCollection(
         None,
-        element_type=pickler.loads(proto.coder_id),
+        element_type=pickler.loads(proto.coder_id, memoize=True),
         windowing=context.windowing_strategies.get_by_id(
             proto.windowing_strategy_id))
 
@@ -379,8 +379,8 @@ class SideInputData(object):
             python_urns.PICKLED_WINDOW_MAPPING_FN)
     return SideInputData(
         proto.access_pattern.urn,
-        pickler.loads(proto.window_mapping_fn.spec.payload),
-        pickler.loads(proto.view_fn.spec.payload))
+        pickler.loads(proto.window_mapping_fn.spec.payload, memoize=True),
+        pickler.loads(proto.view_fn.spec.payload, memoize=True))
 
 
 class AsSingleton(AsSideInput):
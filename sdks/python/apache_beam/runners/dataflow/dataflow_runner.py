@@ -567,6 +567,10 @@ class DataflowRunner(PipelineRunner):
           beam.io.BigQueryDisposition.WRITE_TRUNCATE):
         raise RuntimeError('Can not use write truncation mode in streaming')
       return self.apply_PTransform(transform, pcoll, options)
+    elif transform.table_reference is None:
+      # The native sink only writes to a single table, so dynamic destinations
+      # use streaming inserts in batch pipelines too.
+      return self.apply_PTransform(transform, pcoll, options)
     else:
       return pcoll  | 'WriteToBigQuery' >> beam.io.Write(
           beam.io.BigQuerySink(
@@ -29,6 +29,7 @@ from collections import defaultdict
 from apache_beam.metrics.cells import CounterAggregator
 from apache_beam.metrics.cells import DistributionAggregator
 from apache_beam.metrics.cells import GaugeAggregator
+from apache_beam.metrics.cells import HistogramAggregator
 from apache_beam.metrics.execution import MetricKey
 from apache_beam.metrics.execution import MetricResult
 from apache_beam.metrics.metric import MetricResults
@@ -42,6 +43,8 @@ class DirectMetrics(MetricResults):
         lambda: DirectMetric(DistributionAggregator()))
     self._gauges = defaultdict(
         lambda: DirectMetric(GaugeAggregator()))
+    self._histograms = defaultdict(
+        lambda: DirectMetric(HistogramAggregator()))
 
   def _apply_operation(self, bundle, updates, op):
     for k, v in updates.counters.items():
@@ -53,6 +56,9 @@ class DirectMetrics(MetricResults):
     for k, v in updates.gauges.items():
       op(self._gauges[k], bundle, v)
 
+    for k, v in updates.histograms.items():
+      op(self._histograms[k], bundle, v)
+
   def commit_logical(self, bundle, updates):
     op = lambda obj, bundle, update: obj.commit_logical(bundle, update)
     self._apply_operation(bundle, updates, op)
@@ -81,10 +87,16 @@ class DirectMetrics(MetricResults):
                            v.extract_latest_attempted())
               for k, v in self._gauges.items()
               if self.matches(filter, k)]
+    histograms = [MetricResult(MetricKey(k.step, k.metric),
+                               v.extract_committed(),
+                               v.extract_latest_attempted())
+                  for k, v in self._histograms.items()
+                  if self.matches(filter, k)]
 
     return {self.COUNTERS: counters,
             self.DISTRIBUTIONS: distributions,
-            self.GAUGES: gauges}
+            self.GAUGES: gauges,
+            self.HISTOGRAMS: histograms}
 
 
 class DirectMetric(object):
@@ -265,7 +265,7 @@ class _DirectReadFromPubSub(PTransform):
 
 
 class _DirectWriteToPubSubFn(DoFn):
-  BUFFER_SIZE_ELEMENTS = 100
+  BUFFER_SIZE_ELEMENTS = 1000
   FLUSH_TIMEOUT_SECS = BUFFER_SIZE_ELEMENTS * 0.5
 
   def __init__(self, sink):
@@ -284,33 +284,33 @@ class _DirectWriteToPubSubFn(DoFn):
                                 'supported for PubSub writes')
 
   def start_bundle(self):
-    self._buffer = []
+    from apache_beam.runners.direct import pubsub_clients
+    # The publisher client is shared by the whole process, and batches the
+    # messages published by every bundle into larger publish requests.
+    self._pub_client = pubsub_clients.get_publisher_client()
+    self._topic = self._pub_client.topic_path(
+        self.project, self.short_topic_name)
+    self._futures = []
 
   def process(self, elem):
-    self._buffer.append(elem)
-    if len(self._buffer) >= self.BUFFER_SIZE_ELEMENTS:
+    if self.with_attributes:
+      future = self._pub_client.publish(
+          self._topic, elem.data, **elem.attributes)
+    else:
+      future = self._pub_client.publish(self._topic, elem)
+    self._futures.append(future)
+    if len(self._futures) >= self.BUFFER_SIZE_ELEMENTS:
       self._flush()
 
   def finish_bundle(self):
     self._flush()
 
   def _flush(self):
-    from google.cloud import pubsub
-    pub_client = pubsub.PublisherClient()
-    topic = pub_client.topic_path(self.project, self.short_topic_name)
-
-    if self.with_attributes:
-      futures = [pub_client.publish(topic, elem.data, **elem.attributes)
-                 for elem in self._buffer]
-    else:
-      futures = [pub_client.publish(topic, elem)
-                 for elem in self._buffer]
-
     timer_start = time.time()
-    for future in futures:
+    for future in self._futures:
       remaining = self.FLUSH_TIMEOUT_SECS - (time.time() - timer_start)
       future.result(remaining)
-    self._buffer = []
+    self._futures = []
 
 
 def _get_pubsub_transform_overrides(pipeline_options):
@@ -443,6 +443,11 @@ class DirectPipelineResult(PipelineResult):
       except:  # pylint: disable=broad-except
         self._state = PipelineState.FAILED
         raise
+      finally:
+        # Pub/Sub reads pull and acknowledge messages asynchronously.
+        from apache_beam.runners.direct import pubsub_clients
+        pubsub_clients.stop_pullers()
+        pubsub_clients.flush_acknowledgements()
     return self._state
 
   def aggregated_values(self, aggregator_or_name):
@@ -459,4 +464,6 @@ class DirectPipelineResult(PipelineResult):
     """
     self._state = PipelineState.CANCELLING
     self._executor.shutdown()
+    from apache_beam.runners.direct import pubsub_clients
+    pubsub_clients.stop_pullers()
     self._state = PipelineState.CANCELLED
@@ -33,6 +33,8 @@ from apache_beam.pipeline import Pipeline
 from apache_beam.runners import DirectRunner
 from apache_beam.runners import TestDirectRunner
 from apache_beam.runners import create_runner
+from apache_beam.runners.direct import executor
+from apache_beam.runners.worker import statesampler
 from apache_beam.testing import test_pipeline
 from apache_beam.testing.util import assert_that
 from apache_beam.testing.util import equal_to
@@ -72,6 +74,8 @@ class DirectPipelineResultTest(unittest.TestCase):
         count.inc()
         distro = Metrics.distribution(self.__class__, 'element_dist')
         distro.update(element)
+        histogram = Metrics.histogram(self.__class__, 'element_hist')
+        histogram.update(element * 100)
         return [element]
 
     p = Pipeline(DirectRunner())
@@ -112,6 +116,52 @@ class DirectPipelineResultTest(unittest.TestCase):
     hc.assert_that(gauge_result.committed.value, hc.equal_to(5))
     hc.assert_that(gauge_result.attempted.value, hc.equal_to(5))
 
+    histogram_result, = metrics['histograms']
+    hc.assert_that(
+        histogram_result.key,
+        hc.equal_to(MetricKey('Do', MetricName(namespace, 'element_hist'))))
+    hc.assert_that(histogram_result.committed.count, hc.equal_to(5))
+    hc.assert_that(histogram_result.committed.max, hc.equal_to(500))
+    hc.assert_that(histogram_result.attempted.p50,
+                   hc.close_to(300, 300 / 8.0))
+
+  def test_direct_runner_metrics_of_many_bundles(self):
+
+    class CountingDoFn(beam.DoFn):
+      def process(self, element):
+        Metrics.counter(self.__class__, 'elements').inc()
+
+    p = Pipeline(create_runner('BundleBasedDirectRunner'))
+    # The elements are read in several bundles.
+    _ = (p | beam.Create(list(range(2500)))
+         | 'Do' >> beam.ParDo(CountingDoFn()))
+    result = p.run()
+    result.wait_until_finish()
+    counter, = result.metrics().query()['counters']
+    self.assertEqual(2500, counter.committed)
+    self.assertEqual(2500, counter.attempted)
+
+  def test_executor_threads_have_a_sampler_per_task(self):
+    samplers = []
+
+    class SamplerRecordingTask(executor._ExecutorService.CallableTask):
+      def call(self, state_sampler):
+        samplers.append((state_sampler, statesampler.get_current_tracker()))
+
+    executor_service = executor._ExecutorService(1)
+    try:
+      for _ in range(2):
+        executor_service.submit(SamplerRecordingTask())
+      executor_service.queue.join()
+    finally:
+      executor_service.shutdown()
+    self.assertEqual(2, len(samplers))
+    for state_sampler, current_tracker in samplers:
+      self.assertIs(state_sampler, current_tracker)
+    self.assertIsNot(samplers[0][0], samplers[1][0])
+    worker, = executor_service.workers
+    self.assertIsNone(statesampler.get_tracker_of_thread(worker.ident))
+
   def test_create_runner(self):
     self.assertTrue(
         isinstance(create_runner('DirectRunner'),
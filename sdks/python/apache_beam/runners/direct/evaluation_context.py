@@ -54,6 +54,8 @@ class _SideInputView(object):
     self._view = view
     self.blocked_tasks = collections.deque()
     self.elements = []
+    # Index of the elements' values by window, updated as elements are added.
+    self.values_by_window = collections.defaultdict(list)
     self.value = None
     self.watermark = None
 
@@ -103,7 +105,8 @@ class _SideInputsContainer(object):
     with self._lock:
       view = self._views[side_input]
       if view.watermark and view.watermark.output_watermark >= block_until:
-        view.value = self._pvalue_to_value(side_input, view.elements)
+        if view.value is None:
+          view.value = self._pvalue_to_value(side_input, view)
         return view.value
       else:
         view.blocked_tasks.append((task, block_until))
@@ -112,7 +115,12 @@ class _SideInputsContainer(object):
   def add_values(self, side_input, values):
     with self._lock:
       view = self._views[side_input]
-      view.elements.extend(values)
+      for wv in values:
+        view.elements.append(wv)
+        for w in wv.windows:
+          view.values_by_window[w].append(wv.value)
+      # The cached SideInputMap and its materialized views are stale now.
+      view.value = None
 
   def update_watermarks_for_transform_and_unblock_tasks(self,
                                                         ptransform,
@@ -159,7 +167,8 @@ class _SideInputsContainer(object):
       tasks_just_unblocked = []
       for task, block_until in view.blocked_tasks:
         if watermark.output_watermark >= block_until:
-          view.value = self._pvalue_to_value(side_input, view.elements)
+          if view.value is None:
+            view.value = self._pvalue_to_value(side_input, view)
           unblocked_tasks.append(task)
           tasks_just_unblocked.append((task, block_until))
           task.blocked = False
@@ -167,12 +176,12 @@ class _SideInputsContainer(object):
         view.blocked_tasks.remove(task)
       return unblocked_tasks
 
-  def _pvalue_to_value(self, side_input, values):
+  def _pvalue_to_value(self, side_input, view):
     """Given a side input, returns the associated value in its requested form.
 
     Args:
       side_input: _UnpickledSideInput object.
-      values: Iterable values associated with the side input.
+      view: _SideInputView holding the values associated with the side input.
 
     Returns:
       The side input in its requested form.
@@ -182,7 +191,8 @@ class _SideInputsContainer(object):
     """
     return sideinputs.SideInputMap(type(side_input),
                                    side_input._view_options(),
-                                   values)
+                                   view.elements,
+                                   values_by_window=view.values_by_window)
 
 
 class EvaluationContext(object):
@@ -226,6 +236,7 @@ class EvaluationContext(object):
     self._pending_unblocked_tasks = []
     self._counter_factory = counters.CounterFactory()
     self._metrics = DirectMetrics()
+    self._grouping_tables = {}
 
     self._lock = threading.Lock()
 
@@ -331,6 +342,20 @@ class EvaluationContext(object):
         self._watermark_manager.get_watermarks(applied_ptransform),
         self._transform_keyed_states[applied_ptransform])
 
+  def get_grouping_table(self, applied_ptransform, create_table):
+    """Returns the grouping table shared by the bundles of a GroupByKey step.
+
+    Args:
+      applied_ptransform: the AppliedPTransform of the step.
+      create_table: a callable returning the table, called on the first
+        lookup of the step.
+    """
+    with self._lock:
+      table = self._grouping_tables.get(applied_ptransform)
+      if table is None:
+        table = self._grouping_tables[applied_ptransform] = create_table()
+      return table
+
   def create_bundle(self, output_pcollection):
     """Create an uncommitted bundle for the specified PCollection."""
     return self._bundle_factory.create_bundle(output_pcollection)
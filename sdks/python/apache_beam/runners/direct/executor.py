@@ -86,17 +86,22 @@ class _ExecutorService(object):
         return None
 
     def run(self):
-      state_sampler = statesampler.StateSampler('', counters.CounterFactory())
-      statesampler.set_current_tracker(state_sampler)
       while not self.shutdown_requested:
         task = self._get_task_or_none()
         if task:
           try:
             if not self.shutdown_requested:
+              # The scoped states of a sampler keep the metrics container
+              # they were created with, so each task gets its own sampler.
+              state_sampler = statesampler.StateSampler(
+                  '', counters.CounterFactory())
+              statesampler.set_current_tracker(state_sampler)
               self._update_name(task)
               task.call(state_sampler)
               self._update_name()
           finally:
+            # An idle thread is not attributed to the steps of its last task.
+            statesampler.set_current_tracker(None)
             self.queue.task_done()
 
     def shutdown(self):
@@ -298,7 +303,8 @@ class TransformExecutor(_ExecutorService.CallableTask):
   def call(self, state_sampler):
     self._call_count += 1
     assert self._call_count <= (1 + len(self._applied_ptransform.side_inputs))
-    metrics_container = MetricsContainer(self._applied_ptransform.full_label)
+    metrics_container = MetricsContainer(
+        self._applied_ptransform.full_label, thread_confined=True)
     start_state = state_sampler.scoped_state(
         self._applied_ptransform.full_label,
         'start',
@@ -0,0 +1,237 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""An encoded, hash-partitioned grouping table used by the DirectRunner.
+
+Values are kept as nested-encoded bytes appended to a single buffer per key,
+keys are spread over a fixed number of hash partitions, and partitions whose
+combined size exceeds a memory budget are spilled to temporary files as runs
+sorted by key.  Groups are produced lazily, one partition at a time, by
+merging the runs as they are read back, and the grouped values are only
+decoded when they are iterated.
+
+For internal use only. No backwards compatibility guarantees.
+"""
+
+from __future__ import absolute_import
+
+import heapq
+import itertools
+import operator
+import os
+import struct
+import tempfile
+from builtins import object
+from builtins import range
+
+from apache_beam.coders.coder_impl import create_InputStream
+
+
+class EncodedValues(object):
+  """A re-iterable of values decoded lazily from a nested-encoded buffer."""
+
+  def __init__(self, encoded, value_coder_impl, count):
+    self._encoded = encoded
+    self._value_coder_impl = value_coder_impl
+    self._count = count
+
+  def __len__(self):
+    return self._count
+
+  def __iter__(self):
+    stream = create_InputStream(self._encoded)
+    decode_from_stream = self._value_coder_impl.decode_from_stream
+    for _ in range(self._count):
+      yield decode_from_stream(stream, True)
+
+  def __repr__(self):
+    return 'EncodedValues(%d values, %d bytes)' % (
+        self._count, len(self._encoded))
+
+
+class _Partition(object):
+  """A single hash partition: in-memory buffers plus sorted spilled runs.
+
+  Each spill appends a run of groups sorted by encoded key to the spill file.
+  A group is a record of the key length, value count and values length,
+  followed by the encoded key and values, so that runs are read back one
+  group at a time and merged without holding them in memory.
+  """
+
+  _RECORD_HEADER = struct.Struct('>IQQ')
+
+  def __init__(self):
+    # Mapping of encoded key -> [bytearray of encoded values, value count].
+    self.buffers = {}
+    self.byte_size = 0
+    self.spill_file = None
+    # The (start, end) offsets of the runs in the spill file.
+    self.runs = []
+
+  def add(self, encoded_key, encoded_value):
+    entry = self.buffers.get(encoded_key)
+    if entry is None:
+      entry = self.buffers[encoded_key] = [bytearray(), 0]
+      self.byte_size += len(encoded_key)
+    entry[0].extend(encoded_value)
+    entry[1] += 1
+    self.byte_size += len(encoded_value)
+
+  def spill(self):
+    """Appends the in-memory buffers to the spill file as a sorted run."""
+    if self.spill_file is None:
+      self.spill_file = tempfile.TemporaryFile()
+    self.spill_file.seek(0, os.SEEK_END)
+    start = self.spill_file.tell()
+    pack = self._RECORD_HEADER.pack
+    for encoded_key in sorted(self.buffers):
+      buf, count = self.buffers[encoded_key]
+      self.spill_file.write(pack(len(encoded_key), count, len(buf)))
+      self.spill_file.write(encoded_key)
+      self.spill_file.write(buf)
+    self.runs.append((start, self.spill_file.tell()))
+    self.buffers = {}
+    self.byte_size = 0
+
+  def read_groups(self):
+    """Yields the merged (encoded_key, bytes, count) groups in this partition.
+
+    The spilled runs and the in-memory buffers are merged by key, so that
+    each key is produced exactly once, in key order, with its values in the
+    order they were added. The partition can be read any number of times.
+    """
+    buffers = self.buffers
+    runs = [self._read_run(i, start, end)
+            for i, (start, end) in enumerate(self.runs)]
+    runs.append((encoded_key, len(runs), bytes(buffers[encoded_key][0]),
+                 buffers[encoded_key][1])
+                for encoded_key in sorted(buffers))
+    for encoded_key, records in itertools.groupby(
+        heapq.merge(*runs), key=operator.itemgetter(0)):
+      encoded_values = []
+      count = 0
+      for _, _, run_values, run_count in records:
+        encoded_values.append(run_values)
+        count += run_count
+      yield encoded_key, b''.join(encoded_values), count
+
+  def _read_run(self, index, start, end):
+    """Yields the (encoded_key, index, encoded_values, count) of a run."""
+    header = self._RECORD_HEADER
+    position = start
+    while position < end:
+      # The runs are read in an interleaved manner, hence the seeks.
+      self.spill_file.seek(position)
+      data = self.spill_file.read(header.size)
+      if len(data) < header.size:
+        raise ValueError('Truncated spill record header.')
+      key_length, count, values_length = header.unpack(data)
+      encoded_key = self.spill_file.read(key_length)
+      encoded_values = self.spill_file.read(values_length)
+      if (len(encoded_key) < key_length or
+          len(encoded_values) < values_length):
+        raise ValueError('Truncated spill record.')
+      position += header.size + key_length + values_length
+      yield encoded_key, index, encoded_values, count
+
+  def close(self):
+    if self.spill_file is not None:
+      self.spill_file.close()
+      self.spill_file = None
+    self.runs = []
+    self.buffers = {}
+    self.byte_size = 0
+
+
+class EncodedGroupingTable(object):
+  """Groups nested-encoded values by encoded key in hash partitions.
+
+  Args:
+    value_coder: coder used to encode the grouped values.
+    num_partitions: number of hash partitions the keys are spread over.
+    max_memory_bytes: approximate budget for the in-memory buffers; once it is
+      exceeded, the largest partition is spilled to a temporary file.  If None,
+      nothing is ever spilled.
+  """
+
+  def __init__(self, value_coder, num_partitions=16, max_memory_bytes=None):
+    assert num_partitions > 0
+    self._value_coder_impl = value_coder.get_impl()
+    self._partitions = [_Partition() for _ in range(num_partitions)]
+    self._max_memory_bytes = max_memory_bytes
+    self._byte_size = 0
+    self.spill_count = 0
+
+  def encode_value(self, value):
+    return self._value_coder_impl.encode_nested(value)
+
+  def add_encoded(self, encoded_key, encoded_values):
+    """Adds already-encoded values for the given encoded key."""
+    partition = self._partitions[hash(encoded_key) % len(self._partitions)]
+    before = partition.byte_size
+    for encoded_value in encoded_values:
+      partition.add(encoded_key, encoded_value)
+    self._byte_size += partition.byte_size - before
+    if (self._max_memory_bytes is not None
+        and self._byte_size > self._max_memory_bytes):
+      self._spill_largest_partition()
+
+  def _spill_largest_partition(self):
+    largest = max(self._partitions, key=lambda p: p.byte_size)
+    self._byte_size -= largest.byte_size
+    largest.spill()
+    self.spill_count += 1
+
+  @property
+  def byte_size(self):
+    """The number of bytes currently buffered in memory."""
+    return self._byte_size
+
+  @property
+  def num_partitions(self):
+    return len(self._partitions)
+
+  def partitions(self):
+    """Yields, per partition, an iterable of (encoded_key, values) groups.
+
+    The values of each group are an ``EncodedValues`` iterable that decodes
+    on demand.
+    """
+    for index in range(len(self._partitions)):
+      yield self.partition_groups(index)
+
+  def partition_groups(self, index):
+    """Yields the (encoded_key, values) groups of the given partition.
+
+    The groups are merged from the spilled runs as they are iterated, and can
+    be iterated again until the partition is released.
+    """
+    for encoded_key, encoded, count in self._partitions[index].read_groups():
+      yield encoded_key, EncodedValues(
+          encoded, self._value_coder_impl, count)
+
+  def release_partition(self, index):
+    """Releases the buffers and spill file of the given partition."""
+    partition = self._partitions[index]
+    self._byte_size -= partition.byte_size
+    partition.close()
+
+  def close(self):
+    """Releases all the buffers and spill files held by this table."""
+    for partition in self._partitions:
+      partition.close()
+    self._byte_size = 0
@@ -0,0 +1,193 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Unit tests for the encoded grouping table of the DirectRunner."""
+
+from __future__ import absolute_import
+
+import collections
+import unittest
+from builtins import range
+
+import mock
+
+import apache_beam as beam
+from apache_beam import coders
+from apache_beam.options.pipeline_options import PipelineOptions
+from apache_beam.runners.direct.grouping_table import EncodedGroupingTable
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that
+from apache_beam.testing.util import equal_to
+from apache_beam.transforms import window
+
+
+class EncodedGroupingTableTest(unittest.TestCase):
+
+  def _add(self, table, key, values):
+    table.add_encoded(
+        coders.BytesCoder().encode(key),
+        [table.encode_value(v) for v in values])
+
+  def _groups(self, table):
+    result = {}
+    for groups in table.partitions():
+      for encoded_key, values in groups:
+        self.assertNotIn(encoded_key, result)
+        result[encoded_key] = list(values)
+    return result
+
+  def test_groups_values_by_key(self):
+    table = EncodedGroupingTable(coders.VarIntCoder(), num_partitions=4)
+    self._add(table, b'a', [1, 2])
+    self._add(table, b'b', [3])
+    self._add(table, b'a', [4])
+    self.assertEqual({b'a': [1, 2, 4], b'b': [3]}, self._groups(table))
+
+  def test_values_are_reiterable(self):
+    table = EncodedGroupingTable(coders.StrUtf8Coder(), num_partitions=1)
+    self._add(table, b'k', [u'x', u'y', u'z'])
+    _, values = next(next(table.partitions()))
+    self.assertEqual(3, len(values))
+    self.assertEqual([u'x', u'y', u'z'], list(values))
+    self.assertEqual([u'x', u'y', u'z'], list(values))
+
+  def test_spills_when_over_budget(self):
+    table = EncodedGroupingTable(
+        coders.VarIntCoder(), num_partitions=3, max_memory_bytes=64)
+    expected = {}
+    for i in range(200):
+      key = b'key%d' % (i % 7)
+      self._add(table, key, [i])
+      expected.setdefault(key, []).append(i)
+    self.assertGreater(table.spill_count, 0)
+    self.assertLessEqual(table.byte_size, 64)
+    self.assertEqual(expected, self._groups(table))
+    table.close()
+
+  def test_spill_file_is_read_incrementally(self):
+    table = EncodedGroupingTable(coders.VarIntCoder(), num_partitions=1)
+    for i in range(10):
+      self._add(table, b'key%d' % i, [i])
+    table._spill_largest_partition()
+    self._add(table, b'key0', [10])
+    partition = table._partitions[0]
+    spill_file = partition.spill_file
+    partition.spill_file = mock.Mock(wraps=spill_file)
+    expected = dict((b'key%d' % i, [i]) for i in range(10))
+    expected[b'key0'].append(10)
+    self.assertEqual(expected, self._groups(table))
+    # Every read is bounded by the size of a single record.
+    for args, _ in partition.spill_file.read.call_args_list:
+      self.assertEqual(1, len(args))
+      self.assertLess(args[0], 32)
+    partition.spill_file = spill_file
+    table.close()
+
+  def test_merges_spilled_runs(self):
+    table = EncodedGroupingTable(coders.VarIntCoder(), num_partitions=1)
+    self._add(table, b'b', [1])
+    self._add(table, b'a', [2])
+    table._spill_largest_partition()
+    self._add(table, b'c', [3])
+    self._add(table, b'a', [4])
+    table._spill_largest_partition()
+    self._add(table, b'b', [5])
+    self._add(table, b'a', [6])
+    expected = [(b'a', [2, 4, 6]), (b'b', [1, 5]), (b'c', [3])]
+    # The groups are in key order, and can be read again.
+    for _ in range(2):
+      self.assertEqual(
+          expected,
+          [(k, list(vs)) for k, vs in table.partition_groups(0)])
+    table.release_partition(0)
+    self.assertEqual(0, table.byte_size)
+    self.assertEqual([], list(table.partition_groups(0)))
+
+
+class EncodedGroupByKeyTest(unittest.TestCase):
+
+  def _options(self):
+    return PipelineOptions([
+        '--direct_runner_use_encoded_gbk',
+        '--direct_runner_gbk_partitions=3',
+        '--direct_runner_gbk_memory_mb=0'])
+
+  def test_group_by_key(self):
+    with TestPipeline(
+        runner='BundleBasedDirectRunner', options=self._options()) as p:
+      result = (p
+                | beam.Create([(i % 5, i) for i in range(100)])
+                | beam.GroupByKey()
+                | beam.Map(lambda kv: (kv[0], sorted(kv[1]))))
+      assert_that(result, equal_to(
+          [(k, list(range(k, 100, 5))) for k in range(5)]))
+
+  def test_outputs_a_partition_per_evaluation(self):
+    calls = collections.OrderedDict()
+    partition_groups = EncodedGroupingTable.partition_groups
+    release_partition = EncodedGroupingTable.release_partition
+
+    def read(table, index):
+      calls.setdefault(table, []).append(('read', index))
+      return partition_groups(table, index)
+
+    def release(table, index):
+      calls.setdefault(table, []).append(('release', index))
+      release_partition(table, index)
+
+    with mock.patch.object(EncodedGroupingTable, 'partition_groups', read), \
+         mock.patch.object(EncodedGroupingTable, 'release_partition', release):
+      with TestPipeline(
+          runner='BundleBasedDirectRunner', options=self._options()) as p:
+        result = (p
+                  | beam.Create([('key%d' % i, i) for i in range(100)])
+                  | beam.GroupByKey()
+                  | beam.Map(lambda kv: (kv[0], list(kv[1]))))
+        assert_that(result, equal_to(
+            [('key%d' % i, [i]) for i in range(100)]))
+    # Each partition is read by its own evaluation, and released by the
+    # next one.
+    self.assertEqual(
+        [('read', 0),
+         ('release', 0), ('read', 1),
+         ('release', 0), ('release', 1), ('read', 2),
+         ('release', 0), ('release', 1), ('release', 2)],
+        list(calls.values())[0])
+
+  def test_group_by_key_empty(self):
+    with TestPipeline(
+        runner='BundleBasedDirectRunner', options=self._options()) as p:
+      result = (p
+                | beam.Create([(0, 0)])
+                | beam.Filter(lambda kv: False)
+                | beam.GroupByKey())
+      assert_that(result, equal_to([]))
+
+  def test_group_by_key_windowed(self):
+    with TestPipeline(
+        runner='BundleBasedDirectRunner', options=self._options()) as p:
+      result = (p
+                | beam.Create([('k', i) for i in range(6)])
+                | beam.Map(lambda kv: window.TimestampedValue(kv, kv[1]))
+                | beam.WindowInto(window.FixedWindows(3))
+                | beam.GroupByKey()
+                | beam.Map(lambda kv: (kv[0], sorted(kv[1]))))
+      assert_that(result, equal_to([('k', [0, 1, 2]), ('k', [3, 4, 5])]))
+
+
+if __name__ == '__main__':
+  unittest.main()
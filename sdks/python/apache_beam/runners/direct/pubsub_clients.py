@@ -0,0 +1,289 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Process-wide Pub/Sub clients used by the DirectRunner.
+
+Publisher and subscriber clients hold gRPC channels and background threads,
+so they are created once per process and shared by every bundle, instead of
+once per flush or per pull.  This module also provides a background puller
+feeding a bounded buffer, whose messages are leased until they are read, and
+a batcher sending acknowledgements asynchronously.
+
+For internal use only. No backwards compatibility guarantees.
+"""
+
+from __future__ import absolute_import
+
+import logging
+import threading
+from builtins import object
+from builtins import range
+
+from future.moves import queue
+
+# The largest number of messages a single pull request may return.
+MAX_PULL_SIZE = 1000
+
+# The largest number of ack ids sent in a single acknowledge request.
+MAX_ACK_IDS_PER_REQUEST = 2500
+
+_lock = threading.Lock()
+_clients = {}
+_pullers = {}
+_ack_batchers = {}
+
+
+def _get_client(client_type):
+  # Clients are keyed by their type, so that a patched type gets its own
+  # client rather than one created before it was patched.
+  with _lock:
+    if client_type not in _clients:
+      _clients[client_type] = client_type()
+    return _clients[client_type]
+
+
+def get_publisher_client():
+  """Returns the ``pubsub.PublisherClient`` shared by this process."""
+  from google.cloud import pubsub
+  return _get_client(pubsub.PublisherClient)
+
+
+def get_subscriber_client():
+  """Returns the ``pubsub.SubscriberClient`` shared by this process."""
+  from google.cloud import pubsub
+  return _get_client(pubsub.SubscriberClient)
+
+
+def get_puller(sub_name, pull_size, buffer_size):
+  """Returns the running background puller of the given subscription."""
+  sub_client = get_subscriber_client()
+  with _lock:
+    puller = _pullers.get((sub_client, sub_name))
+    if puller is None or not puller.is_alive():
+      puller = BackgroundPuller(sub_client, sub_name, pull_size, buffer_size)
+      _pullers[sub_client, sub_name] = puller
+      puller.start()
+    return puller
+
+
+def stop_pullers():
+  """Stops the background pullers, once the pipelines reading are done.
+
+  The messages buffered by the pullers are not acknowledged, and their lease
+  is released so that they are redelivered right away.
+  """
+  with _lock:
+    pullers = list(_pullers.values())
+    _pullers.clear()
+  for puller in pullers:
+    puller.stop()
+    puller.release()
+
+
+def get_ack_batcher(sub_name):
+  """Returns the acknowledgement batcher of the given subscription."""
+  sub_client = get_subscriber_client()
+  with _lock:
+    if (sub_client, sub_name) not in _ack_batchers:
+      _ack_batchers[sub_client, sub_name] = AckBatcher(sub_client, sub_name)
+    return _ack_batchers[sub_client, sub_name]
+
+
+def flush_acknowledgements():
+  """Blocks until every acknowledgement requested so far has been sent."""
+  with _lock:
+    batchers = list(_ack_batchers.values())
+  for batcher in batchers:
+    batcher.flush()
+
+
+class BackgroundPuller(threading.Thread):
+  """Pulls messages of a subscription on a daemon thread.
+
+  Received messages are put into a bounded buffer, so that pulling blocks
+  whenever the pipeline falls behind. The ack deadline of the buffered
+  messages is extended periodically, so that they are not redelivered, and
+  read twice, while they wait in the buffer.
+
+  Args:
+    sub_client: the ``pubsub.SubscriberClient`` to pull with.
+    sub_name: the full path of the subscription.
+    pull_size: the maximum number of messages requested per pull.
+    buffer_size: the maximum number of messages held in the buffer.
+  """
+
+  # Seconds a pull request waits for messages before being retried.
+  PULL_TIMEOUT_SECS = 30
+
+  # Seconds a full buffer is waited on before checking if stopped.
+  PUT_TIMEOUT_SECS = 1
+
+  # Seconds between extensions of the ack deadline of buffered messages. This
+  # is below 10 seconds, the shortest ack deadline of a subscription.
+  LEASE_INTERVAL_SECS = 5
+
+  # The ack deadline, in seconds, that buffered messages are extended to.
+  LEASE_DEADLINE_SECS = 60
+
+  def __init__(self, sub_client, sub_name, pull_size, buffer_size):
+    super(BackgroundPuller, self).__init__(
+        name='pubsub-puller-%s' % sub_name.split('/')[-1])
+    self.daemon = True
+    self._sub_client = sub_client
+    self._sub_name = sub_name
+    self._pull_size = pull_size
+    self._buffer = queue.Queue(maxsize=max(buffer_size, pull_size))
+    # The ack ids of the messages received but not taken yet.
+    self._leased = set()
+    self._leased_lock = threading.Lock()
+    self._error = None
+    self._stopped = threading.Event()
+
+  def run(self):
+    leaser = threading.Thread(
+        target=self._extend_leases, name='pubsub-leaser-%s' % (
+            self._sub_name.split('/')[-1]))
+    leaser.daemon = True
+    leaser.start()
+    try:
+      while not self._stopped.is_set():
+        response = self._sub_client.pull(
+            self._sub_name, max_messages=self._pull_size,
+            return_immediately=False, timeout=self.PULL_TIMEOUT_SECS)
+        with self._leased_lock:
+          self._leased.update(
+              received_message.ack_id
+              for received_message in response.received_messages)
+        for received_message in response.received_messages:
+          while not self._stopped.is_set():
+            try:
+              self._buffer.put(
+                  received_message, timeout=self.PUT_TIMEOUT_SECS)
+              break
+            except queue.Full:
+              pass
+    except Exception as e:  # pylint: disable=broad-except
+      if not self._stopped.is_set():
+        logging.exception('Pulling from %s failed.', self._sub_name)
+        self._error = e
+
+  def _extend_leases(self):
+    while not self._stopped.wait(self.LEASE_INTERVAL_SECS):
+      with self._leased_lock:
+        ack_ids = list(self._leased)
+      self._modify_ack_deadline(ack_ids, self.LEASE_DEADLINE_SECS)
+
+  def _modify_ack_deadline(self, ack_ids, ack_deadline_seconds):
+    for start in range(0, len(ack_ids), MAX_ACK_IDS_PER_REQUEST):
+      try:
+        self._sub_client.modify_ack_deadline(
+            self._sub_name, ack_ids[start:start + MAX_ACK_IDS_PER_REQUEST],
+            ack_deadline_seconds)
+      except Exception:  # pylint: disable=broad-except
+        # The messages are redelivered once their ack deadline expires.
+        logging.warning('Failed to modify the ack deadline of %d messages '
+                        'of %s.', len(ack_ids), self._sub_name, exc_info=True)
+
+  def _take_nowait(self, max_messages):
+    received_messages = []
+    for _ in range(max_messages):
+      try:
+        received_messages.append(self._buffer.get_nowait())
+      except queue.Empty:
+        break
+    with self._leased_lock:
+      self._leased.difference_update(
+          received_message.ack_id for received_message in received_messages)
+    return received_messages
+
+  def take(self, max_messages):
+    """Returns at most max_messages received messages, without blocking.
+
+    The messages are no longer leased by the puller, so they must be
+    acknowledged before their ack deadline expires.
+    """
+    received_messages = self._take_nowait(max_messages)
+    error = self._error
+    if not received_messages and error is not None:
+      raise error  # pylint: disable=raising-bad-type
+    return received_messages
+
+  def stop(self):
+    self._stopped.set()
+
+  def release(self):
+    """Releases the messages left in the buffer, for them to be redelivered.
+
+    They are not taken, hence not read twice, afterwards.
+    """
+    ack_ids = [received_message.ack_id for received_message
+               in self._take_nowait(self._buffer.maxsize)]
+    with self._leased_lock:
+      ack_ids.extend(self._leased)
+      self._leased.clear()
+    self._modify_ack_deadline(ack_ids, 0)
+
+
+class AckBatcher(object):
+  """Acknowledges messages of a subscription asynchronously.
+
+  Ack ids added while a request is in flight are sent together by the next
+  request, so consecutive bundles share acknowledge calls.
+
+  Args:
+    sub_client: the ``pubsub.SubscriberClient`` to acknowledge with.
+    sub_name: the full path of the subscription.
+  """
+
+  def __init__(self, sub_client, sub_name):
+    self._sub_client = sub_client
+    self._sub_name = sub_name
+    self._lock = threading.Lock()
+    self._pending = []
+    self._sender = None
+
+  def add(self, ack_ids):
+    with self._lock:
+      self._pending.extend(ack_ids)
+      if self._sender is None:
+        self._sender = threading.Thread(
+            target=self._send, name='pubsub-acker')
+        self._sender.daemon = True
+        self._sender.start()
+
+  def _send(self):
+    while True:
+      with self._lock:
+        ack_ids = self._pending[:MAX_ACK_IDS_PER_REQUEST]
+        del self._pending[:MAX_ACK_IDS_PER_REQUEST]
+        if not ack_ids:
+          self._sender = None
+          return
+      try:
+        self._sub_client.acknowledge(self._sub_name, ack_ids)
+      except Exception:  # pylint: disable=broad-except
+        # The messages are redelivered once their ack deadline expires.
+        logging.warning('Failed to acknowledge %d messages of %s.',
+                        len(ack_ids), self._sub_name, exc_info=True)
+
+  def flush(self):
+    while True:
+      with self._lock:
+        sender = self._sender
+      if sender is None:
+        return
+      sender.join()
@@ -0,0 +1,186 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Unit tests for the Pub/Sub clients of the DirectRunner."""
+
+from __future__ import absolute_import
+
+import threading
+import time
+import unittest
+from builtins import range
+
+import mock
+
+from apache_beam.runners.direct import pubsub_clients
+from apache_beam.testing import test_utils
+
+# Protect against environments where the PubSub library is not available.
+try:
+  from google.cloud import pubsub
+except ImportError:
+  pubsub = None
+
+
+@unittest.skipIf(pubsub is None, 'GCP dependencies are not installed')
+class PubSubClientsTest(unittest.TestCase):
+
+  @mock.patch('google.cloud.pubsub.SubscriberClient')
+  @mock.patch('google.cloud.pubsub.PublisherClient')
+  def test_clients_are_shared(self, mock_publisher, mock_subscriber):
+    self.assertIs(pubsub_clients.get_publisher_client(),
+                  pubsub_clients.get_publisher_client())
+    self.assertIs(pubsub_clients.get_subscriber_client(),
+                  pubsub_clients.get_subscriber_client())
+    self.assertEqual(1, mock_publisher.call_count)
+    self.assertEqual(1, mock_subscriber.call_count)
+
+  def test_background_puller(self):
+    responses = [
+        test_utils.create_pull_response([
+            test_utils.PullResponseMessage(b'%d' % i, ack_id='%d' % i)
+            for i in range(start, start + 3)])
+        for start in (0, 3)]
+    pulled = threading.Event()
+
+    def pull(*unused_args, **unused_kwargs):
+      if responses:
+        return responses.pop(0)
+      pulled.set()
+      time.sleep(0.01)
+      return test_utils.create_pull_response([])
+
+    sub_client = mock.Mock()
+    sub_client.pull.side_effect = pull
+    puller = pubsub_clients.BackgroundPuller(
+        sub_client, 'projects/p/subscriptions/s', 4, 100)
+    puller.start()
+    self.assertTrue(pulled.wait(10))
+    puller.stop()
+    sub_client.pull.assert_called_with(
+        'projects/p/subscriptions/s', max_messages=4,
+        return_immediately=False, timeout=mock.ANY)
+    self.assertEqual(['0', '1', '2', '3'],
+                     [rm.ack_id for rm in puller.take(4)])
+    self.assertEqual(['4', '5'], [rm.ack_id for rm in puller.take(4)])
+    self.assertEqual([], puller.take(4))
+
+  @mock.patch.object(pubsub_clients.BackgroundPuller, 'LEASE_INTERVAL_SECS',
+                     0.01)
+  def test_background_puller_leases_buffered_messages(self):
+    responses = [test_utils.create_pull_response([
+        test_utils.PullResponseMessage(b'%d' % i, ack_id='%d' % i)
+        for i in range(3)])]
+    leases = []
+    leased = threading.Condition()
+
+    def pull(*unused_args, **unused_kwargs):
+      if responses:
+        return responses.pop(0)
+      time.sleep(0.01)
+      return test_utils.create_pull_response([])
+
+    def modify_ack_deadline(unused_sub_name, ack_ids, ack_deadline_seconds):
+      with leased:
+        leases.append((sorted(ack_ids), ack_deadline_seconds))
+        leased.notify_all()
+
+    def wait_for_lease(lease):
+      with leased:
+        deadline = time.time() + 10
+        while lease not in leases and time.time() < deadline:
+          leased.wait(0.1)
+        self.assertIn(lease, leases)
+
+    sub_client = mock.Mock()
+    sub_client.pull.side_effect = pull
+    sub_client.modify_ack_deadline.side_effect = modify_ack_deadline
+    puller = pubsub_clients.BackgroundPuller(
+        sub_client, 'projects/p/subscriptions/s', 10, 100)
+    puller.start()
+    wait_for_lease((['0', '1', '2'], puller.LEASE_DEADLINE_SECS))
+
+    # Taken messages are no longer extended, and the buffered ones are
+    # released once the pipeline is done.
+    self.assertEqual(['0', '1'], [rm.ack_id for rm in puller.take(2)])
+    wait_for_lease((['2'], puller.LEASE_DEADLINE_SECS))
+    puller.stop()
+    puller.join(10)
+    puller.release()
+    wait_for_lease((['2'], 0))
+    self.assertEqual([], puller.take(2))
+
+  def test_background_puller_raises_errors(self):
+    sub_client = mock.Mock()
+    sub_client.pull.side_effect = RuntimeError('unavailable')
+    puller = pubsub_clients.BackgroundPuller(
+        sub_client, 'projects/p/subscriptions/s', 10, 100)
+    puller.start()
+    puller.join(10)
+    with self.assertRaisesRegexp(RuntimeError, r'unavailable'):
+      puller.take(10)
+
+  @mock.patch('google.cloud.pubsub.SubscriberClient')
+  def test_stop_pullers(self, mock_subscriber):
+    # The puller fills its buffer, and blocks until stopped.
+    mock_subscriber.return_value.pull.return_value = (
+        test_utils.create_pull_response([
+            test_utils.PullResponseMessage(b'data', ack_id='%d' % i)
+            for i in range(3)]))
+    puller = pubsub_clients.get_puller('projects/p/subscriptions/s', 1, 1)
+    self.assertIs(
+        puller, pubsub_clients.get_puller('projects/p/subscriptions/s', 1, 1))
+
+    pubsub_clients.stop_pullers()
+    puller.join(10)
+    self.assertFalse(puller.is_alive())
+    new_puller = pubsub_clients.get_puller('projects/p/subscriptions/s', 1, 1)
+    self.assertIsNot(puller, new_puller)
+    pubsub_clients.stop_pullers()
+    new_puller.join(10)
+
+  def test_ack_batcher(self):
+    sent = []
+    blocked = threading.Event()
+
+    def acknowledge(unused_sub_name, ack_ids):
+      blocked.wait(10)
+      sent.append(list(ack_ids))
+
+    sub_client = mock.Mock()
+    sub_client.acknowledge.side_effect = acknowledge
+    batcher = pubsub_clients.AckBatcher(sub_client, 'sub')
+    batcher.add(['a'])
+    batcher.add(['b', 'c'])
+    batcher.add(['d'])
+    blocked.set()
+    batcher.flush()
+    self.assertEqual(['a', 'b', 'c', 'd'], sum(sent, []))
+    self.assertLessEqual(len(sent), 2)
+
+  def test_ack_batcher_splits_large_batches(self):
+    sub_client = mock.Mock()
+    batcher = pubsub_clients.AckBatcher(sub_client, 'sub')
+    ack_ids = ['%d' % i for i in range(
+        pubsub_clients.MAX_ACK_IDS_PER_REQUEST + 1)]
+    batcher.add(ack_ids)
+    batcher.flush()
+    self.assertEqual(2, sub_client.acknowledge.call_count)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -20,6 +20,7 @@
 from __future__ import absolute_import
 
 import collections
+import itertools
 import logging
 import random
 import time
@@ -32,14 +33,17 @@ from apache_beam import coders
 from apache_beam import pvalue
 from apache_beam import typehints
 from apache_beam.internal import pickler
+from apache_beam.options.pipeline_options import DirectOptions
 from apache_beam.runners import common
 from apache_beam.runners.common import DoFnRunner
 from apache_beam.runners.common import DoFnState
 from apache_beam.runners.dataflow.native_io.iobase import _NativeWrite  # pylint: disable=protected-access
+from apache_beam.runners.direct import pubsub_clients
 from apache_beam.runners.direct.direct_runner import _DirectReadFromPubSub
 from apache_beam.runners.direct.direct_runner import _StreamingGroupAlsoByWindow
 from apache_beam.runners.direct.direct_runner import _StreamingGroupByKeyOnly
 from apache_beam.runners.direct.direct_userstate import DirectUserStateContext
+from apache_beam.runners.direct.grouping_table import EncodedGroupingTable
 from apache_beam.runners.direct.sdf_direct_runner import ProcessElements
 from apache_beam.runners.direct.sdf_direct_runner import ProcessFn
 from apache_beam.runners.direct.sdf_direct_runner import SDFProcessElementInvoker
@@ -54,6 +58,7 @@ from apache_beam.transforms import core
 from apache_beam.transforms.trigger import TimeDomain
 from apache_beam.transforms.trigger import _CombiningValueStateTag
 from apache_beam.transforms.trigger import _ListStateTag
+from apache_beam.transforms.trigger import _ValueStateTag
 from apache_beam.transforms.trigger import create_trigger_driver
 from apache_beam.transforms.userstate import get_dofn_specs
 from apache_beam.transforms.userstate import is_stateful_dofn
@@ -393,8 +398,7 @@ class _PubSubSubscriptionWrapper(object):
       short_sub_name: Valid subscription name without
         'projects/{project}/subscriptions/' prefix. May be None.
     """
-    from google.cloud import pubsub
-    self.sub_client = pubsub.SubscriberClient()
+    self.sub_client = pubsub_clients.get_subscriber_client()
 
     if short_sub_name is None:
       self.sub_name = self.sub_client.subscription_path(
@@ -432,6 +436,20 @@ class _PubSubReadEvaluator(_TransformEvaluator):
         self._applied_ptransform, self.source.project, self.source.topic_name,
         self.source.subscription_name)
 
+    direct_options = self._evaluation_context.pipeline_options.view_as(
+        DirectOptions)
+    self._pull_size = direct_options.direct_runner_pubsub_pull_size
+    if not 0 < self._pull_size <= pubsub_clients.MAX_PULL_SIZE:
+      raise ValueError(
+          'direct_runner_pubsub_pull_size must be between 1 and %d, got %d.'
+          % (pubsub_clients.MAX_PULL_SIZE, self._pull_size))
+    if direct_options.direct_runner_pubsub_streaming_pull:
+      self._puller = pubsub_clients.get_puller(
+          self._sub_name, self._pull_size,
+          direct_options.direct_runner_pubsub_buffer_size)
+    else:
+      self._puller = None
+
   @classmethod
   def get_subscription(cls, transform, project, topic, short_sub_name):
     if transform not in cls._subscription_cache:
@@ -447,14 +465,16 @@ class _PubSubReadEvaluator(_TransformEvaluator):
 
   def _read_from_pubsub(self, timestamp_attribute):
     from apache_beam.io.gcp.pubsub import PubsubMessage
-    from google.cloud import pubsub
     # Because of the AutoAck, we are not able to reread messages if this
     # evaluator fails with an exception before emitting a bundle. However,
     # the DirectRunner currently doesn't retry work items anyway, so the
     # pipeline would enter an inconsistent state on any error.
-    sub_client = pubsub.SubscriberClient()
-    response = sub_client.pull(self._sub_name, max_messages=10,
-                               return_immediately=True)
+    if self._puller is not None:
+      received_messages = self._puller.take(self._pull_size)
+    else:
+      received_messages = pubsub_clients.get_subscriber_client().pull(
+          self._sub_name, max_messages=self._pull_size,
+          return_immediately=True).received_messages
 
     def _get_element(message):
       parsed_message = PubsubMessage._from_message(message)
@@ -474,10 +494,10 @@ class _PubSubReadEvaluator(_TransformEvaluator):
 
       return timestamp, parsed_message
 
-    results = [_get_element(rm.message) for rm in response.received_messages]
-    ack_ids = [rm.ack_id for rm in response.received_messages]
+    results = [_get_element(rm.message) for rm in received_messages]
+    ack_ids = [rm.ack_id for rm in received_messages]
     if ack_ids:
-      sub_client.acknowledge(self._sub_name, ack_ids)
+      pubsub_clients.get_ack_batcher(self._sub_name).add(ack_ids)
 
     return results
 
@@ -648,6 +668,7 @@ class _GroupByKeyOnlyEvaluator(_TransformEvaluator):
   MAX_ELEMENT_PER_BUNDLE = None
   ELEMENTS_TAG = _ListStateTag('elements')
   COMPLETION_TAG = _CombiningValueStateTag('completed', any)
+  NEXT_PARTITION_TAG = _ValueStateTag('next_partition')
 
   def __init__(self, evaluation_context, applied_ptransform,
                input_committed_bundle, side_inputs):
@@ -674,6 +695,37 @@ class _GroupByKeyOnlyEvaluator(_TransformEvaluator):
         self._applied_ptransform.transform.get_type_hints().input_types[0][0])
     self.key_coder = coders.registry.get_coder(kv_type_hint.tuple_types[0])
 
+    direct_options = self._evaluation_context.pipeline_options.view_as(
+        DirectOptions)
+    if direct_options.direct_runner_use_encoded_gbk:
+      # The table is shared by all the bundles of the step rather than kept in
+      # the keyed state, which is copied for every bundle.
+      self.grouping_table = self._evaluation_context.get_grouping_table(
+          self._applied_ptransform,
+          lambda: EncodedGroupingTable(
+              self._get_value_coder(),
+              num_partitions=direct_options.direct_runner_gbk_partitions,
+              max_memory_bytes=(
+                  direct_options.direct_runner_gbk_memory_mb << 20)))
+      # Values are staged per bundle so that a retried bundle does not add
+      # them to the shared grouping table twice.
+      self.staged_values = collections.defaultdict(list)
+    else:
+      self.grouping_table = None
+
+  def _get_value_coder(self):
+    # The input type of a GroupByKey will be KV[Any, Any] or more specific.
+    kv_type_hint = self._applied_ptransform.inputs[0].element_type
+    value_type_hint = (kv_type_hint.tuple_types[1] if kv_type_hint
+                       else typehints.Any)
+    if isinstance(value_type_hint, typehints.WindowedValue):
+      window_coder = (self._applied_ptransform.inputs[0]
+                      .windowing.windowfn.get_window_coder())
+      return coders.WindowedValueCoder(
+          coders.registry.get_coder(value_type_hint.inner_type),
+          window_coder)
+    return coders.registry.get_coder(value_type_hint)
+
   def process_timer(self, timer_firing):
     # We do not need to emit a KeyedWorkItem to process_element().
     pass
@@ -686,6 +738,10 @@ class _GroupByKeyOnlyEvaluator(_TransformEvaluator):
         and len(element.value) == 2):
       k, v = element.value
       encoded_k = self.key_coder.encode(k)
+      if self.grouping_table is not None:
+        self.staged_values[encoded_k].append(
+            self.grouping_table.encode_value(v))
+        return
       state = self._step_context.get_keyed_state(encoded_k)
       state.add_state(None, _GroupByKeyOnlyEvaluator.ELEMENTS_TAG, v)
     else:
@@ -694,12 +750,28 @@ class _GroupByKeyOnlyEvaluator(_TransformEvaluator):
                            % element)
 
   def finish_bundle(self):
+    if self.grouping_table is not None:
+      for encoded_k, encoded_vs in iteritems(self.staged_values):
+        self.grouping_table.add_encoded(encoded_k, encoded_vs)
+      self.staged_values = None
+
     if self._is_final_bundle():
       if self.global_state.get_state(
           None, _GroupByKeyOnlyEvaluator.COMPLETION_TAG):
         # Ignore empty bundles after emitting output. (This may happen because
         # empty bundles do not affect input watermarks.)
         bundles = []
+      elif self.grouping_table is not None:
+        bundles, done = self._output_next_partition()
+        if not done:
+          # Fire again to output the next partition once this one is
+          # committed.
+          self.global_state.set_timer(
+              None, '', TimeDomain.WATERMARK,
+              WatermarkManager.WATERMARK_POS_INF)
+          return TransformResult(
+              self, bundles, [], None,
+              {None: WatermarkManager.WATERMARK_NEG_INF})
       else:
         gbk_result = []
         # TODO(ccy): perhaps we can clean this up to not use this
@@ -732,6 +804,45 @@ class _GroupByKeyOnlyEvaluator(_TransformEvaluator):
 
     return TransformResult(self, bundles, [], None, {None: hold})
 
+  def _output_next_partition(self):
+    """Emits the groups of the next non-empty partition of the grouping table.
+
+    Partitions are output by successive evaluations, so that the groups of a
+    single partition are read back at a time, and the grouped values stay
+    encoded until the downstream transform iterates over them. A partition is
+    only released once the evaluation after the one outputting it starts, as
+    a failed evaluation is retried.
+
+    Returns:
+      The output bundles, and whether all the partitions were output.
+    """
+    def len_element_fn(element):
+      _, v = element.value
+      return len(v)
+
+    first_index = index = self.global_state.get_state(
+        None, _GroupByKeyOnlyEvaluator.NEXT_PARTITION_TAG) or 0
+    for released in range(index):
+      self.grouping_table.release_partition(released)
+    while index < self.grouping_table.num_partitions:
+      elements = (GlobalWindows.windowed_value((self.key_coder.decode(k), vs))
+                  for k, vs in self.grouping_table.partition_groups(index))
+      index += 1
+      first = next(elements, None)
+      if first is not None:
+        self.global_state.add_state(
+            None, _GroupByKeyOnlyEvaluator.NEXT_PARTITION_TAG, index)
+        return self._split_list_into_bundles(
+            self.output_pcollection, itertools.chain([first], elements),
+            _GroupByKeyOnlyEvaluator.MAX_ELEMENT_PER_BUNDLE,
+            len_element_fn), False
+    self.grouping_table.close()
+    if first_index:
+      return [], True
+    # Nothing was grouped at all.
+    return [self._evaluation_context.create_bundle(
+        self.output_pcollection)], True
+
 
 class _StreamingGroupByKeyOnlyEvaluator(_TransformEvaluator):
   """TransformEvaluator for _StreamingGroupByKeyOnly transform.
@@ -21,13 +21,21 @@ from __future__ import print_function
 
 import collections
 import datetime
+import json
+import logging
 import os
+import re
+import struct
 import tempfile
 import urllib
 
 import apache_beam as beam
 from apache_beam import coders
+from apache_beam.io import filebasedsink
+from apache_beam.io import filebasedsource
 from apache_beam.io import filesystems
+from apache_beam.io.filesystem import BeamIOError
+from apache_beam.io.filesystem import CompressionTypes
 from apache_beam.transforms import combiners
 
 try:                    # Python 3
@@ -62,6 +70,9 @@ class CacheManager(object):
   def read(self, *labels):
     """Return the PCollection as a list as well as the version number.
 
+    The whole PCollection is held in memory; use read_iter() to go through
+    large PCollections.
+
     Returns:
       (List[PCollection])
       (int) the version number
@@ -73,10 +84,25 @@ class CacheManager(object):
     """
     raise NotImplementedError
 
+  def read_iter(self, *labels):
+    """Returns an iterator over the elements of the PCollection cache.
+
+    Unlike read(), the elements are not all held in memory at once.
+    """
+    return iter(self.read(*labels)[0])
+
   def source(self, *labels):
     """Returns a beam.io.Source that reads the PCollection cache."""
     raise NotImplementedError
 
+  def unpin_all(self):
+    """Allows the PCollection caches found by exists() to be evicted again.
+
+    A cache found by exists() may be read later on, e.g. by the pipeline that
+    is being analyzed, so it is not evicted until this is called.
+    """
+    pass
+
   def sink(self, *labels):
     """Returns a beam.io.Sink that writes the PCollection cache."""
     raise NotImplementedError
@@ -87,9 +113,38 @@ class CacheManager(object):
 
 
 class FileBasedCacheManager(CacheManager):
-  """Maps PCollections to local temp files for materialization."""
+  """Maps PCollections to local temp files for materialization.
+
+  Args:
+    cache_dir: (str) the directory where PCollection caches are kept. A
+        temporary directory is used if not set.
+    cache_format: (str) either 'text', which writes one quoted element per
+        line, or 'binary', which writes length-prefixed records that are
+        decoded without any escaping.
+    compression_type: (CompressionTypes) the compression of the cache files.
+    max_cache_bytes: (int) the disk budget of the caches. Once the caches
+        found on disk exceed it, the least recently used ones are deleted.
+        Unlimited if not set.
+
+  Caches found complete on disk, i.e. with all their shards, are recorded in
+  an index file, in least recently used order, so that looking them up does
+  not need to match the cache directory again. Looking up or reading a cache
+  only reorders the index in memory; the order is persisted with the next
+  cache indexed or forgotten. The caches looked up are pinned, i.e. not
+  evicted, until unpin_all() is called.
+  """
 
-  def __init__(self, cache_dir=None):
+  _available_formats = ('text', 'binary')
+  _INDEX_FILE = 'index.json'
+
+  def __init__(self, cache_dir=None, cache_format='text',
+               compression_type=CompressionTypes.UNCOMPRESSED,
+               max_cache_bytes=None):
+    if cache_format not in self._available_formats:
+      raise ValueError('Unsupported cache format %r, expected one of %s.' % (
+          cache_format, ', '.join(self._available_formats)))
+    self._cache_format = cache_format
+    self._compression_type = compression_type
     if cache_dir:
       self._cache_dir = filesystems.FileSystems.join(
           cache_dir,
@@ -98,14 +153,28 @@ class FileBasedCacheManager(CacheManager):
       self._cache_dir = tempfile.mkdtemp(
           prefix='interactive-temp-', dir=os.environ.get('TEST_TMPDIR', None))
     self._versions = collections.defaultdict(lambda: self._CacheVersion())
+    self._max_cache_bytes = max_cache_bytes
+    self._index = self._load_index()
+    self._pinned = set()
 
   def exists(self, *labels):
-    return bool(self._match(*labels))
+    if not self._paths(*labels):
+      return False
+    key = '-'.join(labels)
+    self._touch(key)
+    self._pinned.add(key)
+    return True
 
   def _latest_version(self, *labels):
     timestamp = 0
-    for path in self._match(*labels):
-      timestamp = max(timestamp, filesystems.FileSystems.last_updated(path))
+    try:
+      for path in self._paths(*labels):
+        timestamp = max(timestamp, filesystems.FileSystems.last_updated(path))
+    except BeamIOError:
+      # The indexed files were removed behind our back.
+      self._forget('-'.join(labels))
+      for path in self._paths(*labels):
+        timestamp = max(timestamp, filesystems.FileSystems.last_updated(path))
     result = self._versions["-".join(labels)].get_version(timestamp)
     return result
 
@@ -113,26 +182,55 @@ class FileBasedCacheManager(CacheManager):
     if not self.exists(*labels):
       return [], -1
 
-    def _read_helper():
-      coder = SafeFastPrimitivesCoder()
-      for path in self._match(*labels):
-        for line in filesystems.FileSystems.open(path):
-          yield coder.decode(line.strip())
-    result, version = list(_read_helper()), self._latest_version(*labels)
+    result, version = list(self.read_iter(*labels)), self._latest_version(
+        *labels)
     return result, version
 
+  def read_iter(self, *labels):
+    self._touch('-'.join(labels))
+    for path in self._paths(*labels):
+      with filesystems.FileSystems.open(
+          path, compression_type=self._compression_type) as file_handle:
+        if self._cache_format == 'binary':
+          decode = coders.FastPrimitivesCoder().decode
+          for record in _read_length_prefixed_records(file_handle):
+            yield decode(record)
+        else:
+          decode = SafeFastPrimitivesCoder().decode
+          for line in iter(file_handle.readline, b''):
+            yield decode(line.strip())
+
   def source(self, *labels):
+    if self._cache_format == 'binary':
+      return _LengthPrefixedSource(self._glob_path(*labels),
+                                   coders.FastPrimitivesCoder(),
+                                   self._compression_type)
     return beam.io.ReadFromText(self._glob_path(*labels),
-                                coder=SafeFastPrimitivesCoder())._source
+                                coder=SafeFastPrimitivesCoder(),
+                                compression_type=self._compression_type)._source
 
   def sink(self, *labels):
+    if self._cache_format == 'binary':
+      return _LengthPrefixedSink(self._path(*labels),
+                                 coders.FastPrimitivesCoder(),
+                                 self._compression_type)
     return beam.io.WriteToText(self._path(*labels),
-                               coder=SafeFastPrimitivesCoder())._sink
+                               coder=SafeFastPrimitivesCoder(),
+                               compression_type=self._compression_type)._sink
+
+  def unpin_all(self):
+    self._pinned.clear()
 
   def cleanup(self):
+    self._index.clear()
+    self._pinned.clear()
     if filesystems.FileSystems.exists(self._cache_dir):
       filesystems.FileSystems.delete([self._cache_dir])
 
+  def cache_size(self):
+    """Returns the total size in bytes of the indexed caches."""
+    return sum(entry['size'] for entry in self._index.values())
+
   def _glob_path(self, *labels):
     return self._path(*labels) + '-*-of-*'
 
@@ -142,7 +240,77 @@ class FileBasedCacheManager(CacheManager):
   def _match(self, *labels):
     match = filesystems.FileSystems.match([self._glob_path(*labels)])
     assert len(match) == 1
-    return [metadata.path for metadata in match[0].metadata_list]
+    return match[0].metadata_list
+
+  def _paths(self, *labels):
+    """Returns the paths of the cache files, from the index if possible.
+
+    Indexed caches whose files were removed are forgotten and matched again.
+    """
+    key = '-'.join(labels)
+    if key in self._index:
+      paths = self._index[key]['paths']
+      if all(filesystems.FileSystems.exists(path) for path in paths):
+        return paths
+      self._forget(key)
+    metadata_list = self._match(*labels)
+    if _is_complete(metadata_list):
+      self._index[key] = {
+          'paths': sorted(metadata.path for metadata in metadata_list),
+          'size': sum(metadata.size_in_bytes for metadata in metadata_list)}
+      self._evict(keep=key)
+      self._save_index()
+    return [metadata.path for metadata in metadata_list]
+
+  def _touch(self, key):
+    """Marks the cache as the most recently used one.
+
+    The index is not saved here, so that reads do not rewrite it.
+    """
+    if key in self._index:
+      self._index[key] = self._index.pop(key)
+
+  def _forget(self, key):
+    if self._index.pop(key, None) is not None:
+      self._save_index()
+
+  def _evict(self, keep):
+    """Deletes least recently used caches until within the disk budget.
+
+    Neither the cache keep nor the pinned caches are deleted, even if this
+    leaves the caches over the budget.
+    """
+    if self._max_cache_bytes is None:
+      return
+    total = self.cache_size()
+    for key in list(self._index):
+      if total <= self._max_cache_bytes:
+        break
+      if key == keep or key in self._pinned:
+        continue
+      entry = self._index.pop(key)
+      total -= entry['size']
+      try:
+        filesystems.FileSystems.delete(entry['paths'])
+      except BeamIOError:
+        logging.warning('Failed to evict the cache %s.', key, exc_info=True)
+
+  def _index_path(self):
+    return filesystems.FileSystems.join(self._cache_dir, self._INDEX_FILE)
+
+  def _load_index(self):
+    index = collections.OrderedDict()
+    if filesystems.FileSystems.exists(self._index_path()):
+      with filesystems.FileSystems.open(self._index_path()) as f:
+        for key, entry in json.loads(f.read().decode('utf-8')):
+          index[key] = entry
+    return index
+
+  def _save_index(self):
+    if not filesystems.FileSystems.exists(self._cache_dir):
+      filesystems.FileSystems.mkdirs(self._cache_dir)
+    with filesystems.FileSystems.create(self._index_path()) as f:
+      f.write(json.dumps(list(self._index.items())).encode('utf-8'))
 
   class _CacheVersion(object):
     """This class keeps track of the timestamp and the corresponding version."""
@@ -206,3 +374,68 @@ class SafeFastPrimitivesCoder(coders.Coder):
 
   def decode(self, value):
     return coders.coders.FastPrimitivesCoder().decode(unquote_to_bytes(value))
+
+
+def _is_complete(metadata_list):
+  """Returns whether the files are all the shards of a cache."""
+  num_shards = set()
+  for metadata in metadata_list:
+    match = re.search(r'-of-(\d+)[^/]*$', metadata.path)
+    if not match:
+      return False
+    num_shards.add(int(match.group(1)))
+  return len(num_shards) == 1 and num_shards.pop() == len(metadata_list)
+
+
+def _read_length_prefixed_records(file_handle, read_size=1 << 20):
+  """Yields the records of a file written by _LengthPrefixedSink.
+
+  The file is read in large chunks, and each record is a slice of the
+  current chunk, rather than reading every length and payload separately.
+  """
+  buf = b''
+  pos = 0
+  while True:
+    data = file_handle.read(read_size)
+    buf = buf[pos:] + data
+    pos = 0
+    end = len(buf)
+    while pos + 4 <= end:
+      length, = struct.unpack_from('>I', buf, pos)
+      if pos + 4 + length > end:
+        break
+      yield buf[pos + 4:pos + 4 + length]
+      pos += 4 + length
+    if not data:
+      if pos != end:
+        raise ValueError('Truncated cache record of %d bytes.' % (end - pos))
+      return
+
+
+class _LengthPrefixedSink(filebasedsink.FileBasedSink):
+  """Writes each encoded element prefixed by its 4-byte big-endian length."""
+
+  def __init__(self, file_path_prefix, coder, compression_type):
+    super(_LengthPrefixedSink, self).__init__(
+        file_path_prefix, coder=coder, compression_type=compression_type)
+
+  def write_encoded_record(self, file_handle, value):
+    file_handle.write(struct.pack('>I', len(value)) + value)
+
+
+class _LengthPrefixedSource(filebasedsource.FileBasedSource):
+  """Reads the files written by _LengthPrefixedSink."""
+
+  def __init__(self, file_pattern, coder, compression_type):
+    super(_LengthPrefixedSource, self).__init__(
+        file_pattern, compression_type=compression_type, splittable=False)
+    self._coder = coder
+
+  def read_records(self, file_name, offset_range_tracker):
+    if not offset_range_tracker.try_claim(
+        offset_range_tracker.start_position()):
+      return
+    decode = self._coder.decode
+    with self.open_file(file_name) as file_handle:
+      for record in _read_length_prefixed_records(file_handle):
+        yield decode(record)
@@ -21,12 +21,20 @@ from __future__ import print_function
 
 import os
 import shutil
+import sys
 import tempfile
 import time
 import unittest
 
+import mock
+
+import apache_beam as beam
 from apache_beam.io import filesystems
+from apache_beam.io.filesystem import CompressionTypes
 from apache_beam.runners.interactive import cache_manager as cache
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that
+from apache_beam.testing.util import equal_to
 
 
 class FileBasedCacheManagerTest(unittest.TestCase):
@@ -162,6 +170,163 @@ class FileBasedCacheManagerTest(unittest.TestCase):
     self.assertTrue(
         self.cache_manager.is_latest_version(version, prefix, cache_label))
 
+  def test_lookups_use_index(self):
+    """Test that complete caches are not matched again once indexed."""
+    prefix = 'full'
+    cache_label = 'some-cache-label'
+    self.write_complete_cache(['a', 'b'], prefix, cache_label)
+
+    with mock.patch.object(filesystems.FileSystems, 'match',
+                           wraps=filesystems.FileSystems.match) as match:
+      self.assertTrue(self.cache_manager.exists(prefix, cache_label))
+      with mock.patch.object(self.cache_manager, '_save_index') as save_index:
+        self.cache_manager.read(prefix, cache_label)
+        save_index.assert_not_called()
+      self.assertTrue(self.cache_manager.exists(prefix, cache_label))
+      self.assertEqual(1, match.call_count)
+
+    # The index is persisted in the cache directory.
+    with mock.patch('tempfile.mkdtemp',
+                    return_value=self.cache_manager._cache_dir):
+      manager = cache.FileBasedCacheManager()
+    self.assertEqual(list(self.cache_manager._index), list(manager._index))
+    manager.cleanup()
+
+  def test_indexed_cache_removed(self):
+    """Test that an indexed cache whose files were removed does not exist."""
+    prefix = 'full'
+    cache_label = 'some-cache-label'
+    self.write_complete_cache(['a', 'b'], prefix, cache_label)
+    self.assertTrue(self.cache_manager.exists(prefix, cache_label))
+
+    os.remove(self.cache_manager._path(prefix, cache_label + '-0-of-1'))
+    self.assertFalse(self.cache_manager.exists(prefix, cache_label))
+    self.assertEqual(0, self.cache_manager.cache_size())
+
+  def test_evicts_least_recently_used(self):
+    """Test that caches over the disk budget are evicted in LRU order."""
+    prefix = 'full'
+    self.write_complete_cache(['x' * 100], prefix, 'one')
+    self.write_complete_cache(['x' * 100], prefix, 'two')
+    self.write_complete_cache(['x' * 100], prefix, 'three')
+    one_size = os.path.getsize(self.cache_manager._path(prefix, 'one-0-of-1'))
+    self.cache_manager._max_cache_bytes = 2 * one_size
+
+    self.assertTrue(self.cache_manager.exists(prefix, 'one'))
+    self.assertTrue(self.cache_manager.exists(prefix, 'two'))
+    self.cache_manager.read(prefix, 'one')
+    self.cache_manager.unpin_all()
+    self.assertTrue(self.cache_manager.exists(prefix, 'three'))
+
+    self.assertFalse(self.cache_manager.exists(prefix, 'two'))
+    self.assertTrue(self.cache_manager.exists(prefix, 'one'))
+    self.assertTrue(self.cache_manager.exists(prefix, 'three'))
+    self.assertEqual(2 * one_size, self.cache_manager.cache_size())
+
+  def test_caches_looked_up_are_not_evicted(self):
+    """Test that caches found by exists() are kept over the disk budget."""
+    prefix = 'full'
+    for cache_label in ('one', 'two', 'three', 'four'):
+      self.write_complete_cache(['x' * 100], prefix, cache_label)
+    one_size = os.path.getsize(self.cache_manager._path(prefix, 'one-0-of-1'))
+    self.cache_manager._max_cache_bytes = 2 * one_size
+
+    # A run looks up more caches than the budget allows, and reads them later.
+    for cache_label in ('one', 'two', 'three'):
+      self.assertTrue(self.cache_manager.exists(prefix, cache_label))
+    for cache_label in ('one', 'two', 'three'):
+      self.assertEqual(
+          ['x' * 100], self.cache_manager.read(prefix, cache_label)[0])
+    self.assertEqual(3 * one_size, self.cache_manager.cache_size())
+
+    # The next run may evict them again.
+    self.cache_manager.unpin_all()
+    self.assertTrue(self.cache_manager.exists(prefix, 'four'))
+    self.assertFalse(self.cache_manager.exists(prefix, 'one'))
+    self.assertFalse(self.cache_manager.exists(prefix, 'two'))
+    self.assertEqual(2 * one_size, self.cache_manager.cache_size())
+
+  def write_complete_cache(self, pcoll_list, prefix, cache_label):
+    cache_path = filesystems.FileSystems.join(
+        self.cache_manager._cache_dir, prefix)
+    if not filesystems.FileSystems.exists(cache_path):
+      filesystems.FileSystems.mkdirs(cache_path)
+    with open(self.cache_manager._path(prefix, cache_label + '-0-of-1'),
+              'w') as f:
+      for line in pcoll_list:
+        f.write(cache.SafeFastPrimitivesCoder().encode(line))
+        f.write('\n')
+
+
+class BinaryFileBasedCacheManagerTest(unittest.TestCase):
+  """Tests the length-prefixed binary format of FileBasedCacheManager."""
+
+  compression_type = CompressionTypes.UNCOMPRESSED
+
+  @classmethod
+  def setUpClass(cls):
+    # Method has been renamed in Python 3
+    if sys.version_info[0] < 3:
+      cls.assertCountEqual = cls.assertItemsEqual
+
+  def setUp(self):
+    self.test_dir = tempfile.mkdtemp()
+    self.cache_manager = cache.FileBasedCacheManager(
+        self.test_dir, cache_format='binary',
+        compression_type=self.compression_type)
+
+  def tearDown(self):
+    if os.path.exists(self.test_dir):
+      shutil.rmtree(self.test_dir)
+
+  def test_write_and_read(self):
+    elements = [b'bytes\nwith newline', u'unicode', 1, 2.5, None,
+                ('a', [1, 2]), {'k': b'v'}]
+    with TestPipeline() as p:
+      _ = (p
+           | beam.Create(elements)
+           | cache.WriteCache(self.cache_manager, 'label'))
+    self.assertTrue(self.cache_manager.exists('full', 'label'))
+    pcoll_list, version = self.cache_manager.read('full', 'label')
+    self.assertCountEqual(elements, pcoll_list)
+    self.assertEqual(0, version)
+    self.assertCountEqual(
+        elements, list(self.cache_manager.read_iter('full', 'label')))
+
+    with TestPipeline() as p:
+      assert_that(p | cache.ReadCache(self.cache_manager, 'label'),
+                  equal_to(elements))
+
+  def test_read_records_across_chunks(self):
+    records = [b'x' * size for size in (0, 1, 5, 17, 3)]
+    path = os.path.join(self.test_dir, 'records')
+    sink = cache._LengthPrefixedSink(path, cache.coders.BytesCoder(),
+                                     CompressionTypes.UNCOMPRESSED)
+    with open(path, 'wb') as f:
+      for record in records:
+        sink.write_encoded_record(f, record)
+    with open(path, 'rb') as f:
+      self.assertEqual(
+          records, list(cache._read_length_prefixed_records(f, read_size=3)))
+
+  def test_read_truncated_record(self):
+    path = os.path.join(self.test_dir, 'records')
+    with open(path, 'wb') as f:
+      f.write(b'\x00\x00\x00\x05abc')
+    with open(path, 'rb') as f:
+      with self.assertRaisesRegexp(ValueError, r'Truncated'):
+        list(cache._read_length_prefixed_records(f))
+
+  def test_unsupported_format(self):
+    with self.assertRaises(ValueError):
+      cache.FileBasedCacheManager(self.test_dir, cache_format='csv')
+
+
+class CompressedBinaryFileBasedCacheManagerTest(
+    BinaryFileBasedCacheManagerTest):
+
+  compression_type = CompressionTypes.GZIP
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -45,7 +45,8 @@ class InteractiveRunner(runners.PipelineRunner):
   """
 
   def __init__(self, underlying_runner=None, cache_dir=None,
-               render_option=None):
+               render_option=None, cache_format='text',
+               max_cache_bytes=None):
     """Constructor of InteractiveRunner.
 
     Args:
@@ -53,10 +54,17 @@ class InteractiveRunner(runners.PipelineRunner):
       cache_dir: (str) the directory where PCollection caches are kept
       render_option: (str) this parameter decides how the pipeline graph is
           rendered. See display.pipeline_graph_renderer for available options.
+      cache_format: (str) the file format of the PCollection caches, either
+          'text' or 'binary'. 'binary' caches are faster to write and read,
+          but caches written in one format cannot be read in the other. See
+          cache.FileBasedCacheManager.
+      max_cache_bytes: (int) the disk budget of the PCollection caches, beyond
+          which the least recently used caches are evicted. Unlimited if None.
     """
     self._underlying_runner = (underlying_runner
                                or direct_runner.DirectRunner())
-    self._cache_manager = cache.FileBasedCacheManager(cache_dir)
+    self._cache_manager = cache.FileBasedCacheManager(
+        cache_dir, cache_format=cache_format, max_cache_bytes=max_cache_bytes)
     self._renderer = pipeline_graph_renderer.get_renderer(render_option)
     self._in_session = False
 
@@ -105,6 +113,8 @@ class InteractiveRunner(runners.PipelineRunner):
   def run_pipeline(self, pipeline, options):
     if not hasattr(self, '_desired_cache_labels'):
       self._desired_cache_labels = set()
+    # The caches looked up for the previous run may be evicted again.
+    self._cache_manager.unpin_all()
 
     # Invoke a round trip through the runner API. This makes sure the Pipeline
     # proto is stable.
@@ -204,10 +214,17 @@ class PipelineResult(beam.runners.runner.PipelineResult):
     return
 
   def get(self, pcoll):
+    return list(self.read_iter(pcoll))
+
+  def read_iter(self, pcoll):
+    """Returns an iterator over the elements of the PCollection.
+
+    Unlike get(), the elements are read from the cache as they are iterated
+    over, rather than all held in memory at once.
+    """
     cache_label = self._cache_label(pcoll)
     if self._cache_manager.exists('full', cache_label):
-      pcoll_list, _ = self._cache_manager.read('full', cache_label)
-      return pcoll_list
+      return self._cache_manager.read_iter('full', cache_label)
     else:
       self._runner._desired_cache_labels.add(cache_label)  # pylint: disable=protected-access
       raise ValueError('PCollection not available, please run the pipeline.')
@@ -28,8 +28,11 @@ import os
 import sys
 import unittest
 
+import mock
+
 import apache_beam as beam
 from apache_beam.runners.direct import direct_runner
+from apache_beam.runners.interactive import cache_manager as cache
 from apache_beam.runners.interactive import interactive_runner
 
 
@@ -103,6 +106,12 @@ class InteractiveRunnerTest(unittest.TestCase):
             'question': 1
         })
 
+    # The cache is read as the elements are iterated over.
+    with mock.patch.object(cache.FileBasedCacheManager, 'read') as read:
+      self.assertEqual(sorted(actual.items()),
+                       sorted(result.read_iter(counts)))
+      read.assert_not_called()
+
   def test_session(self):
     class MockPipelineRunner(object):
       def __init__(self):
@@ -25,6 +25,7 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import hashlib
 
 import apache_beam as beam
 from apache_beam.portability.api import beam_runner_api_pb2
@@ -400,22 +401,26 @@ class PipelineInfo(object):
     if pcoll_id not in self._derivations:
       transform_id, output_tag = self._producers[pcoll_id]
       transform_proto = self._proto.transforms[transform_id]
-      self._derivations[pcoll_id] = self.Derivation({
+      inputs = {
           input_tag: self._derivation(input_id)
           for input_tag, input_id in transform_proto.inputs.items()
-      }, transform_proto, output_tag)
+      }
+      self._derivations[pcoll_id] = self.Derivation(
+          inputs, transform_proto, output_tag,
+          self._proto.pcollections[pcoll_id].coder_id)
     return self._derivations[pcoll_id]
 
   class Derivation(object):
     """Records derivation info of a PCollection. Helper for PipelineInfo."""
 
-    def __init__(self, inputs, transform_proto, output_tag):
+    def __init__(self, inputs, transform_proto, output_tag, coder_id=''):
       """Constructor of Derivation.
 
       Args:
         inputs: (Dict[str, Derivation]) maps PCollection names to Derivations.
         transform_proto: (Transform proto) the producing PTransform.
         output_tag: (str) local name of the PCollection in analysis.
+        coder_id: (str) ID of the coder of the PCollection.
       """
       self._inputs = inputs
       self._transform_info = {
@@ -425,35 +430,49 @@ class PipelineInfo(object):
           'payload': transform_proto.spec.payload.decode('latin1')
       }
       self._output_tag = output_tag
-      self._hash = None
+      self._coder_id = coder_id
+      self._fingerprint = None
 
     def __eq__(self, other):
-      if isinstance(other, self.Derivation):
-        # pylint: disable=protected-access
-        return (self._inputs == other._inputs and
-                self._transform_info == other._transform_info)
+      if isinstance(other, PipelineInfo.Derivation):
+        return self.fingerprint() == other.fingerprint()
+      return NotImplemented
 
     def __ne__(self, other):
       # TODO(BEAM-5949): Needed for Python 2 compatibility.
       return not self == other
 
     def __hash__(self):
-      if self._hash is None:
-        self._hash = (hash(tuple(sorted(self._transform_info.items())))
-                      + sum(hash(tag) * hash(input)
-                            for tag, input in self._inputs.items())
-                      + hash(self._output_tag))
-      return self._hash
+      return int(self.fingerprint()[:15], 16)
+
+    def fingerprint(self):
+      """Returns a hex digest of the subgraph producing the PCollection.
+
+      The digest covers the producing transform, its payload, the coder of the
+      PCollection and, recursively, the fingerprints of its inputs, so it is
+      stable across processes and changes whenever any upstream step does.
+      """
+      if self._fingerprint is None:
+        digest = hashlib.sha1()
+        for key in sorted(self._transform_info):
+          digest.update(self._transform_info[key].encode('utf-8') + b'\0')
+        digest.update(self._output_tag.encode('utf-8') + b'\0')
+        digest.update(self._coder_id.encode('utf-8') + b'\0')
+        for tag in sorted(self._inputs):
+          digest.update(tag.encode('utf-8') + b'\0')
+          digest.update(self._inputs[tag].fingerprint().encode('ascii'))
+        self._fingerprint = digest.hexdigest()
+      return self._fingerprint
 
     def cache_label(self):
-      # TODO(qinyeli): Collision resistance?
-      return 'Pcoll-%x' % abs(hash(self))
+      return 'Pcoll-%s' % self.fingerprint()[:16]
 
     def json(self):
       return {
           'inputs': self._inputs,
           'transform': self._transform_info,
-          'output_tag': self._output_tag
+          'output_tag': self._output_tag,
+          'coder_id': self._coder_id
       }
 
     def __repr__(self):
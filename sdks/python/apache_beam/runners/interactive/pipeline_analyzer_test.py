@@ -282,5 +282,30 @@ class PipelineAnalyzerTest(unittest.TestCase):
                              to_stable_runner_api(expected_pipeline))
 
 
+class PipelineInfoTest(unittest.TestCase):
+
+  def _cache_labels(self, multiplier):
+    p = beam.Pipeline(runner=direct_runner.DirectRunner())
+    _ = (p
+         | 'Create' >> beam.Create([1, 2, 3])
+         | 'Multiply' >> beam.Map(lambda x, m: x * m, multiplier)
+         | 'Square' >> beam.Map(lambda x: x**2))
+    proto = to_stable_runner_api(p)
+    info = pipeline_analyzer.PipelineInfo(proto.components)
+    transforms = proto.components.transforms
+    return {transforms[info.producer(pcoll_id)[0]].unique_name:
+                info.cache_label(pcoll_id)
+            for pcoll_id in info.all_pcollections()}
+
+  def test_cache_labels_are_deterministic(self):
+    self.assertEqual(self._cache_labels(2), self._cache_labels(2))
+
+  def test_cache_labels_follow_upstream_changes(self):
+    labels, changed_labels = self._cache_labels(2), self._cache_labels(3)
+    self.assertEqual(labels['Create/Read'], changed_labels['Create/Read'])
+    self.assertNotEqual(labels['Multiply'], changed_labels['Multiply'])
+    self.assertNotEqual(labels['Square'], changed_labels['Square'])
+
+
 if __name__ == '__main__':
   unittest.main()
@@ -54,46 +54,87 @@ class _PipelineContextMap(object):
 
   Under the hood it encodes and decodes these objects into runner API
   representations.
+
+  If deduplicate is set, objects with identical representations, such as
+  distinct but equivalent coders, share a single id.
   """
-  def __init__(self, context, obj_type, proto_map=None):
+  def __init__(self, context, obj_type, proto_map=None, deduplicate=False):
     self._pipeline_context = context
     self._obj_type = obj_type
     self._obj_to_id = {}
     self._id_to_obj = {}
-    self._id_to_proto = dict(proto_map) if proto_map else {}
+    # The protos given are looked up rather than copied, as a context is
+    # created for every stage and bundle processor of a pipeline.
+    self._proto_map = proto_map
+    self._id_to_proto = {}
     self._counter = 0
+    self._deduplicate = deduplicate
+    # Built on first use, as only contexts adding components need it.
+    self._serialized_proto_to_id = None
 
   def _unique_ref(self, obj=None, label=None):
     self._counter += 1
     return "ref_%s_%s_%s" % (
         self._obj_type.__name__, label or type(obj).__name__, self._counter)
 
-  def populate_map(self, proto_map):
+  def _all_protos(self):
+    if self._proto_map:
+      for id, proto in self._proto_map.items():
+        if id not in self._id_to_proto:
+          yield id, proto
     for id, proto in self._id_to_proto.items():
+      yield id, proto
+
+  def _get_proto_by_id(self, id):
+    proto = self._id_to_proto.get(id)
+    if proto is None:
+      # Looking up a missing id of a proto map would add it.
+      if not self._proto_map or id not in self._proto_map:
+        raise KeyError(id)
+      proto = self._proto_map[id]
+    return proto
+
+  def populate_map(self, proto_map):
+    for id, proto in self._all_protos():
       proto_map[id].CopyFrom(proto)
 
   def get_id(self, obj, label=None):
     if obj not in self._obj_to_id:
-      id = self._unique_ref(obj, label)
+      proto = obj.to_runner_api(self._pipeline_context)
+      if self._deduplicate:
+        if self._serialized_proto_to_id is None:
+          self._serialized_proto_to_id = {
+              existing_proto.SerializeToString(deterministic=True): id
+              for id, existing_proto in self._all_protos()}
+        serialized_proto = proto.SerializeToString(deterministic=True)
+        id = self._serialized_proto_to_id.get(serialized_proto)
+        if id is not None:
+          self._obj_to_id[obj] = id
+          return id
+        self._serialized_proto_to_id[serialized_proto] = id = self._unique_ref(
+            obj, label)
+      else:
+        id = self._unique_ref(obj, label)
       self._id_to_obj[id] = obj
       self._obj_to_id[obj] = id
-      self._id_to_proto[id] = obj.to_runner_api(self._pipeline_context)
+      self._id_to_proto[id] = proto
     return self._obj_to_id[obj]
 
   def get_proto(self, obj, label=None):
-    return self._id_to_proto[self.get_id(obj, label)]
+    return self._get_proto_by_id(self.get_id(obj, label))
 
   def get_by_id(self, id):
     if id not in self._id_to_obj:
       self._id_to_obj[id] = self._obj_type.from_runner_api(
-          self._id_to_proto[id], self._pipeline_context)
+          self._get_proto_by_id(id), self._pipeline_context)
     return self._id_to_obj[id]
 
   def __getitem__(self, id):
     return self.get_by_id(id)
 
   def __contains__(self, id):
-    return id in self._id_to_proto
+    return id in self._id_to_proto or bool(
+        self._proto_map) and id in self._proto_map
 
 
 class PipelineContext(object):
@@ -110,18 +151,24 @@ class PipelineContext(object):
       'environments': Environment,
   }
 
+  # The components which are referenced by value, rather than by identity.
+  _DEDUPLICATED_COMPONENTS = ('coders', 'windowing_strategies', 'environments')
+
   def __init__(
       self, proto=None, default_environment=None, use_fake_coders=False,
       iterable_state_read=None, iterable_state_write=None):
     if isinstance(proto, beam_fn_api_pb2.ProcessBundleDescriptor):
-      proto = beam_runner_api_pb2.Components(
-          coders=dict(proto.coders.items()),
-          windowing_strategies=dict(proto.windowing_strategies.items()),
-          environments=dict(proto.environments.items()))
+      # Only the components of the descriptor which need no translation are
+      # looked up.
+      component_names = ('coders', 'windowing_strategies', 'environments')
+    else:
+      component_names = self._COMPONENT_TYPES
     for name, cls in self._COMPONENT_TYPES.items():
       setattr(
           self, name, _PipelineContextMap(
-              self, cls, getattr(proto, name, None)))
+              self, cls,
+              getattr(proto, name, None) if name in component_names else None,
+              deduplicate=name in self._DEDUPLICATED_COMPONENTS))
     if default_environment:
       self._default_environment_id = self.environments.get_id(
           Environment(default_environment), label='default_environment')
@@ -25,6 +25,12 @@ from apache_beam import coders
 from apache_beam.runners import pipeline_context
 
 
+class _IdentityCoder(coders.Coder):
+
+  __eq__ = object.__eq__
+  __hash__ = object.__hash__
+
+
 class PipelineContextTest(unittest.TestCase):
 
   def test_deduplication(self):
@@ -33,6 +39,22 @@ class PipelineContextTest(unittest.TestCase):
     bytes_coder_ref2 = context.coders.get_id(coders.BytesCoder())
     self.assertEqual(bytes_coder_ref, bytes_coder_ref2)
 
+  def test_deduplication_by_representation(self):
+    context = pipeline_context.PipelineContext()
+    # Distinct objects, which are not equal, with the same representation.
+    first_ref = context.coders.get_id(_IdentityCoder())
+    second_ref = context.coders.get_id(_IdentityCoder())
+    self.assertEqual(first_ref, second_ref)
+    self.assertEqual(1, len(context.to_runner_api().coders))
+
+  def test_deduplication_against_existing_components(self):
+    context = pipeline_context.PipelineContext()
+    bytes_coder_ref = context.coders.get_id(coders.BytesCoder())
+    context2 = pipeline_context.PipelineContext.from_runner_api(
+        context.to_runner_api())
+    self.assertEqual(
+        bytes_coder_ref, context2.coders.get_id(coders.BytesCoder()))
+
   def test_serialization(self):
     context = pipeline_context.PipelineContext()
     float_coder_ref = context.coders.get_id(coders.FloatCoder())
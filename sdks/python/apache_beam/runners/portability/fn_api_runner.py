@@ -60,6 +60,7 @@ from apache_beam.runners.portability.fn_api_runner_transforms import split_buffe
 from apache_beam.runners.portability.fn_api_runner_transforms import unique_name
 from apache_beam.runners.worker import bundle_processor
 from apache_beam.runners.worker import data_plane
+from apache_beam.runners.worker import memory_accounting
 from apache_beam.runners.worker import sdk_worker
 from apache_beam.transforms import trigger
 from apache_beam.transforms.window import GlobalWindows
@@ -139,10 +140,12 @@ class _GroupingBuffer(object):
     self._table = collections.defaultdict(list)
     self._windowing = windowing
     self._grouped_output = None
+    self._encoded_bytes = 0
 
   def append(self, elements_data):
     if self._grouped_output:
       raise RuntimeError('Grouping table append after read.')
+    self._encoded_bytes += len(elements_data)
     input_stream = create_InputStream(elements_data)
     coder_impl = self._pre_grouped_coder.get_impl()
     key_coder_impl = self._key_coder.get_impl()
@@ -176,6 +179,16 @@ class _GroupingBuffer(object):
       self._table = None
     return iter(self._grouped_output)
 
+  def estimated_bytes(self):
+    """Returns an estimate of the bytes held by the buffer.
+
+    This is the encoded size of the elements, a lower bound of the size of
+    their decoded values.
+    """
+    if self._grouped_output:
+      return sum(len(data) for data in self._grouped_output)
+    return self._encoded_bytes
+
 
 class _WindowGroupingBuffer(object):
   """Used to partition windowed side inputs."""
@@ -243,6 +256,8 @@ class FnApiRunner(runner.PipelineRunner):
     self._bundle_repeat = bundle_repeat
     self._progress_frequency = None
     self._profiler_factory = None
+    self._sampling_profiler = None
+    self._memory_accountant = None
     self._use_state_iterables = use_state_iterables
 
   def _next_uid(self):
@@ -261,6 +276,11 @@ class FnApiRunner(runner.PipelineRunner):
         pipeline_options.DirectOptions).direct_runner_bundle_repeat
     self._profiler_factory = profiler.Profile.factory_from_options(
         options.view_as(pipeline_options.ProfilingOptions))
+    self._sampling_profiler = profiler.SamplingProfiler.factory_from_options(
+        options.view_as(pipeline_options.ProfilingOptions))
+    self._memory_accountant = (
+        memory_accounting.MemoryAccountant.factory_from_options(
+            options.view_as(pipeline_options.ProfilingOptions)))
     return self.run_via_runner_api(pipeline.to_runner_api(
         default_environment=self._default_environment))
 
@@ -269,6 +289,20 @@ class FnApiRunner(runner.PipelineRunner):
 
   @contextlib.contextmanager
   def maybe_profile(self):
+    # The sampling profiler only reads the stacks of the threads, hence may
+    # run along with the deterministic one, if at some skew of the samples.
+    if self._sampling_profiler:
+      with self._sampling_profiler:
+        with self._maybe_profile_deterministically():
+          yield
+      for path in self._sampling_profiler.profile_outputs:
+        print('Sampled CPU profile written to %s' % path)
+    else:
+      with self._maybe_profile_deterministically():
+        yield
+
+  @contextlib.contextmanager
+  def _maybe_profile_deterministically(self):
     if self._profiler_factory:
       try:
         profile_id = 'direct-' + subprocess.check_output(
@@ -344,6 +378,8 @@ class FnApiRunner(runner.PipelineRunner):
     monitoring_infos_by_stage = {}
 
     try:
+      if self._memory_accountant:
+        self._memory_accountant.start()
       with self.maybe_profile():
         pcoll_buffers = collections.defaultdict(list)
         for stage in stages:
@@ -357,6 +393,8 @@ class FnApiRunner(runner.PipelineRunner):
           monitoring_infos_by_stage[stage.name] = (
               stage_results.process_bundle.monitoring_infos)
     finally:
+      if self._memory_accountant:
+        self._memory_accountant.stop()
       worker_handler_manager.close_all()
     return RunnerResult(
         runner.PipelineState.DONE, monitoring_infos_by_stage, metrics_by_stage)
@@ -541,6 +579,17 @@ class FnApiRunner(runner.PipelineRunner):
       else:
         break
 
+    # Report the size of the grouping buffers written by this stage, as the
+    # memory retained by their GroupByKey transform.
+    for buffer_id in set(data_output.values()):
+      kind, name = split_buffer_id(buffer_id)
+      if kind == 'group' and buffer_id in pcoll_buffers:
+        result.process_bundle.monitoring_infos.extend([
+            monitoring_infos.int64_gauge_value(
+                monitoring_infos.RETAINED_BYTES_URN,
+                pcoll_buffers[buffer_id].estimated_bytes(),
+                ptransform=pipeline_components.transforms[name].unique_name)])
+
     return result
 
   # These classes are used to interact with the worker.
@@ -637,6 +686,20 @@ class FnApiRunner(runner.PipelineRunner):
       with self._lock:
         del self._state[self._to_key(state_key)]
 
+    # The state is held in memory, so requests complete immediately.
+
+    def get_async(self, state_key, continuation_token=None):
+      return sdk_worker._Future.completed(
+          self.blocking_get(state_key, continuation_token))
+
+    def append_async(self, state_key, data):
+      self.blocking_append(state_key, data)
+      return sdk_worker._Future.completed()
+
+    def clear_async(self, state_key):
+      self.blocking_clear(state_key)
+      return sdk_worker._Future.completed()
+
     @staticmethod
     def _to_key(state_key):
       return state_key.SerializeToString()
@@ -847,11 +910,18 @@ class ExternalWorkerHandler(GrpcWorkerHandler):
 class EmbeddedGrpcWorkerHandler(GrpcWorkerHandler):
   def __init__(self, num_workers_payload, state):
     super(EmbeddedGrpcWorkerHandler, self).__init__(state)
-    self._num_threads = int(num_workers_payload) if num_workers_payload else 1
+    num_workers = (num_workers_payload or b'1').decode('ascii').split(',')
+    self._num_threads = int(num_workers[0])
+    self._num_processes = int(num_workers[1]) if len(num_workers) > 1 else 1
 
   def start_worker(self):
-    self.worker = sdk_worker.SdkHarness(
-        self.control_address, worker_count=self._num_threads)
+    if self._num_processes > 1:
+      self.worker = sdk_worker.MultiProcessSdkHarness(
+          self.control_address, worker_processes=self._num_processes,
+          worker_count=self._num_threads)
+    else:
+      self.worker = sdk_worker.SdkHarness(
+          self.control_address, worker_count=self._num_threads)
     self.worker_thread = threading.Thread(
         name='run_worker', target=self.worker.run)
     self.worker_thread.start()
@@ -1051,6 +1121,7 @@ class FnApiMetrics(metrics.metric.MetricResults):
     self._counters = {}
     self._distributions = {}
     self._gauges = {}
+    self._histograms = {}
     self._user_metrics_only = user_metrics_only
     self._init_metrics_from_monitoring_infos(step_monitoring_infos)
 
@@ -1071,6 +1142,9 @@ class FnApiMetrics(metrics.metric.MetricResults):
         elif monitoring_infos.is_gauge(mi):
           self._gauges[key] = (
               monitoring_infos.extract_metric_result_map_value(mi))
+        elif monitoring_infos.is_histogram(mi):
+          self._histograms[key] = (
+              monitoring_infos.extract_metric_result_map_value(mi))
 
   def _to_metric_key(self, monitoring_info):
     # Right now this assumes that all metrics have a PTRANSFORM
@@ -1089,10 +1163,14 @@ class FnApiMetrics(metrics.metric.MetricResults):
     gauges = [metrics.execution.MetricResult(k, v, v)
               for k, v in self._gauges.items()
               if self.matches(filter, k)]
+    histograms = [metrics.execution.MetricResult(k, v, v)
+                  for k, v in self._histograms.items()
+                  if self.matches(filter, k)]
 
     return {self.COUNTERS: counters,
             self.DISTRIBUTIONS: distributions,
-            self.GAUGES: gauges}
+            self.GAUGES: gauges,
+            self.HISTOGRAMS: histograms}
 
 
 class RunnerResult(runner.PipelineResult):
@@ -19,6 +19,7 @@ from __future__ import print_function
 
 import logging
 import os
+import shutil
 import sys
 import tempfile
 import time
@@ -26,20 +27,26 @@ import traceback
 import unittest
 from builtins import range
 
+import mock
+
 import apache_beam as beam
 from apache_beam.metrics import monitoring_infos
 from apache_beam.metrics.execution import MetricKey
 from apache_beam.metrics.execution import MetricsEnvironment
 from apache_beam.metrics.metricbase import MetricName
+from apache_beam.options.pipeline_options import PipelineOptions
+from apache_beam.portability import common_urns
 from apache_beam.portability import python_urns
 from apache_beam.portability.api import beam_runner_api_pb2
 from apache_beam.runners.portability import fn_api_runner
+from apache_beam.runners.portability import fn_api_runner_transforms
 from apache_beam.runners.worker import data_plane
 from apache_beam.runners.worker import statesampler
 from apache_beam.testing.util import assert_that
 from apache_beam.testing.util import equal_to
 from apache_beam.transforms import userstate
 from apache_beam.transforms import window
+from apache_beam.utils import profiler
 
 if statesampler.FAST_SAMPLER:
   DEFAULT_SAMPLING_PERIOD_MS = statesampler.DEFAULT_SAMPLING_PERIOD_MS
@@ -494,6 +501,7 @@ class FnApiRunnerTest(unittest.TestCase):
     counter = beam.metrics.Metrics.counter('ns', 'counter')
     distribution = beam.metrics.Metrics.distribution('ns', 'distribution')
     gauge = beam.metrics.Metrics.gauge('ns', 'gauge')
+    histogram = beam.metrics.Metrics.histogram('ns', 'histogram')
 
     pcoll = p | beam.Create(['a', 'zzz'])
     # pylint: disable=expression-not-assigned
@@ -501,6 +509,7 @@ class FnApiRunnerTest(unittest.TestCase):
     pcoll | 'count2' >> beam.FlatMap(lambda x: counter.inc(len(x)))
     pcoll | 'dist' >> beam.FlatMap(lambda x: distribution.update(len(x)))
     pcoll | 'gauge' >> beam.FlatMap(lambda x: gauge.set(len(x)))
+    pcoll | 'hist' >> beam.FlatMap(lambda x: histogram.update(len(x)))
 
     res = p.run()
     res.wait_until_finish()
@@ -518,6 +527,11 @@ class FnApiRunnerTest(unittest.TestCase):
         dist.committed.data, beam.metrics.cells.DistributionData(4, 2, 1, 3))
     self.assertEqual(dist.committed.mean, 2.0)
     self.assertEqual(gaug.committed.value, 3)
+    hist, = res.metrics().query(
+        beam.metrics.MetricsFilter().with_step('hist'))['histograms']
+    self.assertEqual(hist.committed.count, 2)
+    self.assertEqual(hist.committed.max, 3)
+    self.assertEqual(hist.committed.p50, 1)
 
   def test_non_user_metrics(self):
     p = self.create_pipeline()
@@ -559,6 +573,25 @@ class FnApiRunnerTest(unittest.TestCase):
       assert_counter_exists(
           all_metrics_via_montoring_infos, namespace, name, step='MyStep')
 
+  def test_grouping_buffer_size_metrics(self):
+    p = self.create_pipeline()
+    if not isinstance(p.runner, fn_api_runner.FnApiRunner):
+      # This test is inherited by others that may not support the same
+      # internal way of accessing progress metrics.
+      self.skipTest('Metrics not supported.')
+
+    _ = (p
+         | beam.Create([('k%d' % (i % 10), 'v' * 100) for i in range(100)])
+         | 'MyGroup' >> beam.GroupByKey())
+    res = p.run()
+    res.wait_until_finish()
+
+    split = monitoring_infos.RETAINED_BYTES_URN.split(':')
+    gauge, = res.monitoring_metrics().query(
+        beam.metrics.MetricsFilter().with_step('MyGroup').with_name(
+            ':'.join(split[1:])))['gauges']
+    self.assertGreater(gauge.committed.value, 100 * 100)
+
   def test_progress_metrics(self):
     p = self.create_pipeline()
     if not isinstance(p.runner, fn_api_runner.FnApiRunner):
@@ -698,6 +731,16 @@ class FnApiRunnerTestWithGrpcMultiThreaded(FnApiRunnerTest):
                 payload=b'2')))
 
 
+class FnApiRunnerTestWithMultiProcessHarness(FnApiRunnerTest):
+
+  def create_pipeline(self):
+    return beam.Pipeline(
+        runner=fn_api_runner.FnApiRunner(
+            default_environment=beam_runner_api_pb2.Environment(
+                urn=python_urns.EMBEDDED_PYTHON_GRPC,
+                payload=b'2,2')))
+
+
 class FnApiRunnerTestWithBundleRepeat(FnApiRunnerTest):
 
   def create_pipeline(self):
@@ -705,6 +748,75 @@ class FnApiRunnerTestWithBundleRepeat(FnApiRunnerTest):
         runner=fn_api_runner.FnApiRunner(bundle_repeat=3))
 
 
+class FnApiRunnerTransformsTest(unittest.TestCase):
+
+  def test_downstream_side_inputs_of_deep_graphs(self):
+    # A chain of stages deeper than the recursion limit, whose last stage has
+    # a side input produced by the first one.
+    depth = sys.getrecursionlimit() + 10
+    transforms = [
+        beam_runner_api_pb2.PTransform(
+            inputs={'in': 'pc%d' % ix}, outputs={'out': 'pc%d' % (ix + 1)})
+        for ix in range(depth)]
+    transforms[0].outputs['side'] = 'side_pc'
+    transforms[-1].inputs['side0'] = 'side_pc'
+    transforms[-1].spec.urn = common_urns.primitives.PAR_DO.urn
+    transforms[-1].spec.payload = beam_runner_api_pb2.ParDoPayload(
+        side_inputs={'side0': beam_runner_api_pb2.SideInput()}
+    ).SerializeToString()
+    stages = [
+        fn_api_runner_transforms.Stage(
+            'stage%d' % ix, [transform], environment='env')
+        for ix, transform in enumerate(transforms)]
+
+    fn_api_runner_transforms.annotate_downstream_side_inputs(stages, None)
+    self.assertEqual(frozenset(['side_pc']), stages[0].downstream_side_inputs)
+    self.assertEqual(frozenset(), stages[1].downstream_side_inputs)
+
+
+class FnApiRunnerProfilingTest(unittest.TestCase):
+
+  def setUp(self):
+    self.profile_location = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.profile_location)
+
+  def test_sampling_and_deterministic_profilers_run_together(self):
+    sampling_profiler = mock.MagicMock(profile_outputs=[])
+    with mock.patch.object(profiler.SamplingProfiler, 'factory_from_options',
+                           return_value=sampling_profiler):
+      p = beam.Pipeline(
+          runner=fn_api_runner.FnApiRunner(),
+          options=PipelineOptions([
+              '--profile_cpu', '--profile_cpu_sampling',
+              '--profile_location', self.profile_location]))
+      # pylint: disable=expression-not-assigned
+      p | beam.Create([1, 2, 3]) | beam.Map(lambda x: x * 2)
+      p.run()
+    sampling_profiler.__enter__.assert_called_once_with()
+    sampling_profiler.__exit__.assert_called_once_with(None, None, None)
+    self.assertTrue(os.listdir(self.profile_location))
+
+  def test_retained_bytes_of_side_input_caches(self):
+    p = beam.Pipeline(
+        runner=fn_api_runner.FnApiRunner(),
+        options=PipelineOptions(['--profile_memory_per_step']))
+    side = p | 'Side' >> beam.Create(['x' * 1000] * 10)
+    # pylint: disable=expression-not-assigned
+    (p
+     | beam.Create([1, 2, 3])
+     | 'MyStep' >> beam.Map(lambda x, side: x, beam.pvalue.AsList(side)))
+    res = p.run()
+    res.wait_until_finish()
+
+    split = monitoring_infos.RETAINED_BYTES_URN.split(':')
+    gauge, = res.monitoring_metrics().query(
+        beam.metrics.MetricsFilter().with_step('MyStep').with_name(
+            ':'.join(split[1:])))['gauges']
+    self.assertGreater(gauge.committed.value, 10 * 1000)
+
+
 if __name__ == '__main__':
   logging.getLogger().setLevel(logging.INFO)
   unittest.main()
@@ -360,18 +360,33 @@ def annotate_downstream_side_inputs(stages, pipeline_context):
   downstream_side_inputs_by_stage = {}
 
   def compute_downstream_side_inputs(stage):
-    if stage not in downstream_side_inputs_by_stage:
+    # The consumers are visited with an explicit stack rather than recursively,
+    # as chains of stages may be deeper than the recursion limit.
+    to_visit = [stage]
+    while to_visit:
+      current = to_visit[-1]
+      if current in downstream_side_inputs_by_stage:
+        to_visit.pop()
+        continue
+      outputs = [output for transform in current.transforms
+                 for output in transform.outputs.values()]
+      unvisited_consumers = [
+          consumer for output in outputs for consumer in consumers[output]
+          if consumer not in downstream_side_inputs_by_stage]
+      if unvisited_consumers:
+        to_visit.extend(unvisited_consumers)
+        continue
       downstream_side_inputs = frozenset()
-      for transform in stage.transforms:
-        for output in transform.outputs.values():
-          if output in all_side_inputs:
-            downstream_side_inputs = union(
-                downstream_side_inputs, frozenset([output]))
-          for consumer in consumers[output]:
-            downstream_side_inputs = union(
-                downstream_side_inputs,
-                compute_downstream_side_inputs(consumer))
-      downstream_side_inputs_by_stage[stage] = downstream_side_inputs
+      for output in outputs:
+        if output in all_side_inputs:
+          downstream_side_inputs = union(
+              downstream_side_inputs, frozenset([output]))
+        for consumer in consumers[output]:
+          downstream_side_inputs = union(
+              downstream_side_inputs,
+              downstream_side_inputs_by_stage[consumer])
+      downstream_side_inputs_by_stage[current] = downstream_side_inputs
+      to_visit.pop()
     return downstream_side_inputs_by_stage[stage]
 
   for stage in stages:
@@ -231,7 +231,8 @@ class PortableMetrics(metrics.metric.MetricResults):
   def query(self, filter=None):
     return {'counters': [],
             'distributions': [],
-            'gauges': []}
+            'gauges': [],
+            'histograms': []}
 
 
 class PipelineResult(runner.PipelineResult):
@@ -45,6 +45,7 @@ from apache_beam.portability.api import beam_fn_api_pb2
 from apache_beam.portability.api import beam_runner_api_pb2
 from apache_beam.runners import pipeline_context
 from apache_beam.runners.dataflow import dataflow_runner
+from apache_beam.runners.worker import memory_accounting
 from apache_beam.runners.worker import operation_specs
 from apache_beam.runners.worker import operations
 from apache_beam.runners.worker import statesampler
@@ -136,16 +137,19 @@ class _StateBackedIterable(object):
       self._coder_impl = coder_or_impl
 
   def __iter__(self):
-    data, continuation_token = self._state_handler.blocking_get(self._state_key)
-    while True:
+    next_page = self._state_handler.get_async(self._state_key)
+    while next_page is not None:
+      data, continuation_token = next_page.get()
+      # Request the following page before decoding this one, so that it is
+      # fetched while the elements of this one are processed.
+      if continuation_token:
+        next_page = self._state_handler.get_async(
+            self._state_key, continuation_token)
+      else:
+        next_page = None
       input_stream = coder_impl.create_InputStream(data)
       while input_stream.size() > 0:
         yield self._coder_impl.decode_from_stream(input_stream, True)
-      if not continuation_token:
-        break
-      else:
-        data, continuation_token = self._state_handler.blocking_get(
-            self._state_key, continuation_token)
 
   def __reduce__(self):
     return list, (list(self),)
@@ -213,6 +217,10 @@ class StateBackedSideInputMap(object):
     return (self._side_input_data.window_mapping_fn
             == sideinputs._global_window_mapping_fn)
 
+  def estimated_cache_bytes(self):
+    """Returns an estimate of the bytes held by the cached views."""
+    return memory_accounting.estimate_size(self._cache)
+
   def reset(self):
     # TODO(BEAM-5428): Cross-bundle caching respecting cache tokens.
     self._cache = {}
@@ -250,7 +258,7 @@ class CombiningValueRuntimeState(userstate.RuntimeState):
     self._underlying_bag_state.clear()
 
   def _commit(self):
-    self._underlying_bag_state._commit()
+    return self._underlying_bag_state._commit()
 
 
 class _ConcatIterable(object):
@@ -292,14 +300,25 @@ class SynchronousBagRuntimeState(userstate.RuntimeState):
     self._added_elements = []
 
   def _commit(self):
+    """Sends the changes of the state, without waiting for them.
+
+    All the elements added since the last commit are sent in a single append,
+    following the clear if the state was cleared.
+
+    Returns:
+      The list of futures of the requests.
+    """
+    to_await = []
     if self._cleared:
-      self._state_handler.blocking_clear(self._state_key)
+      to_await.append(self._state_handler.clear_async(self._state_key))
     if self._added_elements:
       value_coder_impl = self._value_coder.get_impl()
       out = coder_impl.create_OutputStream()
       for element in self._added_elements:
         value_coder_impl.encode_to_stream(element, out, True)
-      self._state_handler.blocking_append(self._state_key, out.get())
+      to_await.append(
+          self._state_handler.append_async(self._state_key, out.get()))
+    return to_await
 
 
 class OutputTimer(object):
@@ -363,8 +382,13 @@ class FnApiUserStateContext(userstate.UserStateContext):
       raise NotImplementedError(state_spec)
 
   def commit(self):
+    # The changes of all the states are sent before waiting for any of them,
+    # so that a single round trip is waited for.
+    to_await = []
     for state in self._all_states.values():
-      state._commit()
+      to_await.extend(state._commit())
+    for future in to_await:
+      future.get()
 
   def reset(self):
     # TODO(BEAM-5428): Implement cross-bundle state caching.
@@ -450,6 +474,9 @@ class BundleProcessor(object):
   def reset(self):
     self.counter_factory.reset()
     self.state_sampler.reset()
+    accountant = memory_accounting.get_active_accountant()
+    if accountant:
+      accountant.reset(self.state_sampler)
     # Side input caches.
     for op in self.ops.values():
       op.reset()
@@ -466,8 +493,14 @@ class BundleProcessor(object):
         # We must wait until we receive "end of stream" for each of these ops.
         expected_inputs.append(op)
 
+    accountant = memory_accounting.get_active_accountant()
+    if accountant and not accountant.traces_allocations:
+      accountant = None
     try:
       self.state_sampler.start()
+      if accountant:
+        # Memory allocated before the bundle is not attributed to its steps.
+        accountant.sample()
       # Start all operations.
       for op in reversed(self.ops.values()):
         logging.debug('start %s', op)
@@ -493,6 +526,8 @@ class BundleProcessor(object):
         logging.debug('finish %s', op)
         op.finish()
     finally:
+      if accountant:
+        accountant.sample()
       self.state_sampler.stop_if_still_running()
 
   def metrics(self):
@@ -534,8 +569,37 @@ class BundleProcessor(object):
       for mi in op.monitoring_infos(transform_id).values():
         fixed_mi = self._fix_output_tags_monitoring_info(transform_id, mi)
         all_monitoring_infos_dict[monitoring_infos.to_key(fixed_mi)] = fixed_mi
+    for mi in self.memory_monitoring_infos():
+      all_monitoring_infos_dict[monitoring_infos.to_key(mi)] = mi
     return list(all_monitoring_infos_dict.values())
 
+  def memory_monitoring_infos(self):
+    """Returns the MonitoringInfos of the memory used by each step.
+
+    They are only reported when memory accounting is enabled, and the bytes
+    allocated by each step only if the allocations are traced.
+    """
+    accountant = memory_accounting.get_active_accountant()
+    if not accountant:
+      return []
+    step_bytes = None
+    if accountant.traces_allocations:
+      step_bytes = accountant.step_bytes(self.state_sampler)
+    infos = []
+    for transform_id, op in self.ops.items():
+      if step_bytes is not None:
+        infos.append(monitoring_infos.int64_counter(
+            monitoring_infos.ALLOCATED_BYTES_URN,
+            step_bytes.get(op.name_context, 0),
+            ptransform=transform_id))
+      retained_bytes = op.estimated_retained_bytes()
+      if retained_bytes:
+        infos.append(monitoring_infos.int64_gauge_value(
+            monitoring_infos.RETAINED_BYTES_URN,
+            retained_bytes,
+            ptransform=transform_id))
+    return infos
+
   def _fix_output_tags_monitoring_info(self, transform_id, monitoring_info):
     actual_output_tags = list(
         self.process_bundle_descriptor.transforms[transform_id].outputs.keys())
@@ -758,6 +822,37 @@ def create(factory, transform_id, transform_proto, serialized_fn, consumers):
       factory, transform_id, transform_proto, consumers, serialized_fn)
 
 
+# Whether the windowing of serialized DoFns is set, and the serialized DoFns
+# completed with the windowing of their input, keyed by the digests of the
+# serialized DoFn, windowing strategy and window coder. They spare unpickling
+# and pickling again the DoFns of every bundle processor created for a bundle
+# descriptor. The DoFns themselves are still unpickled by each operation, as
+# their instances hold per-operation state.
+_serialized_fn_has_windowing = pickler.DigestCache()
+_serialized_fns_with_windowing = pickler.DigestCache()
+
+
+def _has_windowing(serialized_fn):
+  key = pickler.DigestCache.key(serialized_fn)
+  has_windowing = _serialized_fn_has_windowing.get(key)
+  if has_windowing is None:
+    has_windowing = bool(pickler.loads(serialized_fn)[-1])
+    _serialized_fn_has_windowing.put(key, has_windowing, size=0)
+  return has_windowing
+
+
+def _with_windowing(serialized_fn, windowing_protos, get_windowing):
+  key = pickler.DigestCache.key(serialized_fn, *(
+      proto.SerializeToString(deterministic=True)
+      for proto in windowing_protos))
+  result = _serialized_fns_with_windowing.get(key)
+  if result is None:
+    dofn_data = pickler.loads(serialized_fn)
+    result = pickler.dumps(dofn_data[:-1] + (get_windowing(),))
+    _serialized_fns_with_windowing.put(key, result)
+  return result
+
+
 @BeamTransformFactory.register_urn(
     common_urns.primitives.PAR_DO.urn, beam_runner_api_pb2.ParDoPayload)
 def create(factory, transform_id, transform_proto, parameter, consumers):
@@ -803,9 +898,7 @@ def _create_pardo_operation(
     else:
       return tag
 
-  dofn_data = pickler.loads(serialized_fn)
-  if not dofn_data[-1]:
-    # Windowing not set.
+  if not _has_windowing(serialized_fn):
     if pardo_proto:
       other_input_tags = set.union(
           set(pardo_proto.side_inputs), set(pardo_proto.timer_specs))
@@ -813,9 +906,16 @@ def _create_pardo_operation(
       other_input_tags = ()
     pcoll_id, = [pcoll for tag, pcoll in transform_proto.inputs.items()
                  if tag not in other_input_tags]
-    windowing = factory.context.windowing_strategies.get_by_id(
+    windowing_strategy_id = (
         factory.descriptor.pcollections[pcoll_id].windowing_strategy_id)
-    serialized_fn = pickler.dumps(dofn_data[:-1] + (windowing,))
+    windowing_strategy = (
+        factory.descriptor.windowing_strategies[windowing_strategy_id])
+    serialized_fn = _with_windowing(
+        serialized_fn,
+        (windowing_strategy,
+         factory.descriptor.coders[windowing_strategy.window_coder_id]),
+        lambda: factory.context.windowing_strategies.get_by_id(
+            windowing_strategy_id))
 
   if pardo_proto and (pardo_proto.timer_specs or pardo_proto.state_specs):
     main_input_coder = None
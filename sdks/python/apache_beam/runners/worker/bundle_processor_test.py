@@ -0,0 +1,174 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Tests for apache_beam.runners.worker.bundle_processor."""
+
+from __future__ import absolute_import
+
+import unittest
+from builtins import range
+
+import mock
+
+import apache_beam as beam
+from apache_beam import coders
+from apache_beam.internal import pickler
+from apache_beam.portability.api import beam_fn_api_pb2
+from apache_beam.portability.api import beam_runner_api_pb2
+from apache_beam.runners.portability import fn_api_runner
+from apache_beam.runners.worker import bundle_processor
+from apache_beam.transforms import userstate
+from apache_beam.transforms import window
+
+
+class RecordingStateHandler(fn_api_runner.FnApiRunner.StateServicer):
+  """An in memory state handler recording the requests made to it."""
+
+  def __init__(self):
+    super(RecordingStateHandler, self).__init__()
+    self.requests = []
+
+  def get_async(self, state_key, continuation_token=None):
+    self.requests.append(('get', continuation_token))
+    return super(RecordingStateHandler, self).get_async(
+        state_key, continuation_token)
+
+  def append_async(self, state_key, data):
+    self.requests.append(('append', data))
+    return super(RecordingStateHandler, self).append_async(state_key, data)
+
+  def clear_async(self, state_key):
+    self.requests.append(('clear', None))
+    return super(RecordingStateHandler, self).clear_async(state_key)
+
+
+class StateAccessTest(unittest.TestCase):
+
+  def setUp(self):
+    self.state_handler = RecordingStateHandler()
+    self.state_key = beam_fn_api_pb2.StateKey(
+        bag_user_state=beam_fn_api_pb2.StateKey.BagUserState(
+            ptransform_id='transform', user_state_id='state', key=b'key'))
+    self.coder = coders.VarIntCoder()
+
+  def append(self, *values):
+    self.state_handler.blocking_append(
+        self.state_key, b''.join(self.coder.encode(v) for v in values))
+
+  def test_continuation_pages_are_prefetched(self):
+    # Each appended chunk is returned as a page of its own.
+    self.state_handler._use_continuation_tokens = True
+    for k in range(3):
+      self.append(2 * k, 2 * k + 1)
+    self.state_handler.requests = []
+
+    values = iter(bundle_processor._StateBackedIterable(
+        self.state_handler, self.state_key, self.coder))
+    self.assertEqual(0, next(values))
+    # The page after the one being consumed has been requested already.
+    self.assertEqual(
+        [('get', None), ('get', 'token_0:0'), ('get', 'token_0:1')],
+        self.state_handler.requests)
+    self.assertEqual([1, 2, 3, 4, 5], list(values))
+    self.assertEqual(5, len(self.state_handler.requests))
+
+  def test_commit_sends_a_single_append_per_state(self):
+    self.append(1)
+    self.state_handler.requests = []
+    state = bundle_processor.SynchronousBagRuntimeState(
+        self.state_handler, self.state_key, self.coder)
+    state.add(2)
+    state.add(3)
+    self.assertEqual([1, 2, 3], list(state.read()))
+    self.state_handler.requests = []
+
+    to_await = state._commit()
+    self.assertEqual(1, len(to_await))
+    self.assertEqual([('append', b'\x02\x03')], self.state_handler.requests)
+
+  def test_commit_after_clear(self):
+    self.append(1)
+    self.state_handler.requests = []
+    state = bundle_processor.SynchronousBagRuntimeState(
+        self.state_handler, self.state_key, self.coder)
+    state.add(2)
+    state.clear()
+    state.add(3)
+    self.assertEqual([3], list(state.read()))
+    self.assertEqual([], self.state_handler.requests)
+
+    for future in state._commit():
+      future.get()
+    self.assertEqual([('clear', None), ('append', b'\x03')],
+                     self.state_handler.requests)
+    self.assertEqual(
+        (b'\x03', None), self.state_handler.blocking_get(self.state_key))
+
+  def test_user_state_context_commit(self):
+    context = bundle_processor.FnApiUserStateContext(
+        self.state_handler, 'transform', self.coder, self.coder, {})
+    spec = userstate.BagStateSpec('bag', self.coder)
+    for key in range(3):
+      context.get_state(spec, key, 0).add(key)
+    context.get_state(spec, 0, 0).add(10)
+    context.commit()
+    # A single append is sent per state key.
+    self.assertEqual(
+        sorted([('append', b'\x00\x0a'), ('append', b'\x01'),
+                ('append', b'\x02')]),
+        sorted(self.state_handler.requests))
+
+
+class SerializedFnCacheTest(unittest.TestCase):
+
+  def test_serialized_fn_is_completed_once(self):
+    serialized_fn = pickler.dumps((beam.Map(len).fn, (), {}, [], None))
+    windowing = beam.transforms.core.Windowing(window.GlobalWindows())
+    windowing_protos = (
+        beam_runner_api_pb2.WindowingStrategy(window_coder_id='coder'),
+        beam_runner_api_pb2.Coder())
+    self.assertFalse(bundle_processor._has_windowing(serialized_fn))
+    completed = bundle_processor._with_windowing(
+        serialized_fn, windowing_protos, lambda: windowing)
+    self.assertTrue(bundle_processor._has_windowing(completed))
+    self.assertEqual(windowing, pickler.loads(completed)[-1])
+    with mock.patch.object(pickler, 'dumps') as dumps:
+      self.assertIs(
+          completed,
+          bundle_processor._with_windowing(
+              serialized_fn, windowing_protos, lambda: windowing))
+      dumps.assert_not_called()
+
+  def test_completed_serialized_fns_are_bounded_by_size(self):
+    serialized_fn = pickler.dumps((beam.Map(len).fn, (), {}, [], None))
+    windowing = beam.transforms.core.Windowing(window.GlobalWindows())
+    cache = bundle_processor._serialized_fns_with_windowing
+    with mock.patch.object(cache, 'max_bytes', 2 * len(serialized_fn)):
+      for i in range(3):
+        windowing_protos = (
+            beam_runner_api_pb2.WindowingStrategy(
+                window_coder_id='coder%d' % i),)
+        bundle_processor._with_windowing(
+            serialized_fn, windowing_protos, lambda: windowing)
+        self.assertLessEqual(cache.size_in_bytes, cache.max_bytes)
+    # The cache is keyed by digests rather than the serialized DoFns.
+    for key in cache.keys():
+      self.assertEqual([32, 32], [len(digest) for digest in key])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -24,19 +24,48 @@ import math
 import queue
 import sys
 import threading
+from builtins import object
 from builtins import range
 
 import grpc
 
+from apache_beam.metrics.metric import Metrics
 from apache_beam.portability.api import beam_fn_api_pb2
 from apache_beam.portability.api import beam_fn_api_pb2_grpc
+from apache_beam.runners.worker import statesampler
 from apache_beam.runners.worker.worker_id_interceptor import WorkerIdInterceptor
 
 # This module is experimental. No backwards-compatibility guarantees.
 
+# Counted in the metrics of the step logging the records, if any.
+_SUPPRESSED_LOGS_COUNTER = Metrics.counter(
+    'beam.sdk_harness.logging', 'suppressed_log_records')
+_DROPPED_LOGS_COUNTER = Metrics.counter(
+    'beam.sdk_harness.logging', 'dropped_log_records')
+
 
 class FnApiLogRecordHandler(logging.Handler):
-  """A handler that writes log records to the fn API."""
+  """A handler that writes log records to the fn API.
+
+  Records are converted to log entries on the thread sending them, so that
+  logging does not slow down the bundles much. Hence the arguments of the
+  log calls should not be mutated after being logged.
+
+  The records of each call site, i.e. line of code, can be limited to a rate
+  with a token bucket. The records exceeding the rate are dropped, and the
+  number of records dropped is appended to the next record sent by the site.
+  Dropped records are also counted by metrics of the steps logging them.
+
+  Args:
+    log_service_descriptor: the ApiServiceDescriptor of the logging service.
+    default_level: the level of the records which are sent.
+    level_overrides: a dict of the level of the records logged by steps,
+      loggers or modules, keyed by their name. The records of a logger also
+      use the levels of its parent loggers.
+    rate_per_site: if set, the number of records per second each call site
+      may send.
+    burst_per_site: the number of records each call site may send at once.
+  """
 
   # Maximum number of log entries in a single stream request.
   _MAX_BATCH_SIZE = 1000
@@ -55,9 +84,22 @@ class FnApiLogRecordHandler(logging.Handler):
       logging.DEBUG: beam_fn_api_pb2.LogEntry.Severity.DEBUG
   }
 
-  def __init__(self, log_service_descriptor):
+  def __init__(self, log_service_descriptor, default_level=logging.NOTSET,
+               level_overrides=None, rate_per_site=None, burst_per_site=100):
     super(FnApiLogRecordHandler, self).__init__()
 
+    self._default_level = _to_level(default_level)
+    self._level_overrides = {
+        name: _to_level(level)
+        for name, level in (level_overrides or {}).items()}
+    # Records below the default level must reach emit() if an override
+    # lowers the level.
+    self.setLevel(min([self._default_level] +
+                      list(self._level_overrides.values())))
+    self._rate_per_site = rate_per_site
+    self._burst_per_site = burst_per_site
+    self._buckets = {}
+
     self._dropped_logs = 0
     self._log_entry_queue = queue.Queue(maxsize=self._QUEUE_SIZE)
 
@@ -74,30 +116,120 @@ class FnApiLogRecordHandler(logging.Handler):
     self._reader.daemon = True
     self._reader.start()
 
+  @staticmethod
+  def factory_from_options(options):
+    """Returns a function creating a handler from the SdkHarnessOptions."""
+    overrides = dict(
+        override.split('=', 1)
+        for override in options.sdk_harness_log_level_overrides or [])
+
+    def create_handler(log_service_descriptor):
+      return FnApiLogRecordHandler(
+          log_service_descriptor,
+          default_level=options.default_sdk_harness_log_level,
+          level_overrides=overrides,
+          rate_per_site=options.sdk_harness_log_rate_per_site,
+          burst_per_site=options.sdk_harness_log_burst_per_site)
+    return create_handler
+
   def connect(self):
     return self._logging_stub.Logging(self._write_log_entries())
 
+  def _level_of(self, record):
+    if self._level_overrides:
+      tracker = statesampler.get_current_tracker()
+      if tracker is not None:
+        name_context = getattr(tracker.current_state(), 'name_context', None)
+        if name_context is not None:
+          level = self._level_overrides.get(name_context.logging_name())
+          if level is not None:
+            return level
+      name = record.name
+      while name:
+        level = self._level_overrides.get(name)
+        if level is not None:
+          return level
+        name = name.rpartition('.')[0]
+      level = self._level_overrides.get(record.module)
+      if level is not None:
+        return level
+    return self._default_level
+
   def emit(self, record):
+    # This is called with the handler lock held.
+    if record.levelno < self._level_of(record):
+      return
+    suppressed = 0
+    if self._rate_per_site is not None:
+      site = record.pathname, record.lineno
+      bucket = self._buckets.get(site)
+      if bucket is None:
+        bucket = self._buckets[site] = _TokenBucket(
+            self._rate_per_site, self._burst_per_site, record.created)
+      if not bucket.acquire(record.created):
+        bucket.suppressed += 1
+        _SUPPRESSED_LOGS_COUNTER.inc()
+        return
+      suppressed, bucket.suppressed = bucket.suppressed, 0
+
+    if record.exc_info:
+      # Tracebacks hold on to frames, hence are not formatted lazily.
+      to_send = self._to_log_entry(record, suppressed)
+    else:
+      to_send = record, suppressed
+    try:
+      self._log_entry_queue.put(to_send, block=False)
+    except queue.Full:
+      self._dropped_logs += 1
+      _DROPPED_LOGS_COUNTER.inc()
+
+  def _to_log_entry(self, record, suppressed=0):
     log_entry = beam_fn_api_pb2.LogEntry()
     log_entry.severity = self.LOG_LEVEL_MAP[record.levelno]
-    log_entry.message = self.format(record)
+    log_entry.message = self._format_message(record)
+    if suppressed:
+      log_entry.message += (
+          ' [%d similar messages were suppressed]' % suppressed)
     log_entry.thread = record.threadName
     log_entry.log_location = record.module + '.' + record.funcName
     (fraction, seconds) = math.modf(record.created)
     nanoseconds = 1e9 * fraction
     log_entry.timestamp.seconds = int(seconds)
     log_entry.timestamp.nanos = int(nanoseconds)
+    return log_entry
 
+  def _format_message(self, record):
+    # Records are formatted on the thread sending them, so a record which
+    # fails to format must neither end the stream nor lose its batch.
     try:
-      self._log_entry_queue.put(log_entry, block=False)
-    except queue.Full:
-      self._dropped_logs += 1
+      return self.format(record)
+    except Exception:  # pylint: disable=broad-except
+      self.handleError(record)
+      return '%s' % (record.msg,)
+
+  def _suppressed_log_entries(self):
+    """Returns entries summarizing the records dropped since the last ones."""
+    log_entries = []
+    for (pathname, lineno), bucket in sorted(self._buckets.items()):
+      if bucket.suppressed:
+        log_entry = beam_fn_api_pb2.LogEntry()
+        log_entry.severity = beam_fn_api_pb2.LogEntry.Severity.INFO
+        log_entry.message = '%d messages logged at %s:%d were suppressed' % (
+            bucket.suppressed, pathname, lineno)
+        log_entries.append(log_entry)
+        bucket.suppressed = 0
+    return log_entries
 
   def close(self):
     """Flush out all existing log entries and unregister this handler."""
     # Acquiring the handler lock ensures ``emit`` is not run until the lock is
     # released.
     self.acquire()
+    for log_entry in self._suppressed_log_entries():
+      try:
+        self._log_entry_queue.put(log_entry, block=False)
+      except queue.Full:
+        break
     self._log_entry_queue.put(self._FINISHED, timeout=5)
     # wait on server to close.
     self._reader.join()
@@ -118,7 +250,10 @@ class FnApiLogRecordHandler(logging.Handler):
         done = True
         log_entries.pop()
       if log_entries:
-        yield beam_fn_api_pb2.LogEntry.List(log_entries=log_entries)
+        yield beam_fn_api_pb2.LogEntry.List(log_entries=[
+            self._to_log_entry(*log_entry) if isinstance(log_entry, tuple)
+            else log_entry
+            for log_entry in log_entries])
 
   def _read_log_control_messages(self):
     while True:
@@ -136,3 +271,37 @@ class FnApiLogRecordHandler(logging.Handler):
       except Exception as ex:
         print("Logging client failed: {}... resetting".format(ex),
               file=sys.stderr)
+
+
+class _TokenBucket(object):
+  """The tokens of a logging call site, refilled at a constant rate."""
+
+  __slots__ = ('rate', 'capacity', 'tokens', 'last_refill', 'suppressed')
+
+  def __init__(self, rate, capacity, now):
+    self.rate = rate
+    self.capacity = capacity
+    self.tokens = capacity
+    self.last_refill = now
+    self.suppressed = 0
+
+  def acquire(self, now):
+    """Takes a token if there is one, returning whether there was one."""
+    if now > self.last_refill:
+      self.tokens = min(
+          self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+      self.last_refill = now
+    if self.tokens >= 1:
+      self.tokens -= 1
+      return True
+    return False
+
+
+def _to_level(level):
+  """Returns the numeric value of a logging level, or of its name."""
+  if isinstance(level, int):
+    return level
+  numeric_level = logging.getLevelName(level.upper())
+  if not isinstance(numeric_level, int):
+    raise ValueError('Unknown logging level: %s' % level)
+  return numeric_level
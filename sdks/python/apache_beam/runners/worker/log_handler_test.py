@@ -23,11 +23,18 @@ from builtins import range
 from concurrent import futures
 
 import grpc
+import mock
 
+from apache_beam.metrics.execution import MetricsContainer
+from apache_beam.metrics.metricbase import MetricName
+from apache_beam.options.pipeline_options import PipelineOptions
+from apache_beam.options.pipeline_options import SdkHarnessOptions
 from apache_beam.portability.api import beam_fn_api_pb2
 from apache_beam.portability.api import beam_fn_api_pb2_grpc
 from apache_beam.portability.api import endpoints_pb2
 from apache_beam.runners.worker import log_handler
+from apache_beam.runners.worker import statesampler
+from apache_beam.utils import counters
 
 
 class BeamFnLoggingServicer(beam_fn_api_pb2_grpc.BeamFnLoggingServicer):
@@ -90,6 +97,118 @@ class FnApiLogRecordHandlerTest(unittest.TestCase):
     self.assertEqual(num_received_log_entries, num_log_entries)
 
 
+class FnApiLogRecordHandlerFilteringTest(unittest.TestCase):
+
+  def setUp(self):
+    self.test_logging_service = BeamFnLoggingServicer()
+    self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    beam_fn_api_pb2_grpc.add_BeamFnLoggingServicer_to_server(
+        self.test_logging_service, self.server)
+    self.test_port = self.server.add_insecure_port('[::]:0')
+    self.server.start()
+    self.logging_service_descriptor = endpoints_pb2.ApiServiceDescriptor(
+        url='localhost:%s' % self.test_port)
+
+  def tearDown(self):
+    self.server.stop(5)
+
+  def create_handler(self, **kwargs):
+    return log_handler.FnApiLogRecordHandler(
+        self.logging_service_descriptor, **kwargs)
+
+  def log(self, handler, msg, args=(), levelno=logging.INFO, lineno=1,
+          created=1000.0, name='root'):
+    handler.handle(logging.makeLogRecord({
+        'msg': msg, 'args': args, 'levelno': levelno,
+        'levelname': logging.getLevelName(levelno), 'created': created,
+        'pathname': 'my_module.py', 'lineno': lineno, 'module': 'my_module',
+        'funcName': 'my_fn', 'threadName': 'my_thread', 'name': name}))
+
+  def received_messages(self, handler):
+    handler.close()
+    return [log_entry.message
+            for log_entries in self.test_logging_service.log_records_received
+            for log_entry in log_entries.log_entries]
+
+  def test_level_overrides(self):
+    handler = self.create_handler(
+        default_level='WARNING',
+        level_overrides={'my_logger': 'DEBUG', 'my_step': logging.ERROR})
+    self.assertEqual(logging.DEBUG, handler.level)
+    self.log(handler, 'info', levelno=logging.INFO)
+    self.log(handler, 'warning', levelno=logging.WARNING)
+    self.log(handler, 'debug of child logger', levelno=logging.DEBUG,
+             name='my_logger.child')
+
+    sampler = statesampler.StateSampler('stage', counters.CounterFactory())
+    sampler.start()
+    try:
+      with sampler.scoped_state('my_step', 'process'):
+        self.log(handler, 'warning in step', levelno=logging.WARNING)
+        self.log(handler, 'error in step', levelno=logging.ERROR)
+    finally:
+      sampler.stop()
+
+    self.assertEqual(
+        ['warning', 'debug of child logger', 'error in step'],
+        self.received_messages(handler))
+
+  def test_rate_limit_per_site(self):
+    handler = self.create_handler(rate_per_site=1, burst_per_site=2)
+    for k in range(5):
+      self.log(handler, 'first site %s', (k,), lineno=1, created=1000.0)
+    self.log(handler, 'second site', lineno=2, created=1000.0)
+    # A token is refilled every second.
+    self.log(handler, 'first site again', lineno=1, created=1001.0)
+    for k in range(3):
+      self.log(handler, 'first site %s', (k,), lineno=1, created=1001.0)
+
+    self.assertEqual(
+        ['first site 0', 'first site 1', 'second site',
+         'first site again [3 similar messages were suppressed]',
+         '3 messages logged at my_module.py:1 were suppressed'],
+        self.received_messages(handler))
+
+  def test_dropped_records_are_counted_in_step_metrics(self):
+    handler = self.create_handler(rate_per_site=0, burst_per_site=1)
+    container = MetricsContainer('my_step')
+    sampler = statesampler.StateSampler('stage', counters.CounterFactory())
+    sampler.start()
+    try:
+      with sampler.scoped_state(
+          'my_step', 'process', metrics_container=container):
+        for _ in range(4):
+          self.log(handler, 'message')
+    finally:
+      sampler.stop()
+    handler.close()
+    self.assertEqual(3, container.get_counter(MetricName(
+        'beam.sdk_harness.logging',
+        'suppressed_log_records')).get_cumulative())
+
+  def test_records_failing_to_format_are_sent_raw(self):
+    handler = self.create_handler()
+    self.log(handler, 'before')
+    with mock.patch.object(handler, 'handleError') as handle_error:
+      self.log(handler, 'bad %d', ('x',))
+      self.log(handler, 'after')
+      self.assertEqual(
+          ['before', 'bad %d', 'after'], self.received_messages(handler))
+      self.assertEqual(1, handle_error.call_count)
+
+  def test_factory_from_options(self):
+    options = PipelineOptions([
+        '--default_sdk_harness_log_level=ERROR',
+        '--sdk_harness_log_level_override=my_step=DEBUG',
+        '--sdk_harness_log_rate_per_site=10'])
+    handler = log_handler.FnApiLogRecordHandler.factory_from_options(
+        options.view_as(SdkHarnessOptions))(self.logging_service_descriptor)
+    self.assertEqual(logging.DEBUG, handler.level)
+    self.log(handler, 'info', levelno=logging.INFO)
+    self.log(handler, 'error', levelno=logging.ERROR)
+    self.assertEqual(['error'], self.received_messages(handler))
+
+
 # Test cases.
 data = {
     'one_batch': log_handler.FnApiLogRecordHandler._MAX_BATCH_SIZE - 47,
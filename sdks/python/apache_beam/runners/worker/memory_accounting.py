@@ -0,0 +1,276 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Attribution of the memory used by the SDK harness to pipeline steps.
+
+The MemoryAccountant traces allocations with tracemalloc, and periodically
+attributes the growth of the traced memory to the steps that the bundle
+processing threads are executing, as reported by their state samplers. The
+estimate_size function estimates the size of long lived structures, such as
+the tables of partial group by key operations and side input caches.
+Without tracemalloc, i.e. on Python 2, only these estimates are reported.
+
+For internal use only; no backwards-compatibility guarantees.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import collections
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from builtins import object
+
+from apache_beam.runners.worker import statesampler
+
+try:
+  import tracemalloc
+except ImportError:
+  tracemalloc = None
+
+
+_ACTIVE_ACCOUNTANT = None
+
+
+def get_active_accountant():
+  """Returns the started MemoryAccountant of this process, or None."""
+  return _ACTIVE_ACCOUNTANT
+
+
+def estimate_size(obj, max_samples=32, max_depth=4):
+  """Estimates the number of bytes held by an object and its contents.
+
+  The contents of large containers are not all visited: their size is
+  extrapolated from the first max_samples items. Objects shared by several
+  containers are counted once per container holding them.
+
+  Args:
+    obj: the object to estimate the size of.
+    max_samples: the number of items of a container which are visited.
+    max_depth: the number of nested containers which are visited.
+  """
+  size = sys.getsizeof(obj, 0)
+  if max_depth <= 0:
+    return size
+  if isinstance(obj, dict):
+    items = obj.items()
+  elif isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+    items = obj
+  elif hasattr(obj, '__dict__'):
+    return size + estimate_size(obj.__dict__, max_samples, max_depth - 1)
+  else:
+    return size
+  count = len(obj)
+  if not count:
+    return size
+  try:
+    sampled = list(itertools.islice(iter(items), max_samples))
+  except RuntimeError:
+    # The container was modified by another thread.
+    return size
+  if not sampled:
+    return size
+  sampled_size = sum(
+      estimate_size(item, max_samples, max_depth - 1) for item in sampled)
+  if isinstance(obj, dict):
+    # The pairs are transient tuples, not held by the dict.
+    sampled_size -= len(sampled) * sys.getsizeof((None, None), 0)
+  return size + sampled_size * count // len(sampled)
+
+
+class MemoryAccountant(object):
+  """Attributes the memory allocated by the SDK harness to steps.
+
+  A daemon thread reads the size of the memory traced by tracemalloc every
+  sampling period, and attributes the growth since the previous reading to
+  the steps which the threads processing bundles are in, in equal parts.
+  Negative growth, i.e. memory being freed, is attributed in the same way,
+  so the bytes of a step add up to the memory it retains.
+  The traced memory should also be sampled at bundle boundaries, so that
+  bundles do not get attributed memory allocated outside of them.
+
+  When the traced memory first exceeds dump_threshold_bytes, the top
+  allocation sites are logged, and written to the profile location.
+
+  Allocations are only traced if tracemalloc is available. Otherwise, a
+  started MemoryAccountant is still the active one, so that the memory
+  retained by the steps is reported.
+
+  Args:
+    sampling_period_ms: the period between two readings of the traced memory.
+    traceback_frames: the number of frames stored by tracemalloc for each
+      allocation.
+    dump_threshold_bytes: if set, the traced memory size above which the top
+      allocation sites are dumped.
+    dump_top_sites: the number of allocation sites which are dumped.
+    profile_location: if set, the directory the allocation sites are written
+      to.
+  """
+
+  def __init__(self, sampling_period_ms=100, traceback_frames=1,
+               dump_threshold_bytes=None, dump_top_sites=25,
+               profile_location=None):
+    self.sampling_period_ms = sampling_period_ms
+    self.traceback_frames = traceback_frames
+    self.dump_threshold_bytes = dump_threshold_bytes
+    self.dump_top_sites = dump_top_sites
+    self.profile_location = profile_location
+    self.dump_output = None
+    self._lock = threading.Lock()
+    self._bytes_by_tracker = {}
+    self._last_traced_bytes = 0
+    self._dumped = False
+    self._stopped = threading.Event()
+    self._thread = None
+    self._started_tracing = False
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *args):
+    self.stop()
+
+  @property
+  def traces_allocations(self):
+    """Whether the allocations are being traced by this accountant."""
+    return self._thread is not None
+
+  def start(self):
+    global _ACTIVE_ACCOUNTANT
+    if _ACTIVE_ACCOUNTANT is self:
+      return
+    _ACTIVE_ACCOUNTANT = self
+    if tracemalloc is None:
+      warnings.warn(
+          'tracemalloc is not available; the memory allocated by steps is '
+          'not reported%s.' % (
+              '' if self.dump_threshold_bytes is None
+              else ', and the top allocation sites are not dumped'))
+      return
+    if not tracemalloc.is_tracing():
+      tracemalloc.start(self.traceback_frames)
+      self._started_tracing = True
+    self._last_traced_bytes = tracemalloc.get_traced_memory()[0]
+    self._stopped.clear()
+    self._thread = threading.Thread(
+        target=self._run, name='memory-accountant')
+    self._thread.daemon = True
+    self._thread.start()
+
+  def stop(self):
+    global _ACTIVE_ACCOUNTANT
+    if _ACTIVE_ACCOUNTANT is self:
+      _ACTIVE_ACCOUNTANT = None
+    if not self._thread:
+      return
+    self._stopped.set()
+    self._thread.join()
+    self._thread = None
+    if self._started_tracing:
+      tracemalloc.stop()
+      self._started_tracing = False
+
+  def _run(self):
+    while not self._stopped.wait(self.sampling_period_ms / 1000.0):
+      try:
+        self.sample()
+      except Exception:  # pylint: disable=broad-except
+        logging.warning('Failed to account memory.', exc_info=True)
+
+  def sample(self):
+    """Attributes the memory traced since the last sample to current steps."""
+    traced_bytes = tracemalloc.get_traced_memory()[0]
+    current_steps = []
+    for thread in threading.enumerate():
+      tracker = statesampler.get_tracker_of_thread(thread.ident)
+      if tracker is not None:
+        try:
+          current_steps.append(
+              (tracker, tracker.current_state().name_context))
+        except (AttributeError, IndexError):
+          # The state of the tracker changed while it was being read.
+          pass
+    with self._lock:
+      delta = traced_bytes - self._last_traced_bytes
+      self._last_traced_bytes = traced_bytes
+      for tracker, name_context in current_steps:
+        step_bytes = self._bytes_by_tracker.setdefault(tracker, {})
+        step_bytes[name_context] = (
+            step_bytes.get(name_context, 0) + delta // len(current_steps))
+    if (self.dump_threshold_bytes is not None and not self._dumped
+        and traced_bytes > self.dump_threshold_bytes):
+      self._dumped = True
+      self.dump_top_allocation_sites()
+
+  def step_bytes(self, tracker):
+    """Returns the bytes attributed to each step of a state sampler.
+
+    Returns:
+      A dict of the bytes attributed to each step since the last reset of the
+      state sampler, keyed by the NameContext of the step.
+    """
+    with self._lock:
+      return dict(self._bytes_by_tracker.get(tracker, {}))
+
+  def reset(self, tracker):
+    """Forgets the bytes attributed to the steps of a state sampler."""
+    with self._lock:
+      self._bytes_by_tracker.pop(tracker, None)
+
+  def dump_top_allocation_sites(self):
+    """Logs the sites which allocated most of the traced memory.
+
+    The sites are also written to the profile location, if any.
+    """
+    snapshot = tracemalloc.take_snapshot()
+    lines = ['%s: %d KiB in %d blocks' % (
+        stat.traceback, stat.size // 1024, stat.count)
+             for stat in snapshot.statistics('lineno')[:self.dump_top_sites]]
+    logging.warning(
+        'Traced memory of %d bytes exceeds %d bytes. Top allocation sites:\n%s',
+        tracemalloc.get_traced_memory()[0], self.dump_threshold_bytes,
+        '\n'.join(lines))
+    if self.profile_location:
+      from apache_beam.utils import profiler
+      dump_location = os.path.join(
+          self.profile_location,
+          time.strftime('%Y-%m-%d_%H_%M_%S-allocation_sites.txt'))
+      fd, filename = tempfile.mkstemp()
+      try:
+        with os.fdopen(fd, 'w') as f:
+          f.write('\n'.join(lines) + '\n')
+        profiler.Profile.default_file_copy_fn(filename, dump_location)
+      finally:
+        os.remove(filename)
+      self.dump_output = dump_location
+
+  @staticmethod
+  def factory_from_options(options):
+    """Returns a MemoryAccountant if enabled by the ProfilingOptions."""
+    if options.profile_memory_per_step:
+      threshold_mb = options.profile_memory_dump_threshold_mb
+      return MemoryAccountant(
+          dump_threshold_bytes=(
+              threshold_mb << 20 if threshold_mb is not None else None),
+          profile_location=options.profile_location)
@@ -0,0 +1,166 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Unit tests for the memory accounting of the SDK harness."""
+from __future__ import absolute_import
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from builtins import object
+from builtins import range
+
+import mock
+
+from apache_beam.runners.common import NameContext
+from apache_beam.runners.worker import memory_accounting
+from apache_beam.runners.worker import statesampler
+from apache_beam.utils.counters import CounterFactory
+
+
+class EstimateSizeTest(unittest.TestCase):
+
+  def test_scalars(self):
+    self.assertEqual(sys.getsizeof(12345, 0),
+                     memory_accounting.estimate_size(12345))
+    self.assertEqual(sys.getsizeof('x' * 1000, 0),
+                     memory_accounting.estimate_size('x' * 1000))
+
+  def test_containers(self):
+    values = ['x' * 100 for _ in range(10)]
+    self.assertEqual(
+        sys.getsizeof(values, 0) + 10 * sys.getsizeof('x' * 100, 0),
+        memory_accounting.estimate_size(values))
+    table = {i: [i] for i in range(1000, 1010)}
+    self.assertEqual(
+        sys.getsizeof(table, 0)
+        + sum(sys.getsizeof(k, 0) + sys.getsizeof(v, 0) + sys.getsizeof(k, 0)
+              for k, v in table.items()),
+        memory_accounting.estimate_size(table))
+
+  def test_large_containers_are_extrapolated(self):
+    values = ['x' * 100 for _ in range(10000)]
+    estimate = memory_accounting.estimate_size(values, max_samples=10)
+    self.assertEqual(
+        sys.getsizeof(values, 0) + 10000 * sys.getsizeof('x' * 100, 0),
+        estimate)
+
+  def test_objects(self):
+
+    class Accumulator(object):
+      def __init__(self):
+        self.values = list(range(1000, 1100))
+
+    self.assertGreater(
+        memory_accounting.estimate_size(Accumulator()),
+        100 * sys.getsizeof(1000, 0))
+
+  def test_depth_is_bounded(self):
+    nested = []
+    for _ in range(100):
+      nested = [nested]
+    self.assertLess(memory_accounting.estimate_size(nested, max_depth=4),
+                    10 * sys.getsizeof([], 0))
+
+
+class MemoryAccountantTest(unittest.TestCase):
+
+  def setUp(self):
+    self.sampler = statesampler.StateSampler('stage', CounterFactory())
+    self.sampler.start()
+
+  def tearDown(self):
+    self.sampler.stop_if_still_running()
+
+  @mock.patch.object(memory_accounting, 'tracemalloc')
+  def test_allocations_are_attributed_to_current_step(self, tracemalloc):
+    accountant = memory_accounting.MemoryAccountant()
+    tracemalloc.get_traced_memory.return_value = (1000, 1000)
+    accountant.sample()
+    with self.sampler.scoped_state('step1', 'process'):
+      tracemalloc.get_traced_memory.return_value = (5000, 5000)
+      accountant.sample()
+      tracemalloc.get_traced_memory.return_value = (4000, 5000)
+      accountant.sample()
+    with self.sampler.scoped_state('step2', 'process'):
+      tracemalloc.get_traced_memory.return_value = (4500, 5000)
+      accountant.sample()
+
+    step_bytes = accountant.step_bytes(self.sampler)
+    self.assertEqual(3000, step_bytes[NameContext('step1')])
+    self.assertEqual(500, step_bytes[NameContext('step2')])
+
+    accountant.reset(self.sampler)
+    self.assertEqual({}, accountant.step_bytes(self.sampler))
+
+  @mock.patch.object(memory_accounting, 'tracemalloc')
+  def test_allocations_outside_bundles_are_ignored(self, tracemalloc):
+    accountant = memory_accounting.MemoryAccountant()
+    self.sampler.stop()
+    tracemalloc.get_traced_memory.return_value = (1000, 1000)
+    accountant.sample()
+    self.assertEqual({}, accountant.step_bytes(self.sampler))
+
+  @mock.patch.object(memory_accounting, 'tracemalloc')
+  def test_top_allocation_sites_are_dumped_once(self, tracemalloc):
+    tmpdir = tempfile.mkdtemp()
+    try:
+      stat = mock.Mock(traceback='my_module.py:12', size=2 << 20, count=3)
+      tracemalloc.take_snapshot.return_value.statistics.return_value = [stat]
+      accountant = memory_accounting.MemoryAccountant(
+          dump_threshold_bytes=1 << 20, profile_location=tmpdir)
+
+      tracemalloc.get_traced_memory.return_value = (1000, 1000)
+      accountant.sample()
+      self.assertIsNone(accountant.dump_output)
+
+      tracemalloc.get_traced_memory.return_value = (2 << 20, 2 << 20)
+      accountant.sample()
+      accountant.sample()
+      self.assertEqual(1, tracemalloc.take_snapshot.call_count)
+      with open(accountant.dump_output) as f:
+        self.assertEqual('my_module.py:12: 2048 KiB in 3 blocks\n', f.read())
+      self.assertEqual(tmpdir, os.path.dirname(accountant.dump_output))
+    finally:
+      shutil.rmtree(tmpdir)
+
+  @mock.patch.object(memory_accounting, 'tracemalloc', None)
+  def test_start_without_tracemalloc(self):
+    with memory_accounting.MemoryAccountant() as accountant:
+      # The retained bytes are still reported.
+      self.assertIs(accountant, memory_accounting.get_active_accountant())
+      self.assertFalse(accountant.traces_allocations)
+    self.assertIsNone(memory_accounting.get_active_accountant())
+
+  @unittest.skipIf(memory_accounting.tracemalloc is None,
+                   'tracemalloc is not available')
+  def test_start_and_stop(self):
+    with memory_accounting.MemoryAccountant(sampling_period_ms=1) as accountant:
+      self.assertIs(accountant, memory_accounting.get_active_accountant())
+      with self.sampler.scoped_state('step', 'process'):
+        data = [bytearray(1000) for _ in range(1000)]
+        accountant.sample()
+      self.assertGreater(
+          accountant.step_bytes(self.sampler)[NameContext('step')],
+          len(data) * 1000)
+    self.assertIsNone(memory_accounting.get_active_accountant())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -98,11 +98,13 @@ cdef class CombineOperation(Operation):
 cdef class PGBKCVOperation(Operation):
   cdef public object combine_fn
   cdef public object combine_fn_add_input
+  cdef public object combine_fn_add_inputs
+  cdef bint buffer_inputs
   cdef dict table
   cdef long max_keys
   cdef long key_count
 
-  cpdef output_key(self, tuple wkey, value)
+  cpdef output_key(self, tuple wkey, list entry)
 
 
 cdef class FlattenOperation(Operation):
@@ -37,12 +37,14 @@ from apache_beam.portability.api import beam_fn_api_pb2
 from apache_beam.runners import common
 from apache_beam.runners.common import Receiver
 from apache_beam.runners.dataflow.internal.names import PropertyNames
+from apache_beam.runners.worker import memory_accounting
 from apache_beam.runners.worker import opcounters
 from apache_beam.runners.worker import operation_specs
 from apache_beam.runners.worker import sideinputs
 from apache_beam.transforms import sideinputs as apache_sideinputs
 from apache_beam.transforms import combiners
 from apache_beam.transforms import core
+from apache_beam.transforms import cy_combiners
 from apache_beam.transforms import userstate
 from apache_beam.transforms.combiners import PhasedCombineFnExecutor
 from apache_beam.transforms.combiners import curry_combine_fn
@@ -131,7 +133,9 @@ class Operation(object):
     self.consumers = collections.defaultdict(list)
 
     # These are overwritten in the legacy harness.
-    self.metrics_container = MetricsContainer(self.name_context.metrics_name())
+    # Metrics are only updated by the thread processing the bundle.
+    self.metrics_container = MetricsContainer(
+        self.name_context.metrics_name(), thread_confined=True)
 
     self.state_sampler = state_sampler
     self.scoped_start_state = self.state_sampler.scoped_state(
@@ -179,6 +183,10 @@ class Operation(object):
   def reset(self):
     self.metrics_container.reset()
 
+  def estimated_retained_bytes(self):
+    """Returns an estimate of the bytes held across elements."""
+    return 0
+
   def output(self, windowed_value, output_index=0):
     cython.cast(Receiver, self.receivers[output_index]).receive(windowed_value)
 
@@ -516,6 +524,11 @@ class DoOperation(Operation):
     if self.user_state_context:
       self.user_state_context.reset()
 
+  def estimated_retained_bytes(self):
+    return sum(side_input_map.estimated_cache_bytes()
+               for side_input_map in self.side_input_maps or ()
+               if hasattr(side_input_map, 'estimated_cache_bytes'))
+
   def progress_metrics(self):
     metrics = super(DoOperation, self).progress_metrics()
     if self.tagged_receivers:
@@ -609,6 +622,9 @@ class PGBKOperation(Operation):
   def finish(self):
     self.flush(0)
 
+  def estimated_retained_bytes(self):
+    return memory_accounting.estimate_size(self.table)
+
   def flush(self, target):
     limit = self.size - target
     for ix, (kw, vs) in enumerate(self.table.items()):
@@ -625,6 +641,9 @@ class PGBKOperation(Operation):
 
 class PGBKCVOperation(Operation):
 
+  # Number of values buffered per key for combiners that add inputs in batches.
+  MAX_BUFFERED_INPUTS = 256
+
   def __init__(self, name_context, spec, counter_factory, state_sampler):
     super(PGBKCVOperation, self).__init__(
         name_context, spec, counter_factory, state_sampler)
@@ -634,6 +653,11 @@ class PGBKCVOperation(Operation):
     fn, args, kwargs = pickler.loads(self.spec.combine_fn)[:3]
     self.combine_fn = curry_combine_fn(fn, args, kwargs)
     self.combine_fn_add_input = self.combine_fn.add_input
+    self.combine_fn_add_inputs = self.combine_fn.add_inputs
+    # Vectorized combiners fold a buffer of values per key at once, rather
+    # than being called for every value.
+    self.buffer_inputs = isinstance(
+        fn, cy_combiners.VectorizedAccumulatorCombineFn)
     # Optimization for the (known tiny accumulator, often wide keyspace)
     # combine functions.
     # TODO(b/36567833): Bound by in-memory size rather than key count.
@@ -664,7 +688,7 @@ class PGBKCVOperation(Operation):
           # TODO(robertwb): Use an LRU cache?
           for old_wkey, old_wvalue in self.table.items():
             old_wkeys.append(old_wkey)  # Can't mutate while iterating.
-            self.output_key(old_wkey, old_wvalue[0])
+            self.output_key(old_wkey, old_wvalue)
             self.key_count -= 1
             if self.key_count <= target:
               break
@@ -673,16 +697,34 @@ class PGBKCVOperation(Operation):
         self.key_count += 1
         # We save the accumulator as a one element list so we can efficiently
         # mutate when new values are added without searching the cache again.
-        entry = self.table[wkey] = [self.combine_fn.create_accumulator()]
-      entry[0] = self.combine_fn_add_input(entry[0], value)
+        # When buffering inputs, the list also holds the buffered values.
+        if self.buffer_inputs:
+          entry = self.table[wkey] = [self.combine_fn.create_accumulator(), []]
+        else:
+          entry = self.table[wkey] = [self.combine_fn.create_accumulator()]
+      if self.buffer_inputs:
+        buffered = entry[1]
+        buffered.append(value)
+        if len(buffered) >= self.MAX_BUFFERED_INPUTS:
+          entry[0] = self.combine_fn_add_inputs(entry[0], buffered)
+          entry[1] = []
+      else:
+        entry[0] = self.combine_fn_add_input(entry[0], value)
 
   def finish(self):
     for wkey, value in self.table.items():
-      self.output_key(wkey, value[0])
+      self.output_key(wkey, value)
     self.table = {}
     self.key_count = 0
 
-  def output_key(self, wkey, value):
+  def estimated_retained_bytes(self):
+    return memory_accounting.estimate_size(self.table)
+
+  def output_key(self, wkey, entry):
+    if self.buffer_inputs and entry[1]:
+      entry[0] = self.combine_fn_add_inputs(entry[0], entry[1])
+      entry[1] = []
+    value = entry[0]
     windows, key = wkey
     if windows is 0:
       self.output(_globally_windowed_value.with_value((key, value)))
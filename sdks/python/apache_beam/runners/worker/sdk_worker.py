@@ -23,8 +23,11 @@ from __future__ import print_function
 import abc
 import collections
 import contextlib
+import copy
 import logging
+import os
 import queue
+import subprocess
 import sys
 import threading
 import time
@@ -34,14 +37,16 @@ from builtins import range
 from concurrent import futures
 
 import grpc
-from future.utils import raise_
 from future.utils import with_metaclass
+from google.protobuf import text_format
 
 from apache_beam.portability.api import beam_fn_api_pb2
 from apache_beam.portability.api import beam_fn_api_pb2_grpc
+from apache_beam.portability.api import endpoints_pb2
 from apache_beam.runners.worker import bundle_processor
 from apache_beam.runners.worker import data_plane
 from apache_beam.runners.worker.worker_id_interceptor import WorkerIdInterceptor
+from apache_beam.utils import proto_utils
 
 
 class SdkHarness(object):
@@ -237,6 +242,412 @@ class SdkHarness(object):
                            instruction_id, scheduling_delay)
 
 
+class MultiProcessSdkHarness(object):
+  """An SDK harness which processes bundles in several worker processes.
+
+  The threads of a single SdkHarness share the GIL, so CPU bound user code
+  does not run in parallel. This harness starts worker_processes SDK harness
+  subprocesses instead, and dispatches the bundles of the runner to those
+  which have an idle worker thread.
+
+  The control stream of the runner is relayed: registrations are sent to
+  every worker process, and progress and split requests to the process
+  running the bundle. Each worker process has its own data channel, which
+  is served by this process and connected to the data channel of the runner
+  on a per instruction basis, and its own state channel, which is connected
+  directly to the runner. A worker process which exited is replaced, and
+  the registrations are sent again to its replacement, before it is given
+  another bundle.
+
+  Args:
+    control_address: the url of the control service of the runner.
+    worker_processes: the number of worker processes to start.
+    worker_count: the number of bundles dispatched at once to each worker
+      process.
+    credentials: the credentials of the channels to the runner, if any.
+    worker_id: the id of this harness, as assigned by the runner. The worker
+      processes are given ids derived from it, e.g. 'sdk-1' and 'sdk-2' for
+      the processes of the harness 'sdk'.
+    worker_command_line: the command starting a worker process, which will
+      connect to the control service at the CONTROL_API_SERVICE_DESCRIPTOR
+      environment variable. Defaults to running sdk_worker_main with the
+      current interpreter.
+  """
+
+  REQUEST_METHOD_PREFIX = '_request_'
+
+  def __init__(
+      self, control_address, worker_processes, worker_count=1,
+      credentials=None, worker_id=None, worker_command_line=None):
+    self._control_address = control_address
+    self._worker_processes = worker_processes
+    self._worker_count = worker_count
+    self._credentials = credentials
+    self._worker_id = worker_id
+    self._worker_command_line = worker_command_line or [
+        sys.executable, '-m', 'apache_beam.runners.worker.sdk_worker_main']
+    self._data_channel_factory = data_plane.GrpcClientDataChannelFactory(
+        credentials)
+    self.workers = []
+    # The indices of the worker processes, once per bundle they can run.
+    self._idle_workers = queue.Queue()
+    self._workers_lock = threading.Lock()
+    self._register_requests = []
+    self._worker_by_instruction_id = {}
+    self._data_ports = {}
+    self._responses = queue.Queue()
+    # Waiting for the responses of the worker processes does not use the CPU,
+    # hence as many threads as bundles which can run at once.
+    self._process_thread_pool = futures.ThreadPoolExecutor(
+        max_workers=worker_processes * worker_count + 1)
+    # Progress and split requests have their own threads, as those of the
+    # bundles may all be waiting for an idle worker process.
+    self._control_thread_pool = futures.ThreadPoolExecutor(
+        max_workers=worker_processes)
+    logging.info(
+        'Initializing MultiProcessSdkHarness with %s processes.',
+        worker_processes)
+
+  def run(self):
+    if self._credentials is None:
+      control_channel = grpc.insecure_channel(self._control_address)
+    else:
+      control_channel = grpc.secure_channel(
+          self._control_address, self._credentials)
+    grpc.channel_ready_future(control_channel).result(timeout=60)
+    control_channel = grpc.intercept_channel(
+        control_channel, WorkerIdInterceptor(self._worker_id))
+    control_stub = beam_fn_api_pb2_grpc.BeamFnControlStub(control_channel)
+    no_more_work = object()
+
+    self._start_workers()
+
+    def get_responses():
+      while True:
+        response = self._responses.get()
+        if response is no_more_work:
+          return
+        yield response
+
+    try:
+      for work_request in control_stub.Control(get_responses()):
+        logging.debug('Got work %s', work_request.instruction_id)
+        request_type = work_request.WhichOneof('request')
+        getattr(self, MultiProcessSdkHarness.REQUEST_METHOD_PREFIX +
+                request_type)(work_request)
+    finally:
+      logging.info('No more requests from control plane')
+      self._process_thread_pool.shutdown()
+      self._control_thread_pool.shutdown()
+      self._responses.put(no_more_work)
+      for worker in self.workers:
+        worker.close()
+      self._data_channel_factory.close()
+    logging.info('Done consuming work.')
+
+  def _worker_process_id(self, index):
+    return '%s-%d' % (self._worker_id or 'worker', index)
+
+  def _start_workers(self):
+    for index in range(self._worker_processes):
+      self.workers.append(self._start_worker(index))
+    # Bundles are spread round robin over the worker processes.
+    for _ in range(self._worker_count):
+      for index in range(self._worker_processes):
+        self._idle_workers.put(index)
+
+  def _start_worker(self, index):
+    worker = _WorkerProcess(
+        self._worker_command_line, self._worker_process_id(index), index)
+    # The responses are not awaited, as the instructions of a worker process
+    # are processed in order.
+    for request in self._register_requests:
+      worker.push(worker.rewrite_data_ports(request))
+    return worker
+
+  def _live_worker(self, index):
+    """Returns the worker process at index, replacing it if it exited."""
+    with self._workers_lock:
+      worker = self.workers[index]
+      if not worker.is_alive():
+        logging.warning(
+            'Worker process %s exited, starting a new one.', worker.worker_id)
+        worker.close(timeout_secs=0)
+        worker = self.workers[index] = self._start_worker(index)
+      return worker
+
+  def _execute(self, task, request, thread_pool=None):
+    def execute():
+      try:
+        response = task()
+      except Exception:  # pylint: disable=broad-except
+        traceback_string = traceback.format_exc()
+        logging.error(
+            'Error processing instruction %s. Original traceback is\n%s\n',
+            request.instruction_id, traceback_string)
+        response = beam_fn_api_pb2.InstructionResponse(
+            instruction_id=request.instruction_id, error=traceback_string)
+      self._responses.put(response)
+    (thread_pool or self._process_thread_pool).submit(execute)
+
+  def _request_register(self, request):
+    for descriptor in request.register.process_bundle_descriptor:
+      self._data_ports[descriptor.id] = [
+          (transform.spec.urn == bundle_processor.DATA_INPUT_URN,
+           _data_target(transform_id, transform),
+           proto_utils.parse_Bytes(
+               transform.spec.payload, beam_fn_api_pb2.RemoteGrpcPort))
+          for transform_id, transform in descriptor.transforms.items()
+          if transform.spec.urn in (bundle_processor.DATA_INPUT_URN,
+                                    bundle_processor.DATA_OUTPUT_URN)]
+
+    with self._workers_lock:
+      self._register_requests.append(request)
+      workers = list(self.workers)
+
+    def task():
+      responses = [(worker, worker.push(worker.rewrite_data_ports(request)))
+                   for worker in workers]
+      for worker, response in responses:
+        try:
+          if response.get().error:
+            return response.get()
+        except Exception:  # pylint: disable=broad-except
+          # A worker process which exited is registered with its replacement.
+          if worker.is_alive():
+            raise
+      return beam_fn_api_pb2.InstructionResponse(
+          instruction_id=request.instruction_id,
+          register=beam_fn_api_pb2.RegisterResponse())
+
+    self._execute(task, request)
+
+  def _request_process_bundle(self, request):
+
+    def task():
+      index = self._idle_workers.get()
+      try:
+        worker = self._live_worker(index)
+        self._worker_by_instruction_id[request.instruction_id] = worker
+        try:
+          return self._process_bundle(worker, request)
+        finally:
+          self._worker_by_instruction_id.pop(request.instruction_id, None)
+      finally:
+        self._idle_workers.put(index)
+
+    self._execute(task, request)
+
+  def _process_bundle(self, worker, request):
+    instruction_id = request.instruction_id
+    failed = threading.Event()
+    # The data of an instruction must be read by a single consumer per
+    # channel, hence a forwarder per direction and runner data service.
+    targets_by_url = collections.defaultdict(list)
+    grpc_port_by_url = {}
+    for is_input, target, grpc_port in self._data_ports[
+        request.process_bundle.process_bundle_descriptor_reference]:
+      url = grpc_port.api_service_descriptor.url
+      targets_by_url[is_input, url].append(target)
+      grpc_port_by_url[url] = grpc_port
+    for (is_input, url), targets in targets_by_url.items():
+      runner_channel = self._data_channel_factory.create_data_channel(
+          grpc_port_by_url[url])
+      if is_input:
+        source, sink = runner_channel, worker.data_channel
+      else:
+        source, sink = worker.data_channel, runner_channel
+      forwarder = threading.Thread(
+          target=_forward_elements,
+          args=(source, sink, instruction_id, targets, failed.is_set),
+          name='forward_data_%s' % instruction_id)
+      forwarder.daemon = True
+      forwarder.start()
+    try:
+      response = worker.push(request).get()
+    except Exception:
+      failed.set()
+      raise
+    if response.error:
+      # The worker process may never send the remaining outputs.
+      failed.set()
+    return response
+
+  def _request_process_bundle_progress(self, request):
+    instruction_reference = getattr(
+        request, request.WhichOneof('request')).instruction_reference
+    worker = self._worker_by_instruction_id.get(instruction_reference)
+    if worker is None:
+      self._execute(lambda: beam_fn_api_pb2.InstructionResponse(
+          instruction_id=request.instruction_id,
+          error='Unknown process bundle instruction {}'.format(
+              instruction_reference)), request, self._control_thread_pool)
+    else:
+      self._execute(
+          lambda: worker.push(request).get(), request,
+          self._control_thread_pool)
+
+  _request_process_bundle_split = _request_process_bundle_progress
+
+
+def _data_target(transform_id, transform):
+  """Returns the data plane Target of a runner IO transform."""
+  if transform.spec.urn == bundle_processor.DATA_INPUT_URN:
+    names = list(transform.outputs.keys())
+  else:
+    names = list(transform.inputs.keys())
+  return beam_fn_api_pb2.Target(
+      primitive_transform_reference=transform_id, name=names[0])
+
+
+def _forward_elements(
+    source, sink, instruction_id, targets, abort_callback):
+  """Copies the data of an instruction from a data channel to another."""
+  streams = {}
+
+  def output_stream(target):
+    key = target.primitive_transform_reference, target.name
+    if key not in streams:
+      streams[key] = sink.output_stream(instruction_id, target)
+    return streams[key]
+
+  try:
+    for data in source.input_elements(
+        instruction_id, targets, abort_callback=abort_callback):
+      stream = output_stream(data.target)
+      stream.write(data.data)
+      stream.maybe_flush()
+  except Exception:  # pylint: disable=broad-except
+    logging.exception('Failed to forward the data of %s', instruction_id)
+    return
+  if not abort_callback():
+    for target in targets:
+      output_stream(target).close()
+
+
+class _WorkerProcess(object):
+  """An SDK harness subprocess, and the control and data services for it."""
+
+  def __init__(self, command_line, worker_id, index):
+    self.worker_id = worker_id
+    # Options to have no limits (-1) on the size of the messages
+    # received or sent over the data plane.
+    no_max_message_sizes = [("grpc.max_receive_message_length", -1),
+                            ("grpc.max_send_message_length", -1)]
+    self._server = grpc.server(
+        futures.ThreadPoolExecutor(max_workers=4),
+        options=no_max_message_sizes)
+    self.address = 'localhost:%s' % self._server.add_insecure_port(
+        'localhost:0')
+    self.control_handler = _ControlServicer()
+    beam_fn_api_pb2_grpc.add_BeamFnControlServicer_to_server(
+        self.control_handler, self._server)
+    self.data_channel = data_plane.GrpcServerDataChannel()
+    beam_fn_api_pb2_grpc.add_BeamFnDataServicer_to_server(
+        self.data_channel, self._server)
+    self._server.start()
+    logging.info('Starting worker process %s', worker_id)
+    self._process = subprocess.Popen(
+        command_line,
+        env=dict(
+            os.environ,
+            CONTROL_API_SERVICE_DESCRIPTOR=text_format.MessageToString(
+                endpoints_pb2.ApiServiceDescriptor(url=self.address)),
+            WORKER_ID=worker_id,
+            WORKER_PROCESS_INDEX=str(index)))
+
+  def push(self, request):
+    """Sends an instruction, returning a future of its response."""
+    return self.control_handler.push(request)
+
+  def is_alive(self):
+    """Returns whether the process is running and connected."""
+    return self._process.poll() is None and not self.control_handler.finished
+
+  def rewrite_data_ports(self, request):
+    """Returns a register request using the data service of this process."""
+    request = copy.deepcopy(request)
+    for descriptor in request.register.process_bundle_descriptor:
+      for transform in descriptor.transforms.values():
+        if transform.spec.urn in (bundle_processor.DATA_INPUT_URN,
+                                  bundle_processor.DATA_OUTPUT_URN):
+          grpc_port = proto_utils.parse_Bytes(
+              transform.spec.payload, beam_fn_api_pb2.RemoteGrpcPort)
+          grpc_port.api_service_descriptor.url = self.address
+          transform.spec.payload = grpc_port.SerializeToString()
+    return request
+
+  def close(self, timeout_secs=60):
+    self.control_handler.done()
+    deadline = time.time() + timeout_secs
+    while self._process.poll() is None and time.time() < deadline:
+      time.sleep(0.1)
+    if self._process.poll() is None:
+      logging.warning('Killing worker process %s', self.worker_id)
+      self._process.kill()
+      self._process.wait()
+    self.data_channel.close()
+    self._server.stop(5).wait()
+
+
+class _ControlServicer(beam_fn_api_pb2_grpc.BeamFnControlServicer):
+  """Serves the instructions sent to a single worker process."""
+
+  _DONE = object()
+
+  def __init__(self):
+    self._requests = queue.Queue()
+    self._lock = threading.Lock()
+    self._futures_by_id = {}
+    self._finished = False
+
+  @property
+  def finished(self):
+    """Whether the stream of the worker process ended."""
+    return self._finished
+
+  def Control(self, response_iterator, context):
+    reader = threading.Thread(
+        target=self._read, args=(response_iterator,), name='read_control')
+    reader.daemon = True
+    reader.start()
+    while True:
+      request = self._requests.get()
+      if request is self._DONE:
+        return
+      yield request
+
+  def _read(self, response_iterator):
+    try:
+      for response in response_iterator:
+        with self._lock:
+          future = self._futures_by_id.pop(response.instruction_id, None)
+        if future is not None:
+          future.set(response)
+    except Exception:  # pylint: disable=broad-except
+      if not self._finished:
+        logging.exception('Failed to read the responses of a worker process')
+    finally:
+      with self._lock:
+        self._finished = True
+        pending, self._futures_by_id = self._futures_by_id, {}
+      for future in pending.values():
+        future.set_exception(RuntimeError('Worker process disconnected.'))
+
+  def push(self, request):
+    future = _Future()
+    with self._lock:
+      if self._finished:
+        future.set_exception(RuntimeError('Worker process disconnected.'))
+        return future
+      self._futures_by_id[request.instruction_id] = future
+    self._requests.put(request)
+    return future
+
+  def done(self):
+    self._requests.put(self._DONE)
+
+
 class SdkWorker(object):
 
   def __init__(self, state_handler_factory, data_channel_factory, fns,
@@ -380,26 +791,39 @@ class GrpcStateHandlerFactory(StateHandlerFactory):
 class ThrowingStateHandler(object):
   """A state handler that errors on any requests."""
 
-  def blocking_get(self, state_key, instruction_reference):
-    raise RuntimeError(
+  def _error(self, state_key):
+    return RuntimeError(
         'Unable to handle state requests for ProcessBundleDescriptor without '
-        'out state ApiServiceDescriptor for instruction %s and state key %s.'
-        % (state_key, instruction_reference))
+        'out state ApiServiceDescriptor for state key %s.' % state_key)
 
-  def blocking_append(self, state_key, data, instruction_reference):
-    raise RuntimeError(
-        'Unable to handle state requests for ProcessBundleDescriptor without '
-        'out state ApiServiceDescriptor for instruction %s and state key %s.'
-        % (state_key, instruction_reference))
+  def get_async(self, state_key, continuation_token=None):
+    raise self._error(state_key)
 
-  def blocking_clear(self, state_key, instruction_reference):
-    raise RuntimeError(
-        'Unable to handle state requests for ProcessBundleDescriptor without '
-        'out state ApiServiceDescriptor for instruction %s and state key %s.'
-        % (state_key, instruction_reference))
+  def append_async(self, state_key, data):
+    raise self._error(state_key)
+
+  def clear_async(self, state_key):
+    raise self._error(state_key)
+
+  def blocking_get(self, state_key, continuation_token=None):
+    raise self._error(state_key)
+
+  def blocking_append(self, state_key, data):
+    raise self._error(state_key)
+
+  def blocking_clear(self, state_key):
+    raise self._error(state_key)
 
 
 class GrpcStateHandler(object):
+  """A client of the State API of a runner.
+
+  Requests are sent on a single stream without waiting for the responses of
+  the previous ones, and the ``*_async`` methods return futures of their
+  responses. Since the runner handles the requests of the stream in order,
+  e.g. a get sent after an append reads the appended data, even though the
+  append was not awaited.
+  """
 
   _DONE = object()
 
@@ -439,12 +863,19 @@ class GrpcStateHandler(object):
     def pull_responses():
       try:
         for response in responses:
-          self._responses_by_id[response.id].set(response)
+          with self._lock:
+            future, extract = self._responses_by_id.pop(response.id)
+          if response.error:
+            future.set_exception(RuntimeError(response.error))
+          else:
+            future.set(extract(response))
           if self._done:
             break
       except:  # pylint: disable=bare-except
         self._exc_info = sys.exc_info()
         raise
+      finally:
+        self._fail_pending_requests()
 
     reader = threading.Thread(target=pull_responses, name='read_state')
     reader.daemon = True
@@ -453,44 +884,68 @@ class GrpcStateHandler(object):
   def done(self):
     self._done = True
     self._requests.put(self._DONE)
+    self._fail_pending_requests()
 
-  def blocking_get(self, state_key, continuation_token=None):
-    response = self._blocking_request(
+  def get_async(self, state_key, continuation_token=None):
+    """Requests a page of the data of a state.
+
+    Returns:
+      A future of the (data, continuation_token) tuple of the page.
+    """
+    return self._request_async(
         beam_fn_api_pb2.StateRequest(
             state_key=state_key,
             get=beam_fn_api_pb2.StateGetRequest(
-                continuation_token=continuation_token)))
-    return response.get.data, response.get.continuation_token
+                continuation_token=continuation_token)),
+        lambda response: (response.get.data, response.get.continuation_token))
 
-  def blocking_append(self, state_key, data):
-    self._blocking_request(
+  def append_async(self, state_key, data):
+    """Requests appending data to a state, and returns a future of None."""
+    return self._request_async(
         beam_fn_api_pb2.StateRequest(
             state_key=state_key,
             append=beam_fn_api_pb2.StateAppendRequest(data=data)))
 
-  def blocking_clear(self, state_key):
-    self._blocking_request(
+  def clear_async(self, state_key):
+    """Requests clearing a state, and returns a future of None."""
+    return self._request_async(
         beam_fn_api_pb2.StateRequest(
             state_key=state_key,
             clear=beam_fn_api_pb2.StateClearRequest()))
 
-  def _blocking_request(self, request):
-    request.id = self._next_id()
+  def blocking_get(self, state_key, continuation_token=None):
+    return self.get_async(state_key, continuation_token).get()
+
+  def blocking_append(self, state_key, data):
+    self.append_async(state_key, data).get()
+
+  def blocking_clear(self, state_key):
+    self.clear_async(state_key).get()
+
+  def _request_async(self, request, extract=lambda response: None):
     request.instruction_reference = self._context.process_instruction_id
-    self._responses_by_id[request.id] = future = _Future()
+    future = _Future()
+    with self._lock:
+      if self._done or self._exc_info:
+        future.set_exception(self._closed_error())
+        return future
+      request.id = self._next_id()
+      self._responses_by_id[request.id] = future, extract
     self._requests.put(request)
-    while not future.wait(timeout=1):
-      if self._exc_info:
-        t, v, tb = self._exc_info
-        raise_(t, v, tb)
-      elif self._done:
-        raise RuntimeError()
-    del self._responses_by_id[request.id]
-    response = future.get()
-    if response.error:
-      raise RuntimeError(response.error)
-    else:
-      return response
+    return future
+
+  def _closed_error(self):
+    if self._exc_info:
+      return RuntimeError(
+          'State stream failed: %s' % (self._exc_info[1],))
+    return RuntimeError('State stream closed.')
+
+  def _fail_pending_requests(self):
+    with self._lock:
+      pending = list(self._responses_by_id.values())
+      self._responses_by_id.clear()
+    for future, _ in pending:
+      future.set_exception(self._closed_error())
 
   def _next_id(self):
     self._last_id += 1
@@ -498,17 +953,28 @@ class GrpcStateHandler(object):
 
 
 class _Future(object):
-  """A simple future object to implement blocking requests.
+  """A simple future object to implement non-blocking requests.
   """
 
   def __init__(self):
     self._event = threading.Event()
+    self._exception = None
+
+  @classmethod
+  def completed(cls, value=None):
+    """Returns a future which already holds the given value."""
+    future = cls()
+    future.set(value)
+    return future
 
   def wait(self, timeout=None):
     return self._event.wait(timeout)
 
   def get(self, timeout=None):
     if self.wait(timeout):
+      exception = self._exception
+      if exception is not None:
+        raise exception  # pylint: disable=raising-bad-type
       return self._value
     else:
       raise LookupError()
@@ -516,3 +982,7 @@ class _Future(object):
   def set(self, value):
     self._value = value
     self._event.set()
+
+  def set_exception(self, exception):
+    self._exception = exception
+    self._event.set()
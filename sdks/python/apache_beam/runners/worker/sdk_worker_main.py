@@ -36,7 +36,9 @@ from apache_beam.options.pipeline_options import DebugOptions
 from apache_beam.options.pipeline_options import PipelineOptions
 from apache_beam.portability.api import endpoints_pb2
 from apache_beam.runners.internal import names
+from apache_beam.runners.worker import memory_accounting
 from apache_beam.runners.worker.log_handler import FnApiLogRecordHandler
+from apache_beam.runners.worker.sdk_worker import MultiProcessSdkHarness
 from apache_beam.runners.worker.sdk_worker import SdkHarness
 from apache_beam.utils import profiler
 
@@ -90,15 +92,23 @@ class StatusServer(object):
 
 def main(unused_argv):
   """Main entry point for SDK Fn Harness."""
+  if 'PIPELINE_OPTIONS' in os.environ:
+    sdk_pipeline_options = _parse_pipeline_options(
+        os.environ['PIPELINE_OPTIONS'])
+  else:
+    sdk_pipeline_options = PipelineOptions.from_dictionary({})
+
   if 'LOGGING_API_SERVICE_DESCRIPTOR' in os.environ:
     logging_service_descriptor = endpoints_pb2.ApiServiceDescriptor()
     text_format.Merge(os.environ['LOGGING_API_SERVICE_DESCRIPTOR'],
                       logging_service_descriptor)
 
     # Send all logs to the runner.
-    fn_log_handler = FnApiLogRecordHandler(logging_service_descriptor)
-    # TODO(BEAM-5468): This should be picked up from pipeline options.
-    logging.getLogger().setLevel(logging.INFO)
+    fn_log_handler = FnApiLogRecordHandler.factory_from_options(
+        sdk_pipeline_options.view_as(pipeline_options.SdkHarnessOptions))(
+            logging_service_descriptor)
+    # The handler filters the records by the levels of the options.
+    logging.getLogger().setLevel(fn_log_handler.level)
     logging.getLogger().addHandler(fn_log_handler)
     logging.info('Logging handler created.')
   else:
@@ -110,12 +120,6 @@ def main(unused_argv):
   thread.setName('status-server-demon')
   thread.start()
 
-  if 'PIPELINE_OPTIONS' in os.environ:
-    sdk_pipeline_options = _parse_pipeline_options(
-        os.environ['PIPELINE_OPTIONS'])
-  else:
-    sdk_pipeline_options = PipelineOptions.from_dictionary({})
-
   if 'SEMI_PERSISTENT_DIRECTORY' in os.environ:
     semi_persistent_directory = os.environ['SEMI_PERSISTENT_DIRECTORY']
   else:
@@ -130,6 +134,8 @@ def main(unused_argv):
     logging.error(
         'Could not load main session: %s', exception_details, exc_info=True)
 
+  sampling_profiler = None
+  memory_accountant = None
   try:
     logging.info('Python sdk harness started with pipeline_options: %s',
                  sdk_pipeline_options.get_all_options(drop_default=True))
@@ -138,17 +144,45 @@ def main(unused_argv):
                       service_descriptor)
     # TODO(robertwb): Support credentials.
     assert not service_descriptor.oauth2_client_credentials_grant.url
+    worker_processes = _get_worker_processes(sdk_pipeline_options)
+    if worker_processes > 1:
+      # The bundles are processed, and profiled, by the worker processes.
+      MultiProcessSdkHarness(
+          control_address=service_descriptor.url,
+          worker_processes=worker_processes,
+          worker_count=_get_worker_count(sdk_pipeline_options),
+          worker_id=os.environ.get('WORKER_ID')
+      ).run()
+      logging.info('Python sdk harness exiting.')
+      return
+    profiling_options = sdk_pipeline_options.view_as(
+        pipeline_options.ProfilingOptions)
+    sampling_profiler = profiler.SamplingProfiler.factory_from_options(
+        profiling_options)
+    if sampling_profiler:
+      if 'WORKER_PROCESS_INDEX' in os.environ:
+        sampling_profiler.profile_id += '-%s' % os.environ[
+            'WORKER_PROCESS_INDEX']
+      sampling_profiler.start()
+    memory_accountant = memory_accounting.MemoryAccountant.factory_from_options(
+        profiling_options)
+    if memory_accountant:
+      memory_accountant.start()
     SdkHarness(
         control_address=service_descriptor.url,
         worker_count=_get_worker_count(sdk_pipeline_options),
         profiler_factory=profiler.Profile.factory_from_options(
-            sdk_pipeline_options.view_as(pipeline_options.ProfilingOptions))
+            profiling_options)
     ).run()
     logging.info('Python sdk harness exiting.')
   except:  # pylint: disable=broad-except
     logging.exception('Python sdk harness failed: ')
     raise
   finally:
+    if sampling_profiler:
+      sampling_profiler.stop()
+    if memory_accountant:
+      memory_accountant.stop()
     if fn_log_handler:
       fn_log_handler.close()
 
@@ -197,6 +231,34 @@ def _get_worker_count(pipeline_options):
   return 12
 
 
+def _get_worker_processes(pipeline_options):
+  """Extract the number of worker processes from the pipeline_options.
+
+  With more than one worker process, this process dispatches the bundles to
+  that many SDK harness subprocesses, each running worker_threads SdkWorkers.
+  Name of the experimental parameter is 'worker_processes'
+  Example Usage in the Command Line:
+    --experiments worker_processes=4
+
+  The worker processes themselves, which have the WORKER_PROCESS_INDEX
+  environment variable set, always use a single process.
+
+  Returns:
+    an int containing the worker_processes to use. Default is 1
+  """
+  if 'WORKER_PROCESS_INDEX' in os.environ:
+    return 1
+
+  experiments = pipeline_options.view_as(DebugOptions).experiments or []
+
+  for experiment in experiments:
+    match = re.match(r'worker_processes=(?P<worker_processes>.*)', experiment)
+    if match:
+      return int(match.group('worker_processes'))
+
+  return 1
+
+
 def _load_main_session(semi_persistent_directory):
   """Loads a pickled main session from the path specified."""
   if semi_persistent_directory:
@@ -22,8 +22,11 @@ from __future__ import print_function
 
 import json
 import logging
+import os
 import unittest
 
+import mock
+
 from apache_beam.options.pipeline_options import PipelineOptions
 from apache_beam.runners.worker import sdk_worker_main
 
@@ -116,6 +119,17 @@ class SdkWorkerMainTest(unittest.TestCase):
     self._check_worker_count(
         '{"experiments":["worker_threads=1a"]}', exception=True)
 
+  def test_worker_processes(self):
+    options = PipelineOptions.from_dictionary(
+        {'experiments': ['worker_threads=2', 'worker_processes=4']})
+    self.assertEqual(4, sdk_worker_main._get_worker_processes(options))
+    self.assertEqual(
+        1, sdk_worker_main._get_worker_processes(
+            PipelineOptions.from_dictionary({})))
+    # The worker processes do not start processes of their own.
+    with mock.patch.dict(os.environ, {'WORKER_PROCESS_INDEX': '0'}):
+      self.assertEqual(1, sdk_worker_main._get_worker_processes(options))
+
   def _check_worker_count(self, pipeline_options, expected=0, exception=False):
     if exception:
       self.assertRaises(
@@ -21,15 +21,19 @@ from __future__ import division
 from __future__ import print_function
 
 import logging
+import threading
 import unittest
+from builtins import object
 from builtins import range
 from concurrent import futures
 
 import grpc
+import mock
 
 from apache_beam.portability.api import beam_fn_api_pb2
 from apache_beam.portability.api import beam_fn_api_pb2_grpc
 from apache_beam.portability.api import beam_runner_api_pb2
+from apache_beam.runners.portability import fn_api_runner
 from apache_beam.runners.worker import sdk_worker
 
 
@@ -111,6 +115,198 @@ class SdkWorkerTest(unittest.TestCase):
   def test_fn_registration(self):
     self._check_fn_registration_multi_request((1, 4, 1), (4, 4, 1), (4, 4, 2))
 
+  def test_worker_process_ids_derive_from_the_harness_id(self):
+    harness = sdk_worker.MultiProcessSdkHarness(
+        'localhost:0', worker_processes=2, worker_id='sdk')
+    self.assertEqual(
+        ['sdk-0', 'sdk-1'],
+        [harness._worker_process_id(index) for index in range(2)])
+
+
+class FakeWorkerProcess(object):
+  """Records the instructions sent to a worker process, without starting it.
+
+  If hold_bundles is set, process bundle instructions are only answered once
+  complete_bundles() is called.
+  """
+
+  def __init__(self, command_line, worker_id, index):
+    self.worker_id = worker_id
+    self.alive = True
+    self.hold_bundles = False
+    self.requests = []
+    self.bundle_started = threading.Event()
+    self._pending_bundles = []
+
+  def push(self, request):
+    self.requests.append(request)
+    future = sdk_worker._Future()
+    if request.WhichOneof('request') != 'process_bundle':
+      future.set(beam_fn_api_pb2.InstructionResponse(
+          instruction_id=request.instruction_id))
+    elif self.hold_bundles:
+      self._pending_bundles.append((request, future))
+      self.bundle_started.set()
+    else:
+      future.set(beam_fn_api_pb2.InstructionResponse(
+          instruction_id=request.instruction_id,
+          process_bundle=beam_fn_api_pb2.ProcessBundleResponse()))
+    return future
+
+  def complete_bundles(self):
+    while self._pending_bundles:
+      request, future = self._pending_bundles.pop()
+      future.set(beam_fn_api_pb2.InstructionResponse(
+          instruction_id=request.instruction_id,
+          process_bundle=beam_fn_api_pb2.ProcessBundleResponse()))
+
+  def rewrite_data_ports(self, request):
+    return request
+
+  def is_alive(self):
+    return self.alive
+
+  def close(self, timeout_secs=60):
+    self.alive = False
+
+
+class MultiProcessSdkHarnessTest(unittest.TestCase):
+
+  def setUp(self):
+    patcher = mock.patch.object(
+        sdk_worker, '_WorkerProcess', FakeWorkerProcess)
+    patcher.start()
+    self.addCleanup(patcher.stop)
+    self.harness = sdk_worker.MultiProcessSdkHarness(
+        'localhost:0', worker_processes=1, worker_count=1)
+    self.addCleanup(self.harness._control_thread_pool.shutdown)
+    self.addCleanup(self.harness._process_thread_pool.shutdown)
+    self.harness._start_workers()
+    self.harness._request_register(beam_fn_api_pb2.InstructionRequest(
+        instruction_id='register',
+        register=beam_fn_api_pb2.RegisterRequest(
+            process_bundle_descriptor=[
+                beam_fn_api_pb2.ProcessBundleDescriptor(id='descriptor')])))
+    self.assertFalse(self.harness._responses.get(timeout=10).error)
+
+  def process_bundle(self, instruction_id):
+    self.harness._request_process_bundle(beam_fn_api_pb2.InstructionRequest(
+        instruction_id=instruction_id,
+        process_bundle=beam_fn_api_pb2.ProcessBundleRequest(
+            process_bundle_descriptor_reference='descriptor')))
+
+  def test_exited_worker_process_is_replaced(self):
+    worker = self.harness.workers[0]
+    worker.alive = False
+    self.process_bundle('bundle')
+    response = self.harness._responses.get(timeout=10)
+    self.assertEqual('bundle', response.instruction_id)
+    self.assertFalse(response.error)
+    replacement = self.harness.workers[0]
+    self.assertIsNot(worker, replacement)
+    self.assertEqual(['register'],
+                     [request.instruction_id for request in worker.requests])
+    # The replacement is registered before it is given the bundle.
+    self.assertEqual(
+        ['register', 'bundle'],
+        [request.instruction_id for request in replacement.requests])
+
+  def test_progress_requests_with_all_bundle_threads_busy(self):
+    worker = self.harness.workers[0]
+    worker.hold_bundles = True
+    # More bundles than the threads of the harness, all waiting for the
+    # single worker process.
+    for i in range(4):
+      self.process_bundle('bundle%d' % i)
+    self.assertTrue(worker.bundle_started.wait(10))
+    self.harness._request_process_bundle_progress(
+        beam_fn_api_pb2.InstructionRequest(
+            instruction_id='progress',
+            process_bundle_progress=(
+                beam_fn_api_pb2.ProcessBundleProgressRequest(
+                    instruction_reference=(
+                        worker.requests[-1].instruction_id)))))
+    try:
+      response = self.harness._responses.get(timeout=10)
+      self.assertEqual('progress', response.instruction_id)
+      self.assertFalse(response.error)
+    finally:
+      worker.hold_bundles = False
+      worker.complete_bundles()
+    for _ in range(4):
+      self.assertFalse(self.harness._responses.get(timeout=10).error)
+
+
+class BatchingStateStub(object):
+  """A state stub only responding once it has received batch_size requests."""
+
+  def __init__(self, batch_size, error=None):
+    self._batch_size = batch_size
+    self._error = error
+    self._servicer = fn_api_runner.FnApiRunner.GrpcStateServicer(
+        fn_api_runner.FnApiRunner.StateServicer())
+
+  def State(self, request_iterator):
+    batch = []
+    for request in request_iterator:
+      batch.append(request)
+      if len(batch) == self._batch_size:
+        for response in self._servicer.State(iter(batch)):
+          if self._error:
+            response.error = self._error
+          yield response
+        batch = []
+
+
+class GrpcStateHandlerTest(unittest.TestCase):
+
+  def setUp(self):
+    self.state_key = beam_fn_api_pb2.StateKey(
+        bag_user_state=beam_fn_api_pb2.StateKey.BagUserState(
+            ptransform_id='transform', user_state_id='state', key=b'key'))
+
+  def test_requests_are_pipelined(self):
+    # None of the requests is answered before all of them were sent.
+    state_handler = sdk_worker.GrpcStateHandler(BatchingStateStub(4))
+    with state_handler.process_instruction_id('bundle'):
+      to_await = [state_handler.append_async(self.state_key, b'a'),
+                  state_handler.clear_async(self.state_key),
+                  state_handler.append_async(self.state_key, b'bc')]
+      page = state_handler.get_async(self.state_key)
+      self.assertEqual((b'bc', ''), page.get(timeout=10))
+      for future in to_await:
+        self.assertIsNone(future.get(timeout=10))
+    state_handler.done()
+
+  def test_blocking_requests(self):
+    state_handler = sdk_worker.GrpcStateHandler(BatchingStateStub(1))
+    with state_handler.process_instruction_id('bundle'):
+      state_handler.blocking_append(self.state_key, b'a')
+      state_handler.blocking_append(self.state_key, b'b')
+      self.assertEqual((b'ab', ''), state_handler.blocking_get(self.state_key))
+      state_handler.blocking_clear(self.state_key)
+      self.assertEqual((b'', ''), state_handler.blocking_get(self.state_key))
+    state_handler.done()
+
+  def test_errors_are_raised_by_futures(self):
+    state_handler = sdk_worker.GrpcStateHandler(
+        BatchingStateStub(1, error='no such state'))
+    with state_handler.process_instruction_id('bundle'):
+      future = state_handler.get_async(self.state_key)
+      with self.assertRaisesRegexp(RuntimeError, 'no such state'):
+        future.get(timeout=10)
+    state_handler.done()
+
+  def test_done_fails_pending_requests(self):
+    state_handler = sdk_worker.GrpcStateHandler(BatchingStateStub(2))
+    with state_handler.process_instruction_id('bundle'):
+      future = state_handler.get_async(self.state_key)
+      state_handler.done()
+      with self.assertRaisesRegexp(RuntimeError, 'closed'):
+        future.get(timeout=10)
+      with self.assertRaisesRegexp(RuntimeError, 'closed'):
+        state_handler.blocking_get(self.state_key)
+
 
 if __name__ == "__main__":
   logging.getLogger().setLevel(logging.INFO)
@@ -37,9 +37,17 @@ except ImportError:
 
 _STATE_SAMPLERS = threading.local()
 
+# The trackers of all threads, by thread ident, so that they can be looked up
+# from other threads, e.g. by a sampling profiler.
+_TRACKERS_BY_THREAD = {}
+
 
 def set_current_tracker(tracker):
   _STATE_SAMPLERS.tracker = tracker
+  if tracker is None:
+    _TRACKERS_BY_THREAD.pop(threading.current_thread().ident, None)
+  else:
+    _TRACKERS_BY_THREAD[threading.current_thread().ident] = tracker
 
 
 def get_current_tracker():
@@ -49,6 +57,11 @@ def get_current_tracker():
     return None
 
 
+def get_tracker_of_thread(thread_ident):
+  """Returns the current tracker of the given thread, or None."""
+  return _TRACKERS_BY_THREAD.get(thread_ident)
+
+
 def for_test():
   set_current_tracker(StateSampler('test', CounterFactory()))
   return get_current_tracker()
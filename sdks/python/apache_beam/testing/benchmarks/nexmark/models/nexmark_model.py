@@ -27,8 +27,36 @@ generate events:
 
 """
 
+from __future__ import absolute_import
 
-class Person(object):
+import functools
+
+
+@functools.total_ordering
+class Model(object):
+  """Base of the models, which are equal if all their fields are.
+
+  Models are ordered by type and then by their fields, so that lists of
+  models sort the same way in every run.
+  """
+
+  def _sort_key(self):
+    return type(self).__name__, sorted(self.__dict__.items())
+
+  def __eq__(self, other):
+    return type(self) == type(other) and self.__dict__ == other.__dict__
+
+  def __lt__(self, other):
+    return self._sort_key() < other._sort_key()
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash((type(self), tuple(sorted(self.__dict__.items()))))
+
+
+class Person(Model):
   "Author of an auction or a bid."
 
   def __init__(self, id, name, email, credit_card,
@@ -47,7 +75,7 @@ class Person(object):
                                              'email': self.email})
 
 
-class Auction(object):
+class Auction(Model):
   "Item for auction."
 
   def __init__(self, id, item_name, description, initial_bid, reserve_price,
@@ -68,7 +96,7 @@ class Auction(object):
                                                   'item_name': self.item_name})
 
 
-class Bid(object):
+class Bid(Model):
   "A bid for an item for auction."
 
   def __init__(self, auction, bidder, price, timestamp, extra=None):
@@ -0,0 +1,341 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark event generator.
+
+Generates the people, auctions and bids of the Nexmark suite without any
+external service, following the model of the generator of the Java suite.
+
+Each event is generated from its number alone: its kind is given by the
+event mix, its timestamp by the event rates, and its contents by a random
+generator seeded with its number. Any range of events can thus be generated
+independently of the others, which makes the generator a splittable bounded
+source.
+
+Usage:
+
+  events = p | ReadNexmarkEvents(GeneratorConfig(num_events=100000))
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+
+import random
+import string
+from builtins import object
+from builtins import range
+
+import apache_beam as beam
+from apache_beam.io import iobase
+from apache_beam.io import range_trackers
+from apache_beam.testing.benchmarks.nexmark.models import nexmark_model
+from apache_beam.transforms import window
+
+FIRST_PERSON_ID = 1000
+FIRST_AUCTION_ID = 1000
+FIRST_CATEGORY_ID = 10
+NUM_CATEGORIES = 5
+
+# Bids and auctions may refer to people and auctions created by the next few
+# events, as happens when events are delivered out of order.
+PERSON_ID_LEAD = 10
+AUCTION_ID_LEAD = 10
+
+# Hot people and auctions are the ones whose id is a multiple of this.
+HOT_ID_SPACING = 100
+
+US_STATES = ['AZ', 'CA', 'ID', 'OR', 'WA', 'WY']
+US_CITIES = ['Phoenix', 'Los Angeles', 'San Francisco', 'Boise', 'Portland',
+             'Bend', 'Redmond', 'Seattle', 'Kent', 'Cheyenne']
+FIRST_NAMES = ['Peter', 'Paul', 'Luke', 'John', 'Saul', 'Vicky', 'Kate',
+               'Julie', 'Sarah', 'Deiter', 'Walter']
+LAST_NAMES = ['Shultz', 'Abrams', 'Spencer', 'White', 'Bartels', 'Walton',
+              'Smith', 'Jones', 'Noris']
+
+
+class GeneratorConfig(object):
+  """The configuration of the generated events.
+
+  Args:
+    num_events: the number of events generated.
+    first_event_rate: the number of events per second of event time.
+    next_event_rate: the rate the events alternate to every rate_period_sec,
+      if different from first_event_rate.
+    rate_period_sec: the seconds of event time spent at each rate.
+    person_proportion: the number of people in every consecutive
+      person_proportion + auction_proportion + bid_proportion events.
+    auction_proportion: the number of auctions in the same events.
+    bid_proportion: the number of bids in the same events.
+    hot_auction_ratio: bids go to a hot auction with a probability of
+      1 - 1 / hot_auction_ratio, so 1 disables the skew of auctions.
+    hot_seller_ratio: the same for the sellers of auctions.
+    hot_bidder_ratio: the same for the bidders.
+    num_active_people: the number of recent people who create auctions and
+      bid.
+    num_in_flight_auctions: the number of recent auctions which get bids.
+    avg_person_byte_size: the average size of people, padded with extra data.
+    avg_auction_byte_size: the average size of auctions.
+    avg_bid_byte_size: the average size of bids.
+    base_time_ms: the timestamp of the first event, in milliseconds.
+    seed: the seed of the random generation, combined with event numbers.
+  """
+
+  def __init__(self, num_events=100000, first_event_rate=10000,
+               next_event_rate=None, rate_period_sec=600,
+               person_proportion=1, auction_proportion=3, bid_proportion=46,
+               hot_auction_ratio=2, hot_seller_ratio=4, hot_bidder_ratio=4,
+               num_active_people=1000, num_in_flight_auctions=100,
+               avg_person_byte_size=200, avg_auction_byte_size=500,
+               avg_bid_byte_size=100, base_time_ms=1500000000000, seed=0):
+    if first_event_rate <= 0 or (next_event_rate or 1) <= 0:
+      raise ValueError('Event rates must be positive.')
+    if min(person_proportion, auction_proportion, bid_proportion) < 1:
+      raise ValueError('Every kind of event must have a proportion of at '
+                       'least 1.')
+    self.num_events = num_events
+    self.first_event_rate = first_event_rate
+    self.next_event_rate = next_event_rate or first_event_rate
+    self.rate_period_sec = rate_period_sec
+    self.person_proportion = person_proportion
+    self.auction_proportion = auction_proportion
+    self.bid_proportion = bid_proportion
+    self.hot_auction_ratio = hot_auction_ratio
+    self.hot_seller_ratio = hot_seller_ratio
+    self.hot_bidder_ratio = hot_bidder_ratio
+    self.num_active_people = num_active_people
+    self.num_in_flight_auctions = num_in_flight_auctions
+    self.avg_person_byte_size = avg_person_byte_size
+    self.avg_auction_byte_size = avg_auction_byte_size
+    self.avg_bid_byte_size = avg_bid_byte_size
+    self.base_time_ms = base_time_ms
+    self.seed = seed
+
+  @property
+  def total_proportion(self):
+    return (self.person_proportion + self.auction_proportion
+            + self.bid_proportion)
+
+  @property
+  def avg_event_byte_size(self):
+    return ((self.person_proportion * self.avg_person_byte_size
+             + self.auction_proportion * self.avg_auction_byte_size
+             + self.bid_proportion * self.avg_bid_byte_size)
+            // self.total_proportion)
+
+  def __repr__(self):
+    return 'GeneratorConfig(%s)' % ', '.join(
+        '%s=%r' % item for item in sorted(self.__dict__.items()))
+
+
+class NexmarkGenerator(object):
+  """Generates the events of a GeneratorConfig from their numbers."""
+
+  def __init__(self, config):
+    self.config = config
+
+  def event_timestamp_ms(self, event_number):
+    """Returns the timestamp of an event, in milliseconds."""
+    config = self.config
+    if config.next_event_rate == config.first_event_rate:
+      return (config.base_time_ms
+              + event_number * 1000 // config.first_event_rate)
+    # The rate alternates, every period, between the first and next rates.
+    first_events = config.first_event_rate * config.rate_period_sec
+    next_events = config.next_event_rate * config.rate_period_sec
+    cycles, offset = divmod(event_number, first_events + next_events)
+    timestamp_ms = config.base_time_ms + cycles * 2000 * config.rate_period_sec
+    if offset < first_events:
+      return timestamp_ms + offset * 1000 // config.first_event_rate
+    return (timestamp_ms + 1000 * config.rate_period_sec
+            + (offset - first_events) * 1000 // config.next_event_rate)
+
+  def event(self, event_number):
+    """Returns the Person, Auction or Bid with the given number."""
+    config = self.config
+    rnd = random.Random(event_number * 7919 + config.seed)
+    timestamp_ms = self.event_timestamp_ms(event_number)
+    offset = event_number % config.total_proportion
+    if offset < config.person_proportion:
+      return self._person(rnd, event_number, timestamp_ms)
+    elif offset < config.person_proportion + config.auction_proportion:
+      return self._auction(rnd, event_number, timestamp_ms)
+    else:
+      return self._bid(rnd, event_number, timestamp_ms)
+
+  def _last_base0_person_id(self, event_number):
+    config = self.config
+    epoch, offset = divmod(event_number, config.total_proportion)
+    offset = min(offset, config.person_proportion - 1)
+    return epoch * config.person_proportion + offset
+
+  def _last_base0_auction_id(self, event_number):
+    config = self.config
+    epoch, offset = divmod(event_number, config.total_proportion)
+    if offset < config.person_proportion:
+      # No auction was created yet in this epoch.
+      epoch -= 1
+      offset = config.auction_proportion - 1
+    else:
+      offset = min(offset - config.person_proportion,
+                   config.auction_proportion - 1)
+    return max(epoch * config.auction_proportion + offset, 0)
+
+  def _next_base0_person_id(self, rnd, event_number):
+    num_people = self._last_base0_person_id(event_number) + 1
+    num_active = min(num_people, self.config.num_active_people)
+    return num_people - num_active + rnd.randrange(num_active + PERSON_ID_LEAD)
+
+  def _next_base0_auction_id(self, rnd, event_number):
+    max_auction = self._last_base0_auction_id(event_number)
+    min_auction = max(max_auction - self.config.num_in_flight_auctions, 0)
+    return min_auction + rnd.randrange(
+        max_auction - min_auction + 1 + AUCTION_ID_LEAD)
+
+  def _hot_or_next_person_id(self, rnd, event_number, hot_ratio):
+    if rnd.randrange(hot_ratio) > 0:
+      base0_id = (self._last_base0_person_id(event_number)
+                  // HOT_ID_SPACING * HOT_ID_SPACING)
+    else:
+      base0_id = self._next_base0_person_id(rnd, event_number)
+    return FIRST_PERSON_ID + base0_id
+
+  def _auction_length_ms(self, rnd, event_number, timestamp_ms):
+    # Auctions last long enough for about num_in_flight_auctions of them to
+    # be open at any time.
+    config = self.config
+    events_for_auctions = (config.num_in_flight_auctions
+                           * config.total_proportion
+                           // config.auction_proportion)
+    horizon_ms = (self.event_timestamp_ms(event_number + events_for_auctions)
+                  - timestamp_ms)
+    return 1 + rnd.randrange(max(horizon_ms * 2, 1))
+
+  @staticmethod
+  def _price(rnd):
+    return int(round(10 ** (rnd.random() * 6) * 100))
+
+  @staticmethod
+  def _string(rnd, max_length):
+    return ''.join(rnd.choice(string.ascii_lowercase)
+                   for _ in range(1 + rnd.randrange(max_length)))
+
+  @staticmethod
+  def _extra(rnd, current_size, avg_size):
+    # Pads events to an average size, within 20% of it.
+    if current_size >= avg_size:
+      return ''
+    desired_size = avg_size - current_size
+    delta = int(round(desired_size * 0.2))
+    return 'x' * (desired_size - delta + rnd.randrange(2 * delta + 1))
+
+  def _person(self, rnd, event_number, timestamp_ms):
+    person_id = FIRST_PERSON_ID + self._last_base0_person_id(event_number)
+    name = '%s %s' % (rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES))
+    email = '%s@%s.com' % (self._string(rnd, 7), self._string(rnd, 5))
+    credit_card = ' '.join('%04d' % rnd.randrange(10000) for _ in range(4))
+    city = rnd.choice(US_CITIES)
+    state = rnd.choice(US_STATES)
+    current_size = 8 + len(name) + len(email) + len(credit_card) + len(
+        city) + len(state) + 8
+    return nexmark_model.Person(
+        person_id, name, email, credit_card, city, state, timestamp_ms,
+        self._extra(rnd, current_size, self.config.avg_person_byte_size))
+
+  def _auction(self, rnd, event_number, timestamp_ms):
+    auction_id = FIRST_AUCTION_ID + self._last_base0_auction_id(event_number)
+    seller = self._hot_or_next_person_id(
+        rnd, event_number, self.config.hot_seller_ratio)
+    category = FIRST_CATEGORY_ID + rnd.randrange(NUM_CATEGORIES)
+    initial_bid = self._price(rnd)
+    reserve_price = initial_bid + self._price(rnd)
+    expires = timestamp_ms + self._auction_length_ms(
+        rnd, event_number, timestamp_ms)
+    item_name = self._string(rnd, 20)
+    description = self._string(rnd, 100)
+    current_size = 8 + len(item_name) + len(description) + 8 + 8 + 8 + 8 + 8
+    return nexmark_model.Auction(
+        auction_id, item_name, description, initial_bid, reserve_price,
+        timestamp_ms, expires, seller, category,
+        self._extra(rnd, current_size, self.config.avg_auction_byte_size))
+
+  def _bid(self, rnd, event_number, timestamp_ms):
+    if rnd.randrange(self.config.hot_auction_ratio) > 0:
+      base0_auction = (self._last_base0_auction_id(event_number)
+                       // HOT_ID_SPACING * HOT_ID_SPACING)
+    else:
+      base0_auction = self._next_base0_auction_id(rnd, event_number)
+    bidder = self._hot_or_next_person_id(
+        rnd, event_number, self.config.hot_bidder_ratio)
+    price = self._price(rnd)
+    return nexmark_model.Bid(
+        FIRST_AUCTION_ID + base0_auction, bidder, price, timestamp_ms,
+        self._extra(rnd, 8 + 8 + 8 + 8, self.config.avg_bid_byte_size))
+
+
+class NexmarkSource(iobase.BoundedSource):
+  """A bounded source of the events of a GeneratorConfig.
+
+  The positions of the source are event numbers, so it is split into ranges
+  of events, and supports dynamic splitting.
+  """
+
+  def __init__(self, config):
+    self._config = config
+    self._generator = NexmarkGenerator(config)
+
+  def estimate_size(self):
+    return self._config.num_events * self._config.avg_event_byte_size
+
+  def split(self, desired_bundle_size, start_position=None,
+            stop_position=None):
+    if start_position is None:
+      start_position = 0
+    if stop_position is None:
+      stop_position = self._config.num_events
+    bundle_size_in_events = max(
+        1, desired_bundle_size // max(self._config.avg_event_byte_size, 1))
+    for start in range(start_position, stop_position, bundle_size_in_events):
+      stop = min(start + bundle_size_in_events, stop_position)
+      yield iobase.SourceBundle(stop - start, self, start, stop)
+
+  def get_range_tracker(self, start_position, stop_position):
+    if start_position is None:
+      start_position = 0
+    if stop_position is None:
+      stop_position = self._config.num_events
+    return range_trackers.OffsetRangeTracker(start_position, stop_position)
+
+  def read(self, range_tracker):
+    event_number = range_tracker.start_position()
+    while range_tracker.try_claim(event_number):
+      yield self._generator.event(event_number)
+      event_number += 1
+
+
+class ReadNexmarkEvents(beam.PTransform):
+  """Reads the events of a GeneratorConfig, timestamped by their creation."""
+
+  def __init__(self, config, label=None):
+    super(ReadNexmarkEvents, self).__init__(label)
+    self._config = config
+
+  def expand(self, pbegin):
+    return (pbegin
+            | 'ReadEvents' >> beam.io.Read(NexmarkSource(self._config))
+            | 'AssignEventTimestamps' >> beam.Map(
+                lambda event: window.TimestampedValue(
+                    event, event.timestamp / 1000)))
@@ -0,0 +1,102 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Unit tests for the Nexmark event generator."""
+
+from __future__ import absolute_import
+
+import unittest
+
+from apache_beam.io import source_test_utils
+from apache_beam.testing.benchmarks.nexmark import nexmark_generator
+from apache_beam.testing.benchmarks.nexmark.models import nexmark_model
+
+
+class NexmarkGeneratorTest(unittest.TestCase):
+
+  def test_events_are_generated_deterministically(self):
+    config = nexmark_generator.GeneratorConfig(num_events=100)
+    first = nexmark_generator.NexmarkGenerator(config)
+    second = nexmark_generator.NexmarkGenerator(config)
+    for event_number in (0, 1, 17, 99):
+      self.assertEqual(first.event(event_number).__dict__,
+                       second.event(event_number).__dict__)
+
+  def test_event_mix_and_ids(self):
+    config = nexmark_generator.GeneratorConfig(
+        num_events=100, person_proportion=1, auction_proportion=3,
+        bid_proportion=6)
+    generator = nexmark_generator.NexmarkGenerator(config)
+    events = [generator.event(n) for n in range(100)]
+    people = [e for e in events if isinstance(e, nexmark_model.Person)]
+    auctions = [e for e in events if isinstance(e, nexmark_model.Auction)]
+    bids = [e for e in events if isinstance(e, nexmark_model.Bid)]
+    self.assertEqual((10, 30, 60), (len(people), len(auctions), len(bids)))
+    self.assertEqual(
+        list(range(nexmark_generator.FIRST_PERSON_ID,
+                   nexmark_generator.FIRST_PERSON_ID + 10)),
+        [person.id for person in people])
+    self.assertEqual(
+        list(range(nexmark_generator.FIRST_AUCTION_ID,
+                   nexmark_generator.FIRST_AUCTION_ID + 30)),
+        [auction.id for auction in auctions])
+    for auction in auctions:
+      self.assertLess(auction.timestamp, auction.expires)
+      self.assertLessEqual(auction.initial_bid, auction.reserve_price)
+
+  def test_event_timestamps_follow_rates(self):
+    config = nexmark_generator.GeneratorConfig(
+        first_event_rate=100, next_event_rate=10, rate_period_sec=1,
+        base_time_ms=0)
+    generator = nexmark_generator.NexmarkGenerator(config)
+    self.assertEqual(10, generator.event_timestamp_ms(1))
+    # The first 100 events take a second, the next 10 events another one.
+    self.assertEqual(1000, generator.event_timestamp_ms(100))
+    self.assertEqual(1100, generator.event_timestamp_ms(101))
+    self.assertEqual(2000, generator.event_timestamp_ms(110))
+
+  def test_hot_auctions_get_most_bids(self):
+    def bids_on_top_auction(hot_auction_ratio):
+      config = nexmark_generator.GeneratorConfig(
+          hot_auction_ratio=hot_auction_ratio)
+      generator = nexmark_generator.NexmarkGenerator(config)
+      counts = {}
+      for n in range(5000):
+        event = generator.event(n)
+        if isinstance(event, nexmark_model.Bid):
+          counts[event.auction] = counts.get(event.auction, 0) + 1
+      return max(counts.values())
+
+    self.assertGreater(bids_on_top_auction(4), 5 * bids_on_top_auction(1))
+
+  def test_source_splits(self):
+    config = nexmark_generator.GeneratorConfig(num_events=200)
+    source = nexmark_generator.NexmarkSource(config)
+    splits = list(source.split(desired_bundle_size=50 * 100))
+    self.assertGreater(len(splits), 1)
+    self.assertEqual(
+        source_test_utils.read_from_source(source),
+        sum([source_test_utils.read_from_source(
+            split.source, split.start_position, split.stop_position)
+             for split in splits], []))
+    source_test_utils.assert_split_at_fraction_exhaustive(
+        nexmark_generator.NexmarkSource(
+            nexmark_generator.GeneratorConfig(num_events=20)))
+
+
+if __name__ == '__main__':
+  unittest.main()
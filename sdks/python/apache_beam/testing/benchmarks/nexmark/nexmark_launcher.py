@@ -21,6 +21,11 @@ The Nexmark suite is a series of queries (streaming pipelines) performed
 on a simulation of auction events. The launcher orchestrates the generation
 and parsing of streaming events and the running of queries.
 
+The events are either generated by the pipeline itself, which needs no
+external service, or read from a file and published to Pub/Sub when --input
+is given. The launcher measures each query it runs, and appends the
+measurements to a JSON file when --export_summary_to_json is given.
+
 Model
   - Person: Author of an auction or a bid.
   - Auction: Item under auction.
@@ -33,11 +38,40 @@ Events
 
 Queries
   - Query0: Pass through (send and receive auction events).
+  - Query1: Convert bid prices from dollars to euros.
+  - Query2: Select auctions by auction id.
+  - Query3: Local item suggestion.
+  - Query4: Average price for a category.
+  - Query5: Hot items.
+  - Query6: Average selling price by seller.
+  - Query7: Highest bid.
+  - Query8: Monitor new users.
+  - Query9: Winning bids.
+  - Query10: Log to sharded files.
+  - Query11: User sessions.
+  - Query12: Processing time windows.
+
+Measurements
+  - runtime_sec: the wall time of the pipeline, from its run to its end.
+  - events_per_sec, results_per_sec: the events read and results produced
+    per second of runtime.
+  - first_result_latency_sec: the wall time from the reading of the first
+    event to the production of the first result.
+  - last_result_latency_sec: the wall time from the reading of the last
+    event to the production of the last result.
 
 Usage
+  - Generated events
+      python nexmark_launcher.py \
+          --query/q <query number> \
+          --num_events <number of events> \
+          --runner <DirectRunner, or the full name of the FnApiRunner> \
+          --export_summary_to_json <path of the JSON file> (optional)
+
   - DirectRunner
       python nexmark_launcher.py \
           --query/q <query number> \
+          --input <path of the file of events> \
           --project <project id> \
           --loglevel=DEBUG (optional) \
           --wait_until_finish_duration <time_in_ms> \
@@ -57,31 +91,93 @@ Usage
 """
 
 from __future__ import absolute_import
+from __future__ import division
 from __future__ import print_function
 
 import argparse
+import json
 import logging
+import os
 import sys
+import tempfile
+import time
 import uuid
 
-from google.cloud import pubsub
-
 import apache_beam as beam
+from apache_beam.metrics.metric import MetricsFilter
 from apache_beam.options.pipeline_options import GoogleCloudOptions
 from apache_beam.options.pipeline_options import PipelineOptions
 from apache_beam.options.pipeline_options import SetupOptions
 from apache_beam.options.pipeline_options import StandardOptions
 from apache_beam.options.pipeline_options import TestOptions
+from apache_beam.testing.benchmarks.nexmark import nexmark_generator
 from apache_beam.testing.benchmarks.nexmark.nexmark_util import Command
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import MonitorFn
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import ParseEventFn
 from apache_beam.testing.benchmarks.nexmark.queries import query0
 from apache_beam.testing.benchmarks.nexmark.queries import query1
 from apache_beam.testing.benchmarks.nexmark.queries import query2
+from apache_beam.testing.benchmarks.nexmark.queries import query3
+from apache_beam.testing.benchmarks.nexmark.queries import query4
+from apache_beam.testing.benchmarks.nexmark.queries import query5
+from apache_beam.testing.benchmarks.nexmark.queries import query6
+from apache_beam.testing.benchmarks.nexmark.queries import query7
+from apache_beam.testing.benchmarks.nexmark.queries import query8
+from apache_beam.testing.benchmarks.nexmark.queries import query9
+from apache_beam.testing.benchmarks.nexmark.queries import query10
+from apache_beam.testing.benchmarks.nexmark.queries import query11
+from apache_beam.testing.benchmarks.nexmark.queries import query12
+
+try:
+  from google.cloud import pubsub
+except ImportError:
+  pubsub = None
+
+QUERIES = {
+    0: query0,
+    1: query1,
+    2: query2,
+    3: query3,
+    4: query4,
+    5: query5,
+    6: query6,
+    7: query7,
+    8: query8,
+    9: query9,
+    10: query10,
+    11: query11,
+    12: query12,
+}
+
+# The options of the generated events, with their defaults.
+GENERATOR_OPTIONS = [
+    ('num_events', int, 100000),
+    ('first_event_rate', int, 10000),
+    ('next_event_rate', int, None),
+    ('rate_period_sec', int, 600),
+    ('person_proportion', int, 1),
+    ('auction_proportion', int, 3),
+    ('bid_proportion', int, 46),
+    ('hot_auction_ratio', int, 2),
+    ('hot_seller_ratio', int, 4),
+    ('hot_bidder_ratio', int, 4),
+    ('seed', int, 0),
+]
+
+EVENTS_NAMESPACE = 'nexmark.events'
+RESULTS_NAMESPACE = 'nexmark.results'
 
 
 class NexmarkLauncher(object):
   def __init__(self):
     self.parse_args()
     self.uuid = str(uuid.uuid4())
+    if not self.args.input:
+      return
+    if pubsub is None:
+      raise ImportError(
+          'Reading events from --input requires Google Cloud Pub/Sub, '
+          'please install apache_beam[gcp]')
     self.topic_name = self.args.topic_name + self.uuid
     self.subscription_name = self.args.subscription_name + self.uuid
     publish_client = pubsub.Client(project=self.project)
@@ -105,7 +201,7 @@ class NexmarkLauncher(object):
                         type=int,
                         action='append',
                         required=True,
-                        choices=[0, 1, 2],
+                        choices=sorted(QUERIES),
                         help='Query to run')
 
     parser.add_argument('--subscription_name',
@@ -123,8 +219,24 @@ class NexmarkLauncher(object):
                         help='Set logging level to debug')
     parser.add_argument('--input',
                         type=str,
-                        required=True,
-                        help='Path to the data file containing nexmark events.')
+                        help='Path to the data file containing nexmark events. '
+                        'The events are generated by the pipeline if unset.')
+
+    for name, option_type, default in GENERATOR_OPTIONS:
+      parser.add_argument('--' + name,
+                          type=option_type,
+                          default=default,
+                          help='The %s of the generated events.' % name)
+
+    parser.add_argument('--output_path',
+                        type=str,
+                        help='Directory Query10 writes to, a temporary '
+                        'directory if unset.')
+
+    parser.add_argument('--export_summary_to_json',
+                        type=str,
+                        help='Path of a JSON file the measurements of the '
+                        'queries are appended to.')
 
     self.args, self.pipeline_args = parser.parse_known_args()
     logging.basicConfig(level=getattr(logging, self.args.loglevel, None),
@@ -133,6 +245,10 @@ class NexmarkLauncher(object):
     self.pipeline_options = PipelineOptions(self.pipeline_args)
     logging.debug('args, pipeline_args: %s, %s', self.args, self.pipeline_args)
 
+    # The generated events need no external service.
+    if not self.args.input:
+      return
+
     # Usage with Dataflow requires a project to be supplied.
     self.project = self.pipeline_options.view_as(GoogleCloudOptions).project
     if self.project is None:
@@ -160,7 +276,16 @@ class NexmarkLauncher(object):
     # workflow rely on global context (e.g., a module imported at module level).
     self.pipeline_options.view_as(SetupOptions).save_main_session = True
 
+  def generator_config(self):
+    return nexmark_generator.GeneratorConfig(**dict(
+        (name, getattr(self.args, name))
+        for name, _, _ in GENERATOR_OPTIONS))
+
   def generate_events(self):
+    if not self.args.input:
+      return self.pipeline | 'GenerateEvents' >> (
+          nexmark_generator.ReadNexmarkEvents(self.generator_config()))
+
     publish_client = pubsub.Client(project=self.project)
     topic = publish_client.topic(self.topic_name)
     sub = topic.subscription(self.subscription_name)
@@ -188,14 +313,17 @@ class NexmarkLauncher(object):
       raw_events = self.pipeline | 'ReadPubSub' >> beam.io.ReadFromPubSub(
           topic=topic.full_name)
 
-    return raw_events
+    return raw_events | 'ParseEventFn' >> beam.ParDo(ParseEventFn())
 
-  def run_query(self, query, query_args, query_errors):
+  def run_query(self, query_num, query_args, query_errors):
     try:
       self.parse_args()
       self.pipeline = beam.Pipeline(options=self.pipeline_options)
-      raw_events = self.generate_events()
-      query.load(raw_events, query_args)
+      events = (self.generate_events()
+                | 'MonitorEvents' >> beam.ParDo(MonitorFn(EVENTS_NAMESPACE)))
+      _ = (QUERIES[query_num].load(events, query_args)
+           | 'MonitorResults' >> beam.ParDo(MonitorFn(RESULTS_NAMESPACE)))
+      start = time.time()
       result = self.pipeline.run()
       job_duration = (
           self.pipeline_options.view_as(TestOptions).wait_until_finish_duration
@@ -205,11 +333,57 @@ class NexmarkLauncher(object):
         result.cancel()
       else:
         result.wait_until_finish()
+      self.report(query_num, result, time.time() - start)
     except Exception as exc:
-      query_errors.append(str(exc))
+      if query_errors is not None:
+        query_errors.append(str(exc))
       raise
 
+  def report(self, query_num, result, runtime_sec):
+    """Logs the measurements of a query, and exports them if requested."""
+    metrics = result.metrics().query(
+        MetricsFilter().with_namespaces([EVENTS_NAMESPACE, RESULTS_NAMESPACE]))
+    counters = dict((metric.key.metric.namespace, metric.committed)
+                    for metric in metrics['counters'])
+    wall_times_ms = dict((metric.key.metric.namespace, metric.committed)
+                         for metric in metrics['distributions'])
+    num_events = counters.get(EVENTS_NAMESPACE, 0)
+    num_results = counters.get(RESULTS_NAMESPACE, 0)
+    summary = {
+        'query': query_num,
+        'runner': self.pipeline_options.view_as(
+            StandardOptions).runner or 'DirectRunner',
+        'timestamp': time.time(),
+        'generator': None if self.args.input else (
+            self.generator_config().__dict__),
+        'runtime_sec': runtime_sec,
+        'events': num_events,
+        'results': num_results,
+        'events_per_sec': num_events / runtime_sec,
+        'results_per_sec': num_results / runtime_sec,
+    }
+    if num_events and num_results:
+      events_ms = wall_times_ms[EVENTS_NAMESPACE]
+      results_ms = wall_times_ms[RESULTS_NAMESPACE]
+      summary['first_result_latency_sec'] = (
+          results_ms.min - events_ms.min) / 1000
+      summary['last_result_latency_sec'] = (
+          results_ms.max - events_ms.max) / 1000
+    logging.info('Query %d: %s', query_num, summary)
+
+    if self.args.export_summary_to_json:
+      summaries = []
+      if os.path.exists(self.args.export_summary_to_json):
+        with open(self.args.export_summary_to_json) as f:
+          summaries = json.load(f)
+      summaries.append(summary)
+      with open(self.args.export_summary_to_json, 'w') as f:
+        json.dump(summaries, f, indent=2, sort_keys=True)
+    return summary
+
   def cleanup(self):
+    if not self.args.input:
+      return
     publish_client = pubsub.Client(project=self.project)
     topic = publish_client.topic(self.topic_name)
     if topic.exists():
@@ -219,18 +393,15 @@ class NexmarkLauncher(object):
       sub.delete()
 
   def run(self):
-    queries = {
-        0: query0,
-        1: query1,
-        2: query2,
-        # TODO(mariagh): Add more queries.
-    }
-
     # TODO(mariagh): Move to a config file.
     query_args = {
         2: {
-            'auction_id': 'a1003'
-        }
+            'auction_id': 'a1003' if self.args.input else (
+                nexmark_generator.FIRST_AUCTION_ID + 3)
+        },
+        10: {
+            'output_path': self.args.output_path or tempfile.mkdtemp()
+        },
     }
 
     query_errors = []
@@ -240,20 +411,21 @@ class NexmarkLauncher(object):
 
       # The DirectRunner is the default runner, and it needs
       # special handling to cancel streaming jobs.
-      launch_from_direct_runner = self.pipeline_options.view_as(
-          StandardOptions).runner in [None, 'DirectRunner']
+      launch_from_direct_runner = self.args.input and (
+          self.pipeline_options.view_as(StandardOptions).runner in [
+              None, 'DirectRunner'])
 
       query_duration = self.pipeline_options.view_as(TestOptions).wait_until_finish_duration # pylint: disable=line-too-long
       if launch_from_direct_runner:
-        command = Command(self.run_query, args=[queries[i],
+        command = Command(self.run_query, args=[i,
                                                 query_args.get(i),
                                                 query_errors])
         command.run(timeout=query_duration // 1000)
       else:
         try:
-          self.run_query(queries[i], query_args.get(i), query_errors=None)
+          self.run_query(i, query_args.get(i), query_errors=None)
         except Exception as exc:
-          query_errors.append(exc)
+          query_errors.append(str(exc))
 
     if query_errors:
       logging.error('Query failed with %s', ', '.join(query_errors))
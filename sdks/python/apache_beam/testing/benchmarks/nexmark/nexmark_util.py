@@ -23,6 +23,9 @@ on a simulation of auction events. This util includes:
   - A Command class used to terminate the streaming jobs
     launched in nexmark_launcher.py by the DirectRunner.
   - A ParseEventFn DoFn to parse events received from PubSub.
+  - Predicates selecting the people, auctions or bids of the events.
+  - A MaxValuesFn CombineFn selecting the elements with the highest value.
+  - A MonitorFn DoFn measuring the elements flowing through a pipeline.
 
 Usage:
 
@@ -37,8 +40,10 @@ from __future__ import print_function
 
 import logging
 import threading
+import time
 
 import apache_beam as beam
+from apache_beam.metrics import Metrics
 from apache_beam.testing.benchmarks.nexmark.models import nexmark_model
 
 
@@ -98,6 +103,62 @@ class ParseEventFn(beam.DoFn):
     yield event
 
 
+def is_person(event):
+  return isinstance(event, nexmark_model.Person)
+
+
+def is_auction(event):
+  return isinstance(event, nexmark_model.Auction)
+
+
+def is_bid(event):
+  return isinstance(event, nexmark_model.Bid)
+
+
+class MaxValuesFn(beam.CombineFn):
+  """Combines (element, value) pairs into the pairs with the highest value."""
+
+  def create_accumulator(self):
+    return None, []
+
+  def add_input(self, accumulator, element_value):
+    return self.merge_accumulators(
+        [accumulator, (element_value[1], [element_value])])
+
+  def merge_accumulators(self, accumulators):
+    max_value, max_pairs = None, []
+    for value, pairs in accumulators:
+      if value is None:
+        continue
+      if max_value is None or value > max_value:
+        max_value, max_pairs = value, list(pairs)
+      elif value == max_value:
+        max_pairs.extend(pairs)
+    return max_value, max_pairs
+
+  def extract_output(self, accumulator):
+    return accumulator[1]
+
+
+class MonitorFn(beam.DoFn):
+  """Passes elements through, measuring their number and wall time.
+
+  The elements are counted by the counter 'elements' of the metrics
+  namespace, and the wall time at which they went through, in milliseconds,
+  is recorded by the distribution 'wall_time_ms', whose minimum and maximum
+  give the times at which the first and last element went through.
+  """
+
+  def __init__(self, namespace):
+    self.elements = Metrics.counter(namespace, 'elements')
+    self.wall_time_ms = Metrics.distribution(namespace, 'wall_time_ms')
+
+  def process(self, elem):
+    self.elements.inc()
+    self.wall_time_ms.update(int(time.time() * 1000))
+    yield elem
+
+
 def display(elm):
   logging.debug(elm)
   return elm
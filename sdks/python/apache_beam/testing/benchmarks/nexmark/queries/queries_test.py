@@ -0,0 +1,131 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Unit tests for the Nexmark queries."""
+
+from __future__ import absolute_import
+
+import importlib
+import shutil
+import tempfile
+import unittest
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark import nexmark_generator
+from apache_beam.testing.benchmarks.nexmark.models.nexmark_model import Auction
+from apache_beam.testing.benchmarks.nexmark.models.nexmark_model import Bid
+from apache_beam.testing.benchmarks.nexmark.models.nexmark_model import Person
+from apache_beam.testing.benchmarks.nexmark.queries import query3
+from apache_beam.testing.benchmarks.nexmark.queries import query5
+from apache_beam.testing.benchmarks.nexmark.queries import query7
+from apache_beam.testing.benchmarks.nexmark.queries import query9
+from apache_beam.testing.benchmarks.nexmark.queries import query11
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that
+from apache_beam.testing.util import equal_to
+from apache_beam.transforms import window
+
+
+def person(person_id, state='OR', timestamp=0):
+  return Person(person_id, 'name%d' % person_id, 'email', 'card', 'city',
+                state, timestamp)
+
+
+def auction(auction_id, seller, category=10, reserve_price=100, timestamp=0,
+            expires=10000):
+  return Auction(auction_id, 'item', 'description', 10, reserve_price,
+                 timestamp, expires, seller, category)
+
+
+def bid(auction_id, bidder, price, timestamp):
+  return Bid(auction_id, bidder, price, timestamp)
+
+
+class QueriesTest(unittest.TestCase):
+
+  def run_query(self, query, events, expected, query_args=None):
+    with TestPipeline() as p:
+      result = query.load(
+          p
+          | beam.Create(events)
+          | beam.Map(lambda event: window.TimestampedValue(
+              event, event.timestamp / 1000)),
+          query_args)
+      assert_that(result, equal_to(expected))
+
+  def test_models_are_ordered_by_fields(self):
+    bids = [bid(1, 4, 20, 0), bid(2, 2, 30, 0), bid(2, 3, 30, 0)]
+    self.assertEqual(bids, sorted(reversed(bids)))
+    self.assertLess(auction(2, 1), bid(1, 1, 10, 0))
+
+  def test_query3_joins_local_sellers_to_auctions(self):
+    self.run_query(
+        query3,
+        [person(1), person(2, state='WA'), auction(10, 1),
+         auction(11, 1, category=11), auction(12, 2)],
+        [{'name': 'name1', 'city': 'city', 'state': 'OR', 'id': 10}])
+
+  def test_query5_selects_most_bid_on_auctions(self):
+    self.run_query(
+        query5,
+        [bid(1, 1, 10, 1000), bid(1, 2, 10, 2000), bid(2, 1, 10, 3000)],
+        [{'auction': 1, 'num': 2}] * 2,
+        {'window_size_sec': 10, 'window_period_sec': 5})
+
+  def test_query7_selects_highest_bids(self):
+    self.run_query(
+        query7,
+        [bid(1, 1, 10, 1000), bid(2, 2, 30, 2000), bid(3, 3, 30, 3000),
+         bid(1, 4, 20, 11000)],
+        [bid(2, 2, 30, 2000), bid(3, 3, 30, 3000), bid(1, 4, 20, 11000)],
+        {'window_size_sec': 10})
+
+  def test_query9_selects_winning_bids(self):
+    self.run_query(
+        query9,
+        [auction(1, 1), auction(2, 1), auction(3, 1),
+         # Below the reserve price, or after the expiry of the auction.
+         bid(1, 2, 50, 1000), bid(1, 2, 500, 20000),
+         # The earliest of the highest bids wins.
+         bid(2, 2, 200, 2000), bid(2, 3, 300, 3000), bid(2, 4, 300, 4000)],
+        [(auction(2, 1), bid(2, 3, 300, 3000))])
+
+  def test_query11_counts_bids_per_session(self):
+    self.run_query(
+        query11,
+        [bid(1, 1, 10, 1000), bid(1, 1, 10, 5000), bid(1, 1, 10, 30000),
+         bid(1, 2, 10, 1000)],
+        [{'bidder': 1, 'bids': 2}, {'bidder': 1, 'bids': 1},
+         {'bidder': 2, 'bids': 1}],
+        {'session_gap_sec': 10})
+
+  def test_queries_run_on_generated_events(self):
+    output_path = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, output_path)
+    query_args = {2: {'auction_id': nexmark_generator.FIRST_AUCTION_ID},
+                  10: {'output_path': output_path}}
+    for query_num in range(13):
+      query = importlib.import_module(
+          'apache_beam.testing.benchmarks.nexmark.queries.query%d' % query_num)
+      with TestPipeline() as p:
+        events = p | nexmark_generator.ReadNexmarkEvents(
+            nexmark_generator.GeneratorConfig(num_events=500))
+        query.load(events, query_args.get(query_num))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -27,15 +27,13 @@ from __future__ import absolute_import
 
 import apache_beam as beam
 from apache_beam.testing.benchmarks.nexmark.models import nexmark_model
-from apache_beam.testing.benchmarks.nexmark.nexmark_util import ParseEventFn
 from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_bid
 
 
-def load(raw_events, query_args=None):
-  return (raw_events
-          | 'ParseEventFn' >> beam.ParDo(ParseEventFn())
-          | 'FilterInBids' >> beam.Filter(
-              lambda event: isinstance(event, nexmark_model.Bid))
+def load(events, query_args=None):
+  return (events
+          | 'FilterInBids' >> beam.Filter(is_bid)
           | 'ConvertToEuro' >> beam.Map(
               lambda bid: nexmark_model.Bid(
                   bid.auction,
@@ -0,0 +1,78 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark Query 10: Log to sharded files.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+This query writes all the events to files under output_path, a file per
+fixed window of window_size_sec seconds and shard, out of num_shards, and
+returns the names of the files.
+It illustrates a windowed write to a file system.
+"""
+
+from __future__ import absolute_import
+
+import json
+import random
+
+import apache_beam as beam
+from apache_beam.io.filesystems import FileSystems
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.transforms import window
+from apache_beam.utils.timestamp import Timestamp
+
+
+class WriteShardFn(beam.DoFn):
+  """Writes the events of a shard and window to a file, one JSON per line."""
+
+  def __init__(self, output_path):
+    self.output_path = output_path
+
+  def process(self, shard_and_events, shard_window=beam.DoFn.WindowParam):
+    shard, events = shard_and_events
+    file_name = FileSystems.join(
+        self.output_path, 'events-%s-%s-shard-%d.json' % (
+            Timestamp.of(shard_window.start).to_rfc3339(),
+            Timestamp.of(shard_window.end).to_rfc3339(), shard))
+    output = FileSystems.create(file_name)
+    try:
+      for event in events:
+        output.write(json.dumps(
+            dict(event.__dict__, kind=type(event).__name__)).encode('utf-8'))
+        output.write(b'\n')
+    finally:
+      output.close()
+    yield file_name
+
+
+def load(events, query_args=None):
+  query_args = query_args or {}
+  if not query_args.get('output_path'):
+    raise ValueError('Query 10 requires an output_path.')
+  num_shards = query_args.get('num_shards', 10)
+  return (events
+          | 'FixedWindows' >> beam.WindowInto(
+              window.FixedWindows(query_args.get('window_size_sec', 10)))
+          | 'KeyByShard' >> beam.Map(
+              lambda event: (random.randrange(num_shards), event))
+          | 'GroupByShard' >> beam.GroupByKey()
+          | 'WriteShards' >> beam.ParDo(
+              WriteShardFn(query_args['output_path']))
+          | 'DisplayQuery10' >> beam.Map(display)
+         )  # pylint: disable=expression-not-assigned
@@ -0,0 +1,48 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark Query 11: User sessions.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+This query counts the bids of each bidder per session, a session ending
+after session_gap_sec seconds without bids.
+It illustrates merging windows.
+"""
+
+from __future__ import absolute_import
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_bid
+from apache_beam.transforms import window
+
+
+def load(events, query_args=None):
+  query_args = query_args or {}
+  return (events
+          | 'FilterInBids' >> beam.Filter(is_bid)
+          | 'KeyByBidder' >> beam.Map(lambda bid: (bid.bidder, 1))
+          | 'Sessions' >> beam.WindowInto(
+              window.Sessions(query_args.get('session_gap_sec', 10)))
+          | 'CountBidsPerSession' >> beam.CombinePerKey(sum)
+          | 'ToBidsPerSession' >> beam.Map(
+              lambda bidder_bids: {'bidder': bidder_bids[0],
+                                   'bids': bidder_bids[1]})
+          | 'DisplayQuery11' >> beam.Map(display)
+         )  # pylint: disable=expression-not-assigned
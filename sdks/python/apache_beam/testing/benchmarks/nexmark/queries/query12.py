@@ -0,0 +1,53 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark Query 12: Processing time windows.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+This query counts the bids of each bidder in windows of window_size_sec
+seconds of processing time, rather than of event time.
+It illustrates processing time windows. They are assigned as bids are
+processed, rather than by processing time triggers in the global window,
+which the batch runners do not fire.
+"""
+
+from __future__ import absolute_import
+
+import time
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_bid
+
+
+def load(events, query_args=None):
+  window_size_sec = (query_args or {}).get('window_size_sec', 10)
+  return (events
+          | 'FilterInBids' >> beam.Filter(is_bid)
+          | 'KeyByBidderAndWindow' >> beam.Map(
+              lambda bid: ((bid.bidder, int(time.time() // window_size_sec)),
+                           1))
+          | 'CountBidsPerWindow' >> beam.CombinePerKey(sum)
+          | 'ToBidsPerWindow' >> beam.Map(
+              lambda key_bids: {
+                  'bidder': key_bids[0][0],
+                  'window_start': key_bids[0][1] * window_size_sec,
+                  'bids': key_bids[1]})
+          | 'DisplayQuery12' >> beam.Map(display)
+         )  # pylint: disable=expression-not-assigned
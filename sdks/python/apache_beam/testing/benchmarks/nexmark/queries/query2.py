@@ -27,16 +27,14 @@ It illustrates a simple filter.
 from __future__ import absolute_import
 
 import apache_beam as beam
-from apache_beam.testing.benchmarks.nexmark.models import nexmark_model
-from apache_beam.testing.benchmarks.nexmark.nexmark_util import ParseEventFn
 from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_auction
 
 
-def load(raw_events, metadata=None):
-  return (raw_events
-          | 'ParseEventFn' >> beam.ParDo(ParseEventFn())
+def load(events, metadata=None):
+  return (events
           | 'FilterInAuctionsWithSelectedId' >> beam.Filter(
-              lambda event: (isinstance(event, nexmark_model.Auction)
+              lambda event: (is_auction(event)
                              and event.id == metadata.get('auction_id')))
           | 'DisplayQuery2' >> beam.Map(display)
          )  # pylint: disable=expression-not-assigned
@@ -0,0 +1,63 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark Query 3: Local item suggestion.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+This query selects the people in Oregon, Idaho or California who sell items
+in category 10, with the ids of these auctions.
+It illustrates a join of two filtered collections.
+"""
+
+from __future__ import absolute_import
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_auction
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_person
+
+STATES = ('OR', 'ID', 'CA')
+CATEGORY = 10
+
+
+def _join_sellers_to_auctions(seller_id_and_events):
+  _, events = seller_id_and_events
+  for person in events['persons']:
+    for auction in events['auctions']:
+      yield {'name': person.name, 'city': person.city,
+             'state': person.state, 'id': auction.id}
+
+
+def load(events, query_args=None):
+  auctions_by_seller = (
+      events
+      | 'FilterInAuctionsInCategory' >> beam.Filter(
+          lambda event: is_auction(event) and event.category == CATEGORY)
+      | 'KeyAuctionsBySeller' >> beam.Map(
+          lambda auction: (auction.seller, auction)))
+  persons_by_id = (
+      events
+      | 'FilterInPersonsInStates' >> beam.Filter(
+          lambda event: is_person(event) and event.state in STATES)
+      | 'KeyPersonsById' >> beam.Map(lambda person: (person.id, person)))
+  return ({'auctions': auctions_by_seller, 'persons': persons_by_id}
+          | 'JoinPersonsToAuctions' >> beam.CoGroupByKey()
+          | 'SelectSellers' >> beam.FlatMap(_join_sellers_to_auctions)
+          | 'DisplayQuery3' >> beam.Map(display)
+         )  # pylint: disable=expression-not-assigned
@@ -0,0 +1,52 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark Query 4: Average price for a category.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+This query computes the average winning price of the closed auctions of
+each category, in sliding windows of window_size_sec seconds, every
+window_period_sec seconds.
+It illustrates a join, followed by a windowed aggregation.
+"""
+
+from __future__ import absolute_import
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.queries.winning_bids import WinningBids
+from apache_beam.transforms import window
+
+
+def load(events, query_args=None):
+  query_args = query_args or {}
+  return (events
+          | 'WinningBids' >> WinningBids()
+          | 'KeyPriceByCategory' >> beam.Map(
+              lambda auction_bid: (auction_bid[0].category,
+                                   auction_bid[1].price))
+          | 'SlidingWindows' >> beam.WindowInto(window.SlidingWindows(
+              query_args.get('window_size_sec', 10),
+              query_args.get('window_period_sec', 5)))
+          | 'AveragePricePerCategory' >> beam.combiners.Mean.PerKey()
+          | 'ToCategoryPrice' >> beam.Map(
+              lambda category_price: {'category': category_price[0],
+                                      'price': category_price[1]})
+          | 'DisplayQuery4' >> beam.Map(display)
+         )  # pylint: disable=expression-not-assigned
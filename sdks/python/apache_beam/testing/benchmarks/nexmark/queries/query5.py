@@ -0,0 +1,52 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark Query 5: Hot items.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+This query selects the auctions with the most bids in sliding windows of
+window_size_sec seconds, every window_period_sec seconds.
+It illustrates a windowed top-N, with N = 1 and ties kept.
+"""
+
+from __future__ import absolute_import
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import MaxValuesFn
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_bid
+from apache_beam.transforms import window
+
+
+def load(events, query_args=None):
+  query_args = query_args or {}
+  return (events
+          | 'FilterInBids' >> beam.Filter(is_bid)
+          | 'SlidingWindows' >> beam.WindowInto(window.SlidingWindows(
+              query_args.get('window_size_sec', 10),
+              query_args.get('window_period_sec', 5)))
+          | 'BidAuctions' >> beam.Map(lambda bid: bid.auction)
+          | 'CountBidsPerAuction' >> beam.combiners.Count.PerElement()
+          | 'SelectMostBidOn' >> beam.CombineGlobally(
+              MaxValuesFn()).without_defaults()
+          | 'ToAuctionCounts' >> beam.FlatMap(
+              lambda auction_counts: [{'auction': auction, 'num': count}
+                                      for auction, count in auction_counts])
+          | 'DisplayQuery5' >> beam.Map(display)
+         )  # pylint: disable=expression-not-assigned
@@ -0,0 +1,54 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark Query 6: Average selling price by seller.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+This query computes the average winning price of the last
+num_last_auctions closed auctions of each seller.
+It illustrates a join, followed by an aggregation over the latest values of
+each key.
+"""
+
+from __future__ import absolute_import
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.queries.winning_bids import WinningBids
+
+
+def _average_of_last_prices(seller_and_bids, num_last_auctions):
+  seller, bids = seller_and_bids
+  last_bids = sorted(bids, key=lambda bid: bid.timestamp)[-num_last_auctions:]
+  return {'seller': seller,
+          'price': sum(bid.price for bid in last_bids) / len(last_bids)}
+
+
+def load(events, query_args=None):
+  query_args = query_args or {}
+  return (events
+          | 'WinningBids' >> WinningBids()
+          | 'KeyBidsBySeller' >> beam.Map(
+              lambda auction_bid: (auction_bid[0].seller, auction_bid[1]))
+          | 'GroupBySeller' >> beam.GroupByKey()
+          | 'AveragePricePerSeller' >> beam.Map(
+              _average_of_last_prices,
+              query_args.get('num_last_auctions', 10))
+          | 'DisplayQuery6' >> beam.Map(display)
+         )  # pylint: disable=expression-not-assigned
@@ -0,0 +1,49 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark Query 7: Highest bid.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+This query selects the bids with the highest price in fixed windows of
+window_size_sec seconds.
+It illustrates a windowed global aggregation.
+"""
+
+from __future__ import absolute_import
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import MaxValuesFn
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_bid
+from apache_beam.transforms import window
+
+
+def load(events, query_args=None):
+  query_args = query_args or {}
+  return (events
+          | 'FilterInBids' >> beam.Filter(is_bid)
+          | 'FixedWindows' >> beam.WindowInto(
+              window.FixedWindows(query_args.get('window_size_sec', 10)))
+          | 'KeyByPrice' >> beam.Map(lambda bid: (bid, bid.price))
+          | 'SelectHighestBids' >> beam.CombineGlobally(
+              MaxValuesFn()).without_defaults()
+          | 'ToBids' >> beam.FlatMap(
+              lambda bid_prices: [bid for bid, _ in bid_prices])
+          | 'DisplayQuery7' >> beam.Map(display)
+         )  # pylint: disable=expression-not-assigned
@@ -0,0 +1,61 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Nexmark Query 8: Monitor new users.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+This query selects the people who created auctions in the same fixed window
+of window_size_sec seconds as they were created.
+It illustrates a windowed join.
+"""
+
+from __future__ import absolute_import
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import display
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_auction
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_person
+from apache_beam.transforms import window
+
+
+def _join_new_persons_to_auctions(person_id_and_events):
+  _, events = person_id_and_events
+  for person in events['persons']:
+    for auction in events['auctions']:
+      yield {'id': person.id, 'name': person.name,
+             'reserve': auction.reserve_price}
+
+
+def load(events, query_args=None):
+  query_args = query_args or {}
+  windowed_events = events | 'FixedWindows' >> beam.WindowInto(
+      window.FixedWindows(query_args.get('window_size_sec', 10)))
+  persons_by_id = (windowed_events
+                   | 'FilterInPersons' >> beam.Filter(is_person)
+                   | 'KeyPersonsById' >> beam.Map(
+                       lambda person: (person.id, person)))
+  auctions_by_seller = (windowed_events
+                        | 'FilterInAuctions' >> beam.Filter(is_auction)
+                        | 'KeyAuctionsBySeller' >> beam.Map(
+                            lambda auction: (auction.seller, auction)))
+  return ({'persons': persons_by_id, 'auctions': auctions_by_seller}
+          | 'JoinPersonsToAuctions' >> beam.CoGroupByKey()
+          | 'SelectNewSellers' >> beam.FlatMap(_join_new_persons_to_auctions)
+          | 'DisplayQuery8' >> beam.Map(display)
+         )  # pylint: disable=expression-not-assigned
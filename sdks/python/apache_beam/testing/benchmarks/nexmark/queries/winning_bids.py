@@ -0,0 +1,76 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""The winning bids of the closed auctions of the Nexmark suite.
+
+The Nexmark suite is a series of queries (streaming pipelines) performed
+on a simulation of auction events.
+
+A bid is valid if it was made while its auction was open, at or above the
+reserve price. The winning bid of an auction is its highest valid bid, the
+earliest one in case of a tie. Auctions without any valid bid are dropped.
+
+Auctions and bids are joined in the global window, so the winning bids are
+all known once the bounded events have been read. They are timestamped by
+the expiry of their auctions, as if emitted when the auctions closed.
+"""
+
+from __future__ import absolute_import
+
+import apache_beam as beam
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_auction
+from apache_beam.testing.benchmarks.nexmark.nexmark_util import is_bid
+from apache_beam.transforms import window
+
+
+def _is_valid_bid(auction, bid):
+  return (auction.timestamp <= bid.timestamp < auction.expires
+          and bid.price >= auction.reserve_price)
+
+
+def _winning_bid(auction_id_and_events):
+  _, events = auction_id_and_events
+  for auction in events['auctions']:
+    best_bid = None
+    for bid in events['bids']:
+      if _is_valid_bid(auction, bid) and (
+          best_bid is None or bid.price > best_bid.price
+          or (bid.price == best_bid.price
+              and bid.timestamp < best_bid.timestamp)):
+        best_bid = bid
+    if best_bid is not None:
+      yield window.TimestampedValue(
+          (auction, best_bid), auction.expires / 1000)
+
+
+class WinningBids(beam.PTransform):
+  """Returns the (auction, winning bid) pairs of the closed auctions."""
+
+  def expand(self, events):
+    events = events | 'GlobalWindow' >> beam.WindowInto(
+        window.GlobalWindows())
+    auctions_by_id = (events
+                      | 'FilterInAuctions' >> beam.Filter(is_auction)
+                      | 'KeyAuctionsById' >> beam.Map(
+                          lambda auction: (auction.id, auction)))
+    bids_by_auction = (events
+                       | 'FilterInBids' >> beam.Filter(is_bid)
+                       | 'KeyBidsByAuction' >> beam.Map(
+                           lambda bid: (bid.auction, bid)))
+    return ({'auctions': auctions_by_id, 'bids': bids_by_auction}
+            | 'JoinBidsToAuctions' >> beam.CoGroupByKey()
+            | 'SelectWinningBids' >> beam.FlatMap(_winning_bid))
@@ -23,6 +23,12 @@ it is required to specify project of runner),
 * metrics_namespace (optional) - name of BigQuery table where metrics
 will be stored,
 in case of lack of any of both options metrics won't be saved
+* metrics_json_path (optional) - path of a JSON file to which the metrics
+are appended,
+* metrics_csv_path (optional) - path of a CSV file to which the metrics
+are appended,
+* publish_to_console (optional) - 'true' to print the metrics,
+these local sinks can be used with any runner, e.g. to compare runners offline,
 * input_options - options for Synthetic Sources
 * co_input_options - options for  Synthetic Sources.
 
@@ -88,21 +94,15 @@ import unittest
 
 import apache_beam as beam
 from apache_beam.testing import synthetic_pipeline
+from apache_beam.testing.load_tests.load_test_metrics_utils import MeasureTime
+from apache_beam.testing.load_tests.load_test_metrics_utils import MetricsMonitor
 from apache_beam.testing.test_pipeline import TestPipeline
 
-try:
-  from apache_beam.testing.load_tests.load_test_metrics_utils import MeasureTime
-  from apache_beam.testing.load_tests.load_test_metrics_utils import MetricsMonitor
-  from google.cloud import bigquery as bq
-except ImportError:
-  bq = None
-
 INPUT_TAG = 'pc1'
 CO_INPUT_TAG = 'pc2'
 RUNTIME_LABEL = 'runtime'
 
 
-@unittest.skipIf(bq is None, 'BigQuery for storing metrics not installed')
 class CoGroupByKeyTest(unittest.TestCase):
 
   def parseTestPipelineOptions(self, options):
@@ -127,25 +127,14 @@ class CoGroupByKeyTest(unittest.TestCase):
     self.co_input_options = json.loads(
         self.pipeline.get_option('co_input_options'))
 
-    metrics_project_id = self.pipeline.get_option('project')
     self.metrics_namespace = self.pipeline.get_option('metrics_table')
-    metrics_dataset = self.pipeline.get_option('metrics_dataset')
-    self.metrics_monitor = None
-    check = metrics_project_id and self.metrics_namespace and metrics_dataset\
-            is not None
-    if check:
-      measured_values = [{'name': RUNTIME_LABEL,
-                          'type': 'FLOAT',
-                          'mode': 'REQUIRED'}]
-      self.metrics_monitor = MetricsMonitor(
-          project_name=metrics_project_id,
-          table=self.metrics_namespace,
-          dataset=metrics_dataset,
-          schema_map=measured_values
-      )
-    else:
-      logging.error('One or more of parameters for collecting metrics '
-                    'are empty. Metrics will not be collected')
+    if not self.metrics_namespace:
+      self.metrics_namespace = self.__class__.__name__
+    measured_values = [{'name': RUNTIME_LABEL,
+                        'type': 'FLOAT',
+                        'mode': 'REQUIRED'}]
+    self.metrics_monitor = MetricsMonitor.from_test_pipeline(
+        self.pipeline, self.metrics_namespace, measured_values)
 
   class _Ungroup(beam.DoFn):
     def process(self, element):
@@ -158,36 +147,36 @@ class CoGroupByKeyTest(unittest.TestCase):
         yield i
 
   def testCoGroupByKey(self):
-    with self.pipeline as p:
-      pc1 = (p
-             | 'Read ' + INPUT_TAG >> beam.io.Read(
-                 synthetic_pipeline.SyntheticSource(
-                     self.parseTestPipelineOptions(self.input_options)))
-             | 'Make ' + INPUT_TAG + ' iterable' >> beam.Map(lambda x: (x, x))
-             | 'Measure time: Start pc1' >> beam.ParDo(
-                 MeasureTime(self.metrics_namespace))
-            )
-
-      pc2 = (p
-             | 'Read ' + CO_INPUT_TAG >> beam.io.Read(
-                 synthetic_pipeline.SyntheticSource(
-                     self.parseTestPipelineOptions(self.co_input_options)))
-             | 'Make ' + CO_INPUT_TAG + ' iterable' >> beam.Map(
-                 lambda x: (x, x))
-             | 'Measure time: Start pc2' >> beam.ParDo(
-                 MeasureTime(self.metrics_namespace))
-            )
-      # pylint: disable=expression-not-assigned
-      ({INPUT_TAG: pc1, CO_INPUT_TAG: pc2}
-       | 'CoGroupByKey: ' >> beam.CoGroupByKey()
-       | 'Consume Joined Collections' >> beam.ParDo(self._Ungroup())
-       | 'Measure time: End' >> beam.ParDo(MeasureTime(self.metrics_namespace))
-      )
-
-      result = p.run()
-      result.wait_until_finish()
-      if self.metrics_monitor is not None:
-        self.metrics_monitor.send_metrics(result)
+    p = self.pipeline
+    pc1 = (p
+           | 'Read ' + INPUT_TAG >> beam.io.Read(
+               synthetic_pipeline.SyntheticSource(
+                   self.parseTestPipelineOptions(self.input_options)))
+           | 'Make ' + INPUT_TAG + ' iterable' >> beam.Map(lambda x: (x, x))
+           | 'Measure time: Start pc1' >> beam.ParDo(
+               MeasureTime(self.metrics_namespace))
+          )
+
+    pc2 = (p
+           | 'Read ' + CO_INPUT_TAG >> beam.io.Read(
+               synthetic_pipeline.SyntheticSource(
+                   self.parseTestPipelineOptions(self.co_input_options)))
+           | 'Make ' + CO_INPUT_TAG + ' iterable' >> beam.Map(
+               lambda x: (x, x))
+           | 'Measure time: Start pc2' >> beam.ParDo(
+               MeasureTime(self.metrics_namespace))
+          )
+    # pylint: disable=expression-not-assigned
+    ({INPUT_TAG: pc1, CO_INPUT_TAG: pc2}
+     | 'CoGroupByKey: ' >> beam.CoGroupByKey()
+     | 'Consume Joined Collections' >> beam.ParDo(self._Ungroup())
+     | 'Measure time: End' >> beam.ParDo(MeasureTime(self.metrics_namespace))
+    )
+
+    result = p.run()
+    result.wait_until_finish()
+    if self.metrics_monitor is not None:
+      self.metrics_monitor.send_metrics(result)
 
 
 if __name__ == '__main__':
@@ -23,6 +23,12 @@ it is required to specify project of runner),
 * metrics_namespace (optional) - name of BigQuery table where metrics
 will be stored,
 in case of lack of any of both options metrics won't be saved
+* metrics_json_path (optional) - path of a JSON file to which the metrics
+are appended,
+* metrics_csv_path (optional) - path of a CSV file to which the metrics
+are appended,
+* publish_to_console (optional) - 'true' to print the metrics,
+these local sinks can be used with any runner, e.g. to compare runners offline,
 * input_options - options for Synthetic Sources.
 
 Example test run on DirectRunner:
@@ -73,19 +79,13 @@ import unittest
 
 import apache_beam as beam
 from apache_beam.testing import synthetic_pipeline
+from apache_beam.testing.load_tests.load_test_metrics_utils import MeasureTime
+from apache_beam.testing.load_tests.load_test_metrics_utils import MetricsMonitor
 from apache_beam.testing.test_pipeline import TestPipeline
 
-try:
-  from apache_beam.testing.load_tests.load_test_metrics_utils import MeasureTime
-  from apache_beam.testing.load_tests.load_test_metrics_utils import MetricsMonitor
-  from google.cloud import bigquery as bq
-except ImportError:
-  bq = None
-
 RUNTIME_LABEL = 'runtime'
 
 
-@unittest.skipIf(bq is None, 'BigQuery for storing metrics not installed')
 class CombineTest(unittest.TestCase):
   def parseTestPipelineOptions(self):
     return {
@@ -107,46 +107,35 @@ class CombineTest(unittest.TestCase):
     self.pipeline = TestPipeline(is_integration_test=True)
     self.input_options = json.loads(self.pipeline.get_option('input_options'))
 
-    metrics_project_id = self.pipeline.get_option('project')
     self.metrics_namespace = self.pipeline.get_option('metrics_table')
-    metrics_dataset = self.pipeline.get_option('metrics_dataset')
-    self.metrics_monitor = None
-    check = metrics_project_id and self.metrics_namespace and metrics_dataset \
-            is not None
-    if check:
-      schema = [{'name': RUNTIME_LABEL, 'type': 'FLOAT', 'mode': 'REQUIRED'}]
-      self.metrics_monitor = MetricsMonitor(
-          project_name=metrics_project_id,
-          table=self.metrics_namespace,
-          dataset=metrics_dataset,
-          schema_map=schema
-      )
-    else:
-      logging.error('One or more of parameters for collecting metrics '
-                    'are empty. Metrics will not be collected')
+    if not self.metrics_namespace:
+      self.metrics_namespace = self.__class__.__name__
+    schema = [{'name': RUNTIME_LABEL, 'type': 'FLOAT', 'mode': 'REQUIRED'}]
+    self.metrics_monitor = MetricsMonitor.from_test_pipeline(
+        self.pipeline, self.metrics_namespace, schema)
 
   class _GetElement(beam.DoFn):
     def process(self, element):
       yield element
 
   def testCombineGlobally(self):
-    with self.pipeline as p:
-      # pylint: disable=expression-not-assigned
-      (p
-       | beam.io.Read(synthetic_pipeline.SyntheticSource(
-           self.parseTestPipelineOptions()))
-       | 'Measure time: Start' >> beam.ParDo(
-           MeasureTime(self.metrics_namespace))
-       | 'Combine with Top' >> beam.CombineGlobally(
-           beam.combiners.TopCombineFn(1000))
-       | 'Consume' >> beam.ParDo(self._GetElement())
-       | 'Measure time: End' >> beam.ParDo(MeasureTime(self.metrics_namespace))
-      )
-
-      result = p.run()
-      result.wait_until_finish()
-      if self.metrics_monitor is not None:
-        self.metrics_monitor.send_metrics(result)
+    p = self.pipeline
+    # pylint: disable=expression-not-assigned
+    (p
+     | beam.io.Read(synthetic_pipeline.SyntheticSource(
+         self.parseTestPipelineOptions()))
+     | 'Measure time: Start' >> beam.ParDo(
+         MeasureTime(self.metrics_namespace))
+     | 'Combine with Top' >> beam.CombineGlobally(
+         beam.combiners.TopCombineFn(1000))
+     | 'Consume' >> beam.ParDo(self._GetElement())
+     | 'Measure time: End' >> beam.ParDo(MeasureTime(self.metrics_namespace))
+    )
+
+    result = p.run()
+    result.wait_until_finish()
+    if self.metrics_monitor is not None:
+      self.metrics_monitor.send_metrics(result)
 
 
 if __name__ == '__main__':
@@ -23,6 +23,12 @@ it is required to specify project of runner),
 * metrics_namespace (optional) - name of BigQuery table where metrics
 will be stored,
 in case of lack of any of both options metrics won't be saved
+* metrics_json_path (optional) - path of a JSON file to which the metrics
+are appended,
+* metrics_csv_path (optional) - path of a CSV file to which the metrics
+are appended,
+* publish_to_console (optional) - 'true' to print the metrics,
+these local sinks can be used with any runner, e.g. to compare runners offline,
 * input_options - options for Synthetic Sources.
 
 Example test run on DirectRunner:
@@ -42,6 +48,24 @@ python setup.py nosetests \
     }'" \
     --tests apache_beam.testing.load_tests.group_by_key_test
 
+Example test run on the FnApiRunner, saving metrics to local files:
+
+python setup.py nosetests \
+    --test-pipeline-options="
+    --runner=apache_beam.runners.portability.fn_api_runner.FnApiRunner
+    --metrics_json_path=/tmp/load_tests.json
+    --metrics_csv_path=/tmp/load_tests.csv
+    --publish_to_console=true
+    --input_options='{
+    \"num_records\": 300,
+    \"key_size\": 5,
+    \"value_size\":15,
+    \"bundle_size_distribution_type\": \"const\",
+    \"bundle_size_distribution_param\": 1,
+    \"force_initial_num_bundles\": 0
+    }'" \
+    --tests apache_beam.testing.load_tests.group_by_key_test
+
 To run test on other runner (ex. Dataflow):
 
 python setup.py nosetests \
@@ -73,19 +97,13 @@ import unittest
 
 import apache_beam as beam
 from apache_beam.testing import synthetic_pipeline
+from apache_beam.testing.load_tests.load_test_metrics_utils import MeasureTime
+from apache_beam.testing.load_tests.load_test_metrics_utils import MetricsMonitor
 from apache_beam.testing.test_pipeline import TestPipeline
 
-try:
-  from apache_beam.testing.load_tests.load_test_metrics_utils import MeasureTime
-  from apache_beam.testing.load_tests.load_test_metrics_utils import MetricsMonitor
-  from google.cloud import bigquery as bq
-except ImportError:
-  bq = None
-
 RUNTIME_LABEL = 'runtime'
 
 
-@unittest.skipIf(bq is None, 'BigQuery for storing metrics not installed')
 class GroupByKeyTest(unittest.TestCase):
   def parseTestPipelineOptions(self):
     return {
@@ -107,42 +125,31 @@ class GroupByKeyTest(unittest.TestCase):
     self.pipeline = TestPipeline(is_integration_test=True)
     self.input_options = json.loads(self.pipeline.get_option('input_options'))
 
-    metrics_project_id = self.pipeline.get_option('project')
     self.metrics_namespace = self.pipeline.get_option('metrics_table')
-    metrics_dataset = self.pipeline.get_option('metrics_dataset')
-    self.metrics_monitor = None
-    check = metrics_project_id and self.metrics_namespace and metrics_dataset \
-            is not None
-    if check:
-      schema = [{'name': RUNTIME_LABEL, 'type': 'FLOAT', 'mode': 'REQUIRED'}]
-      self.metrics_monitor = MetricsMonitor(
-          project_name=metrics_project_id,
-          table=self.metrics_namespace,
-          dataset=metrics_dataset,
-          schema_map=schema
-      )
-    else:
-      logging.error('One or more of parameters for collecting metrics '
-                    'are empty. Metrics will not be collected')
+    if not self.metrics_namespace:
+      self.metrics_namespace = self.__class__.__name__
+    schema = [{'name': RUNTIME_LABEL, 'type': 'FLOAT', 'mode': 'REQUIRED'}]
+    self.metrics_monitor = MetricsMonitor.from_test_pipeline(
+        self.pipeline, self.metrics_namespace, schema)
 
   def testGroupByKey(self):
-    with self.pipeline as p:
-      # pylint: disable=expression-not-assigned
-      (p
-       | beam.io.Read(synthetic_pipeline.SyntheticSource(
-           self.parseTestPipelineOptions()))
-       | 'Measure time: Start' >> beam.ParDo(
-           MeasureTime(self.metrics_namespace))
-       | 'GroupByKey' >> beam.GroupByKey()
-       | 'Ungroup' >> beam.FlatMap(
-           lambda elm: [(elm[0], v) for v in elm[1]])
-       | 'Measure time: End' >> beam.ParDo(MeasureTime(self.metrics_namespace))
-      )
-
-      result = p.run()
-      result.wait_until_finish()
-      if self.metrics_monitor is not None:
-        self.metrics_monitor.send_metrics(result)
+    p = self.pipeline
+    # pylint: disable=expression-not-assigned
+    (p
+     | beam.io.Read(synthetic_pipeline.SyntheticSource(
+         self.parseTestPipelineOptions()))
+     | 'Measure time: Start' >> beam.ParDo(
+         MeasureTime(self.metrics_namespace))
+     | 'GroupByKey' >> beam.GroupByKey()
+     | 'Ungroup' >> beam.FlatMap(
+         lambda elm: [(elm[0], v) for v in elm[1]])
+     | 'Measure time: End' >> beam.ParDo(MeasureTime(self.metrics_namespace))
+    )
+
+    result = p.run()
+    result.wait_until_finish()
+    if self.metrics_monitor is not None:
+      self.metrics_monitor.send_metrics(result)
 
 
 if __name__ == '__main__':
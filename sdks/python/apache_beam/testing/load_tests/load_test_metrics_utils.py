@@ -17,15 +17,35 @@
 
 """
 Utility functions used for integrating Metrics API into load tests pipelines.
+
+The metrics of a load test run are published by MetricsPublishers: to
+BigQuery, or to local JSON or CSV files and the console, so that load tests
+run on local runners can be compared offline. Besides the runtime and the
+user counters, the published metrics include, when the runner reports them,
+the number of elements, the wall time measured by the state sampler, the
+throughput and the memory of each step, and the peak memory of the process.
 """
 
 from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
 
+import csv
+import json
 import logging
+import os
+import sys
 import time
+from builtins import object
 
 import apache_beam as beam
 from apache_beam.metrics import Metrics
+from apache_beam.metrics import monitoring_infos
+
+try:
+  import resource
+except ImportError:
+  resource = None
 
 try:
   from google.cloud import bigquery
@@ -38,6 +58,22 @@ except ImportError:
 
 RUNTIME_LABEL = 'runtime'
 SUBMIT_TIMESTAMP_LABEL = 'submit_timestamp'
+NAMESPACE_LABEL = 'namespace'
+RUNNER_LABEL = 'runner'
+PEAK_MEMORY_LABEL = 'peak_memory_bytes'
+
+# The labels identifying a load test run, rather than measuring it.
+RUN_LABELS = (SUBMIT_TIMESTAMP_LABEL, NAMESPACE_LABEL, RUNNER_LABEL)
+
+# The suffixes of the labels of the metrics of each step, keyed by the URN of
+# the system metric they are computed from.
+STEP_METRIC_SUFFIXES = {
+    monitoring_infos.ELEMENT_COUNT_URN: 'element_count',
+    monitoring_infos.TOTAL_MSECS_URN: 'msecs',
+    monitoring_infos.ALLOCATED_BYTES_URN: 'allocated_bytes',
+    monitoring_infos.RETAINED_BYTES_URN: 'retained_bytes',
+}
+THROUGHPUT_SUFFIX = 'elements_per_sec'
 
 
 def _get_schema_field(schema_field):
@@ -47,7 +83,92 @@ def _get_schema_field(schema_field):
       mode=schema_field['mode'])
 
 
-class BigQueryClient(object):
+def _peak_memory_bytes():
+  if resource is None:
+    return None
+  peak_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                 resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+  # The peak is in kilobytes on Linux, and in bytes on macOS.
+  return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+class MetricsPublisher(object):
+  """Publishes the metrics of a load test run.
+
+  The metrics are given as a list of dictionaries, each holding the 'label'
+  and the 'value' of a metric.
+  """
+
+  def publish(self, results):
+    raise NotImplementedError
+
+
+class ConsoleMetricsPublisher(MetricsPublisher):
+  """Prints the metrics of load test runs to the standard output."""
+
+  def publish(self, results):
+    if not results:
+      return
+    width = max(len(str(result['label'])) for result in results)
+    print('Load test results:')
+    for result in results:
+      print('  %-*s %s' % (width, result['label'], result['value']))
+
+
+class JsonMetricsPublisher(MetricsPublisher):
+  """Appends the metrics of load test runs to a JSON list of objects.
+
+  Each run is an object mapping the labels of its metrics to their values.
+  """
+
+  def __init__(self, path):
+    self._path = path
+
+  def publish(self, results):
+    runs = []
+    if os.path.exists(self._path) and os.path.getsize(self._path):
+      with open(self._path) as f:
+        runs = json.load(f)
+    runs.append(dict((result['label'], result['value'])
+                     for result in results))
+    with open(self._path, 'w') as f:
+      json.dump(runs, f, indent=2, sort_keys=True)
+
+
+class CsvMetricsPublisher(MetricsPublisher):
+  """Appends the metrics of load test runs to a CSV file.
+
+  The file has a row per metric, holding the labels identifying its run, as
+  the metrics of different tests and runners differ. A header is written to
+  files which are created.
+  """
+
+  COLUMNS = RUN_LABELS + ('label', 'value')
+
+  def __init__(self, path):
+    self._path = path
+
+  def publish(self, results):
+    run = dict((result['label'], result['value']) for result in results
+               if result['label'] in RUN_LABELS)
+    write_header = (not os.path.exists(self._path)
+                    or not os.path.getsize(self._path))
+    with open(self._path, 'a') as f:
+      writer = csv.writer(f, lineterminator='\n')
+      if write_header:
+        writer.writerow(self.COLUMNS)
+      for result in results:
+        if result['label'] not in RUN_LABELS:
+          writer.writerow([run.get(label) for label in RUN_LABELS]
+                          + [result['label'], result['value']])
+
+
+class BigQueryClient(MetricsPublisher):
+  """Inserts the metrics of load test runs into a BigQuery table.
+
+  Only the metrics named in the schema of the table are inserted.
+  """
+
   def __init__(self, project_name, table, dataset, schema_map):
     self._namespace = table
 
@@ -63,6 +184,9 @@ class BigQueryClient(object):
     rows_tuple = tuple(self._match_inserts_by_schema(result_list))
     self._insert_data(rows_tuple)
 
+  def publish(self, results):
+    self.match_and_save(results)
+
   def _match_inserts_by_schema(self, insert_list):
     for name in self._schema_names:
       yield self._get_element_by_schema(name, insert_list)
@@ -117,9 +241,67 @@ class BigQueryClient(object):
 
 
 class MetricsMonitor(object):
-  def __init__(self, project_name, table, dataset, schema_map):
+  """Collects the metrics of load test runs and publishes them.
+
+  Args:
+    project_name: if set, the project of the BigQuery dataset to which the
+      metrics are published.
+    table: the BigQuery table of the metrics, which is also the namespace of
+      the metrics of the load test.
+    dataset: the BigQuery dataset of the table.
+    schema_map: the fields of the BigQuery table, besides the submit
+      timestamp.
+    publishers: additional MetricsPublishers of the metrics.
+    runner: the name of the runner of the load test, which is published
+      along with the metrics.
+  """
+
+  def __init__(self, project_name=None, table=None, dataset=None,
+               schema_map=None, publishers=None, runner=None):
+    self.namespace = table
+    self.runner = runner
+    self.publishers = list(publishers or [])
     if project_name is not None:
       self.bq = BigQueryClient(project_name, table, dataset, schema_map)
+      self.publishers.insert(0, self.bq)
+
+  @staticmethod
+  def from_test_pipeline(pipeline, namespace, schema_map):
+    """Returns a MetricsMonitor publishing to the sinks set in the options.
+
+    The metrics are published to BigQuery if the project, metrics_dataset and
+    metrics_table options are all set, to the JSON and CSV files of the
+    metrics_json_path and metrics_csv_path options, and to the console if the
+    publish_to_console option is 'true'.
+
+    Returns:
+      None if no sink is set.
+    """
+    publishers = []
+    json_path = pipeline.get_option('metrics_json_path')
+    if json_path:
+      publishers.append(JsonMetricsPublisher(json_path))
+    csv_path = pipeline.get_option('metrics_csv_path')
+    if csv_path:
+      publishers.append(CsvMetricsPublisher(csv_path))
+    if (pipeline.get_option('publish_to_console') or '').lower() == 'true':
+      publishers.append(ConsoleMetricsPublisher())
+
+    project_name = pipeline.get_option('project')
+    dataset = pipeline.get_option('metrics_dataset')
+    if not (project_name and dataset and pipeline.get_option('metrics_table')):
+      project_name = None
+    if project_name is None and not publishers:
+      logging.error('One or more of parameters for collecting metrics '
+                    'are empty. Metrics will not be collected')
+      return None
+    return MetricsMonitor(
+        project_name=project_name,
+        table=namespace,
+        dataset=dataset,
+        schema_map=schema_map,
+        publishers=publishers,
+        runner=pipeline.get_option('runner') or 'DirectRunner')
 
   def send_metrics(self, result):
     metrics = result.metrics().query()
@@ -134,9 +316,53 @@ class MetricsMonitor(object):
       dist_list = self._prepare_runtime_metrics(distributions)
 
     timestamp = {'label': SUBMIT_TIMESTAMP_LABEL, 'value': time.time()}
-
-    insert_list = [timestamp] + dist_list + counters_list
-    self.bq.match_and_save(insert_list)
+    run_list = [{'label': NAMESPACE_LABEL, 'value': self.namespace},
+                {'label': RUNNER_LABEL, 'value': self.runner}]
+
+    insert_list = ([timestamp] + run_list + dist_list + counters_list
+                   + self._prepare_step_metrics(result)
+                   + self._prepare_memory_metrics())
+    for publisher in self.publishers:
+      publisher.publish(insert_list)
+
+  def _prepare_step_metrics(self, result):
+    """Returns the metrics of each step, from the system metrics of a run.
+
+    Only runners whose results have monitoring_metrics report them, such as
+    the FnApiRunner. The wall time of a step is the time measured by its state
+    sampler, from which the throughput of the step is computed.
+    """
+    if not hasattr(result, 'monitoring_metrics'):
+      return []
+    values = {}
+    monitoring_metrics = result.monitoring_metrics().query()
+    for metric in monitoring_metrics['counters'] + monitoring_metrics['gauges']:
+      metric_name = metric.key.metric
+      suffix = STEP_METRIC_SUFFIXES.get(
+          '%s:%s' % (metric_name.namespace, metric_name.name))
+      if suffix is not None:
+        value = metric.committed
+        values[metric.key.step, suffix] = getattr(value, 'value', value)
+
+    steps = sorted(set(step for step, _ in values))
+    step_list = []
+    for step in steps:
+      for suffix in sorted(STEP_METRIC_SUFFIXES.values()):
+        if (step, suffix) in values:
+          step_list.append({'label': '%s/%s' % (step, suffix),
+                            'value': values[step, suffix]})
+      msecs = values.get((step, 'msecs'))
+      if msecs:
+        step_list.append({
+            'label': '%s/%s' % (step, THROUGHPUT_SUFFIX),
+            'value': values.get((step, 'element_count'), 0) * 1000 / msecs})
+    return step_list
+
+  def _prepare_memory_metrics(self):
+    peak_memory = _peak_memory_bytes()
+    if peak_memory is None:
+      return []
+    return [{'label': PEAK_MEMORY_LABEL, 'value': peak_memory}]
 
   def _prepare_counter_metrics(self, counters):
     for counter in counters:
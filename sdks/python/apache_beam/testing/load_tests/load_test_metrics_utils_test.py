@@ -0,0 +1,163 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Tests for apache_beam.testing.load_tests.load_test_metrics_utils."""
+
+from __future__ import absolute_import
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+import apache_beam as beam
+from apache_beam.metrics.cells import DistributionData
+from apache_beam.metrics.cells import DistributionResult
+from apache_beam.metrics.execution import MetricKey
+from apache_beam.metrics.execution import MetricResult
+from apache_beam.metrics.metricbase import MetricName
+from apache_beam.runners.portability import fn_api_runner
+from apache_beam.testing.load_tests import load_test_metrics_utils
+from apache_beam.testing.test_pipeline import TestPipeline
+
+
+def _result(step, namespace, name, value):
+  key = MetricKey(step, MetricName(namespace, name))
+  return MetricResult(key, value, value)
+
+
+class PublishersTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def results(self, runtime):
+    return [{'label': 'submit_timestamp', 'value': 1.5},
+            {'label': 'namespace', 'value': 'gbk'},
+            {'label': 'runner', 'value': 'DirectRunner'},
+            {'label': 'runtime', 'value': runtime}]
+
+  def test_json_publisher_appends_runs(self):
+    path = os.path.join(self.tmpdir, 'metrics.json')
+    publisher = load_test_metrics_utils.JsonMetricsPublisher(path)
+    publisher.publish(self.results(1.0))
+    publisher.publish(self.results(2.0))
+    with open(path) as f:
+      runs = json.load(f)
+    self.assertEqual([1.0, 2.0], [run['runtime'] for run in runs])
+    self.assertEqual('gbk', runs[0]['namespace'])
+
+  def test_csv_publisher_writes_a_row_per_metric(self):
+    path = os.path.join(self.tmpdir, 'metrics.csv')
+    publisher = load_test_metrics_utils.CsvMetricsPublisher(path)
+    publisher.publish(self.results(1.0))
+    publisher.publish(self.results(2.0))
+    with open(path) as f:
+      rows = list(csv.reader(f))
+    self.assertEqual(
+        [['submit_timestamp', 'namespace', 'runner', 'label', 'value'],
+         ['1.5', 'gbk', 'DirectRunner', 'runtime', '1.0'],
+         ['1.5', 'gbk', 'DirectRunner', 'runtime', '2.0']],
+        rows)
+
+  def test_monitor_from_test_pipeline(self):
+    path = os.path.join(self.tmpdir, 'metrics.json')
+    pipeline = TestPipeline(argv=[
+        '--test-pipeline-options=--metrics_json_path=%s '
+        '--publish_to_console=true' % path])
+    monitor = load_test_metrics_utils.MetricsMonitor.from_test_pipeline(
+        pipeline, 'gbk', [])
+    self.assertEqual(
+        [load_test_metrics_utils.JsonMetricsPublisher,
+         load_test_metrics_utils.ConsoleMetricsPublisher],
+        [type(publisher) for publisher in monitor.publishers])
+    self.assertEqual('DirectRunner', monitor.runner)
+
+    self.assertIsNone(
+        load_test_metrics_utils.MetricsMonitor.from_test_pipeline(
+            TestPipeline(argv=['--test-pipeline-options=--project=p']),
+            'gbk', []))
+
+
+class MetricsMonitorTest(unittest.TestCase):
+
+  def send_metrics(self, result):
+    publisher = mock.Mock()
+    monitor = load_test_metrics_utils.MetricsMonitor(
+        table='gbk', publishers=[publisher], runner='FnApiRunner')
+    monitor.send_metrics(result)
+    publisher.publish.assert_called_once()
+    return dict((metric['label'], metric['value'])
+                for metric in publisher.publish.call_args[0][0])
+
+  def test_step_metrics(self):
+    user_metrics = {
+        'counters': [_result('Step', 'gbk', 'bytes', 100)],
+        'distributions': [_result(
+            'Step', 'gbk', 'runtime',
+            DistributionResult(DistributionData(30, 2, 10, 20)))],
+    }
+    monitoring_metrics = {
+        'counters': [
+            _result('Step', 'beam', 'metric:element_count:v1', 500),
+            _result('Step', 'beam',
+                    'metric:ptransform_execution_time:total_msecs:v1', 250),
+            _result('Other', 'beam', 'metric:element_count:v1', 3),
+            _result('Other', 'beam',
+                    'metric:pardo_execution_time:start_bundle_msecs:v1', 1),
+        ] + user_metrics['counters'],
+        'gauges': [],
+    }
+    result = mock.Mock()
+    result.metrics.return_value.query.return_value = user_metrics
+    result.monitoring_metrics.return_value.query.return_value = (
+        monitoring_metrics)
+
+    metrics = self.send_metrics(result)
+    self.assertEqual('gbk', metrics['namespace'])
+    self.assertEqual('FnApiRunner', metrics['runner'])
+    self.assertEqual(10.0, metrics['runtime'])
+    self.assertEqual(100, metrics['bytes'])
+    self.assertEqual(500, metrics['Step/element_count'])
+    self.assertEqual(250, metrics['Step/msecs'])
+    self.assertEqual(2000, metrics['Step/elements_per_sec'])
+    self.assertEqual(3, metrics['Other/element_count'])
+    self.assertNotIn('Other/msecs', metrics)
+    self.assertNotIn('Other/elements_per_sec', metrics)
+    if load_test_metrics_utils.resource is not None:
+      self.assertGreater(metrics['peak_memory_bytes'], 0)
+
+  def test_metrics_of_fn_api_runner(self):
+    p = beam.Pipeline(runner=fn_api_runner.FnApiRunner())
+    # pylint: disable=expression-not-assigned
+    (p
+     | beam.Create(range(10))
+     | 'Measure' >> beam.ParDo(load_test_metrics_utils.MeasureTime('gbk')))
+    metrics = self.send_metrics(p.run())
+    self.assertEqual(10, metrics['Measure/element_count'])
+    self.assertIn('Measure/msecs', metrics)
+
+
+if __name__ == '__main__':
+  unittest.main()
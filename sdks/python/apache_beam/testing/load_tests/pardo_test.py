@@ -26,6 +26,12 @@ will be stored,
 in case of lack of any of both options metrics won't be saved
 * output (optional) - destination to save output, in case of no option
 output won't be written
+* metrics_json_path (optional) - path of a JSON file to which the metrics
+are appended,
+* metrics_csv_path (optional) - path of a CSV file to which the metrics
+are appended,
+* publish_to_console (optional) - 'true' to print the metrics,
+these local sinks can be used with any runner, e.g. to compare runners offline,
 * input_options - options for Synthetic Sources.
 
 Example test run on DirectRunner:
@@ -80,20 +86,14 @@ import unittest
 
 import apache_beam as beam
 from apache_beam.testing import synthetic_pipeline
+from apache_beam.testing.load_tests.load_test_metrics_utils import MeasureTime
+from apache_beam.testing.load_tests.load_test_metrics_utils import MetricsMonitor
 from apache_beam.testing.test_pipeline import TestPipeline
 
-try:
-  from apache_beam.testing.load_tests.load_test_metrics_utils import MeasureTime
-  from apache_beam.testing.load_tests.load_test_metrics_utils import MetricsMonitor
-  from google.cloud import bigquery as bq
-except ImportError:
-  bq = None
-
 COUNTER_LABEL = "total_bytes_count"
 RUNTIME_LABEL = 'runtime'
 
 
-@unittest.skipIf(bq is None, 'BigQuery for storing metrics not installed')
 class ParDoTest(unittest.TestCase):
   def parseTestPipelineOptions(self):
     return {'numRecords': self.input_options.get('num_records'),
@@ -119,24 +119,15 @@ class ParDoTest(unittest.TestCase):
     self.iterations = self.pipeline.get_option('number_of_counter_operations')
     self.input_options = json.loads(self.pipeline.get_option('input_options'))
 
-    metrics_project_id = self.pipeline.get_option('project')
     self.metrics_namespace = self.pipeline.get_option('metrics_table')
-    metrics_dataset = self.pipeline.get_option('metrics_dataset')
-    self.metrics_monitor = None
-    if metrics_project_id and self.metrics_namespace is not None:
-      measured_values = [
-          {'name': RUNTIME_LABEL, 'type': 'FLOAT', 'mode': 'REQUIRED'},
-          {'name': COUNTER_LABEL, 'type': 'INTEGER', 'mode': 'REQUIRED'}
-      ]
-      self.metrics_monitor = MetricsMonitor(
-          project_name=metrics_project_id,
-          table=self.metrics_namespace,
-          dataset=metrics_dataset,
-          schema_map=measured_values
-      )
-    else:
-      logging.error('One or more of parameters for collecting metrics '
-                    'are empty. Metrics will not be collected')
+    if not self.metrics_namespace:
+      self.metrics_namespace = self.__class__.__name__
+    measured_values = [
+        {'name': RUNTIME_LABEL, 'type': 'FLOAT', 'mode': 'REQUIRED'},
+        {'name': COUNTER_LABEL, 'type': 'INTEGER', 'mode': 'REQUIRED'}
+    ]
+    self.metrics_monitor = MetricsMonitor.from_test_pipeline(
+        self.pipeline, self.metrics_namespace, measured_values)
 
   def testParDo(self):
 
@@ -153,38 +144,38 @@ class ParDoTest(unittest.TestCase):
     else:
       num_runs = int(self.iterations)
 
-    with self.pipeline as p:
-      pc = (p
-            | 'Read synthetic' >> beam.io.Read(
-                synthetic_pipeline.SyntheticSource(
-                    self.parseTestPipelineOptions()
-                ))
-            | 'Measure time: Start' >> beam.ParDo(
-                MeasureTime(self.metrics_namespace))
+    p = self.pipeline
+    pc = (p
+          | 'Read synthetic' >> beam.io.Read(
+              synthetic_pipeline.SyntheticSource(
+                  self.parseTestPipelineOptions()
+              ))
+          | 'Measure time: Start' >> beam.ParDo(
+              MeasureTime(self.metrics_namespace))
+         )
+
+    for i in range(num_runs):
+      is_returning = (i == (num_runs-1))
+      pc = (pc
+            | 'Step: %d' % i >> beam.ParDo(
+                _GetElement(), self.metrics_namespace, is_returning)
            )
 
-      for i in range(num_runs):
-        is_returning = (i == (num_runs-1))
-        pc = (pc
-              | 'Step: %d' % i >> beam.ParDo(
-                  _GetElement(), self.metrics_namespace, is_returning)
-             )
-
-      if self.output is not None:
-        pc = (pc
-              | "Write" >> beam.io.WriteToText(self.output)
-             )
+    if self.output is not None:
+      pc = (pc
+            | "Write" >> beam.io.WriteToText(self.output)
+           )
 
-      # pylint: disable=expression-not-assigned
-      (pc
-       | 'Measure time: End' >> beam.ParDo(MeasureTime(self.metrics_namespace))
-      )
+    # pylint: disable=expression-not-assigned
+    (pc
+     | 'Measure time: End' >> beam.ParDo(MeasureTime(self.metrics_namespace))
+    )
 
-      result = p.run()
-      result.wait_until_finish()
+    result = p.run()
+    result.wait_until_finish()
 
-      if self.metrics_monitor is not None:
-        self.metrics_monitor.send_metrics(result)
+    if self.metrics_monitor is not None:
+      self.metrics_monitor.send_metrics(result)
 
 
 if __name__ == '__main__':
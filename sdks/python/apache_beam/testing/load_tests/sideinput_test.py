@@ -27,6 +27,12 @@ in case of lack of any of both options metrics won't be saved
 * metrics_dataset (optional) - name of BigQuery dataset where metrics
 will be stored,
 in case of lack of all three options metrics won't be saved
+* metrics_json_path (optional) - path of a JSON file to which the metrics
+are appended,
+* metrics_csv_path (optional) - path of a CSV file to which the metrics
+are appended,
+* publish_to_console (optional) - 'true' to print the metrics,
+these local sinks can be used with any runner, e.g. to compare runners offline,
 * input_options - options for Synthetic Sources.
 
 To run test on DirectRunner
@@ -136,27 +142,14 @@ class SideInputTest(unittest.TestCase):
       self.iterations = 1
     self.iterations = int(self.iterations)
 
-    metrics_project_id = self.pipeline.get_option('project')
     self.metrics_namespace = self.pipeline.get_option('metrics_table')
     if not self.metrics_namespace:
       self.metrics_namespace = self.__class__.__name__
-    metrics_dataset = self.pipeline.get_option('metrics_dataset')
-    self.metrics_monitor = None
-    check = metrics_project_id and self.metrics_namespace and metrics_dataset \
-            is not None
-    if check:
-      measured_values = [
-          {'name': RUNTIME_LABEL, 'type': 'FLOAT', 'mode': 'REQUIRED'},
-      ]
-      self.metrics_monitor = MetricsMonitor(
-          project_name=metrics_project_id,
-          table=self.metrics_namespace,
-          dataset=metrics_dataset,
-          schema_map=measured_values
-      )
-    else:
-      logging.error('One or more of parameters for collecting metrics '
-                    'are empty. Metrics will not be collected')
+    measured_values = [
+        {'name': RUNTIME_LABEL, 'type': 'FLOAT', 'mode': 'REQUIRED'},
+    ]
+    self.metrics_monitor = MetricsMonitor.from_test_pipeline(
+        self.pipeline, self.metrics_namespace, measured_values)
 
   def testSideInput(self):
     def join_fn(element, side_input, iterations):
@@ -167,37 +160,38 @@ class SideInputTest(unittest.TestCase):
             list.append({key: element[1]+value})
       yield list
 
-    with self.pipeline as p:
-      main_input = (p
-                    | "Read pcoll 1" >> beam.io.Read(
-                        synthetic_pipeline.SyntheticSource(
-                            self._parseTestPipelineOptions()))
-                    | 'Measure time: Start pcoll 1' >> beam.ParDo(
-                        MeasureTime(self.metrics_namespace))
-                   )
-
-      side_input = (p
-                    | "Read pcoll 2" >> beam.io.Read(
-                        synthetic_pipeline.SyntheticSource(
-                            self._getSideInput()))
-                    | 'Measure time: Start pcoll 2' >> beam.ParDo(
-                        MeasureTime(self.metrics_namespace))
-                   )
-      # pylint: disable=expression-not-assigned
-      (main_input
-       | "Merge" >> beam.ParDo(
-           join_fn,
-           AsIter(side_input),
-           self.iterations)
-       | 'Measure time' >> beam.ParDo(MeasureTime(self.metrics_namespace))
-      )
-
-      result = p.run()
-      result.wait_until_finish()
-
-      if self.metrics_monitor is not None:
-        self.metrics_monitor.send_metrics(result)
-
-  if __name__ == '__main__':
-    logging.getLogger().setLevel(logging.DEBUG)
-    unittest.main()
+    p = self.pipeline
+    main_input = (p
+                  | "Read pcoll 1" >> beam.io.Read(
+                      synthetic_pipeline.SyntheticSource(
+                          self._parseTestPipelineOptions()))
+                  | 'Measure time: Start pcoll 1' >> beam.ParDo(
+                      MeasureTime(self.metrics_namespace))
+                 )
+
+    side_input = (p
+                  | "Read pcoll 2" >> beam.io.Read(
+                      synthetic_pipeline.SyntheticSource(
+                          self._getSideInput()))
+                  | 'Measure time: Start pcoll 2' >> beam.ParDo(
+                      MeasureTime(self.metrics_namespace))
+                 )
+    # pylint: disable=expression-not-assigned
+    (main_input
+     | "Merge" >> beam.ParDo(
+         join_fn,
+         AsIter(side_input),
+         self.iterations)
+     | 'Measure time' >> beam.ParDo(MeasureTime(self.metrics_namespace))
+    )
+
+    result = p.run()
+    result.wait_until_finish()
+
+    if self.metrics_monitor is not None:
+      self.metrics_monitor.send_metrics(result)
+
+
+if __name__ == '__main__':
+  logging.getLogger().setLevel(logging.DEBUG)
+  unittest.main()
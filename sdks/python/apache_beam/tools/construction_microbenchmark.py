@@ -0,0 +1,144 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""A microbenchmark for the construction of pipelines with many transforms.
+
+This builds pipelines of a growing number of independent branches, each
+reading, transforming, grouping and combining its own data, as generated
+per-table pipelines do, and measures the time taken by each of the phases
+which happen before any data is processed:
+
+  apply: the construction of the pipeline, with type inference.
+  to_runner_api: the translation of the pipeline into its proto.
+  from_runner_api: the translation back, as done by Pipeline.run.
+  create_stages: the optimization of the proto by the FnApiRunner.
+
+The cost of each phase should be linear in the number of transforms. The
+benchmark prints the cost per transform of each phase, and the exponent of
+its growth, which should stay close to 1.
+
+Run as
+
+   python -m apache_beam.tools.construction_microbenchmark
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import collections
+import gc
+import time
+from builtins import range
+
+import numpy
+
+import apache_beam as beam
+from apache_beam.pipeline import Pipeline
+from apache_beam.runners.portability import fn_api_runner
+
+PHASES = ('apply', 'to_runner_api', 'from_runner_api', 'create_stages')
+
+
+def _build_branch(p, ix, transforms_per_branch):
+  pcoll = p | 'Create%d' % ix >> beam.Create([(ix, 1), (ix, 2)])
+  for jx in range(transforms_per_branch - 3):
+    pcoll = pcoll | 'Map%d_%d' % (ix, jx) >> beam.Map(
+        lambda kv, offset=jx: (kv[0], kv[1] + offset))
+  return (pcoll
+          | 'Group%d' % ix >> beam.GroupByKey()
+          | 'Sum%d' % ix >> beam.Map(lambda kv: (kv[0], sum(kv[1]))))
+
+
+def build_pipeline(num_branches, transforms_per_branch=10):
+  """Returns a pipeline of num_branches independent branches."""
+  p = beam.Pipeline(runner=fn_api_runner.FnApiRunner())
+  for ix in range(num_branches):
+    _build_branch(p, ix, transforms_per_branch)
+  return p
+
+
+def time_construction(num_branches, transforms_per_branch=10):
+  """Returns the seconds taken by each phase of the construction."""
+  timings = {}
+  start = time.time()
+  p = build_pipeline(num_branches, transforms_per_branch)
+  timings['apply'] = time.time() - start
+
+  start = time.time()
+  proto = p.to_runner_api(use_fake_coders=True)
+  timings['to_runner_api'] = time.time() - start
+
+  start = time.time()
+  p = Pipeline.from_runner_api(proto, p.runner, p._options)
+  timings['from_runner_api'] = time.time() - start
+
+  proto = p.to_runner_api()
+  start = time.time()
+  p.runner.create_stages(proto)
+  timings['create_stages'] = time.time() - start
+  return timings
+
+
+def run_benchmark(num_branches_list=(10, 20, 40, 80, 160), num_runs=3,
+                  transforms_per_branch=10, verbose=True):
+  """Runs the benchmark on pipelines of each number of branches.
+
+  Returns:
+    A dictionary of the median seconds taken by each phase, keyed by phase and
+    then number of transforms.
+  """
+  results = collections.defaultdict(dict)
+  for num_branches in num_branches_list:
+    num_transforms = num_branches * transforms_per_branch
+    runs = collections.defaultdict(list)
+    for _ in range(num_runs):
+      gc.collect()
+      for phase, seconds in time_construction(
+          num_branches, transforms_per_branch).items():
+        runs[phase].append(seconds)
+    for phase in PHASES:
+      results[phase][num_transforms] = numpy.median(runs[phase])
+    if verbose:
+      print('%6d transforms: %s' % (num_transforms, ', '.join(
+          '%s %.3f sec' % (phase, results[phase][num_transforms])
+          for phase in PHASES)))
+
+  if verbose and len(num_branches_list) > 1:
+    print()
+    for phase in PHASES:
+      sizes, seconds = zip(*sorted(results[phase].items()))
+      # The slope of the log-log plot is the exponent of the growth.
+      exponent = numpy.polyfit(
+          numpy.log(sizes), numpy.log(numpy.maximum(seconds, 1e-6)), 1)[0]
+      print('%-16s per transform %g sec, growth exponent %.2f' % (
+          phase, seconds[-1] / sizes[-1], exponent))
+  return results
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--num_branches', default='10,20,40,80,160')
+  parser.add_argument('--transforms_per_branch', default=10, type=int)
+  parser.add_argument('--num_runs', default=3, type=int)
+  options = parser.parse_args()
+
+  run_benchmark(
+      [int(n) for n in options.num_branches.split(',')],
+      num_runs=options.num_runs,
+      transforms_per_branch=options.transforms_per_branch)
@@ -0,0 +1,425 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Microbenchmarks of whole pipelines run by the FnApiRunner.
+
+Each benchmark runs pipelines over elements generated from a fixed seed, and
+measures the number of elements processed per second and the peak resident
+set size of the process running them:
+
+  group_by_key_*: a GroupByKey over 10 keys, 1000 keys or unique keys.
+  combine_per_key_lifted: a CombinePerKey, lifted by the runner into a
+    combination before and after the shuffle.
+  combine_per_key_unlifted: the same combination of values, after a
+    GroupByKey.
+  side_input_as_*: lookups into a side input of all the elements, read as a
+    list, a dict or a multimap.
+  flatten_fan_in: a Flatten of 10 PCollections.
+  stateful_dofn: a DoFn counting the values of each key in its state.
+  *_round_trip: a pipeline writing the elements to text, avro or parquet
+    files, then another reading them back.
+
+Each run of a benchmark happens in a process of its own, so that its peak
+resident set size is not that of the runs before it. The results can be
+written to a JSON file, and compared to those of a baseline JSON file: the
+benchmarks whose throughput decreased, or whose peak resident set size
+increased, by more than the tolerance are reported as regressions.
+
+Run as
+
+   python -m apache_beam.tools.fn_api_runner_microbenchmark \\
+       --output=results.json [--baseline=baseline.json]
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import argparse
+import collections
+import functools
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from builtins import range
+
+import numpy
+
+import apache_beam as beam
+from apache_beam.coders import VarIntCoder
+from apache_beam.runners.portability import fn_api_runner
+from apache_beam.tools import utils
+from apache_beam.transforms import userstate
+from apache_beam.typehints import typehints
+from apache_beam.version import __version__ as beam_version
+
+try:
+  import resource
+except ImportError:
+  resource = None
+
+# pylint: disable=wrong-import-order, wrong-import-position, ungrouped-imports
+try:
+  import avro.schema
+  try:
+    from avro.schema import Parse  # avro-python3 library for python3
+  except ImportError:
+    from avro.schema import parse as Parse  # avro library for python2
+except ImportError:
+  avro = None
+
+try:
+  import fastavro
+except ImportError:
+  fastavro = None
+
+try:
+  import pyarrow
+except ImportError:
+  pyarrow = None
+# pylint: enable=wrong-import-order, wrong-import-position, ungrouped-imports
+
+# The number of PCollections the elements are generated in, as shards.
+NUM_SHARDS = 10
+
+
+def _pipeline():
+  return beam.Pipeline(runner=fn_api_runner.FnApiRunner())
+
+
+def _generate_shard(shard, num_elements, num_keys, seed):
+  rnd = random.Random(seed * 1000003 + shard)
+  for _ in range(num_elements):
+    yield rnd.randrange(num_keys), rnd.randrange(1 << 20)
+
+
+def _generate(p, num_elements, num_keys, seed, label='Generate'):
+  """Returns num_elements (key, value) pairs over num_keys keys."""
+  return (p
+          | label + 'Shards' >> beam.Create(list(range(NUM_SHARDS)))
+          | label >> beam.FlatMap(
+              _generate_shard, num_elements // NUM_SHARDS, num_keys, seed
+          ).with_output_types(typehints.KV[int, int]))
+
+
+def group_by_key(num_elements, seed, num_keys=None):
+  with _pipeline() as p:
+    _ = (_generate(p, num_elements, num_keys or num_elements, seed)
+         | beam.GroupByKey()
+         | beam.Map(lambda key_values: sum(key_values[1])))
+
+
+def combine_per_key(num_elements, seed, lifted=True):
+  with _pipeline() as p:
+    pcoll = _generate(p, num_elements, 1000, seed)
+    if lifted:
+      _ = pcoll | beam.CombinePerKey(sum)
+    else:
+      _ = pcoll | beam.GroupByKey() | beam.CombineValues(sum)
+
+
+def side_input(num_elements, seed, view=beam.pvalue.AsList):
+  # Lists are iterated over entirely by each of a few main elements, while
+  # dicts and multimaps are looked up by a tenth as many main elements as
+  # they have keys.
+  lookups = {
+      beam.pvalue.AsList: (
+          lambda key, side: sum(1 for _ in side), NUM_SHARDS),
+      beam.pvalue.AsDict: (
+          lambda key, side: side.get(key), num_elements // 10),
+      beam.pvalue.AsMultiMap: (
+          lambda key, side: sum(1 for _ in side[key]), num_elements // 10),
+  }
+  lookup, num_lookups = lookups[view]
+  with _pipeline() as p:
+    side = _generate(p, num_elements, num_elements, seed, label='GenerateSide')
+    _ = (_generate(p, num_lookups, num_elements, seed + 1)
+         | beam.Keys()
+         | beam.Map(lookup, view(side)))
+
+
+def flatten_fan_in(num_elements, seed):
+  with _pipeline() as p:
+    shards = [p
+              | 'Shard%d' % shard >> beam.Create([shard])
+              | 'Generate%d' % shard >> beam.FlatMap(
+                  _generate_shard, num_elements // NUM_SHARDS, 1000, seed
+              ).with_output_types(typehints.KV[int, int])
+              for shard in range(NUM_SHARDS)]
+    _ = shards | beam.Flatten() | beam.Map(lambda key_value: key_value[1])
+
+
+class _StatefulCountFn(beam.DoFn):
+  COUNT_STATE = userstate.CombiningValueStateSpec('count', VarIntCoder(), sum)
+
+  def process(self, key_value, count=beam.DoFn.StateParam(COUNT_STATE)):
+    count.add(1)
+
+
+def stateful_dofn(num_elements, seed):
+  with _pipeline() as p:
+    _ = (_generate(p, num_elements, 1000, seed)
+         | beam.ParDo(_StatefulCountFn()))
+
+
+def _round_trip(num_elements, seed, write, read):
+  temp_dir = tempfile.mkdtemp()
+  try:
+    path = os.path.join(temp_dir, 'elements')
+    with _pipeline() as p:
+      _ = _generate(p, num_elements, num_elements, seed) | write(path)
+    with _pipeline() as p:
+      _ = p | read(path + '*') | beam.Map(lambda record: record)
+  finally:
+    shutil.rmtree(temp_dir)
+
+
+def text_round_trip(num_elements, seed):
+  def write(path):
+    return (beam.Map(lambda key_value: '%d,%d' % key_value)
+            | beam.io.WriteToText(path))
+
+  def read(pattern):
+    return (beam.io.ReadFromText(pattern)
+            | beam.Map(lambda line: tuple(int(x) for x in line.split(','))))
+
+  _round_trip(num_elements, seed, write, read)
+
+
+_AVRO_SCHEMA = json.dumps({
+    'namespace': 'apache_beam.tools',
+    'type': 'record',
+    'name': 'Element',
+    'fields': [{'name': 'key', 'type': 'long'},
+               {'name': 'value', 'type': 'long'}],
+})
+
+
+def avro_round_trip(num_elements, seed, use_fastavro=False):
+  def write(path):
+    return (beam.Map(lambda key_value: {'key': key_value[0],
+                                        'value': key_value[1]})
+            | beam.io.WriteToAvro(path, Parse(_AVRO_SCHEMA),
+                                  use_fastavro=use_fastavro))
+
+  def read(pattern):
+    return beam.io.ReadFromAvro(pattern, use_fastavro=use_fastavro)
+
+  _round_trip(num_elements, seed, write, read)
+
+
+def parquet_round_trip(num_elements, seed):
+  def write(path):
+    return (beam.Map(lambda key_value: {'key': key_value[0],
+                                        'value': key_value[1]})
+            | beam.io.WriteToParquet(path, pyarrow.schema(
+                [('key', pyarrow.int64()), ('value', pyarrow.int64())])))
+
+  def read(pattern):
+    return beam.io.ReadFromParquet(pattern)
+
+  _round_trip(num_elements, seed, write, read)
+
+
+# The benchmarks, which take the number of elements and the seed, with the
+# libraries they need.
+BENCHMARKS = collections.OrderedDict([
+    ('group_by_key_10_keys',
+     (functools.partial(group_by_key, num_keys=10), True)),
+    ('group_by_key_1000_keys',
+     (functools.partial(group_by_key, num_keys=1000), True)),
+    ('group_by_key_unique_keys', (group_by_key, True)),
+    ('combine_per_key_lifted',
+     (functools.partial(combine_per_key, lifted=True), True)),
+    ('combine_per_key_unlifted',
+     (functools.partial(combine_per_key, lifted=False), True)),
+    ('side_input_as_list',
+     (functools.partial(side_input, view=beam.pvalue.AsList), True)),
+    ('side_input_as_dict',
+     (functools.partial(side_input, view=beam.pvalue.AsDict), True)),
+    ('side_input_as_multimap',
+     (functools.partial(side_input, view=beam.pvalue.AsMultiMap), True)),
+    ('flatten_fan_in', (flatten_fan_in, True)),
+    ('stateful_dofn', (stateful_dofn, True)),
+    ('text_round_trip', (text_round_trip, True)),
+    ('avro_round_trip', (avro_round_trip, avro is not None)),
+    ('fastavro_round_trip',
+     (functools.partial(avro_round_trip, use_fastavro=True),
+      avro is not None and fastavro is not None)),
+    ('parquet_round_trip', (parquet_round_trip, pyarrow is not None)),
+])
+
+
+def _peak_rss_bytes():
+  if resource is None:
+    return None
+  peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # The peak is in kilobytes on Linux, and in bytes on macOS.
+  return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def _measure(benchmark, num_elements, seed):
+  gc.collect()
+  start = time.time()
+  benchmark(num_elements, seed)
+  return time.time() - start, _peak_rss_bytes()
+
+
+def _measure_in_child(queue, benchmark, num_elements, seed):
+  try:
+    queue.put(_measure(benchmark, num_elements, seed))
+  except Exception as e:  # pylint: disable=broad-except
+    queue.put(e)
+
+
+def _measure_in_process(benchmark, num_elements, seed):
+  queue = multiprocessing.Queue()
+  process = multiprocessing.Process(
+      target=_measure_in_child, args=(queue, benchmark, num_elements, seed))
+  process.start()
+  result = queue.get()
+  process.join()
+  if isinstance(result, Exception):
+    raise result
+  return result
+
+
+def run_benchmarks(names=None, num_elements=100000, num_runs=3, seed=0,
+                   isolate=True, verbose=True):
+  """Runs the benchmarks, and returns their results.
+
+  Args:
+    names: the names of the benchmarks to run, all of them if None.
+    num_elements: the number of elements processed by each benchmark.
+    num_runs: the number of runs of each benchmark.
+    seed: the seed of the generation of the elements.
+    isolate: whether each run happens in a process of its own.
+    verbose: whether to print the results.
+
+  Returns:
+    A dictionary with the configuration of the runs under 'config', and the
+    results of each benchmark under 'benchmarks': its median elements_per_sec,
+    its maximum peak_rss_bytes, and the runtime_sec of each run. Benchmarks
+    whose libraries are not installed are skipped.
+  """
+  measure = _measure_in_process if isolate else _measure
+  results = collections.OrderedDict()
+  for name in names or BENCHMARKS:
+    benchmark, available = BENCHMARKS[name]
+    if not available:
+      if verbose:
+        print('%-26s skipped, its libraries are not installed' % name)
+      continue
+    runtimes, peak_rss = [], []
+    for _ in range(num_runs):
+      runtime_sec, peak_rss_bytes = measure(benchmark, num_elements, seed)
+      runtimes.append(runtime_sec)
+      peak_rss.append(peak_rss_bytes)
+    results[name] = {
+        'elements_per_sec': num_elements / numpy.median(runtimes),
+        'peak_rss_bytes': None if None in peak_rss else max(peak_rss),
+        'runtime_sec': runtimes,
+    }
+    if verbose:
+      print('%-26s %12.0f elements/sec, peak RSS %s MiB' % (
+          name, results[name]['elements_per_sec'],
+          '?' if results[name]['peak_rss_bytes'] is None
+          else results[name]['peak_rss_bytes'] >> 20))
+  return {
+      'config': {
+          'num_elements': num_elements,
+          'num_runs': num_runs,
+          'seed': seed,
+          'beam_version': beam_version,
+          'python_version': platform.python_version(),
+      },
+      'benchmarks': results,
+  }
+
+
+def compare_results(results, baseline, tolerance=0.1, verbose=True):
+  """Compares the results of benchmarks to those of a baseline.
+
+  Args:
+    results: the results of run_benchmarks.
+    baseline: the results of run_benchmarks to compare to.
+    tolerance: the relative decrease of throughput, or increase of peak
+      resident set size, above which a benchmark has regressed.
+    verbose: whether to print the comparison.
+
+  Returns:
+    A list of (benchmark name, metric, baseline value, value) tuples, one per
+    regressed metric of a benchmark.
+  """
+  regressions = []
+  for name, result in results['benchmarks'].items():
+    baseline_result = baseline['benchmarks'].get(name)
+    if baseline_result is None:
+      continue
+    for metric, higher_is_better in (('elements_per_sec', True),
+                                     ('peak_rss_bytes', False)):
+      value, baseline_value = result[metric], baseline_result[metric]
+      if not value or not baseline_value:
+        continue
+      change = value / baseline_value - 1
+      regressed = (change < -tolerance if higher_is_better
+                   else change > tolerance)
+      if regressed:
+        regressions.append((name, metric, baseline_value, value))
+      if verbose:
+        print('%-26s %-16s %+7.1f%%%s' % (
+            name, metric, change * 100, '  REGRESSION' if regressed else ''))
+  return regressions
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--benchmarks', default=','.join(BENCHMARKS),
+                      help='Comma separated names of the benchmarks to run.')
+  parser.add_argument('--num_elements', default=100000, type=int)
+  parser.add_argument('--num_runs', default=3, type=int)
+  parser.add_argument('--seed', default=0, type=int)
+  parser.add_argument('--output',
+                      help='Path of the JSON file the results are written to.')
+  parser.add_argument('--baseline',
+                      help='Path of a JSON file of results to compare to.')
+  parser.add_argument('--tolerance', default=0.1, type=float,
+                      help='Relative change of a metric above which a '
+                      'benchmark has regressed.')
+  options = parser.parse_args()
+
+  utils.check_compiled('apache_beam.runners.common')
+  benchmark_results = run_benchmarks(
+      options.benchmarks.split(','), num_elements=options.num_elements,
+      num_runs=options.num_runs, seed=options.seed)
+  if options.output:
+    with open(options.output, 'w') as f:
+      json.dump(benchmark_results, f, indent=2)
+  if options.baseline:
+    with open(options.baseline) as f:
+      baseline_results = json.load(f)
+    print()
+    if compare_results(benchmark_results, baseline_results,
+                       options.tolerance):
+      sys.exit(1)
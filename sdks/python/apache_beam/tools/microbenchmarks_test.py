@@ -22,6 +22,8 @@ from __future__ import absolute_import
 import unittest
 
 from apache_beam.tools import coders_microbenchmark
+from apache_beam.tools import construction_microbenchmark
+from apache_beam.tools import fn_api_runner_microbenchmark
 
 
 class MicrobenchmarksTest(unittest.TestCase):
@@ -31,6 +33,40 @@ class MicrobenchmarksTest(unittest.TestCase):
     coders_microbenchmark.run_coder_benchmarks(
         num_runs=1, input_size=10, seed=1, verbose=False)
 
+  def test_construction_microbenchmark(self):
+    results = construction_microbenchmark.run_benchmark(
+        num_branches_list=(1, 2), num_runs=1, transforms_per_branch=4,
+        verbose=False)
+    self.assertEqual(
+        set(construction_microbenchmark.PHASES), set(results))
+    self.assertEqual([4, 8], sorted(results['apply']))
+
+  def test_fn_api_runner_microbenchmark(self):
+    results = fn_api_runner_microbenchmark.run_benchmarks(
+        ['group_by_key_10_keys', 'side_input_as_multimap', 'text_round_trip'],
+        num_elements=100, num_runs=1, isolate=False, verbose=False)
+    self.assertEqual(
+        ['group_by_key_10_keys', 'side_input_as_multimap', 'text_round_trip'],
+        list(results['benchmarks']))
+    for result in results['benchmarks'].values():
+      self.assertGreater(result['elements_per_sec'], 0)
+      self.assertEqual(1, len(result['runtime_sec']))
+
+  def test_fn_api_runner_microbenchmark_comparison(self):
+    def results(elements_per_sec, peak_rss_bytes):
+      return {'benchmarks': {'benchmark': {
+          'elements_per_sec': elements_per_sec,
+          'peak_rss_bytes': peak_rss_bytes}}}
+
+    baseline = results(1000, 100 << 20)
+    self.assertEqual([], fn_api_runner_microbenchmark.compare_results(
+        results(950, 105 << 20), baseline, verbose=False))
+    self.assertEqual(
+        [('benchmark', 'elements_per_sec', 1000, 800),
+         ('benchmark', 'peak_rss_bytes', 100 << 20, 120 << 20)],
+        fn_api_runner_microbenchmark.compare_results(
+            results(800, 120 << 20), baseline, verbose=False))
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -21,9 +21,11 @@ from __future__ import absolute_import
 from __future__ import division
 
 import heapq
+import math
 import operator
 import random
 from builtins import object
+from builtins import range
 from builtins import zip
 from functools import cmp_to_key
 
@@ -536,31 +538,120 @@ class Sample(object):
 @with_input_types(T)
 @with_output_types(List[T])
 class SampleCombineFn(core.CombineFn):
-  """CombineFn for all Sample transforms."""
+  """CombineFn for all Sample transforms.
+
+  Uses reservoir sampling with geometric skips (Vitter's Algorithm L): once
+  the reservoir is full, the number of elements to skip before the next one
+  is admitted is drawn directly, so skipped elements cost a single counter
+  comparison and no allocation.
+
+  The accumulator is a list [count, next_index, threshold, reservoir], where
+  count is the number of elements seen, next_index the (1-based) count at
+  which the next element enters the reservoir and threshold the current
+  Algorithm L weight W.
+  """
 
   def __init__(self, n):
     super(SampleCombineFn, self).__init__()
-    # Most of this combiner's work is done by a TopCombineFn. We could just
-    # subclass TopCombineFn to make this class, but since sampling is not
-    # really a kind of Top operation, we use a TopCombineFn instance as a
-    # helper instead.
-    self._top_combiner = TopCombineFn(n)
+    self._n = n
 
   def create_accumulator(self):
-    return self._top_combiner.create_accumulator()
+    return [0, 0, 0.0, []]
+
+  def add_input(self, accumulator, element):
+    count = accumulator[0] + 1
+    accumulator[0] = count
+    if count <= self._n:
+      accumulator[3].append(element)
+      if count == self._n:
+        self._start_skipping(accumulator)
+    elif count == accumulator[1]:
+      self._admit(accumulator, element)
+    return accumulator
+
+  def add_inputs(self, accumulator, elements):
+    if not isinstance(elements, (list, tuple)):
+      for element in elements:
+        accumulator = self.add_input(accumulator, element)
+      return accumulator
+    n = self._n
+    start = accumulator[0]
+    end = start + len(elements)
+    if start < n:
+      # Fill the reservoir first.
+      for element in elements[:n - start]:
+        accumulator = self.add_input(accumulator, element)
+    # Then jump straight from one admitted element to the next.
+    while n and accumulator[0] >= n and accumulator[1] <= end:
+      accumulator[0] = accumulator[1]
+      self._admit(accumulator, elements[accumulator[1] - start - 1])
+    accumulator[0] = end
+    return accumulator
 
-  def add_input(self, heap, element):
-    # Before passing elements to the Top combiner, we pair them with random
-    # numbers. The elements with the n largest random number "keys" will be
-    # selected for the output.
-    return self._top_combiner.add_input(heap, (random.random(), element))
+  def _admit(self, accumulator, element):
+    reservoir = accumulator[3]
+    reservoir[random.randrange(len(reservoir))] = element
+    accumulator[2] *= math.exp(math.log(_random_open()) / self._n)
+    self._schedule_next(accumulator)
+
+  def _start_skipping(self, accumulator):
+    # Start the weight off as the largest of n uniform keys.
+    accumulator[2] = math.exp(math.log(_random_open()) / self._n)
+    self._schedule_next(accumulator)
+
+  def _schedule_next(self, accumulator):
+    threshold = accumulator[2]
+    if threshold >= 1.0:
+      skip = 0
+    else:
+      skip = int(math.log(_random_open()) / math.log1p(-threshold))
+    accumulator[1] = accumulator[0] + skip + 1
+
+  def merge_accumulators(self, accumulators):
+    accumulators = iter(accumulators)
+    result = next(accumulators)
+    for accumulator in accumulators:
+      result = self._merge_two(result, accumulator)
+    return result
+
+  def _merge_two(self, left, right):
+    left_count, right_count = left[0], right[0]
+    if not right_count:
+      return left
+    elif not left_count:
+      return right
+    # Draw how many of the merged sample come from each side, weighting the
+    # sides by the number of elements each one has seen.
+    count = left_count + right_count
+    size = min(self._n, count)
+    left_remaining, right_remaining = left_count, right_count
+    from_left = 0
+    for _ in range(size):
+      if random.random() * (left_remaining + right_remaining) < left_remaining:
+        from_left += 1
+        left_remaining -= 1
+      else:
+        right_remaining -= 1
+    reservoir = (random.sample(left[3], from_left)
+                 + random.sample(right[3], size - from_left))
+    merged = [count, 0, 0.0, reservoir]
+    if count >= self._n > 0:
+      # The weight of a full reservoir after count elements is distributed
+      # as the n-th smallest of count uniform keys.
+      merged[2] = random.betavariate(self._n, count - self._n + 1)
+      self._schedule_next(merged)
+    return merged
+
+  def extract_output(self, accumulator):
+    return list(accumulator[3])
 
-  def merge_accumulators(self, heaps):
-    return self._top_combiner.merge_accumulators(heaps)
 
-  def extract_output(self, heap):
-    # Here we strip off the random number keys we added in add_input.
-    return [e for _, e in self._top_combiner.extract_output(heap)]
+def _random_open():
+  """Returns a uniform random number in the open interval (0, 1)."""
+  value = random.random()
+  while value == 0.0:
+    value = random.random()
+  return value
 
 
 class _TupleCombineFnBase(core.CombineFn):
@@ -265,6 +265,47 @@ class CombineTest(unittest.TestCase):
     assert_that(result, matcher())
     pipeline.run()
 
+  def test_sample_combine_fn_is_uniform(self):
+    # Every element should be picked with probability n / count, whether it
+    # is added one by one, in batches or through merged accumulators.
+    random.seed(0)
+    combine_fn = combine.SampleCombineFn(5)
+    values = list(range(50))
+    counts = [0] * len(values)
+    trials = 2000
+    for trial in range(trials):
+      if trial % 3 == 0:
+        accumulator = combine_fn.create_accumulator()
+        for v in values:
+          accumulator = combine_fn.add_input(accumulator, v)
+      elif trial % 3 == 1:
+        accumulator = combine_fn.add_inputs(
+            combine_fn.create_accumulator(), values)
+      else:
+        accumulator = combine_fn.merge_accumulators([
+            combine_fn.add_inputs(combine_fn.create_accumulator(), values[:7]),
+            combine_fn.add_inputs(combine_fn.create_accumulator(), values[7:]),
+            combine_fn.create_accumulator()])
+      sample = combine_fn.extract_output(accumulator)
+      self.assertEqual(5, len(set(sample)))
+      for v in sample:
+        counts[v] += 1
+    expected = trials * 5 / len(values)
+    for count in counts:
+      self.assertLess(abs(count - expected), 0.35 * expected)
+
+  def test_sample_combine_fn_small_inputs(self):
+    combine_fn = combine.SampleCombineFn(10)
+    accumulator = combine_fn.merge_accumulators([
+        combine_fn.add_inputs(combine_fn.create_accumulator(), [1, 2]),
+        combine_fn.add_input(combine_fn.create_accumulator(), 3)])
+    self.assertEqual([1, 2, 3], sorted(combine_fn.extract_output(accumulator)))
+    accumulator = combine_fn.add_inputs(accumulator, list(range(4, 20)))
+    self.assertEqual(10, len(set(combine_fn.extract_output(accumulator))))
+    self.assertEqual([], combine.SampleCombineFn(0).extract_output(
+        combine.SampleCombineFn(0).add_inputs(
+            combine_fn.create_accumulator(), [1, 2])))
+
   def test_tuple_combine_fn(self):
     with TestPipeline() as p:
       result = (
@@ -355,6 +396,24 @@ class CombineTest(unittest.TestCase):
               lambda key: random.randrange(0, 5)))
       assert_that(result, equal_to([(None, 499.5)]))
 
+  def test_adaptive_hot_key_fanout(self):
+    p = TestPipeline()
+    elements = ([('hot', e) for e in range(1000)]
+                + [('cold%s' % e, e) for e in range(10)])
+    random.shuffle(elements)
+    result = (
+        p
+        | beam.Create(elements)
+        | beam.CombinePerKey(
+            combine.MeanCombineFn()).with_adaptive_hot_key_fanout(
+                5, hot_key_threshold=10))
+    assert_that(result, equal_to(
+        [('hot', 499.5)] + [('cold%s' % e, e) for e in range(10)]))
+    res = p.run()
+    hot_keys = res.metrics().query(
+        beam.metrics.MetricsFilter().with_name('hot_keys'))['counters']
+    self.assertEqual(1, sum(c.committed for c in hot_keys))
+
   def test_global_fanout(self):
     with TestPipeline() as p:
       result = (
@@ -865,6 +865,8 @@ class ParDo(PTransformWithSideInputs):
     # TODO(robertwb): Change all uses of the dofn attribute to use fn instead.
     self.dofn = self.fn
     self.output_tags = set()
+    # The fn data this ParDo was unpickled from, with its payload.
+    self._unpickled_fn_data = None
 
     if not isinstance(self.fn, DoFn):
       raise TypeError('ParDo must be called with a DoFn instance.')
@@ -961,7 +963,13 @@ class ParDo(PTransformWithSideInputs):
   def to_runner_api_parameter(self, context):
     assert isinstance(self, ParDo), \
         "expected instance of ParDo, but got %s" % self.__class__
-    picked_pardo_fn_data = pickler.dumps(self._pardo_fn_data())
+    pardo_fn_data = self._pardo_fn_data()
+    if self._unpickled_fn_data and all(
+        a is b for a, b in zip(self._unpickled_fn_data[0], pardo_fn_data)):
+      # Pickling the same fn data again would result in the same payload.
+      picked_pardo_fn_data = self._unpickled_fn_data[1]
+    else:
+      picked_pardo_fn_data = pickler.dumps(pardo_fn_data)
     state_specs, timer_specs = userstate.get_dofn_specs(self.fn)
     return (
         common_urns.primitives.PAR_DO.urn,
@@ -989,12 +997,14 @@ class ParDo(PTransformWithSideInputs):
   def from_runner_api_parameter(pardo_payload, context):
     assert pardo_payload.do_fn.spec.urn == python_urns.PICKLED_DOFN_INFO
     fn, args, kwargs, si_tags_and_types, windowing = pickler.loads(
-        pardo_payload.do_fn.spec.payload)
+        pardo_payload.do_fn.spec.payload, memoize=True)
     if si_tags_and_types:
       raise NotImplementedError('explicit side input data')
     elif windowing:
       raise NotImplementedError('explicit windowing')
     result = ParDo(fn, *args, **kwargs)
+    result._unpickled_fn_data = (
+        result._pardo_fn_data(), pardo_payload.do_fn.spec.payload)
     # This is an ordered list stored as a dict (see the comments in
     # to_runner_api_parameter above).
     indexed_side_inputs = [
@@ -1346,6 +1356,34 @@ class CombinePerKey(PTransformWithSideInputs):
         curry_combine_fn(self.fn, self.args, self.kwargs),
         fanout)
 
+  def with_adaptive_hot_key_fanout(self, fanout, hot_key_threshold=1000):
+    """Like with_hot_key_fanout, but only for keys detected as hot.
+
+    Key frequencies are sampled, per worker, with a count-min sketch while
+    the input is split.  Only the keys whose recent estimated count reaches
+    hot_key_threshold take the intermediate, nonce-keyed level of aggregation;
+    all the other keys go directly to the final combine.  Older counts decay
+    so that keys which stop being hot return to the cold path.
+
+    The number of keys detected as hot and of values routed through the hot
+    path are reported as the ``hot_keys`` and ``hot_key_elements`` counters.
+
+    Args:
+      fanout: either an int, for a constant-degree fanout, or a callable
+          mapping keys to a key-specific degree of fanout, applied to the keys
+          detected as hot.
+      hot_key_threshold: the estimated number of occurrences of a key, among
+          the recent inputs of a worker, from which the key is considered hot.
+
+    Returns:
+      A per-key combining PTransform with adaptive fanout.
+    """
+    from apache_beam.transforms.combiners import curry_combine_fn
+    return _CombinePerKeyWithHotKeyFanout(
+        curry_combine_fn(self.fn, self.args, self.kwargs),
+        fanout,
+        hot_key_threshold=hot_key_threshold)
+
   def display_data(self):
     return {'combine_fn':
             DisplayDataItem(self.fn.__class__, label='Combine Function'),
@@ -1497,12 +1535,26 @@ class CombineValuesDoFn(DoFn):
 
 class _CombinePerKeyWithHotKeyFanout(PTransform):
 
-  def __init__(self, combine_fn, fanout):
+  # Width and depth of the count-min sketch used to detect hot keys.
+  _SKETCH_WIDTH = 2048
+  _SKETCH_DEPTH = 4
+  # The sketch counts decay once this many times hot_key_threshold values
+  # have been seen, so that the detection follows the recent inputs.
+  _DECAY_PERIOD = 16
+
+  def __init__(self, combine_fn, fanout, hot_key_threshold=None):
     self._combine_fn = combine_fn
     self._fanout_fn = (
         (lambda key: fanout) if isinstance(fanout, int) else fanout)
+    self._hot_key_threshold = hot_key_threshold
 
   def default_label(self):
+    if self._hot_key_threshold is not None:
+      return '%s(%s, fanout=%s, hot_key_threshold=%s)' % (
+          self.__class__.__name__,
+          ptransform.label_from_callable(self._combine_fn),
+          ptransform.label_from_callable(self._fanout_fn),
+          self._hot_key_threshold)
     return '%s(%s, fanout=%s)' % (
         self.__class__.__name__,
         ptransform.label_from_callable(self._combine_fn),
@@ -1510,12 +1562,21 @@ class _CombinePerKeyWithHotKeyFanout(PTransform):
 
   def expand(self, pcoll):
 
+    from apache_beam.metrics import Metrics
     from apache_beam.transforms.trigger import AccumulationMode
+    from apache_beam.utils.sketches import CountMinSketch
     combine_fn = self._combine_fn
     fanout_fn = self._fanout_fn
+    hot_key_threshold = self._hot_key_threshold
+    sketch_width = self._SKETCH_WIDTH
+    sketch_depth = self._SKETCH_DEPTH
+    decay_period = (
+        hot_key_threshold * self._DECAY_PERIOD if hot_key_threshold else None)
 
     class SplitHotCold(DoFn):
 
+      _sketch = None
+
       def start_bundle(self):
         # Spreading a hot key across all possible sub-keys for all bundles
         # would defeat the goal of not overwhelming downstream reducers
@@ -1523,14 +1584,50 @@ class _CombinePerKeyWithHotKeyFanout(PTransform):
         # Instead, each bundle independently makes a consistent choice about
         # which "shard" of a key to send its intermediate results.
         self._nonce = int(random.getrandbits(31))
+        if hot_key_threshold is not None and self._sketch is None:
+          # The sketch is kept across bundles, so that keys are detected as
+          # hot from the values seen by this worker rather than by one bundle.
+          self._sketch = CountMinSketch(sketch_width, sketch_depth)
+          self._hot_keys = set()
+          self._hot_keys_counter = Metrics.counter(
+              self.__class__, 'hot_keys')
+          self._hot_key_elements_counter = Metrics.counter(
+              self.__class__, 'hot_key_elements')
+
+      def _is_hot(self, key):
+        try:
+          if key in self._hot_keys:
+            self._sketch.add(key)
+            is_hot = True
+          else:
+            is_hot = self._sketch.add(key) >= hot_key_threshold
+            if is_hot:
+              logging.info('Detected hot key %r.', key)
+              self._hot_keys.add(key)
+              self._hot_keys_counter.inc()
+        except TypeError:
+          # Unhashable keys are never considered hot.
+          return False
+        if self._sketch.total >= decay_period:
+          self._sketch.decay()
+          # Keys that are still frequent after the decay remain hot.
+          self._hot_keys = set(
+              k for k in self._hot_keys
+              if self._sketch.estimate(k) * 2 >= hot_key_threshold)
+        return is_hot
 
       def process(self, element):
         key, value = element
-        fanout = fanout_fn(key)
+        if self._sketch is not None and not self._is_hot(key):
+          fanout = 1
+        else:
+          fanout = fanout_fn(key)
         if fanout <= 1:
           # Boolean indicates this is not an accumulator.
           yield (key, (False, value))  # cold
         else:
+          if self._sketch is not None:
+            self._hot_key_elements_counter.inc()
           yield pvalue.TaggedOutput('hot', ((self._nonce % fanout, key), value))
 
     class PreCombineFn(CombineFn):
@@ -25,6 +25,7 @@ For internal use only; no backwards-compatibility guarantees.
 from __future__ import absolute_import
 from __future__ import division
 
+import math
 from builtins import object
 
 from apache_beam.transforms import core
@@ -34,6 +35,11 @@ try:
 except ImportError:
   from apache_beam.transforms.py_dataflow_distribution_counter import DataflowDistributionCounter
 
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
 
 class AccumulatorCombineFn(core.CombineFn):
   # singleton?
@@ -335,3 +341,355 @@ class DataflowDistributionCounterFn(AccumulatorCombineFn):
   version.
   """
   _accumulator_type = DataflowDistributionCounter
+
+
+# Vectorized combiners.
+#
+# These accumulators also implement add_inputs, which folds a whole batch of
+# values at once: over NumPy arrays when NumPy is available, and over the
+# buffered list of values otherwise.  PGBKCVOperation buffers the values of
+# each key for them, and CombineValuesDoFn already adds them in batches.
+
+
+if np is not None:
+  _sum, _min, _max = np.sum, np.min, np.max
+else:
+  _sum, _min, _max = sum, min, max
+
+
+def _int64_values(elements):
+  if np is not None:
+    # Raises OverflowError for values that do not fit in an int64.
+    return np.asarray(elements, dtype=np.int64)
+  values = [int(element) for element in elements]
+  for value in values:
+    if not INT64_MIN <= value <= INT64_MAX:
+      raise OverflowError(value)
+  return values
+
+
+def _float64_values(elements):
+  if np is not None:
+    return np.asarray(elements, dtype=np.float64)
+  return [float(element) for element in elements]
+
+
+def _wrap_int64(value):
+  if not INT64_MIN <= value <= INT64_MAX:
+    value %= 2**64
+    if value >= INT64_MAX:
+      value -= 2**64
+  return value
+
+
+class VectorizedCountAccumulator(object):
+  def __init__(self):
+    self.value = 0
+
+  def add_input(self, unused_element):
+    self.value += 1
+
+  def add_inputs(self, elements):
+    self.value += len(elements)
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      self.value += accumulator.value
+
+  def extract_output(self):
+    return self.value
+
+
+class VectorizedSumInt64Accumulator(object):
+  def __init__(self):
+    self.value = 0
+
+  def add_input(self, element):
+    element = int(element)
+    if not INT64_MIN <= element <= INT64_MAX:
+      raise OverflowError(element)
+    self.value += element
+
+  def add_inputs(self, elements):
+    if len(elements):
+      self.value += int(_sum(_int64_values(elements)))
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      self.value += accumulator.value
+
+  def extract_output(self):
+    self.value = _wrap_int64(self.value)
+    return self.value
+
+
+class VectorizedSumDoubleAccumulator(object):
+  def __init__(self):
+    self.value = 0.0
+
+  def add_input(self, element):
+    self.value += float(element)
+
+  def add_inputs(self, elements):
+    if len(elements):
+      self.value += float(_sum(_float64_values(elements)))
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      self.value += accumulator.value
+
+  def extract_output(self):
+    return self.value
+
+
+class VectorizedMinInt64Accumulator(object):
+  def __init__(self):
+    self.value = INT64_MAX
+
+  def add_input(self, element):
+    element = int(element)
+    if not INT64_MIN <= element <= INT64_MAX:
+      raise OverflowError(element)
+    if element < self.value:
+      self.value = element
+
+  def add_inputs(self, elements):
+    if len(elements):
+      self.value = min(self.value, int(_min(_int64_values(elements))))
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      if accumulator.value < self.value:
+        self.value = accumulator.value
+
+  def extract_output(self):
+    return self.value
+
+
+class VectorizedMaxInt64Accumulator(object):
+  def __init__(self):
+    self.value = INT64_MIN
+
+  def add_input(self, element):
+    element = int(element)
+    if not INT64_MIN <= element <= INT64_MAX:
+      raise OverflowError(element)
+    if element > self.value:
+      self.value = element
+
+  def add_inputs(self, elements):
+    if len(elements):
+      self.value = max(self.value, int(_max(_int64_values(elements))))
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      if accumulator.value > self.value:
+        self.value = accumulator.value
+
+  def extract_output(self):
+    return self.value
+
+
+class VectorizedMinDoubleAccumulator(object):
+  def __init__(self):
+    self.value = _POS_INF
+
+  def add_input(self, element):
+    element = float(element)
+    if element < self.value:
+      self.value = element
+
+  def add_inputs(self, elements):
+    if len(elements):
+      self.value = min(self.value, float(_min(_float64_values(elements))))
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      if accumulator.value < self.value:
+        self.value = accumulator.value
+
+  def extract_output(self):
+    return self.value
+
+
+class VectorizedMaxDoubleAccumulator(object):
+  def __init__(self):
+    self.value = _NEG_INF
+
+  def add_input(self, element):
+    element = float(element)
+    if element > self.value:
+      self.value = element
+
+  def add_inputs(self, elements):
+    if len(elements):
+      self.value = max(self.value, float(_max(_float64_values(elements))))
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      if accumulator.value > self.value:
+        self.value = accumulator.value
+
+  def extract_output(self):
+    return self.value
+
+
+class VectorizedMeanInt64Accumulator(object):
+  def __init__(self):
+    self.sum = 0
+    self.count = 0
+
+  def add_input(self, element):
+    element = int(element)
+    if not INT64_MIN <= element <= INT64_MAX:
+      raise OverflowError(element)
+    self.sum += element
+    self.count += 1
+
+  def add_inputs(self, elements):
+    if len(elements):
+      self.sum += int(_sum(_int64_values(elements)))
+      self.count += len(elements)
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      self.sum += accumulator.sum
+      self.count += accumulator.count
+
+  def extract_output(self):
+    self.sum = _wrap_int64(self.sum)
+    return self.sum // self.count if self.count else _NAN
+
+
+class VectorizedMeanDoubleAccumulator(object):
+  def __init__(self):
+    self.sum = 0.0
+    self.count = 0
+
+  def add_input(self, element):
+    self.sum += float(element)
+    self.count += 1
+
+  def add_inputs(self, elements):
+    if len(elements):
+      self.sum += float(_sum(_float64_values(elements)))
+      self.count += len(elements)
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      self.sum += accumulator.sum
+      self.count += accumulator.count
+
+  def extract_output(self):
+    return self.sum / self.count if self.count else _NAN
+
+
+class VectorizedVarianceDoubleAccumulator(object):
+  """Accumulates the count, mean and sum of squared deviations of values.
+
+  Batches and accumulators are combined with Chan et al.'s parallel update,
+  which is numerically stable unlike a sum of squares.
+  """
+
+  def __init__(self):
+    self.count = 0
+    self.mean = 0.0
+    self.m2 = 0.0
+
+  def add_input(self, element):
+    # Welford's online update.
+    element = float(element)
+    self.count += 1
+    delta = element - self.mean
+    self.mean += delta / self.count
+    self.m2 += delta * (element - self.mean)
+
+  def add_inputs(self, elements):
+    count = len(elements)
+    if not count:
+      return
+    values = _float64_values(elements)
+    if np is not None:
+      mean = float(values.mean())
+      m2 = float(((values - mean) ** 2).sum())
+    else:
+      mean = sum(values) / count
+      m2 = sum((value - mean) ** 2 for value in values)
+    self._merge_moments(count, mean, m2)
+
+  def _merge_moments(self, count, mean, m2):
+    total = self.count + count
+    delta = mean - self.mean
+    self.mean += delta * count / total
+    self.m2 += m2 + delta * delta * self.count * count / total
+    self.count = total
+
+  def merge(self, accumulators):
+    for accumulator in accumulators:
+      if accumulator.count:
+        self._merge_moments(
+            accumulator.count, accumulator.mean, accumulator.m2)
+
+  def extract_output(self):
+    return self.m2 / self.count if self.count else _NAN
+
+
+class VectorizedStddevDoubleAccumulator(VectorizedVarianceDoubleAccumulator):
+
+  def extract_output(self):
+    return math.sqrt(self.m2 / self.count) if self.count else _NAN
+
+
+class VectorizedAccumulatorCombineFn(AccumulatorCombineFn):
+  """An AccumulatorCombineFn whose accumulators can add a batch of inputs."""
+
+  @staticmethod
+  def add_inputs(accumulator, elements):
+    if not isinstance(elements, (list, tuple)):
+      elements = list(elements)
+    accumulator.add_inputs(elements)
+    return accumulator
+
+
+class VectorizedCountFn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedCountAccumulator
+
+
+class VectorizedSumInt64Fn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedSumInt64Accumulator
+
+
+class VectorizedMinInt64Fn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedMinInt64Accumulator
+
+
+class VectorizedMaxInt64Fn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedMaxInt64Accumulator
+
+
+class VectorizedMeanInt64Fn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedMeanInt64Accumulator
+
+
+class VectorizedSumFloatFn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedSumDoubleAccumulator
+
+
+class VectorizedMinFloatFn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedMinDoubleAccumulator
+
+
+class VectorizedMaxFloatFn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedMaxDoubleAccumulator
+
+
+class VectorizedMeanFloatFn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedMeanDoubleAccumulator
+
+
+class VectorizedVarianceFloatFn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedVarianceDoubleAccumulator
+
+
+class VectorizedStddevFloatFn(VectorizedAccumulatorCombineFn):
+  _accumulator_type = VectorizedStddevDoubleAccumulator
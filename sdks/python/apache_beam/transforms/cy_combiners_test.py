@@ -0,0 +1,109 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Unit tests for the vectorized combiners of cy_combiners."""
+from __future__ import absolute_import
+from __future__ import division
+
+import math
+import unittest
+
+from future.builtins import range
+
+import apache_beam as beam
+from apache_beam.testing.test_pipeline import TestPipeline
+from apache_beam.testing.util import assert_that
+from apache_beam.testing.util import equal_to
+from apache_beam.transforms import cy_combiners
+
+
+class VectorizedCombinersTest(unittest.TestCase):
+
+  def combine(self, combine_fn, values):
+    """Adds values one by one, in batches and merged, and checks agreement."""
+    one_by_one = combine_fn.create_accumulator()
+    for value in values:
+      one_by_one = combine_fn.add_input(one_by_one, value)
+    accumulators = [
+        combine_fn.add_inputs(combine_fn.create_accumulator(), values[k::3])
+        for k in range(3)]
+    batched = combine_fn.merge_accumulators(accumulators)
+    result = combine_fn.extract_output(batched)
+    expected = combine_fn.extract_output(one_by_one)
+    if isinstance(result, float) and math.isnan(result):
+      self.assertTrue(math.isnan(expected))
+    else:
+      self.assertAlmostEqual(expected, result)
+    return result
+
+  def test_int64_combiners(self):
+    values = [3, -7, 12, 5, 0, 9, 1]
+    self.assertEqual(7, self.combine(cy_combiners.VectorizedCountFn(), values))
+    self.assertEqual(
+        23, self.combine(cy_combiners.VectorizedSumInt64Fn(), values))
+    self.assertEqual(
+        -7, self.combine(cy_combiners.VectorizedMinInt64Fn(), values))
+    self.assertEqual(
+        12, self.combine(cy_combiners.VectorizedMaxInt64Fn(), values))
+    self.assertEqual(
+        3, self.combine(cy_combiners.VectorizedMeanInt64Fn(), values))
+
+  def test_float_combiners(self):
+    values = [1.5, 2.5, -4.0, 8.0]
+    self.assertEqual(
+        8.0, self.combine(cy_combiners.VectorizedSumFloatFn(), values))
+    self.assertEqual(
+        -4.0, self.combine(cy_combiners.VectorizedMinFloatFn(), values))
+    self.assertEqual(
+        8.0, self.combine(cy_combiners.VectorizedMaxFloatFn(), values))
+    self.assertEqual(
+        2.0, self.combine(cy_combiners.VectorizedMeanFloatFn(), values))
+
+  def test_variance_and_stddev(self):
+    values = [2.0, 4.0, 4.0, 4.0, 5.0, 5.0, 7.0, 9.0]
+    self.assertAlmostEqual(
+        4.0, self.combine(cy_combiners.VectorizedVarianceFloatFn(), values))
+    self.assertAlmostEqual(
+        2.0, self.combine(cy_combiners.VectorizedStddevFloatFn(), values))
+
+  def test_empty_input(self):
+    self.assertTrue(math.isnan(
+        self.combine(cy_combiners.VectorizedMeanFloatFn(), [])))
+    self.assertTrue(math.isnan(
+        self.combine(cy_combiners.VectorizedVarianceFloatFn(), [])))
+    self.assertEqual(0, self.combine(cy_combiners.VectorizedSumInt64Fn(), []))
+
+  def test_int64_overflow(self):
+    combine_fn = cy_combiners.VectorizedSumInt64Fn()
+    with self.assertRaises(OverflowError):
+      combine_fn.add_inputs(combine_fn.create_accumulator(), [2**63])
+    accumulator = combine_fn.add_inputs(
+        combine_fn.create_accumulator(), [2**63 - 1, 1])
+    self.assertEqual(-2**63, combine_fn.extract_output(accumulator))
+
+  def test_combine_per_key(self):
+    with TestPipeline() as p:
+      result = (
+          p
+          | beam.Create([(k % 3, k) for k in range(3000)])
+          | beam.CombinePerKey(cy_combiners.VectorizedSumInt64Fn()))
+      assert_that(result, equal_to(
+          [(k, sum(range(k, 3000, 3))) for k in range(3)]))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -641,10 +641,14 @@ class PTransformWithSideInputs(PTransform):
     # Prevent name collisions with fns of the form '<function <lambda> at ...>'
     self._cached_fn = self.fn
 
-    # Ensure fn and side inputs are picklable for remote execution.
-    self.fn = pickler.loads(pickler.dumps(self.fn))
-    self.args = pickler.loads(pickler.dumps(self.args))
-    self.kwargs = pickler.loads(pickler.dumps(self.kwargs))
+    # Ensure fn and side inputs are picklable for remote execution. A fn which
+    # was just unpickled, e.g. from its runner API representation, is.
+    if not pickler.is_unpickled(self.fn):
+      self.fn = pickler.loads(pickler.dumps(self.fn))
+    if self.args:
+      self.args = pickler.loads(pickler.dumps(self.args))
+    if self.kwargs:
+      self.kwargs = pickler.loads(pickler.dumps(self.kwargs))
 
     # For type hints, because loads(dumps(class)) != class.
     self.fn = self._cached_fn
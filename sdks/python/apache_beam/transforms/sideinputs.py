@@ -48,21 +48,40 @@ def default_window_mapping_fn(target_window_fn):
 
 
 class SideInputMap(object):
-  """Represents a mapping of windows to side input values."""
+  """Represents a mapping of windows to side input values.
 
-  def __init__(self, view_class, view_options, iterable):
+  If values_by_window, a mapping of each side input window to the values in
+  that window, is given, it is used instead of filtering the whole iterable on
+  every lookup, and the materialized views are shared by all the windows that
+  map to the same side input window.
+  """
+
+  def __init__(self, view_class, view_options, iterable,
+               values_by_window=None):
     self._window_mapping_fn = view_options.get(
         'window_mapping_fn', _global_window_mapping_fn)
     self._view_class = view_class
     self._view_options = view_options
     self._iterable = iterable
+    self._values_by_window = values_by_window
     self._cache = {}
+    self._target_window_cache = {}
 
   def __getitem__(self, window):
     if window not in self._cache:
       target_window = self._window_mapping_fn(window)
-      self._cache[window] = self._view_class._from_runtime_iterable(
-          _FilteringIterable(self._iterable, target_window), self._view_options)
+      if self._values_by_window is None:
+        self._cache[window] = self._view_class._from_runtime_iterable(
+            _FilteringIterable(self._iterable, target_window),
+            self._view_options)
+      else:
+        if target_window not in self._target_window_cache:
+          self._target_window_cache[target_window] = (
+              self._view_class._from_runtime_iterable(
+                  _WindowValuesIterable(
+                      self._values_by_window.get(target_window, [])),
+                  self._view_options))
+        self._cache[window] = self._target_window_cache[target_window]
     return self._cache[window]
 
   def is_globally_windowed(self):
@@ -85,3 +104,21 @@ class _FilteringIterable(object):
   def __reduce__(self):
     # Pickle self as an already filtered list.
     return list, (list(self),)
+
+
+class _WindowValuesIterable(object):
+  """A read-only iterable over the indexed values of a single window.
+  """
+
+  def __init__(self, values):
+    self._values = values
+
+  def __iter__(self):
+    return iter(self._values)
+
+  def __len__(self):
+    return len(self._values)
+
+  def __reduce__(self):
+    # Pickle self as a list.
+    return list, (list(self),)
@@ -28,6 +28,7 @@ import apache_beam as beam
 from apache_beam.testing.test_pipeline import TestPipeline
 from apache_beam.testing.util import assert_that
 from apache_beam.testing.util import equal_to
+from apache_beam.transforms import sideinputs
 from apache_beam.transforms import window
 
 
@@ -310,6 +311,48 @@ class SideInputsTest(unittest.TestCase):
     pipeline.run()
 
 
+class SideInputMapTest(unittest.TestCase):
+
+  def _windowed_values(self):
+    w1 = window.IntervalWindow(0, 10)
+    w2 = window.IntervalWindow(10, 20)
+    return w1, w2, [
+        window.WindowedValue(('a', 1), 1, [w1]),
+        window.WindowedValue(('b', 2), 11, [w2]),
+        window.WindowedValue(('c', 3), 5, [w1, w2])]
+
+  def _values_by_window(self, windowed_values):
+    values_by_window = {}
+    for wv in windowed_values:
+      for w in wv.windows:
+        values_by_window.setdefault(w, []).append(wv.value)
+    return values_by_window
+
+  def test_indexed_lookup_matches_filtering(self):
+    w1, w2, windowed_values = self._windowed_values()
+    view_options = {'window_mapping_fn': lambda w: w}
+    for view_class in (beam.pvalue.AsList, beam.pvalue.AsDict,
+                       beam.pvalue.AsMultiMap):
+      filtering = sideinputs.SideInputMap(
+          view_class, view_options, windowed_values)
+      indexed = sideinputs.SideInputMap(
+          view_class, view_options, windowed_values,
+          values_by_window=self._values_by_window(windowed_values))
+      for w in (w1, w2, window.IntervalWindow(20, 30)):
+        self.assertEqual(filtering[w], indexed[w])
+
+  def test_indexed_views_shared_per_target_window(self):
+    _, _, windowed_values = self._windowed_values()
+    global_window = window.GlobalWindow()
+    indexed = sideinputs.SideInputMap(
+        beam.pvalue.AsList, {}, windowed_values,
+        values_by_window={global_window: [1, 2, 3]})
+    view = indexed[window.IntervalWindow(0, 10)]
+    self.assertEqual([1, 2, 3], view)
+    self.assertIs(view, indexed[window.IntervalWindow(10, 20)])
+    self.assertIs(view, indexed[global_window])
+
+
 if __name__ == '__main__':
   logging.getLogger().setLevel(logging.DEBUG)
   unittest.main()
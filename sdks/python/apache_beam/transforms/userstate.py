@@ -24,6 +24,7 @@ from __future__ import absolute_import
 
 import itertools
 import types
+import weakref
 from builtins import object
 
 from apache_beam.coders import Coder
@@ -130,11 +131,57 @@ def on_timer(timer_spec):
   return _inner
 
 
+# The default values of the arguments of the methods of DoFns, keyed by the
+# function of the method, as inspecting them dominates the cost of
+# get_dofn_specs for pipelines with many DoFns.
+_method_defaults = weakref.WeakKeyDictionary()
+
+
+def _get_method_defaults(dofn, method_name, method):
+  # Avoid circular import.
+  from apache_beam.runners.common import MethodWrapper
+
+  if hasattr(dofn, '_inspect_%s' % method_name):
+    # The arguments are those of an object wrapped by the DoFn.
+    return MethodWrapper(dofn, method_name).defaults
+  try:
+    return _method_defaults[method.__func__]
+  except KeyError:
+    defaults = _method_defaults[method.__func__] = (
+        MethodWrapper(dofn, method_name).defaults)
+    return defaults
+  except TypeError:
+    # The function is not hashable, or can not be weakly referenced.
+    return MethodWrapper(dofn, method_name).defaults
+
+
+# The state and timer specs of live DoFns, by the id of the DoFn, with a weak
+# reference to it. The specs of a DoFn are requested several times during
+# the construction and translation of its ParDo.
+_dofn_specs = {}
+
+
 def get_dofn_specs(dofn):
   """Gets the state and timer specs for a DoFn, if any."""
+  cached = _dofn_specs.get(id(dofn))
+  if cached is not None and cached[0]() is dofn:
+    all_state_specs, all_timer_specs = cached[1]
+    return set(all_state_specs), set(all_timer_specs)
+  all_state_specs, all_timer_specs = _get_dofn_specs(dofn)
+  try:
+    dofn_ref = weakref.ref(
+        dofn, lambda unused_ref, key=id(dofn): _dofn_specs.pop(key, None))
+  except TypeError:
+    # The DoFn can not be weakly referenced.
+    pass
+  else:
+    _dofn_specs[id(dofn)] = dofn_ref, (
+        frozenset(all_state_specs), frozenset(all_timer_specs))
+  return all_state_specs, all_timer_specs
+
 
+def _get_dofn_specs(dofn):
   # Avoid circular import.
-  from apache_beam.runners.common import MethodWrapper
   from apache_beam.transforms.core import _DoFnParam
   from apache_beam.transforms.core import _StateDoFnParam
   from apache_beam.transforms.core import _TimerDoFnParam
@@ -145,16 +192,17 @@ def get_dofn_specs(dofn):
   # Validate params to process(), start_bundle(), finish_bundle() and to
   # any on_timer callbacks.
   for method_name in dir(dofn):
-    if not isinstance(getattr(dofn, method_name, None), types.MethodType):
+    method = getattr(dofn, method_name, None)
+    if not isinstance(method, types.MethodType):
       continue
-    method = MethodWrapper(dofn, method_name)
-    param_ids = [d.param_id for d in method.defaults
+    defaults = _get_method_defaults(dofn, method_name, method)
+    param_ids = [d.param_id for d in defaults
                  if isinstance(d, _DoFnParam)]
     if len(param_ids) != len(set(param_ids)):
       raise ValueError(
           'DoFn %r has duplicate %s method parameters: %s.' % (
               dofn, method_name, param_ids))
-    for d in method.defaults:
+    for d in defaults:
       if isinstance(d, _StateDoFnParam):
         all_state_specs.add(d.state_spec)
       elif isinstance(d, _TimerDoFnParam):
@@ -31,6 +31,7 @@ from builtins import zip
 
 from future.utils import itervalues
 
+from apache_beam import coders
 from apache_beam import typehints
 from apache_beam.metrics import Metrics
 from apache_beam.portability import common_urns
@@ -388,71 +389,157 @@ class _BatchSizeEstimator(object):
     return int(max(self._min_batch_size + jitter, min(target, cap)))
 
 
-class _GlobalWindowsBatchingDoFn(DoFn):
-  def __init__(self, batch_size_estimator):
+def _to_numpy_batch(batch):
+  """Stacks a batch of homogeneous elements into a NumPy array.
+
+  Returns the batch itself if the elements are not of a single type or do not
+  stack into an array of a non-object dtype.
+  """
+  import numpy as np
+  first_type = type(batch[0])
+  if any(type(element) is not first_type for element in batch):
+    return batch
+  try:
+    array = np.asarray(batch)
+  except ValueError:
+    return batch
+  return batch if array.dtype == np.object_ else array
+
+
+def _to_pyarrow_batch(batch):
+  """Converts a batch of dicts sharing the same keys into a RecordBatch.
+
+  Returns the batch itself if the elements are not dicts with the same keys,
+  or if the values of a key do not convert into an array, e.g. as they are of
+  mixed types.
+  """
+  import pyarrow as pa
+  if not isinstance(batch[0], dict):
+    return batch
+  names = sorted(batch[0])
+  if any(not isinstance(element, dict) or sorted(element) != names
+         for element in batch):
+    return batch
+  try:
+    arrays = [pa.array([element[name] for element in batch])
+              for name in names]
+  except (pa.ArrowException, TypeError):
+    return batch
+  return pa.RecordBatch.from_arrays(arrays, names)
+
+
+_BATCH_FORMATTERS = {
+    'numpy': _to_numpy_batch,
+    'pyarrow': _to_pyarrow_batch,
+}
+
+
+class _BatchingDoFnBase(DoFn):
+  """Common batch bookkeeping for the batching DoFns.
+
+  A batch is emitted once it has reached the estimated batch size or, if an
+  element_size_fn is given, when adding the next element would make it exceed
+  max_batch_byte_size.
+  """
+
+  def __init__(self, batch_size_estimator, element_size_fn=None,
+               max_batch_byte_size=None, batch_formatter=None):
     self._batch_size_estimator = batch_size_estimator
+    self._element_size_fn = element_size_fn
+    self._max_batch_byte_size = max_batch_byte_size
+    self._batch_formatter = batch_formatter
+
+  def _format(self, batch):
+    if self._batch_formatter is None:
+      return batch
+    return self._batch_formatter(batch)
+
+
+class _GlobalWindowsBatchingDoFn(_BatchingDoFnBase):
 
   def start_bundle(self):
     self._batch = []
+    self._batch_byte_size = 0
     self._batch_size = self._batch_size_estimator.next_batch_size()
     # The first emit often involves non-trivial setup.
     self._batch_size_estimator.ignore_next_timing()
 
+  def _emit(self):
+    with self._batch_size_estimator.record_time(len(self._batch)):
+      yield self._format(self._batch)
+    self._batch = []
+    self._batch_byte_size = 0
+    self._batch_size = self._batch_size_estimator.next_batch_size()
+
   def process(self, element):
+    if self._element_size_fn is not None:
+      element_byte_size = self._element_size_fn(element)
+      if (self._batch and self._batch_byte_size + element_byte_size
+          > self._max_batch_byte_size):
+        for batch in self._emit():
+          yield batch
+      self._batch_byte_size += element_byte_size
     self._batch.append(element)
     if len(self._batch) >= self._batch_size:
-      with self._batch_size_estimator.record_time(self._batch_size):
-        yield self._batch
-      self._batch = []
-      self._batch_size = self._batch_size_estimator.next_batch_size()
+      for batch in self._emit():
+        yield batch
 
   def finish_bundle(self):
     if self._batch:
-      with self._batch_size_estimator.record_time(self._batch_size):
-        yield window.GlobalWindows.windowed_value(self._batch)
+      with self._batch_size_estimator.record_time(len(self._batch)):
+        yield window.GlobalWindows.windowed_value(self._format(self._batch))
       self._batch = None
       self._batch_size = self._batch_size_estimator.next_batch_size()
 
 
-class _WindowAwareBatchingDoFn(DoFn):
+class _WindowAwareBatchingDoFn(_BatchingDoFnBase):
 
   _MAX_LIVE_WINDOWS = 10
 
-  def __init__(self, batch_size_estimator):
-    self._batch_size_estimator = batch_size_estimator
-
   def start_bundle(self):
     self._batches = collections.defaultdict(list)
+    self._batch_byte_sizes = collections.defaultdict(int)
     self._batch_size = self._batch_size_estimator.next_batch_size()
     # The first emit often involves non-trivial setup.
     self._batch_size_estimator.ignore_next_timing()
 
+  def _emit(self, window):
+    batch = self._batches.pop(window)
+    self._batch_byte_sizes.pop(window, None)
+    with self._batch_size_estimator.record_time(len(batch)):
+      yield windowed_value.WindowedValue(
+          self._format(batch), window.max_timestamp(), (window,))
+    self._batch_size = self._batch_size_estimator.next_batch_size()
+
   def process(self, element, window=DoFn.WindowParam):
+    if self._element_size_fn is not None:
+      element_byte_size = self._element_size_fn(element)
+      if (self._batches.get(window) and
+          self._batch_byte_sizes[window] + element_byte_size
+          > self._max_batch_byte_size):
+        for batch in self._emit(window):
+          yield batch
+      self._batch_byte_sizes[window] += element_byte_size
     self._batches[window].append(element)
     if len(self._batches[window]) >= self._batch_size:
-      with self._batch_size_estimator.record_time(self._batch_size):
-        yield windowed_value.WindowedValue(
-            self._batches[window], window.max_timestamp(), (window,))
-      del self._batches[window]
-      self._batch_size = self._batch_size_estimator.next_batch_size()
+      for batch in self._emit(window):
+        yield batch
     elif len(self._batches) > self._MAX_LIVE_WINDOWS:
       window, _ = sorted(
           self._batches.items(),
           key=lambda window_batch: len(window_batch[1]),
           reverse=True)[0]
-      with self._batch_size_estimator.record_time(self._batch_size):
-        yield windowed_value.WindowedValue(
-            self._batches[window], window.max_timestamp(), (window,))
-      del self._batches[window]
-      self._batch_size = self._batch_size_estimator.next_batch_size()
+      for batch in self._emit(window):
+        yield batch
 
   def finish_bundle(self):
     for window, batch in self._batches.items():
       if batch:
-        with self._batch_size_estimator.record_time(self._batch_size):
+        with self._batch_size_estimator.record_time(len(batch)):
           yield windowed_value.WindowedValue(
-              batch, window.max_timestamp(), (window,))
+              self._format(batch), window.max_timestamp(), (window,))
     self._batches = None
+    self._batch_byte_sizes = None
     self._batch_size = self._batch_size_estimator.next_batch_size()
 
 
@@ -489,6 +576,17 @@ class BatchElements(PTransform):
         linear interpolation
     clock: (optional) an alternative to time.time for measuring the cost of
         donwstream operations (mostly for testing)
+    max_batch_byte_size: (optional) the largest total size, in bytes, of the
+        elements of a batch; a batch is emitted before it would exceed this
+        size, although a single element larger than it still forms its own
+        batch
+    element_size_fn: (optional) a function returning the size in bytes of an
+        element, used with max_batch_byte_size; defaults to the estimate_size
+        of the input PCollection's coder
+    batch_format: (optional) either 'numpy', to emit batches of homogeneous
+        elements as NumPy arrays, or 'pyarrow', to emit batches of dicts
+        sharing the same keys as ``pyarrow.RecordBatch`` objects with a column
+        per key; batches that cannot be converted are emitted as lists
   """
 
   def __init__(self,
@@ -497,7 +595,18 @@ class BatchElements(PTransform):
                target_batch_overhead=.05,
                target_batch_duration_secs=1,
                variance=0.25,
-               clock=time.time):
+               clock=time.time,
+               max_batch_byte_size=None,
+               element_size_fn=None,
+               batch_format=None):
+    if max_batch_byte_size is not None and max_batch_byte_size <= 0:
+      raise ValueError("max_batch_byte_size (%s) must be positive" % (
+          max_batch_byte_size))
+    if element_size_fn is not None and max_batch_byte_size is None:
+      raise ValueError("element_size_fn requires max_batch_byte_size.")
+    if batch_format is not None and batch_format not in _BATCH_FORMATTERS:
+      raise ValueError("batch_format (%s) must be one of %s" % (
+          batch_format, sorted(_BATCH_FORMATTERS)))
     self._batch_size_estimator = _BatchSizeEstimator(
         min_batch_size=min_batch_size,
         max_batch_size=max_batch_size,
@@ -505,17 +614,31 @@ class BatchElements(PTransform):
         target_batch_duration_secs=target_batch_duration_secs,
         variance=variance,
         clock=clock)
+    self._max_batch_byte_size = max_batch_byte_size
+    self._element_size_fn = element_size_fn
+    self._batch_format = batch_format
+    if batch_format is not None:
+      self.with_output_types(typehints.Any)
 
   def expand(self, pcoll):
+    element_size_fn = self._element_size_fn
+    if self._max_batch_byte_size is not None and element_size_fn is None:
+      element_size_fn = coders.registry.get_coder(
+          pcoll.element_type).estimate_size
+    kwargs = dict(
+        element_size_fn=element_size_fn,
+        max_batch_byte_size=self._max_batch_byte_size,
+        batch_formatter=_BATCH_FORMATTERS.get(self._batch_format))
     if getattr(pcoll.pipeline.runner, 'is_streaming', False):
       raise NotImplementedError("Requires stateful processing (BEAM-2687)")
     elif pcoll.windowing.is_default():
       # This is the same logic as _GlobalWindowsBatchingDoFn, but optimized
       # for that simpler case.
       return pcoll | ParDo(_GlobalWindowsBatchingDoFn(
-          self._batch_size_estimator))
+          self._batch_size_estimator, **kwargs))
     else:
-      return pcoll | ParDo(_WindowAwareBatchingDoFn(self._batch_size_estimator))
+      return pcoll | ParDo(_WindowAwareBatchingDoFn(
+          self._batch_size_estimator, **kwargs))
 
 
 class _IdentityWindowFn(NonMergingWindowFn):
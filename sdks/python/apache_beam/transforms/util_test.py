@@ -99,6 +99,65 @@ class BatchElementsTest(unittest.TestCase):
           10, 7,         # elements in [30, 47)
       ]))
 
+  def test_byte_size_batches(self):
+    # Assumes a single bundle...
+    with TestPipeline() as p:
+      res = (
+          p
+          | beam.Create(['a' * 4, 'b' * 4, 'c' * 8, 'd', 'e' * 20, 'f'])
+          | util.BatchElements(
+              min_batch_size=10, max_batch_size=10, max_batch_byte_size=10,
+              element_size_fn=len)
+          | beam.Map(lambda batch: ''.join(batch)))
+      assert_that(res, equal_to(
+          ['a' * 4 + 'b' * 4, 'c' * 8 + 'd', 'e' * 20, 'f']))
+
+  def test_byte_size_batches_with_coder_size(self):
+    # Assumes a single bundle...
+    with TestPipeline() as p:
+      res = (
+          p
+          | beam.Create([b'x' * 10] * 10)
+          | util.BatchElements(
+              min_batch_size=10, max_batch_size=10, max_batch_byte_size=25)
+          | beam.Map(len))
+      # Each element has an estimated size of 10 bytes, plus 1 for its length.
+      assert_that(res, equal_to([2, 2, 2, 2, 2]))
+
+  def test_numpy_batches(self):
+    import numpy as np
+    with TestPipeline() as p:
+      res = (
+          p
+          | beam.Create(range(10))
+          | util.BatchElements(
+              min_batch_size=5, max_batch_size=5, batch_format='numpy')
+          | beam.Map(lambda batch: (type(batch), batch.sum())))
+      assert_that(res, equal_to([(np.ndarray, 10), (np.ndarray, 35)]))
+
+  def test_numpy_batches_of_mixed_types_stay_lists(self):
+    self.assertEqual([1, 'a'], util._to_numpy_batch([1, 'a']))
+    self.assertEqual([(1, 2), (3,)], util._to_numpy_batch([(1, 2), (3,)]))
+
+  def test_pyarrow_batches(self):
+    with TestPipeline() as p:
+      res = (
+          p
+          | beam.Create([{'x': i, 'y': str(i)} for i in range(4)])
+          | util.BatchElements(
+              min_batch_size=4, max_batch_size=4, batch_format='pyarrow')
+          | beam.Map(lambda batch: (batch.num_rows, batch.schema.names,
+                                    batch.column(0).to_pylist())))
+      assert_that(res, equal_to([(4, ['x', 'y'], [0, 1, 2, 3])]))
+    self.assertEqual([{'x': 1}, {'y': 2}],
+                     util._to_pyarrow_batch([{'x': 1}, {'y': 2}]))
+    self.assertEqual([{'x': 1}, {'x': 'a'}],
+                     util._to_pyarrow_batch([{'x': 1}, {'x': 'a'}]))
+
+  def test_invalid_batch_format(self):
+    with self.assertRaises(ValueError):
+      util.BatchElements(batch_format='csv')
+
   def test_target_duration(self):
     clock = FakeClock()
     batch_estimator = util._BatchSizeEstimator(
@@ -286,9 +286,37 @@ def infer_return_type(c, input_types, debug=False, depth=5):
       return Any
 
 
+# The return types inferred for functions, keyed by their code object, input
+# types and inspection depth, with the values of the closure and globals
+# which the code referenced when the type was inferred. Many functions share
+# their code, e.g. lambdas created in a loop, and hence their return type.
+_MAX_CACHED_RETURN_TYPES = 10000
+_return_types = {}
+_MISSING = object()
+
+
+def _return_type_cache_key(f, input_types, depth):
+  key = (f.__code__, depth) + tuple(
+      (Const, t.type, t.value) if isinstance(t, Const) else t
+      for t in input_types)
+  hash(key)
+  return key
+
+
+def _referenced_values(f):
+  f_globals = f.__globals__
+  return tuple(
+      [f_globals.get(name, _MISSING) for name in f.__code__.co_names]
+      + [cell.cell_contents for cell in f.__closure__ or ()])
+
+
 def infer_return_type_func(f, input_types, debug=False, depth=0):
   """Analyses a function to deduce its return type.
 
+  The inferred types are cached, and reused for functions with the same code
+  which reference the same global and closure values. The functions which f
+  calls are assumed not to be redefined.
+
   Args:
     f: A Python function object to infer the return type of.
     input_types: A sequence of inputs corresponding to the input types.
@@ -302,11 +330,41 @@ def infer_return_type_func(f, input_types, debug=False, depth=0):
   Raises:
     TypeInferenceError: if no type can be inferred.
   """
+  if debug:
+    return _infer_return_type_func(f, input_types, debug, depth)
+  try:
+    key = _return_type_cache_key(f, input_types, depth)
+    referenced_values = _referenced_values(f)
+  except (TypeError, ValueError):
+    # Unhashable input types, or empty closure cells.
+    return _infer_return_type_func(f, input_types, debug, depth)
+  cached = _return_types.get(key)
+  if cached is not None and len(cached[0]) == len(referenced_values) and all(
+      a is b for a, b in zip(cached[0], referenced_values)):
+    return cached[1]
+  result = _infer_return_type_func(f, input_types, debug, depth)
+  if len(_return_types) >= _MAX_CACHED_RETURN_TYPES:
+    _return_types.clear()
+  _return_types[key] = referenced_values, result
+  return result
+
+
+_simple_ops = None
+
+
+def _get_simple_ops():
+  global _simple_ops
+  if _simple_ops is None:
+    from . import opcodes
+    _simple_ops = dict((k.upper(), v) for k, v in opcodes.__dict__.items())
+  return _simple_ops
+
+
+def _infer_return_type_func(f, input_types, debug=False, depth=0):
   if debug:
     print()
     print(f, id(f), input_types)
-  from . import opcodes
-  simple_ops = dict((k.upper(), v) for k, v in opcodes.__dict__.items())
+  simple_ops = _get_simple_ops()
 
   co = f.__code__
   code = co.co_code
@@ -207,6 +207,24 @@ class TrivialInferenceTest(unittest.TestCase):
         typehints.Any,
         lambda row: {f: row[f] for f in fields}, [typehints.Any])
 
+  def testCachedByCode(self):
+    def make_fn(value):
+      return lambda x: (x, value)
+    self.assertReturnType(typehints.Tuple[int, int], make_fn(1), [int])
+    # The same code, with other closure values or inputs.
+    self.assertReturnType(typehints.Tuple[int, str], make_fn('a'), [int])
+    self.assertReturnType(typehints.Tuple[str, str], make_fn('a'), [str])
+
+  def testCachedTypeOfRedefinedGlobal(self):
+    global global_int  # pylint: disable=global-statement
+    f = lambda: global_int
+    self.assertReturnType(int, f)
+    global_int = 'a'
+    try:
+      self.assertReturnType(str, f)
+    finally:
+      global_int = 1
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -15,7 +15,11 @@
 # limitations under the License.
 #
 
-"""A profiler context manager based on cProfile.Profile objects.
+"""Profilers of the CPU and memory usage of the SDK.
+
+This module contains a profiler context manager based on cProfile.Profile
+objects, a low overhead sampling profiler attributing its samples to the
+pipeline steps being executed, and a memory reporter.
 
 For internal use only; no backwards-compatibility guarantees.
 """
@@ -28,11 +32,15 @@ import logging
 import os
 import pstats
 import random
+import re
+import sys
 import tempfile
+import threading
 import time
 import warnings
 from builtins import object
-from threading import Timer
+from collections import Counter
+from collections import defaultdict
 
 from apache_beam.io import filesystems
 
@@ -102,6 +110,202 @@ class Profile(object):
       return create_profiler
 
 
+class SamplingProfiler(object):
+  """A statistical profiler of the threads executing pipeline steps.
+
+  A daemon thread periodically captures the Python stacks of the threads
+  which are executing a bundle, and attributes each sample to the step whose
+  state the thread's state sampler is in. The samples are aggregated into
+  collapsed stacks, one file per step, which can be rendered as flame graphs
+  e.g. by flamegraph.pl or speedscope.
+
+  The sampling period grows whenever taking the samples would use more than
+  ``max_overhead`` of the time, so the profiler can be left running.
+
+  Usage:::
+
+    with SamplingProfiler('worker', profile_location='gs://bucket/profiles'):
+      <process bundles>
+
+  Args:
+    profile_id: a name prefixed to the output files.
+    profile_location: the directory the collapsed stacks are written to on
+      stop() and flush(), or None not to write them.
+    sampling_period_ms: the minimum period between two samples.
+    max_overhead: the maximum fraction of time spent taking samples.
+    all_threads: if set, threads not executing a bundle are sampled too, and
+      attributed to the step ``UNTRACKED_STEP``.
+    flush_interval_secs: if set, the collapsed stacks are also written every
+      so many seconds while the profiler runs.
+    file_copy_fn: the function copying a local file to the profile location.
+  """
+
+  UNTRACKED_STEP = 'untracked'
+  UNKNOWN_STEP = 'unknown'
+  MAX_STACK_DEPTH = 128
+
+  def __init__(self, profile_id, profile_location=None, sampling_period_ms=10,
+               max_overhead=0.01, all_threads=False, flush_interval_secs=None,
+               file_copy_fn=None, time_prefix='%Y-%m-%d_%H_%M_%S-'):
+    self.profile_id = str(profile_id)
+    self.profile_location = profile_location
+    self.sampling_period_ms = sampling_period_ms
+    self.max_overhead = max_overhead
+    self.all_threads = all_threads
+    self.flush_interval_secs = flush_interval_secs
+    self.file_copy_fn = file_copy_fn or Profile.default_file_copy_fn
+    self.time_prefix = time_prefix
+    self.sample_count = 0
+    self.profile_outputs = []
+    # Samples are counted by step and by tuple of code objects, root first,
+    # and only formatted when written.
+    self._samples = defaultdict(Counter)
+    self._lock = threading.Lock()
+    self._stopped = threading.Event()
+    self._thread = None
+    self._start_time = None
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *args):
+    self.stop()
+
+  def start(self):
+    if self._thread:
+      return
+    self._start_time = time.strftime(self.time_prefix)
+    self._stopped.clear()
+    self._thread = threading.Thread(
+        target=self._run, name='sampling-profiler')
+    self._thread.daemon = True
+    self._thread.start()
+    logging.info('Started sampling profiler: %s', self.profile_id)
+
+  def stop(self):
+    if not self._thread:
+      return
+    self._stopped.set()
+    self._thread.join()
+    self._thread = None
+    logging.info('Stopped sampling profiler: %s after %d samples',
+                 self.profile_id, self.sample_count)
+    self.flush()
+
+  def _run(self):
+    from apache_beam.runners.worker import statesampler
+    min_period = self.sampling_period_ms / 1000.0
+    last_flush = time.time()
+    while True:
+      start = time.time()
+      self.sample(statesampler.get_tracker_of_thread)
+      elapsed = time.time() - start
+      if (self.flush_interval_secs
+          and start - last_flush >= self.flush_interval_secs):
+        last_flush = start
+        try:
+          self.flush()
+        except Exception:  # pylint: disable=broad-except
+          logging.warning('Failed to write the sampled profile.',
+                          exc_info=True)
+      if self._stopped.wait(max(min_period, elapsed / self.max_overhead)):
+        return
+
+  def sample(self, get_tracker):
+    """Takes one sample of the stacks of the profiled threads.
+
+    Args:
+      get_tracker: a function returning the state sampler of a thread given
+        its ident, or None if it is not executing a bundle.
+    """
+    own_ident = threading.current_thread().ident
+    samples = []
+    for ident, frame in sys._current_frames().items():  # pylint: disable=protected-access
+      if ident == own_ident:
+        continue
+      step = self._step_of(get_tracker(ident))
+      if step is None:
+        continue
+      stack = []
+      while frame is not None and len(stack) < self.MAX_STACK_DEPTH:
+        stack.append(frame.f_code)
+        frame = frame.f_back
+      stack.reverse()
+      samples.append((step, tuple(stack)))
+    with self._lock:
+      for step, stack in samples:
+        self._samples[step][stack] += 1
+      self.sample_count += 1
+
+  def _step_of(self, tracker):
+    if tracker is None:
+      return self.UNTRACKED_STEP if self.all_threads else None
+    try:
+      name_context = tracker.current_state().name_context
+    except (AttributeError, IndexError):
+      # The state of the tracker changed while it was being read.
+      return self.UNKNOWN_STEP
+    if name_context is None:
+      return self.UNKNOWN_STEP
+    return name_context.metrics_name()
+
+  @staticmethod
+  def _format_frame(code):
+    return '%s (%s:%d)' % (
+        code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+  def steps(self):
+    """Returns the steps which were sampled."""
+    with self._lock:
+      return sorted(self._samples)
+
+  def collapsed_stacks(self, step):
+    """Returns the samples of a step as collapsed stack lines.
+
+    Each line holds the semicolon separated frames of a stack, root first,
+    followed by the number of times it was sampled.
+    """
+    with self._lock:
+      counts = list(self._samples[step].items())
+    lines = [
+        '%s %d' % (';'.join(self._format_frame(code) for code in stack), count)
+        for stack, count in counts]
+    return sorted(lines)
+
+  def flush(self):
+    """Writes the collapsed stacks of each step to the profile location."""
+    if not self.profile_location:
+      return
+    outputs = []
+    for step in self.steps():
+      dump_location = os.path.join(
+          self.profile_location,
+          '%s%s-%s.collapsed' % (self._start_time, self.profile_id,
+                                 re.sub(r'[^\w.-]+', '_', step)))
+      fd, filename = tempfile.mkstemp()
+      try:
+        with os.fdopen(fd, 'w') as f:
+          for line in self.collapsed_stacks(step):
+            f.write(line + '\n')
+        self.file_copy_fn(filename, dump_location)
+      finally:
+        os.remove(filename)
+      outputs.append(dump_location)
+    logging.info('Wrote sampled profiles to: %s', outputs)
+    self.profile_outputs = outputs
+
+  @staticmethod
+  def factory_from_options(options):
+    """Returns a SamplingProfiler if enabled by the ProfilingOptions."""
+    if options.profile_cpu_sampling:
+      return SamplingProfiler(
+          'sampled',
+          profile_location=options.profile_location,
+          sampling_period_ms=options.profile_sampling_period_ms,
+          flush_interval_secs=options.profile_flush_interval_secs)
+
+
 class MemoryReporter(object):
   """A memory reporter that reports the memory usage and heap profile.
   Usage:::
@@ -159,10 +363,10 @@ class MemoryReporter(object):
       if not self._enabled:
         return
       self.report_once()
-      self._timer = Timer(self._interval_second, report_with_interval)
+      self._timer = threading.Timer(self._interval_second, report_with_interval)
       self._timer.start()
 
-    self._timer = Timer(self._interval_second, report_with_interval)
+    self._timer = threading.Timer(self._interval_second, report_with_interval)
     self._timer.start()
 
   def stop(self):
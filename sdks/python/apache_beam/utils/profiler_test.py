@@ -0,0 +1,118 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Unit tests for the profilers."""
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from apache_beam.runners.worker import statesampler
+from apache_beam.utils import profiler
+from apache_beam.utils.counters import CounterFactory
+
+
+def _busy_step_function(seconds):
+  end = time.time() + seconds
+  while time.time() < end:
+    pass
+
+
+class SamplingProfilerTest(unittest.TestCase):
+
+  def setUp(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def run_in_step(self, step_name, target):
+    def run():
+      sampler = statesampler.StateSampler('stage', CounterFactory())
+      sampler.start()
+      try:
+        with sampler.scoped_state(step_name, 'process'):
+          target()
+      finally:
+        sampler.stop()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+  def test_samples_are_attributed_to_steps(self):
+    sampling_profiler = profiler.SamplingProfiler(
+        'test', profile_location=self.tmpdir, sampling_period_ms=1,
+        max_overhead=0.5, file_copy_fn=shutil.copyfile, time_prefix='')
+    with sampling_profiler:
+      thread = self.run_in_step(
+          'my_step', lambda: _busy_step_function(0.5))
+      thread.join()
+
+    self.assertGreater(sampling_profiler.sample_count, 0)
+    self.assertIn('my_step', sampling_profiler.steps())
+    stacks = sampling_profiler.collapsed_stacks('my_step')
+    self.assertTrue(
+        any('_busy_step_function (profiler_test.py:' in line
+            for line in stacks),
+        stacks)
+    # Each line ends with the number of times its stack was sampled.
+    self.assertTrue(all(int(line.rsplit(' ', 1)[1]) > 0 for line in stacks))
+
+    output = os.path.join(self.tmpdir, 'test-my_step.collapsed')
+    self.assertIn(output, sampling_profiler.profile_outputs)
+    with open(output) as f:
+      self.assertEqual(stacks, f.read().splitlines())
+
+  def sample_from_other_thread(self, sampling_profiler, get_tracker):
+    thread = threading.Thread(
+        target=sampling_profiler.sample, args=(get_tracker,))
+    thread.start()
+    thread.join()
+
+  def test_untracked_threads(self):
+    sampling_profiler = profiler.SamplingProfiler('test')
+    self.sample_from_other_thread(sampling_profiler, lambda ident: None)
+    self.assertEqual(1, sampling_profiler.sample_count)
+    self.assertEqual([], sampling_profiler.steps())
+
+    sampling_profiler = profiler.SamplingProfiler('test', all_threads=True)
+    self.sample_from_other_thread(sampling_profiler, lambda ident: None)
+    self.assertEqual([profiler.SamplingProfiler.UNTRACKED_STEP],
+                     sampling_profiler.steps())
+    self.assertIn(
+        'test_untracked_threads (profiler_test.py:',
+        ' '.join(sampling_profiler.collapsed_stacks(
+            profiler.SamplingProfiler.UNTRACKED_STEP)))
+
+  def test_sampling_period_bounds_overhead(self):
+    sampling_profiler = profiler.SamplingProfiler(
+        'test', sampling_period_ms=0, max_overhead=0.01)
+    with sampling_profiler:
+      thread = self.run_in_step(
+          'my_step', lambda: _busy_step_function(0.2))
+      thread.join()
+    # Even with no minimum period, samples are spaced by a hundred times
+    # the time taken to take them.
+    self.assertLess(sampling_profiler.sample_count, 1000)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,80 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Compact probabilistic summaries of streams of values.
+
+For internal use only; no backwards-compatibility guarantees.
+"""
+
+from __future__ import absolute_import
+
+import random
+from builtins import object
+from builtins import range
+
+# A Mersenne prime larger than any hash value, used for universal hashing.
+_PRIME = (1 << 61) - 1
+
+
+class CountMinSketch(object):
+  """A count-min sketch estimating the frequency of hashable items.
+
+  Estimates never undercount; with ``width`` counters per row they overcount
+  by at most ``2 * total / width`` with probability ``1 - 2**-depth``.
+
+  Args:
+    width: number of counters per row.
+    depth: number of independent rows (hash functions).
+    seed: optional seed for the hash functions.
+  """
+
+  def __init__(self, width=1024, depth=4, seed=None):
+    assert width > 0 and depth > 0
+    rand = random.Random(seed)
+    self._width = width
+    self._hashes = [(rand.randint(1, _PRIME - 1), rand.randint(0, _PRIME - 1))
+                    for _ in range(depth)]
+    self._rows = [[0] * width for _ in range(depth)]
+    self.total = 0
+
+  def _indices(self, item):
+    h = hash(item)
+    width = self._width
+    return [((a * h + b) % _PRIME) % width for a, b in self._hashes]
+
+  def add(self, item, count=1):
+    """Adds count occurrences of item and returns its new estimated count."""
+    estimate = None
+    for row, index in zip(self._rows, self._indices(item)):
+      value = row[index] + count
+      row[index] = value
+      if estimate is None or value < estimate:
+        estimate = value
+    self.total += count
+    return estimate
+
+  def estimate(self, item):
+    """Returns the estimated number of occurrences of item."""
+    return min(row[index]
+               for row, index in zip(self._rows, self._indices(item)))
+
+  def decay(self, factor=0.5):
+    """Scales all the counts down, so that recent items weigh the most."""
+    for row in self._rows:
+      for i in range(self._width):
+        row[i] = int(row[i] * factor)
+    self.total = int(self.total * factor)
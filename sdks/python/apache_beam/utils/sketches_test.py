@@ -0,0 +1,58 @@
+#
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+"""Unit tests for the sketches module."""
+
+from __future__ import absolute_import
+
+import unittest
+from builtins import range
+
+from apache_beam.utils.sketches import CountMinSketch
+
+
+class CountMinSketchTest(unittest.TestCase):
+
+  def test_never_undercounts(self):
+    sketch = CountMinSketch(width=16, depth=3, seed=0)
+    counts = {}
+    for i in range(1000):
+      key = 'key%d' % (i % 37)
+      counts[key] = counts.get(key, 0) + 1
+      self.assertGreaterEqual(sketch.add(key), counts[key])
+    for key, count in counts.items():
+      self.assertGreaterEqual(sketch.estimate(key), count)
+    self.assertEqual(1000, sketch.total)
+
+  def test_heavy_hitter_estimate(self):
+    sketch = CountMinSketch(width=1024, depth=4, seed=0)
+    for i in range(1000):
+      sketch.add('hot')
+      sketch.add(i)
+    self.assertEqual(1000, sketch.estimate('hot'))
+    self.assertLess(sketch.estimate(-1), 10)
+
+  def test_decay(self):
+    sketch = CountMinSketch(seed=0)
+    sketch.add('a', 10)
+    sketch.decay()
+    self.assertEqual(5, sketch.estimate('a'))
+    self.assertEqual(5, sketch.total)
+
+
+if __name__ == '__main__':
+  unittest.main()